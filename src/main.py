@@ -1,10 +1,28 @@
+import time
+_STARTED_AT = time.perf_counter() # Taken before the heavier imports so the startup report covers them
 import tkinter as tk
-from tkinter import ttk, filedialog, messagebox
-import subprocess
+from tkinter import ttk, filedialog, messagebox, simpledialog
 import os
 import sys # Added for resource_path
-import json
-from ttkthemes import ThemedTk
+import threading
+from replay_core.engine import ConversionJob
+from replay_core.util import format_bytes, format_elapsed
+from replay_core.outputlog import STDERR, new_log_path, prune_logs
+from replay_core.batch import BatchJob, BatchRunner, default_max_workers
+from replay_core.command import (OUTPUT_FORMATS, INPUT_EXTENSIONS, CommandError, build_command,
+                                 format_command, default_output_base, get_option_value)
+from replay_core.frames import build_shard_commands, frame_commands, resolve_frame_selection
+from replay_core.preview import CommandPreviewModel, diff_text
+from replay_core.progress import ProgressSnapshot
+from replay_core.cache import ConversionCache, cache_from_settings
+from replay_core.startup import StartupProfiler, profiling_requested
+from replay_core.scheduler import ORDERINGS, scheduler_from_settings
+from replay_core.probe import ConverterProbe
+from replay_core.presets import Preset, PresetStore
+from replay_core.resume import ExportCheckpoint, plan_export
+from replay_core.metrics import MetricsRegistry, MetricsServer, describe_snapshot
+from replay_core.launcher import MODES as LAUNCH_MODES, PRIORITIES, launcher_from_settings
+from replay_core import settings as settings_store
 
 def resource_path(relative_path):
     """ Get absolute path to resource, works for dev and for PyInstaller """
@@ -22,47 +40,76 @@ class ReplayConverterApp:
     """
     A GUI application for LMI's ReplayConverter.exe tool with an improved visual design.
     """
-    APP_NAME = "ReplayConverterGUI"
-    SETTINGS_FILENAME = "replay_converter_settings.json"
-
-    def __init__(self, root):
+    APP_NAME = settings_store.APP_NAME
+    SETTINGS_FILENAME = settings_store.SETTINGS_FILENAME
+    JOB_POLL_INTERVAL_MS = 100 # How often the Tk thread checks on a running conversion
+    DEBUG_OVERLAY_INTERVAL_MS = 1000 # How often the F12 debug overlay refreshes its numbers
+    LOG_VIEW_MAX_LINES = 1000 # Lines kept in the log pane; the full output is in the log file
+    PREVIEW_DEBOUNCE_MS = 150 # Typing pauses this long before the command preview is rebuilt
+    FRAME_PREVIEW_DEBOUNCE_MS = 250 # Scrubbing pauses this long before a frame is rendered
+    CONVERTER_INFO_POLL_MS = 250 # How often the settings window checks whether a new converter has been probed
+    INPUT_EXTENSIONS = INPUT_EXTENSIONS # Picked up by "Add Folder..." in batch mode
+
+    THEME_NAME = "arc"
+
+    def __init__(self, root, profiler=None):
         """
         Initializes the main application window.
+        The theme, styles and icon are applied in finish_startup, once the window is on screen.
         Args:
-            root: The root ThemedTk window.
+            root: The root Tk window.
+            profiler: Optional StartupProfiler that records the startup phases.
         """
         self.root = root
+        self.profiler = profiler or StartupProfiler()
         self.root.title("Replay Converter UI")
-        self.root.geometry("700x600")
-        self.root.minsize(650, 480)
-
-        # Set application icon
-        try:
-            # Use resource_path to find icon.png correctly in dev and frozen states
-            # "icon.png" is the relative path from base_path (src/ for dev, _MEIPASS/ for frozen)
-            icon_path_resolved = resource_path("icon.png")
-            if os.path.exists(icon_path_resolved):
-                self.app_icon = tk.PhotoImage(file=icon_path_resolved) # Keep a reference
-                self.root.iconphoto(True, self.app_icon)
-            else:
-                print(f"Warning: Application icon 'icon.png' not found at resolved path: {icon_path_resolved}")
-        except tk.TclError as e:
-            # Handle cases where the icon format might not be supported or other Tk errors
-            print(f"Warning: Could not set application icon: {e}")
-        except Exception as e: # Catch other potential errors during icon loading
-            print(f"An unexpected error occurred while setting application icon: {e}")
+        self.root.geometry("700x780")
+        self.root.minsize(650, 600)
+        self.styles_ready = False
+        self.settings_window = None # Built on first open, then reused
 
         # --- Instance Variables ---
         self.command_parts = []
+        self.current_job = None # The ConversionJob currently running, if any
+        self.shard_runner = None # BatchRunner for a frame list/range export from the main window
+        self.shard_frames = [] # Frames selected when the frame field holds a list or range
+        self.batch_window = None
+        self.batch_runner = None
+        self.batch_inputs = [] # Input files queued in the batch window
+        self.watch_window = None
+        self.watcher = None # FolderWatcher while "Watch Folder" is on
         # Determine and set up the settings file path
-        self.app_data_dir = os.path.join(os.path.expanduser("~"), f".{self.APP_NAME}")
+        self.app_data_dir = settings_store.get_app_data_dir()
         self.settings_file_path = os.path.join(self.app_data_dir, self.SETTINGS_FILENAME)
+        self.log_dir = os.path.join(self.app_data_dir, "logs")
+        self.cache_dir = os.path.join(self.app_data_dir, "cache")
+        self.history = None # JobHistory every run is recorded in, opened on first use (see get_history)
+        self.metrics = MetricsRegistry() # Stage timings and counters, shown by the F12 debug overlay
+        self.metrics_server = None # MetricsServer while the "metrics_port" setting is set
+        self.debug_overlay = None # Label of the debug overlay while it is shown
+        self.debug_overlay_after_id = None
+        self.history_window = None
+        self.staging = None # StagingArea shared by all runs, see get_staging
+        self.staging_key = None # The settings self.staging was built from
+        self.frame_preview_window = None
+        self.thumbnail_renderer = None # Created with the first preview
+        self.frame_preview_key = None # Thumbnail the preview window is waiting for
+        self.frame_preview_after_id = None
+        self.log_seq = 0 # Next OutputLog line the log pane hasn't shown yet
         self.settings = self.load_settings()
+        # What the converter supports; started the way conversions are (see get_launcher)
+        self.converter_probe = ConverterProbe(settings_store.get_probe_cache_path(), launcher=self.get_launcher())
+        self.settings_baseline = dict(self.settings) # As read from the file, so saving only writes what changed here
+        self.presets = PresetStore(settings_store.get_presets_file_path()) # Shared with other instances and the CLI
+        self.profiler.mark("load settings")
 
         self._processing_output_entry_change = False # Flag to prevent recursion
 
-        # --- Style Configuration ---
-        self.setup_styles()
+        # Command preview state (see update_command_display)
+        self.preview_model = CommandPreviewModel()
+        self.preset_pcd = {} # PCD options of the applied preset; they override the saved ones until Settings are saved
+        self._preview_after_id = None # Pending debounced preview update
+        self._shown_preview = ("", ("", None)) # (command, (footer, tag)) currently in the Text widget
 
         # --- Main Frame ---
         main_frame = ttk.Frame(self.root, padding="20")
@@ -92,7 +139,7 @@ class ReplayConverterApp:
         self.output_format_dropdown = ttk.Combobox(
             options_frame,
             textvariable=self.output_format_var,
-            values=['.gprec', '.srf', '.sur', '.pcd', '.pro', '.csv'],
+            values=list(OUTPUT_FORMATS),
             state='readonly'
         )
         self.output_format_dropdown.grid(row=0, column=1, sticky='ew', pady=5)
@@ -104,11 +151,14 @@ class ReplayConverterApp:
                                                 variable=self.export_all_var, command=self.toggle_frame_entry)
         self.export_all_check.grid(row=1, column=0, sticky='w', pady=5)
 
-        ttk.Label(options_frame, text="Frame Index (-f):").grid(row=1, column=2, sticky='e', padx=(20, 10), pady=5)
+        # Accepts a single index, or a list/range (e.g. 3,7,42 or 1000-5000:10) that runs one job per frame
+        ttk.Label(options_frame, text="Frame(s) (-f):").grid(row=1, column=2, sticky='e', padx=(20, 10), pady=5)
         self.frame_index_var = tk.StringVar(value="0")
         self.frame_index_entry = ttk.Entry(options_frame, textvariable=self.frame_index_var, width=15)
         self.frame_index_entry.grid(row=1, column=3, sticky='ew', pady=5)
-        self.frame_index_entry.bind("<KeyRelease>", self.update_command_display)
+        self.frame_index_entry.bind("<KeyRelease>", self.schedule_command_update)
+        self.frame_preview_button = ttk.Button(options_frame, text="Preview...", command=self.open_frame_preview_window)
+        self.frame_preview_button.grid(row=1, column=4, sticky='w', padx=(5, 0), pady=5)
 
         # Output File Name
         ttk.Label(options_frame, text="Output Name:").grid(row=2, column=0, sticky='w', padx=(0, 10), pady=(15, 5))
@@ -120,6 +170,19 @@ class ReplayConverterApp:
         self.browse_output_button = ttk.Button(options_frame, text="Browse...", command=self.browse_output_file, width=10)
         self.browse_output_button.grid(row=2, column=2, sticky='e', padx=(5,0), pady=(15,5))
 
+        # Presets: named format + frame mode + PCD options
+        ttk.Label(options_frame, text="Preset:").grid(row=3, column=0, sticky='w', padx=(0, 10), pady=5)
+        self.preset_var = tk.StringVar()
+        # postcommand re-reads the preset list when it was changed elsewhere (another window or instance)
+        self.preset_dropdown = ttk.Combobox(options_frame, textvariable=self.preset_var, state='readonly',
+                                            postcommand=self.refresh_preset_names)
+        self.preset_dropdown.grid(row=3, column=1, sticky='ew', pady=5)
+        self.preset_dropdown.bind("<<ComboboxSelected>>", self.apply_preset)
+        preset_buttons = ttk.Frame(options_frame)
+        preset_buttons.grid(row=3, column=2, columnspan=3, sticky='w', padx=(5, 0), pady=5)
+        ttk.Button(preset_buttons, text="Save As...", command=self.save_preset).pack(side='left')
+        ttk.Button(preset_buttons, text="Delete", command=self.delete_preset).pack(side='left', padx=(5, 0))
+
 
         # --- Command Preview Section ---
         command_frame = ttk.LabelFrame(main_frame, text="3. Review Command", padding=(15, 10))
@@ -131,6 +194,31 @@ class ReplayConverterApp:
                                     padx=10, pady=10)
         self.command_text.pack(expand=True, fill='both')
         self.command_text.tag_configure("error", foreground="red")
+        self.command_text.tag_configure("info", foreground="#00529B")
+
+        # --- Output Log Section ---
+        log_frame = ttk.LabelFrame(main_frame, text="4. Converter Output", padding=(15, 10))
+        log_frame.pack(expand=True, fill='both', pady=(0, 15))
+
+        # Progress (parsed from frame counters in the output, or from the output file's growth)
+        progress_row = ttk.Frame(log_frame)
+        progress_row.pack(fill='x', pady=(0, 8))
+        self.progress_bar = ttk.Progressbar(progress_row, mode='determinate', maximum=100)
+        self.progress_bar.pack(side='left', expand=True, fill='x')
+        self.progress_text_var = tk.StringVar(value="")
+        ttk.Label(progress_row, textvariable=self.progress_text_var, width=48).pack(side='left', padx=(10, 0))
+        self._progress_indeterminate = False
+
+        self.log_text = tk.Text(log_frame, height=8, wrap='none',
+                                font=("Courier New", 9), relief='solid', borderwidth=1,
+                                background="#FFFFFF", foreground="#333333", state='disabled',
+                                padx=5, pady=5)
+        log_scroll = ttk.Scrollbar(log_frame, orient='vertical', command=self.log_text.yview)
+        self.log_text.configure(yscrollcommand=log_scroll.set)
+        log_scroll.pack(side='right', fill='y')
+        self.log_text.pack(expand=True, fill='both')
+        self.log_text.tag_configure(STDERR, foreground="red")
+        self.log_text.tag_configure("info", foreground="#00529B")
 
         # --- Action Buttons ---
         button_frame = ttk.Frame(main_frame)
@@ -139,15 +227,104 @@ class ReplayConverterApp:
         self.settings_button = ttk.Button(button_frame, text="Settings", command=self.open_settings)
         self.settings_button.pack(side='left')
 
-        self.quit_button = ttk.Button(button_frame, text="Quit", command=self.root.quit)
+        self.batch_button = ttk.Button(button_frame, text="Batch...", command=self.open_batch_window)
+        self.batch_button.pack(side='left', padx=(10, 0))
+
+        self.watch_button = ttk.Button(button_frame, text="Watch...", command=self.open_watch_window)
+        self.watch_button.pack(side='left', padx=(10, 0))
+
+        self.history_button = ttk.Button(button_frame, text="History...", command=self.open_history_window)
+        self.history_button.pack(side='left', padx=(10, 0))
+
+        self.quit_button = ttk.Button(button_frame, text="Quit", command=self.quit_app)
         self.quit_button.pack(side='right')
         
-        self.run_button = ttk.Button(button_frame, text="Convert", command=self.run_conversion, style="Accent.TButton")
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_conversion, state='disabled')
+        self.cancel_button.pack(side='right')
+
+        # Gets the Accent style in finish_startup, once setup_styles has defined it
+        self.run_button = ttk.Button(button_frame, text="Convert", command=self.run_conversion)
         self.run_button.pack(side='right', padx=10)
 
+        # Status line (shows elapsed time while a conversion runs)
+        self.status_var = tk.StringVar(value="Ready")
+        self.status_label = ttk.Label(button_frame, textvariable=self.status_var)
+        self.status_label.pack(side='left', padx=15)
+
+        # Make sure closing the window doesn't leave a converter process behind
+        self.root.protocol("WM_DELETE_WINDOW", self.quit_app)
+        self.root.bind("<F12>", self.toggle_debug_overlay)
+
         # --- Initial State ---
         self.toggle_frame_entry()
         self.update_command_display()
+        self.profiler.mark("build widgets")
+
+        # Theme, styles and icon wait until the window has been drawn once
+        self.root.bind("<Map>", self.on_first_map, add='+')
+
+    def on_first_map(self, event):
+        """Schedules finish_startup after the first paint of the main window."""
+        if event.widget is not self.root:
+            return
+        self.root.unbind("<Map>")
+        # Redraws are idle callbacks queued before this one, so this runs after the window is painted
+        self.root.after_idle(self.finish_startup)
+
+    def finish_startup(self):
+        """Applies the deferred startup work: theme, styles and the window icon."""
+        self.profiler.mark("first paint")
+        self.ensure_styles()
+        self.load_icon()
+        self.profiler.mark("load icon")
+        # Learn the converter's options now so commands can be checked instantly later
+        self.converter_probe.probe_in_background(self.settings.get("converter_path"))
+        self.start_metrics_server()
+        self.profiler.report()
+
+    def start_metrics_server(self):
+        """Serves self.metrics to Prometheus on localhost if the "metrics_port" setting holds a port."""
+        port = str(self.settings.get("metrics_port", "")).strip()
+        if not port:
+            return
+        try:
+            self.metrics_server = MetricsServer(self.metrics, ("127.0.0.1", int(port)))
+            self.metrics_server.start()
+        except (ValueError, OSError) as e:
+            print(f"Warning: Could not serve metrics on port {port}: {e}")
+            self.metrics_server = None
+
+    def ensure_styles(self):
+        """Applies the theme and custom styles once. Windows that use 'Accent.TButton' call this first."""
+        if self.styles_ready:
+            return
+        self.styles_ready = True
+        try:
+            from ttkthemes import ThemedStyle # Imported here: ttkthemes pulls in PIL, which is slow to load
+            ThemedStyle(self.root, theme=self.THEME_NAME)
+        except Exception as e:
+            print(f"Warning: Could not apply the '{self.THEME_NAME}' theme: {e}")
+        self.profiler.mark("apply theme")
+        self.setup_styles()
+        self.run_button.config(style="Accent.TButton")
+        self.profiler.mark("setup styles")
+
+    def load_icon(self):
+        """Sets the application icon."""
+        try:
+            # Use resource_path to find icon.png correctly in dev and frozen states
+            # "icon.png" is the relative path from base_path (src/ for dev, _MEIPASS/ for frozen)
+            icon_path_resolved = resource_path("icon.png")
+            if os.path.exists(icon_path_resolved):
+                self.app_icon = tk.PhotoImage(file=icon_path_resolved) # Keep a reference
+                self.root.iconphoto(True, self.app_icon)
+            else:
+                print(f"Warning: Application icon 'icon.png' not found at resolved path: {icon_path_resolved}")
+        except tk.TclError as e:
+            # Handle cases where the icon format might not be supported or other Tk errors
+            print(f"Warning: Could not set application icon: {e}")
+        except Exception as e: # Catch other potential errors during icon loading
+            print(f"An unexpected error occurred while setting application icon: {e}")
 
     def setup_styles(self):
         """Configures the visual styles for the application widgets."""
@@ -222,83 +399,74 @@ class ReplayConverterApp:
 
     def _get_default_settings(self):
         """Returns a dictionary with default settings."""
-        return {
-            "converter_path": "",
-            "pcd_width": "0",
-            "pcd_height": "0",
-            "pcd_swap": False,
-            "pcd_zoom": "1.0",
-            "pcd_remove": False
-        }
+        return settings_store.get_default_settings()
 
     def load_settings(self):
         """Loads settings from JSON, returns defaults if not found."""
-        default_settings = self._get_default_settings()
         # Ensure the application data directory exists
         if not os.path.exists(self.app_data_dir):
             try:
                 os.makedirs(self.app_data_dir)
             except OSError as e:
                 print(f"Warning: Could not create settings directory {self.app_data_dir}: {e}")
-                # Fallback to default settings if directory creation fails,
-                # but still attempt auto-detection below.
-                settings = default_settings.copy() # Make a copy to modify
-                # Auto-detection logic will run on this copy.
+                # Fall back to default settings, but still attempt auto-detection below.
 
-        # Initialize settings with defaults, then try to load and update
-        settings = default_settings.copy()
-        try:
-            with open(self.settings_file_path, 'r') as f:
-                loaded_settings = json.load(f)
-                # Merge loaded settings with defaults to ensure all keys are present
-                settings.update(loaded_settings)
-        except (FileNotFoundError, json.JSONDecodeError):
-            # File not found or invalid JSON, return defaults. File will be created on first save.
-            # 'settings' remains as default_settings.
-            pass
-        except Exception as e:
-            print(f"Warning: Error loading settings file {self.settings_file_path}: {e}")
-            # 'settings' remains as default_settings in case of other errors.
-            pass
+        # Defaults merged with whatever the settings file holds
+        settings = settings_store.read_settings_file(self.settings_file_path)
 
         # --- Auto-populate converter_path if empty and ReplayConverter.exe is found locally ---
         if not settings.get("converter_path"): # Check if path is empty or not set
             try:
-                local_converter_exe = "ReplayConverter.exe"
-                potential_path = resource_path(local_converter_exe)
-                if os.path.isfile(potential_path):
+                potential_path = settings_store.find_converter([os.path.dirname(resource_path(settings_store.CONVERTER_EXE_NAME))])
+                if potential_path:
                     settings["converter_path"] = potential_path
                     print(f"INFO: Auto-detected and set ReplayConverter.exe path: {potential_path}")
             except Exception as e:
                 print(f"DEBUG: Error during auto-detection of ReplayConverter.exe: {e}")
+            else:
+                if potential_path:
+                    # Remember it so later starts skip the search
+                    try:
+                        settings_store.write_settings_file(self.settings_file_path, settings)
+                    except OSError as e:
+                        print(f"Warning: Could not save the detected converter path: {e}")
         
         return settings
 
     def save_settings(self):
-        """Saves current settings to the JSON file."""
-        if not os.path.exists(self.app_data_dir):
-            try:
-                os.makedirs(self.app_data_dir)
-            except OSError as e:
-                messagebox.showerror("Error", f"Could not create settings directory:\n{self.app_data_dir}\n\nSettings not saved.")
-                return
-        with open(self.settings_file_path, 'w') as f:
-            json.dump(self.settings, f, indent=4)
+        """
+        Saves the settings changed in this window to the JSON file. Settings another
+        instance saved meanwhile are kept, and picked up here.
+        """
+        try:
+            self.settings.update(settings_store.update_settings_file(self.settings_file_path, self.settings,
+                                                                     self.settings_baseline))
+            self.settings_baseline = dict(self.settings)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save settings to:\n{self.settings_file_path}\n\n{e}")
 
     def browse_input_file(self):
-        """Opens a file dialog to select an input file."""
-        file_path = filedialog.askopenfilename(
-            title="Select Input File",
+        """Opens a file dialog to select an input file. Selecting several files opens batch mode."""
+        file_paths = filedialog.askopenfilenames(
+            title="Select Input File(s)",
             filetypes=(("All Supported", "*.gprec *.srf *.sur *.pcd *.pro"),
                        ("GoPxL Recording", "*.gprec"), ("Surface", "*.srf *.sur *.pcd"),
                        ("Profile", "*.pro"), ("All files", "*.*"))
         )
-        if file_path:
+        if len(file_paths) > 1:
+            self.open_batch_window()
+            self.add_batch_inputs(file_paths)
+            return
+        if file_paths:
+            file_path = file_paths[0]
             self.input_file_var.set(file_path)
             path, filename = os.path.split(file_path)
             name, _ = os.path.splitext(filename)
             self.output_file_var.set(os.path.join(path, name))
             self.update_command_display()
+            staging = self.get_staging()
+            if staging is not None:
+                staging.prefetch(file_path) # Copy from the share while the user sets up the rest
 
     def browse_output_file(self):
         """Opens a save dialog to select an output file name and location."""
@@ -393,189 +561,1463 @@ class ReplayConverterApp:
         
         if not format_changed_by_typing:
             # If format wasn't changed by typing (e.g. user just edited base name, or typed invalid ext)
-            # we still need to update the command preview.
-            self.update_command_display()
+            # we still need to update the command preview (debounced, as this runs on every key).
+            self.schedule_command_update()
         
         self._processing_output_entry_change = False
 
+    def schedule_command_update(self, event=None):
+        """
+        Coalesces preview updates while typing: every keystroke restarts a short timer
+        and only the last one rebuilds the preview.
+        """
+        if self._preview_after_id is not None:
+            self.root.after_cancel(self._preview_after_id)
+        self._preview_after_id = self.root.after(self.PREVIEW_DEBOUNCE_MS, self.update_command_display)
+
     def update_command_display(self, event=None):
         """Builds the command for execution and updates the preview text area."""
-        error_messages = [] 
-
-        converter_path_val = self.settings.get("converter_path")
-        input_file_val = self.input_file_var.get()
-        output_file_base_val = self.output_file_var.get()
-        output_format_val = self.output_format_dropdown.get()
-
-        # --- Determine PCD arguments if applicable ---
-        pcd_args = []
-        if output_format_val == '.pcd':
-            pcd_width = self.settings.get('pcd_width', '0')
-            pcd_height = self.settings.get('pcd_height', '0')
-            pcd_swap = self.settings.get('pcd_swap', False)
-            pcd_zoom = self.settings.get('pcd_zoom', '1.0')
-            pcd_remove = self.settings.get('pcd_remove', False)
-
-            if pcd_width != '0': pcd_args.extend(("-w", pcd_width))
-            if pcd_height != '0': pcd_args.extend(("-h", pcd_height))
-            if pcd_swap: pcd_args.append("-s")
-            if pcd_zoom != '1.0': pcd_args.extend(("-z", pcd_zoom))
-            if pcd_remove: pcd_args.append("-r")
-
-        # --- Build parts for DISPLAY PREVIEW ---
-        display_parts_for_preview = []
-        if converter_path_val:
-            display_parts_for_preview.append(converter_path_val)
-        else:
-            display_parts_for_preview.append("[CONVERTER_PATH]")
-            error_messages.append("Error: Path to ReplayConverter.exe is not set. Please go to Settings.")
-
-        # Input File
-        if input_file_val:
-            display_parts_for_preview.extend(['-i', input_file_val])
-        else:
-            display_parts_for_preview.extend(['-i', '[INPUT_FILE]'])
-            error_messages.append("Error: Please select an input file.")
-
-        # Export All / Frame Index
-        if self.export_all_var.get():
-            display_parts_for_preview.append('-a')
-        else:
-            frame_index_val = self.frame_index_var.get()
-            display_parts_for_preview.extend(['-f', frame_index_val if frame_index_val else '[FRAME_INDEX]'])
-            if not frame_index_val:
-                 error_messages.append("Warning: Frame index is empty when 'Export all frames' is unchecked.")
-
-        # Output File Name and Format
-        if output_file_base_val:
-            display_parts_for_preview.extend(['-o', f"{output_file_base_val}{output_format_val}"])
-        else:
-            display_parts_for_preview.extend(['-o', f"[OUTPUT_NAME]{output_format_val}"])
-            error_messages.append("Warning: Output file name is not specified.")
-
-        # Add PCD arguments to preview
-        display_parts_for_preview.extend(pcd_args)
-
-        # Generate the display string, quoting paths for readability
-        quoted_display_list = []
-        for i, part in enumerate(display_parts_for_preview):
-            # Quote the executable path and paths after -i or -o
-            if i == 0 or (i > 0 and display_parts_for_preview[i-1] in ['-i', '-o']):
-                quoted_display_list.append(f'"{part}"')
+        if self._preview_after_id is not None: # This update supersedes any pending debounced one
+            self.root.after_cancel(self._preview_after_id)
+            self._preview_after_id = None
+
+        with self.metrics.span("gui_command_preview"):
+            # The preview model rebuilds only the parts of the command whose inputs changed, using the
+            # same builder (replay_core.command) as execution, so what is shown is exactly what runs.
+            # A frame list/range fans out into one -f job per frame; the preview shows the first of them.
+            self.preview_model.set(self.command_settings(), self.input_file_var.get(), self.output_file_var.get(),
+                                   self.output_format_dropdown.get(), self.get_frame_option())
+            state = self.preview_model.render()
+            self.shard_frames = state.shard_frames
+
+            # Known converter options are checked here too; an unprobed converter is only checked at run time
+            problems = state.problems or self.converter_probe.check(state.command_parts, wait=False)
+            if problems:
+                footer, footer_tag = "\n".join(problems), "error"
+            elif state.shard_frames:
+                footer, footer_tag = (f"(1 of {len(state.shard_frames)} per-frame commands, frames "
+                                      f"{state.shard_frames[0]}-{state.shard_frames[-1]}, run in parallel)"), "info"
             else:
-                quoted_display_list.append(part)
-        command_display_str = " ".join(quoted_display_list)
+                footer, footer_tag = "", None
+            self.render_command_preview(state.display, footer, footer_tag)
 
-        self.command_text.config(state='normal')
-        self.command_text.delete('1.0', tk.END)
-        self.command_text.insert('1.0', command_display_str)
-        if error_messages:
-            self.command_text.insert(tk.END, f"\n" + "\n".join(error_messages), "error")
-        
-        # --- Build self.command_parts for EXECUTION (re-use validated values) ---
-        self.command_parts = [] 
-        if converter_path_val and input_file_val: # Critical parts must be present
-            self.command_parts.append(converter_path_val)
-            self.command_parts.extend(['-i', input_file_val])
-
-            if self.export_all_var.get():
-                self.command_parts.append('-a')
-            else:
-                frame_index_val_exec = self.frame_index_var.get()
-                if frame_index_val_exec: # Basic check, could add isdigit validation
-                    self.command_parts.extend(['-f', frame_index_val_exec])
-                else:
-                    self.command_parts = [] # Invalidate command for execution
-
-            # Only add output and PCD options if command is still valid and output name is provided
-            if self.command_parts: # Check if still valid after primary args
-                if output_file_base_val:
-                    self.command_parts.extend(['-o', f"{output_file_base_val}{output_format_val}"])
-                else:
-                    self.command_parts = [] # Output name is crucial for execution
-
-                if self.command_parts: # Check if still valid after output option
-                    self.command_parts.extend(pcd_args) # Add PCD args to execution command
-        else: # Critical parts (converter path or input file) were missing
-            self.command_parts = []
+            # --- Build self.command_parts for EXECUTION (only runnable when nothing is missing) ---
+            self.command_parts = state.command_parts
 
+    def render_command_preview(self, command_display_str, footer, footer_tag):
+        """
+        Updates the preview Text widget with the smallest edit possible instead of
+        deleting and re-inserting everything.
+        """
+        shown_command, shown_footer = self._shown_preview
+        if (command_display_str, (footer, footer_tag)) == (shown_command, shown_footer):
+            return
+        self.command_text.config(state='normal')
+        if command_display_str != shown_command:
+            start, old_end, replacement = diff_text(shown_command, command_display_str)
+            self.command_text.delete(f"1.0 + {start} chars", f"1.0 + {old_end} chars")
+            if replacement:
+                self.command_text.insert(f"1.0 + {start} chars", replacement)
+        if (footer, footer_tag) != shown_footer:
+            # The footer (errors/notes) is short, so it is simply replaced
+            self.command_text.delete(f"1.0 + {len(command_display_str)} chars", tk.END)
+            if footer:
+                self.command_text.insert(tk.END, "\n" + footer, footer_tag)
         self.command_text.config(state='disabled')
+        self._shown_preview = (command_display_str, (footer, footer_tag))
+
+    def get_frame_option(self):
+        """Returns None when exporting all frames, otherwise the frame index text."""
+        return None if self.export_all_var.get() else self.frame_index_var.get()
+
+    def command_settings(self):
+        """The settings commands are built from: the saved ones, with the applied preset's PCD options on top."""
+        return dict(self.settings, **self.preset_pcd)
+
+    def build_command_parts(self, input_file_val, output_file_base_val):
+        """
+        Builds the argument list for executing one conversion with the current options (the frame
+        field resolved as the preview does; the first frame of a list or range).
+        Returns an empty list if something required (converter, input, frame index, output) is missing.
+        """
+        frame_option, _, error = resolve_frame_selection(self.get_frame_option())
+        if error:
+            return []
+        try:
+            return build_command(self.command_settings(), input_file_val, output_file_base_val,
+                                 self.output_format_dropdown.get(), frame_option)
+        except CommandError:
+            return []
+
+    def get_cache(self):
+        """Returns the ConversionCache if caching is enabled in Settings, else None."""
+        return cache_from_settings(self.settings, self.cache_dir)
+
+    def get_history(self):
+        """Returns the JobHistory, opening it on first use."""
+        if self.history is None:
+            from replay_core.history import JobHistory # Imported here: sqlite3 is slow to load
+            self.history = JobHistory(settings_store.get_history_db_path())
+        return self.history
+
+    def get_scheduler(self):
+        """Returns the ResourceScheduler for multi-job runs per the settings, or None for plain FIFO."""
+        return scheduler_from_settings(self.settings, self.get_history())
+
+    def get_packager(self):
+        """Returns the Packager if output compression is enabled in Settings, else None."""
+        from replay_core.packaging import packager_from_settings # Imported here, like the other optional features, to keep startup fast
+        return packager_from_settings(self.settings)
+
+    def get_launcher(self):
+        """Returns the Launcher that starts converters per the settings (native, Wine or a wrapper; priority, CPUs)."""
+        return launcher_from_settings(self.settings)
+
+    def get_staging(self):
+        """Returns the StagingArea if local scratch staging is enabled in Settings, else None."""
+        key = tuple(self.settings.get(name) for name in
+                    ("staging_enabled", "staging_dir", "staging_max_mb", "staging_remote_only"))
+        if key != self.staging_key:
+            from replay_core.staging import staging_from_settings # Imported here to keep startup fast
+            if self.staging is not None:
+                # Let the old area finish copying outputs back without blocking the window
+                threading.Thread(target=self.staging.close, daemon=True).start()
+            self.staging = staging_from_settings(self.settings)
+            self.staging_key = key
+        return self.staging
+
+    def check_commands(self, jobs, max_shown=10):
+        """
+        Checks every job's command against what the converter supports before anything starts.
+        Returns up to `max_shown` "<file>: <problem>" lines (empty if all commands look runnable).
+        Never starts the converter: one that hasn't been probed yet is checked by each job's own thread.
+        """
+        problems = []
+        for job in jobs:
+            for problem in self.converter_probe.check(job.command_parts, wait=False):
+                problems.append(f"{os.path.basename(job.label)}: {problem}")
+        if len(problems) > max_shown:
+            problems = problems[:max_shown] + [f"... and {len(problems) - max_shown} more"]
+        return problems
+
+    def is_converting(self):
+        """True while a conversion started from the main window is running."""
+        single_running = self.current_job is not None and self.current_job.is_running
+        shards_running = self.shard_runner is not None and self.shard_runner.is_running
+        return single_running or shards_running
 
     def run_conversion(self):
-        """Executes the generated command in a subprocess using the command_parts list."""
+        """Starts the generated command in a background ConversionJob so the window stays responsive."""
+        if self._preview_after_id is not None:
+            self.update_command_display() # Don't run a command that is missing the last keystrokes
+        if self.is_converting():
+            messagebox.showwarning("Busy", "A conversion is already running.")
+            return
         if not self.command_parts:
             messagebox.showerror("Error", "No command to execute. Please check your inputs and settings.")
             return
         if not os.path.exists(self.command_parts[0]):
             messagebox.showerror("Error", f"Converter not found at: {self.command_parts[0]}\nPlease check the path in Settings.")
             return
+        # Per-frame commands differ only in -f and -o, so checking the first one covers them all.
+        # A converter that hasn't been probed yet is checked by the job's thread instead (probing can take seconds).
+        problems = self.converter_probe.check(self.command_parts, wait=False)
+        if problems:
+            messagebox.showerror("Error", "\n".join(problems))
+            return
+        if self.shard_frames:
+            self.run_sharded_conversion()
+            return
+        checkpoint, commands = plan_export(self.command_parts, self.settings.get("resume_exports", True))
+        if checkpoint is not None and commands != [self.command_parts]:
+            output_name = os.path.basename(checkpoint.output_path)
+            if not commands:
+                if not messagebox.askyesno("Already Converted", f"Every frame of the interrupted export to {output_name} "
+                                           "was already converted.\n\nConvert all frames again?"):
+                    checkpoint.delete()
+                    return
+            else:
+                answer = messagebox.askyesnocancel(
+                    "Resume Export", f"An earlier export to {output_name} was interrupted ({checkpoint.describe()}).\n\n"
+                    "Convert only the missing frames? Choose No to convert all frames again.")
+                if answer is None:
+                    return
+                if answer:
+                    jobs = []
+                    for command_parts in commands:
+                        frame = int(get_option_value(command_parts, '-f'))
+                        jobs.append(BatchJob(str(frame), self.input_file_var.get(), command_parts, frame=frame,
+                                             checkpoint=checkpoint))
+                    self.run_sharded_conversion(jobs)
+                    return
+            checkpoint = ExportCheckpoint(self.command_parts)
+        # Use self.command_parts directly for a robust call
+        self.start_single_job(self.command_parts, self.input_file_var.get(), checkpoint)
+
+    def start_single_job(self, command_parts, input_file, checkpoint=None):
+        """Runs one command in the main window (log pane, progress bar, Cancel button)."""
+        # The full output of every run goes to a log file; the pane only shows the latest lines
+        prune_logs(self.log_dir)
+        log_path = new_log_path(self.log_dir, input_file)
+        self.clear_log()
+        self.append_log([("info", f"> {format_command(command_parts)}")])
+
+        self.current_job = ConversionJob(command_parts, log_path=log_path, cache=self.get_cache(),
+                                         history=self.get_history(), source="gui", staging=self.get_staging(),
+                                         packager=self.get_packager(), validate=self.settings.get("validate_outputs", True),
+                                         checkpoint=checkpoint, metrics=self.metrics, launcher=self.get_launcher(),
+                                         probe=self.converter_probe)
+        self.log_seq = 0
+        self.reset_progress()
+        self.current_job.start()
+        self.set_running_state(True)
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_conversion)
+
+    def poll_conversion(self):
+        """Runs on the Tk thread: refreshes the elapsed time and picks up the job's result."""
+        job = self.current_job
+        if job is None:
+            return
+        status = "Cancelling" if job.cancel_requested else "Running"
+        result = None
+        with self.metrics.span("gui_poll"):
+            self.status_var.set(f"{status}... {format_elapsed(job.elapsed)}")
+            self.drain_job_output(job)
+            self.show_progress(job.progress.snapshot())
+            while not job.events.empty():
+                event, payload = job.events.get_nowait()
+                if event == "finished":
+                    result = payload
+                    break
+        if result is not None: # Handled outside the timed span: its message box waits for the user
+            self.on_conversion_finished(result)
+            return
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_conversion)
+
+    def show_progress(self, snapshot):
+        """Updates the progress bar and its label from a ProgressSnapshot."""
+        fraction = snapshot.fraction
+        if fraction is None:
+            # No frame total known: animate the bar so it's still clear something is happening
+            if not self._progress_indeterminate:
+                self.progress_bar.config(mode='indeterminate')
+                self.progress_bar.start(20)
+                self._progress_indeterminate = True
+        else:
+            if self._progress_indeterminate:
+                self.progress_bar.stop()
+                self.progress_bar.config(mode='determinate')
+                self._progress_indeterminate = False
+            self.progress_bar['value'] = fraction * 100
+        self.progress_text_var.set(snapshot.describe())
+
+    def reset_progress(self, value=0):
+        """Stops any animation and sets the progress bar to a fixed value."""
+        if self._progress_indeterminate:
+            self.progress_bar.stop()
+            self.progress_bar.config(mode='determinate')
+            self._progress_indeterminate = False
+        self.progress_bar['value'] = value
+        self.progress_text_var.set("")
+
+    def drain_job_output(self, job):
+        """Copies lines the job printed since the last poll into the log pane."""
+        lines, self.log_seq, skipped = job.output.read_since(self.log_seq)
+        if skipped:
+            lines.insert(0, ("info", f"... {skipped} lines not shown (see the log file) ..."))
+        self.append_log(lines)
+
+    def append_log(self, lines):
+        """Appends (stream, text) lines to the log pane, trimming it to LOG_VIEW_MAX_LINES."""
+        if not lines:
+            return
+        at_bottom = self.log_text.yview()[1] >= 0.999 # Only auto-scroll if the user hasn't scrolled up
+        self.log_text.config(state='normal')
+        for stream, text in lines:
+            self.log_text.insert(tk.END, text + "\n", stream)
+        line_count = int(self.log_text.index('end-1c').split('.')[0])
+        if line_count > self.LOG_VIEW_MAX_LINES:
+            self.log_text.delete('1.0', f"{line_count - self.LOG_VIEW_MAX_LINES + 1}.0")
+        self.log_text.config(state='disabled')
+        if at_bottom:
+            self.log_text.see(tk.END)
+
+    def clear_log(self):
+        """Empties the log pane."""
+        self.log_text.config(state='normal')
+        self.log_text.delete('1.0', tk.END)
+        self.log_text.config(state='disabled')
+
+    def on_conversion_finished(self, result):
+        """Reports the result of a finished ConversionJob to the user."""
+        self.drain_job_output(self.current_job)
+        final_progress = self.current_job.progress.snapshot()
+        self.current_job = None
+        self.reset_progress(100 if result.succeeded else self.progress_bar['value'])
+        self.progress_text_var.set(final_progress.describe() if not result.succeeded else "")
+        self.set_running_state(False)
+        elapsed = format_elapsed(result.elapsed)
+        log_note = f"\n\nFull output: {result.log_path}" if result.log_path else ""
+        if result.log_path:
+            self.append_log([("info", f"Log file: {result.log_path}")])
+        if result.validation is not None:
+            stream = "info" if result.validation.ok else STDERR
+            self.append_log([(stream, line) for line in result.validation.describe().splitlines()])
+
+        if result.cancelled:
+            self.status_var.set(f"Cancelled after {elapsed}")
+            messagebox.showinfo("Cancelled", "The conversion was cancelled.")
+        elif result.error is not None:
+            self.status_var.set("Failed to start")
+            messagebox.showerror("An Unexpected Error Occurred", str(result.error))
+        elif result.returncode != 0:
+            self.status_var.set(f"Failed after {elapsed}")
+            stderr_tail = "\n".join(result.stderr.splitlines()[-10:])
+            error_message = f"Conversion Failed!\n\nReturn Code: {result.returncode}\n\nError:\n{stderr_tail}{log_note}"
+            messagebox.showerror("Error", error_message)
+        else:
+            self.status_var.set(f"Finished in {elapsed}" + (" (from cache)" if result.cached else ""))
+            output_message = f"Conversion Successful!"
+            if result.cached:
+                output_message += "\n\nAn identical conversion was found in the cache, so its output was reused."
+            if result.validation is not None:
+                output_message += f"\n\nOutput check:\n{result.validation.describe()}"
+            if result.archives:
+                output_message += "\n\nCompressed to:\n" + "\n".join(result.archives)
+            if result.stderr:
+                warnings_tail = "\n".join(result.stderr.splitlines()[-10:])
+                output_message += f"\n\nWarnings:\n{warnings_tail}"
+            if result.validation is not None and not result.validation.ok:
+                messagebox.showwarning("Check the Output", output_message + log_note)
+            else:
+                messagebox.showinfo("Success", output_message + log_note)
 
+    def run_sharded_conversion(self, jobs=None):
+        """
+        Runs one single-frame job per selected frame across a pool of converter processes
+        (or the given per-frame `jobs`, e.g. the missing frames of an interrupted export).
+        """
+        if jobs is None:
+            input_file_val = self.input_file_var.get()
+            try:
+                shard_commands = build_shard_commands(self.command_settings(), input_file_val, self.output_file_var.get(),
+                                                      self.output_format_dropdown.get(), self.shard_frames)
+            except CommandError as e:
+                messagebox.showerror("Error", str(e))
+                return
+            jobs = [BatchJob(str(frame), input_file_val, command_parts, frame=frame)
+                    for frame, command_parts in shard_commands]
+
+        prune_logs(self.log_dir)
+        self.clear_log()
+        self.append_log([("info", f"> {len(jobs)} per-frame jobs, e.g. {format_command(jobs[0].command_parts)}")])
+        self.reset_progress()
+        self.shard_runner = BatchRunner(jobs, max_workers=default_max_workers(), log_dir=self.log_dir,
+                                        cache=self.get_cache(), history=self.get_history(), source="gui",
+                                        scheduler=self.get_scheduler(), staging=self.get_staging(),
+                                        packager=self.get_packager(), validate=self.settings.get("validate_outputs", True),
+                                        metrics=self.metrics, launcher=self.get_launcher(), probe=self.converter_probe)
+        self.shard_runner.start()
+        self.set_running_state(True)
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_sharded_conversion)
+
+    def poll_sharded_conversion(self):
+        """Runs on the Tk thread: logs per-frame results and updates overall progress."""
+        runner = self.shard_runner
+        if runner is None:
+            return
+        summary = None
+        with self.metrics.span("gui_poll"):
+            while not runner.events.empty():
+                event, payload = runner.events.get_nowait()
+                if event == "job" and payload.is_final:
+                    stream = "info" if payload.status == BatchJob.SUCCEEDED else STDERR
+                    self.append_log([(stream, f"[{payload.status}] frame {payload.frame}")])
+                elif event == "done":
+                    summary = payload
+
+            done = sum(1 for job in runner.jobs if job.is_final)
+            elapsed = runner.elapsed
+            frames_per_sec = done / elapsed if done and elapsed > 0 else None
+            eta = (len(runner.jobs) - done) / frames_per_sec if frames_per_sec else None
+            self.show_progress(ProgressSnapshot(frames_done=done, frames_total=len(runner.jobs),
+                                                frames_per_sec=frames_per_sec, eta=eta))
+            status = "Cancelling" if runner.cancel_requested else "Running"
+            self.status_var.set(f"{status}... {format_elapsed(elapsed)}")
+
+        if summary is not None:
+            self.on_sharded_conversion_finished(summary)
+        else:
+            self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_sharded_conversion)
+
+    def on_sharded_conversion_finished(self, summary):
+        """Reports the result of a frame list/range export."""
+        archives = self.shard_runner.archives
+        self.shard_runner = None
+        self.set_running_state(False)
+        self.status_var.set(f"Finished in {format_elapsed(summary.elapsed)}")
+        message = f"Frame export finished in {format_elapsed(summary.elapsed)}.\n\n{summary}"
+        if archives:
+            message += "\n\nPacked into:\n" + "\n".join(archives)
+        message += self.describe_suspect_jobs(summary)
+        if summary.failed_jobs or summary.suspect_jobs:
+            failed_frames = ", ".join(str(job.frame) for job in summary.failed_jobs[:20])
+            if len(summary.failed_jobs) > 20:
+                failed_frames += ", ..."
+            if failed_frames:
+                message += f"\n\nFailed frames: {failed_frames}"
+            messagebox.showwarning("Frame Export Finished", message)
+        else:
+            messagebox.showinfo("Frame Export Finished", message)
+
+    def describe_suspect_jobs(self, summary):
+        """Message lines for jobs whose output check found problems ("" if there are none)."""
+        if not summary.suspect_jobs:
+            return ""
+        lines = [f"\n\nOutputs to check ({len(summary.suspect_jobs)}):"]
+        for job in summary.suspect_jobs[:10]:
+            lines.append(f"{os.path.basename(job.label)}: {job.result.validation.problems[0]}")
+        if len(summary.suspect_jobs) > 10:
+            lines.append(f"... and {len(summary.suspect_jobs) - 10} more")
+        return "\n".join(lines)
+
+    def cancel_conversion(self):
+        """Terminates the running converter process(es)."""
+        if self.current_job is not None and self.current_job.is_running:
+            self.current_job.cancel()
+        elif self.shard_runner is not None and self.shard_runner.is_running:
+            self.shard_runner.cancel()
+        else:
+            return
+        self.cancel_button.config(state='disabled')
+        self.status_var.set("Cancelling...")
+
+    def set_running_state(self, running):
+        """Enables/disables the action buttons while a conversion is running."""
+        self.run_button.config(state='disabled' if running else 'normal')
+        self.cancel_button.config(state='normal' if running else 'disabled')
+
+    def toggle_debug_overlay(self, event=None):
+        """Shows or hides the live stage timings and counters over the top-right corner (F12)."""
+        if self.debug_overlay is not None:
+            self.root.after_cancel(self.debug_overlay_after_id)
+            self.debug_overlay.destroy()
+            self.debug_overlay = None
+            return
+        self.debug_overlay = tk.Label(self.root, justify='left', anchor='nw', font=("Courier", 8),
+                                      bg="#202020", fg="#e0e0e0", padx=6, pady=4)
+        self.debug_overlay.place(relx=1.0, rely=0.0, anchor='ne')
+        self.refresh_debug_overlay()
+
+    def refresh_debug_overlay(self):
+        """Runs on the Tk thread while the overlay is shown."""
+        if self.debug_overlay is None:
+            return
+        lines = describe_snapshot(self.metrics.snapshot()) or ["No timings yet - run a conversion"]
+        if self.metrics_server is not None:
+            lines.append(f"Serving {self.metrics_server.url}")
+        self.debug_overlay.config(text="\n".join(lines + ["F12 to hide"]))
+        self.debug_overlay.lift()
+        self.debug_overlay_after_id = self.root.after(self.DEBUG_OVERLAY_INTERVAL_MS, self.refresh_debug_overlay)
+
+    def quit_app(self):
+        """Quits the application, asking first if a conversion is still running."""
+        single_running = self.is_converting()
+        batch_running = self.batch_runner is not None and self.batch_runner.is_running
+        if single_running or batch_running:
+            if not messagebox.askyesno("Quit", "A conversion is still running. Cancel it and quit?"):
+                return
+            if single_running:
+                self.cancel_conversion()
+            if batch_running:
+                self.batch_runner.cancel()
+        if self.watcher is not None:
+            self.watcher.stop()
+        if self.thumbnail_renderer is not None:
+            self.thumbnail_renderer.close()
+        if self.metrics_server is not None:
+            self.metrics_server.stop()
+        if self.staging is not None:
+            if self.staging.pending_uploads():
+                self.status_var.set("Copying outputs back to their destination...")
+                self.root.update_idletasks()
+            self.staging.close()
+        self.root.quit()
+
+    # --- Batch Mode ---
+
+    def open_batch_window(self):
+        """Opens (or raises) the batch conversion window."""
+        if self.batch_window is not None and self.batch_window.winfo_exists():
+            self.batch_window.lift()
+            return
+
+        self.ensure_styles()
+        self.batch_window = tk.Toplevel(self.root)
+        self.batch_window.title("Batch Conversion")
+        self.batch_window.geometry("820x500")
+        self.batch_window.transient(self.root)
+        self.batch_window.protocol("WM_DELETE_WINDOW", self.close_batch_window)
+
+        batch_frame = ttk.Frame(self.batch_window, padding="20")
+        batch_frame.pack(expand=True, fill='both')
+
+        # Input list controls
+        list_buttons = ttk.Frame(batch_frame)
+        list_buttons.pack(fill='x', pady=(0, 10))
+        ttk.Button(list_buttons, text="Add Files...", command=self.browse_batch_files).pack(side='left')
+        ttk.Button(list_buttons, text="Add Folder...", command=self.browse_batch_folder).pack(side='left', padx=10)
+        ttk.Button(list_buttons, text="Clear", command=self.clear_batch_inputs).pack(side='left')
+
+        # Per-job status table
+        tree_frame = ttk.Frame(batch_frame)
+        tree_frame.pack(expand=True, fill='both')
+        self.batch_tree = ttk.Treeview(tree_frame, columns=('file', 'status', 'attempts', 'time'), show='headings')
+        self.batch_tree.heading('file', text="Input File")
+        self.batch_tree.heading('status', text="Status")
+        self.batch_tree.heading('attempts', text="Attempts")
+        self.batch_tree.heading('time', text="Time")
+        self.batch_tree.column('file', width=380)
+        self.batch_tree.column('status', width=100, anchor='center')
+        self.batch_tree.column('attempts', width=70, anchor='center')
+        self.batch_tree.column('time', width=70, anchor='center')
+        tree_scroll = ttk.Scrollbar(tree_frame, orient='vertical', command=self.batch_tree.yview)
+        self.batch_tree.configure(yscrollcommand=tree_scroll.set)
+        self.batch_tree.pack(side='left', expand=True, fill='both')
+        tree_scroll.pack(side='right', fill='y')
+
+        # Concurrency and retry options
+        options_row = ttk.Frame(batch_frame)
+        options_row.pack(fill='x', pady=10)
+        ttk.Label(options_row, text="Parallel jobs:").pack(side='left')
+        self.batch_workers_var = tk.StringVar(value=str(default_max_workers()))
+        ttk.Spinbox(options_row, from_=1, to=64, textvariable=self.batch_workers_var, width=5).pack(side='left', padx=(5, 20))
+        ttk.Label(options_row, text="Retries per file:").pack(side='left')
+        self.batch_retries_var = tk.StringVar(value="1")
+        ttk.Spinbox(options_row, from_=0, to=10, textvariable=self.batch_retries_var, width=5).pack(side='left', padx=(5, 20))
+        ttk.Label(options_row, text="Order:").pack(side='left')
+        self.batch_order_var = tk.StringVar(value=self.settings.get("schedule_order", "fifo"))
+        ttk.Combobox(options_row, textvariable=self.batch_order_var, values=list(ORDERINGS), state='readonly',
+                     width=13).pack(side='left', padx=(5, 20))
+        self.batch_throttle_var = tk.BooleanVar(value=self.settings.get("schedule_throttle", True))
+        ttk.Checkbutton(options_row, text="Wait for free memory/disk", variable=self.batch_throttle_var).pack(side='left')
+
+        # Other machines: serve the jobs over HTTP to `python -m replay_core --worker URL` processes
+        remote_row = ttk.Frame(batch_frame)
+        remote_row.pack(fill='x', pady=(0, 10))
+        self.batch_remote_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(remote_row, text="Send to workers on other machines, port:",
+                        variable=self.batch_remote_var).pack(side='left')
+        self.batch_port_var = tk.StringVar(value=self.settings.get("server_port", "8765"))
+        ttk.Entry(remote_row, textvariable=self.batch_port_var, width=7).pack(side='left', padx=(5, 15))
+        ttk.Label(remote_row, text="Token:").pack(side='left')
+        self.batch_token_var = tk.StringVar(value=self.settings.get("server_token", ""))
+        ttk.Entry(remote_row, textvariable=self.batch_token_var, width=16, show='*').pack(side='left', padx=(5, 0))
+
+        ttk.Label(batch_frame, text="Each file is converted next to its input using the format and frame options of the main window.",
+                  wraplength=700).pack(fill='x')
+
+        btn_frame = ttk.Frame(batch_frame)
+        btn_frame.pack(fill='x', side='bottom', pady=(10, 0))
+        self.batch_status_var = tk.StringVar(value="")
+        ttk.Label(btn_frame, textvariable=self.batch_status_var).pack(side='left')
+        ttk.Button(btn_frame, text="Close", command=self.close_batch_window).pack(side='right')
+        self.batch_cancel_button = ttk.Button(btn_frame, text="Cancel", command=self.cancel_batch, state='disabled')
+        self.batch_cancel_button.pack(side='right')
+        self.batch_start_button = ttk.Button(btn_frame, text="Start", command=self.start_batch, style='Accent.TButton')
+        self.batch_start_button.pack(side='right', padx=10)
+
+        self.refresh_batch_tree()
+
+    def close_batch_window(self):
+        """Closes the batch window (a running batch keeps going only if the user agrees to leave it)."""
+        if self.batch_runner is not None and self.batch_runner.is_running:
+            if not messagebox.askyesno("Batch Running", "A batch is still running. Cancel it and close?", parent=self.batch_window):
+                return
+            self.batch_runner.cancel()
+        self.batch_window.destroy()
+        self.batch_window = None
+
+    def browse_batch_files(self):
+        """Adds one or more files to the batch list."""
+        file_paths = filedialog.askopenfilenames(
+            title="Add Input Files", parent=self.batch_window,
+            filetypes=(("All Supported", "*.gprec *.srf *.sur *.pcd *.pro"), ("All files", "*.*"))
+        )
+        self.add_batch_inputs(file_paths)
+
+    def browse_batch_folder(self):
+        """Adds every supported file of a folder to the batch list."""
+        folder = filedialog.askdirectory(title="Add Input Folder", parent=self.batch_window)
+        if not folder:
+            return
         try:
-            command_string_for_display = self.command_text.get("1.0", tk.END).strip()
-            messagebox.showinfo("Running", f"Executing command:\n\n{command_string_for_display}")
-            
-            # Use self.command_parts directly for a robust call
-            process = subprocess.run(self.command_parts, capture_output=True, text=True, check=True, creationflags=subprocess.CREATE_NO_WINDOW)
-            
-            output_message = f"Conversion Successful!"
-            if process.stdout:
-                output_message += f"\n\nOutput:\n{process.stdout}"
-            if process.stderr:
-                output_message += f"\n\nWarnings:\n{process.stderr}"
-            messagebox.showinfo("Success", output_message)
-
-        except subprocess.CalledProcessError as e:
-            error_message = f"Conversion Failed!\n\nReturn Code: {e.returncode}\n\nError:\n{e.stderr}"
-            messagebox.showerror("Error", error_message)
-        except Exception as e:
-            messagebox.showerror("An Unexpected Error Occurred", str(e))
+            names = sorted(os.listdir(folder))
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not read folder:\n{folder}\n\n{e}", parent=self.batch_window)
+            return
+        self.add_batch_inputs([os.path.join(folder, name) for name in names
+                               if os.path.splitext(name)[1].lower() in self.INPUT_EXTENSIONS])
+
+    def add_batch_inputs(self, file_paths):
+        """Appends files to the batch list, skipping ones already queued."""
+        if self.batch_runner is not None and self.batch_runner.is_running:
+            messagebox.showwarning("Busy", "Files can't be added while a batch is running.", parent=self.batch_window)
+            return
+        for file_path in file_paths:
+            if file_path not in self.batch_inputs:
+                self.batch_inputs.append(file_path)
+        self.batch_runner = None # The list changed, so any previous results no longer apply
+        self.refresh_batch_tree()
+
+    def clear_batch_inputs(self):
+        """Empties the batch list."""
+        if self.batch_runner is not None and self.batch_runner.is_running:
+            return
+        self.batch_inputs = []
+        self.batch_runner = None
+        self.refresh_batch_tree()
+
+    def refresh_batch_tree(self, jobs=None):
+        """Rebuilds the batch table from the input list, or with one row per job of a starting batch."""
+        self.batch_tree.delete(*self.batch_tree.get_children())
+        if jobs is None:
+            for index, file_path in enumerate(self.batch_inputs):
+                self.batch_tree.insert('', 'end', iid=str(index), values=(file_path, BatchJob.QUEUED, 0, ""))
+            self.batch_status_var.set(f"{len(self.batch_inputs)} file(s) queued")
+            return
+        for job in jobs: # A frame list or range gives each file one row per frame
+            self.batch_tree.insert('', 'end', iid=job.job_id, values=(job.label, BatchJob.QUEUED, 0, ""))
+        self.batch_status_var.set(f"{len(jobs)} job(s) queued")
+
+    def start_batch(self):
+        """Builds one job per input file and starts them on a bounded worker pool."""
+        if not self.batch_inputs:
+            messagebox.showerror("Error", "Add some input files first.", parent=self.batch_window)
+            return
+        try:
+            max_workers = int(self.batch_workers_var.get())
+            max_retries = int(self.batch_retries_var.get())
+            if max_workers < 1 or max_retries < 0:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Error", "Parallel jobs must be at least 1 and retries at least 0.", parent=self.batch_window)
+            return
+
+        jobs = []
+        settings = self.command_settings()
+        for index, file_path in enumerate(self.batch_inputs):
+            # Same naming as browse_input_file: output goes next to the input with the input's name.
+            # The frame field is resolved like the preview: a list or range runs one job per frame.
+            try:
+                commands = frame_commands(settings, file_path, default_output_base(file_path),
+                                          self.output_format_dropdown.get(), self.get_frame_option())
+            except CommandError as e:
+                messagebox.showerror("Error", f"Could not build the command for {os.path.basename(file_path)}:\n\n{e}",
+                                     parent=self.batch_window)
+                return
+            for frame, command_parts in commands:
+                job_id = str(index) if frame is None else f"{index}:{frame}"
+                jobs.append(BatchJob(job_id, file_path, command_parts, frame=frame))
+        if self.batch_remote_var.get():
+            self.start_remote_batch(jobs, max_retries) # Workers check the commands against their own converter
+            return
+        if not os.path.exists(jobs[0].command_parts[0]):
+            messagebox.showerror("Error", f"Converter not found at: {jobs[0].command_parts[0]}\nPlease check the path in Settings.",
+                                 parent=self.batch_window)
+            return
+        problems = self.check_commands(jobs)
+        if problems:
+            messagebox.showerror("Error", "Some commands can't run:\n\n" + "\n".join(problems), parent=self.batch_window)
+            return
+
+        self.refresh_batch_tree(jobs)
+        prune_logs(self.log_dir)
+        # The order and throttle choices become the defaults for next time
+        self.settings["schedule_order"] = self.batch_order_var.get()
+        self.settings["schedule_throttle"] = self.batch_throttle_var.get()
+        self.save_settings()
+        self.batch_runner = BatchRunner(jobs, max_workers=max_workers, max_retries=max_retries, log_dir=self.log_dir,
+                                        cache=self.get_cache(), history=self.get_history(), scheduler=self.get_scheduler(),
+                                        staging=self.get_staging(), packager=self.get_packager(),
+                                        validate=self.settings.get("validate_outputs", True), metrics=self.metrics,
+                                        launcher=self.get_launcher(), probe=self.converter_probe)
+        self.batch_runner.start()
+        self.batch_start_button.config(state='disabled')
+        self.batch_cancel_button.config(state='normal')
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_batch)
+
+    def start_remote_batch(self, jobs, max_retries):
+        """Serves the batch jobs to workers on other machines instead of converting them here."""
+        try:
+            port = int(self.batch_port_var.get())
+        except ValueError:
+            messagebox.showerror("Error", "The port must be a number, e.g. 8765.", parent=self.batch_window)
+            return
+        token = self.batch_token_var.get().strip()
+        if not token:
+            messagebox.showerror("Error", "Enter a token for the workers first: anyone who can reach the port could "
+                                 "otherwise take the jobs. Start the workers with the same --token.", parent=self.batch_window)
+            return
+        from replay_core.jobserver import RemoteBatchRunner # Imported here: http.server and urllib are slow to load
+        runner = RemoteBatchRunner(jobs, ("0.0.0.0", port), token=token,
+                                   max_retries=max_retries, validate=self.settings.get("validate_outputs", True))
+        try:
+            runner.start()
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not listen on port {port}:\n\n{e}", parent=self.batch_window)
+            return
+        self.settings["server_port"] = str(port)
+        self.settings["server_token"] = token
+        self.save_settings()
+        self.refresh_batch_tree(jobs)
+        self.batch_runner = runner
+        self.batch_start_button.config(state='disabled')
+        self.batch_cancel_button.config(state='normal')
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_batch)
+
+    def poll_batch(self):
+        """Runs on the Tk thread: applies job status changes to the table."""
+        runner = self.batch_runner
+        if runner is None:
+            return
+        summary = None
+        with self.metrics.span("gui_poll"):
+            window_open = self.batch_window is not None and self.batch_window.winfo_exists()
+            while not runner.events.empty():
+                event, payload = runner.events.get_nowait()
+                if event == "job" and window_open:
+                    job = payload
+                    elapsed = format_elapsed(job.result.elapsed) if job.result is not None else ""
+                    status = f"{job.status} on {job.worker}" if job.worker and job.status == BatchJob.RUNNING else job.status
+                    self.batch_tree.item(job.job_id, values=(job.label, status, job.attempts, elapsed))
+                elif event == "done":
+                    summary = payload
+                    break
+            if summary is None and window_open:
+                for job_id, fraction in runner.progress_fractions().items():
+                    if fraction is not None:
+                        self.batch_tree.set(job_id, 'status', f"{BatchJob.RUNNING} {fraction:.0%}")
+                done = sum(1 for job in runner.jobs if job.is_final)
+                waiting = [job for job in runner.jobs if job.status == BatchJob.WAITING]
+                waiting_note = f", {len(waiting)} {waiting[0].waiting_reason}" if waiting else ""
+                if not isinstance(runner, BatchRunner): # Served to remote workers
+                    waiting_note += f", {len(runner.workers())} worker(s) at {runner.url}"
+                self.batch_status_var.set(f"{done}/{len(runner.jobs)} done{waiting_note} - {format_elapsed(runner.elapsed)}")
+        if summary is not None:
+            self.on_batch_finished(summary)
+            return
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_batch)
+
+    def on_batch_finished(self, summary):
+        """Shows the end-of-batch summary."""
+        if self.batch_window is None or not self.batch_window.winfo_exists():
+            return
+        self.batch_start_button.config(state='normal')
+        self.batch_cancel_button.config(state='disabled')
+        self.batch_status_var.set(f"{summary} in {format_elapsed(summary.elapsed)}")
+
+        message = f"Batch finished in {format_elapsed(summary.elapsed)}.\n\n{summary}"
+        if summary.failed_jobs:
+            message += "\n\nFailed files:"
+            for job in summary.failed_jobs[:10]:
+                message += f"\n{os.path.basename(job.input_path)}"
+            if len(summary.failed_jobs) > 10:
+                message += f"\n... and {len(summary.failed_jobs) - 10} more"
+        message += self.describe_suspect_jobs(summary)
+        if summary.failed_jobs or summary.suspect_jobs:
+            messagebox.showwarning("Batch Finished", message, parent=self.batch_window)
+        else:
+            messagebox.showinfo("Batch Finished", message, parent=self.batch_window)
+
+    def cancel_batch(self):
+        """Cancels the running batch."""
+        if self.batch_runner is not None and self.batch_runner.is_running:
+            self.batch_runner.cancel()
+            self.batch_cancel_button.config(state='disabled')
+            self.batch_status_var.set("Cancelling...")
+
+    # --- Frame Preview ---
+
+    def open_frame_preview_window(self):
+        """Opens the frame preview: a height map of one frame, rendered in the background and cached."""
+        if self.frame_preview_window is not None and self.frame_preview_window.winfo_exists():
+            self.frame_preview_window.lift()
+            return
+        if self.thumbnail_renderer is None:
+            from replay_core.thumbnails import ThumbnailCache, ThumbnailRenderer # Imported here: numpy is slow to load
+            cache = ThumbnailCache(os.path.join(self.app_data_dir, "thumbnails"))
+            self.thumbnail_renderer = ThumbnailRenderer(cache, work_dir=os.path.join(self.app_data_dir, "preview"))
+            os.makedirs(self.thumbnail_renderer.work_dir, exist_ok=True)
+
+        self.ensure_styles()
+        self.frame_preview_window = tk.Toplevel(self.root)
+        self.frame_preview_window.title("Frame Preview")
+        self.frame_preview_window.geometry("420x400")
+        self.frame_preview_window.transient(self.root)
+        self.frame_preview_window.protocol("WM_DELETE_WINDOW", self.close_frame_preview_window)
+
+        preview_frame = ttk.Frame(self.frame_preview_window, padding="15")
+        preview_frame.pack(expand=True, fill='both')
+
+        frame_row = ttk.Frame(preview_frame)
+        frame_row.pack(fill='x', pady=(0, 10))
+        ttk.Label(frame_row, text="Frame:").pack(side='left', padx=(0, 10))
+        first_frame = self.frame_index_var.get().strip()
+        self.frame_preview_number_var = tk.StringVar(value=first_frame if first_frame.isdigit() else "0")
+        frame_spinbox = ttk.Spinbox(frame_row, from_=0, to=10**6, textvariable=self.frame_preview_number_var, width=10,
+                                    command=self.schedule_frame_preview)
+        frame_spinbox.pack(side='left')
+        frame_spinbox.bind("<KeyRelease>", self.schedule_frame_preview)
+        ttk.Button(frame_row, text="Use This Frame", command=self.use_previewed_frame).pack(side='right')
+
+        # Height map: low points dark blue, high points yellow, no points gray
+        self.frame_preview_image = None
+        self.frame_preview_image_label = ttk.Label(preview_frame, anchor='center')
+        self.frame_preview_image_label.pack(expand=True, fill='both')
+        self.frame_preview_status_var = tk.StringVar(value="")
+        ttk.Label(preview_frame, textvariable=self.frame_preview_status_var, wraplength=380).pack(fill='x', pady=(10, 0))
+
+        self.schedule_frame_preview()
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_frame_preview)
+
+    def close_frame_preview_window(self):
+        """Closes the preview; a render still running finishes into the cache."""
+        self.frame_preview_window.destroy()
+        self.frame_preview_window = None
+        self.frame_preview_key = None
+
+    def schedule_frame_preview(self, event=None):
+        """Debounces frame changes so holding an arrow key doesn't queue a render per step."""
+        if self.frame_preview_after_id is not None:
+            self.root.after_cancel(self.frame_preview_after_id)
+        self.frame_preview_after_id = self.root.after(self.FRAME_PREVIEW_DEBOUNCE_MS, self.request_frame_preview)
+
+    def request_frame_preview(self):
+        """Asks the renderer for the selected frame: from an existing .csv/.pcd output if there is one, else
+        by converting just that frame."""
+        self.frame_preview_after_id = None
+        if self.frame_preview_window is None:
+            return
+        frame_text = self.frame_preview_number_var.get().strip()
+        input_file = self.input_file_var.get()
+        if not frame_text.isdigit():
+            self.frame_preview_status_var.set("Enter a frame number.")
+            return
+        if not input_file or not os.path.isfile(input_file):
+            self.frame_preview_status_var.set("Select an input file first.")
+            return
+        frame = int(frame_text)
+        output_path = self.output_file_var.get() + self.output_format_dropdown.get()
+        from replay_core.thumbnails import find_frame_output
+        existing = find_frame_output(output_path, frame)
+        if existing is None and self.get_frame_option() == frame_text and os.path.isfile(output_path) \
+                and output_path.lower().endswith((".csv", ".pcd")):
+            existing = output_path # A single-frame export of this very frame
+        try:
+            if existing is not None:
+                self.frame_preview_key = self.thumbnail_renderer.request_file(existing)
+                self.frame_preview_status_var.set(f"Frame {frame} from {os.path.basename(existing)}")
+            else:
+                self.frame_preview_key = self.thumbnail_renderer.request_frame(self.command_settings(), input_file, frame)
+                self.frame_preview_status_var.set(f"Converting frame {frame}...")
+        except (OSError, CommandError) as e:
+            self.frame_preview_status_var.set(f"Can't preview frame {frame}: {e}")
+
+    def poll_frame_preview(self):
+        """Runs on the Tk thread: shows finished thumbnails while the preview window is open."""
+        if self.frame_preview_window is None:
+            return
+        renderer = self.thumbnail_renderer
+        while not renderer.events.empty():
+            _, key, image_path, error = renderer.events.get_nowait()
+            if key != self.frame_preview_key:
+                continue # A frame the user has already scrolled past
+            if error:
+                self.frame_preview_status_var.set(error)
+                continue
+            try:
+                self.frame_preview_image = tk.PhotoImage(file=image_path)
+            except tk.TclError as e:
+                self.frame_preview_status_var.set(f"Could not show the preview: {e}")
+                continue
+            self.frame_preview_image_label.config(image=self.frame_preview_image)
+            if self.frame_preview_status_var.get().startswith("Converting"):
+                self.frame_preview_status_var.set(f"Frame {self.frame_preview_number_var.get().strip()}")
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_frame_preview)
+
+    def use_previewed_frame(self):
+        """Copies the previewed frame into the main window's frame field."""
+        self.export_all_var.set(False)
+        self.toggle_frame_entry()
+        self.frame_index_var.set(self.frame_preview_number_var.get().strip())
+        self.update_command_display()
+
+    # --- Presets ---
+
+    def refresh_preset_names(self):
+        """Fills the preset dropdown (the store only re-reads its file if it changed)."""
+        self.preset_dropdown['values'] = self.presets.names()
+
+    def apply_preset(self, event=None):
+        """
+        Loads the selected preset's format and frame mode into the main window and uses its PCD
+        options for the conversions started from it. The saved settings are left alone.
+        """
+        preset = self.presets.get(self.preset_var.get())
+        if preset is None:
+            messagebox.showerror("Error", f"The preset '{self.preset_var.get()}' no longer exists.")
+            self.refresh_preset_names()
+            return
+        self.output_format_var.set(preset.output_format)
+        self.export_all_var.set(not preset.frame)
+        if preset.frame:
+            self.frame_index_var.set(preset.frame)
+        self.preset_pcd = dict(preset.pcd)
+        self.toggle_frame_entry() # Also rebuilds the command preview
+
+    def save_preset(self):
+        """Saves the current format, frame mode and PCD options under a name."""
+        name = simpledialog.askstring("Save Preset", "Preset name:", initialvalue=self.preset_var.get(), parent=self.root)
+        if name is None:
+            return
+        try:
+            preset = Preset.from_settings(name, self.command_settings(), self.output_format_dropdown.get(), self.get_frame_option())
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if self.presets.get(preset.name) is not None and not messagebox.askyesno(
+                "Save Preset", f"Replace the preset '{preset.name}'?"):
+            return
+        try:
+            self.presets.save(preset)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not save the preset:\n\n{e}")
+            return
+        self.refresh_preset_names()
+        self.preset_var.set(preset.name)
+
+    def delete_preset(self):
+        """Deletes the selected preset."""
+        name = self.preset_var.get()
+        if not name:
+            messagebox.showinfo("Delete Preset", "Select a preset first.")
+            return
+        if not messagebox.askyesno("Delete Preset", f"Delete the preset '{name}'?"):
+            return
+        try:
+            self.presets.delete(name)
+        except OSError as e:
+            messagebox.showerror("Error", f"Could not delete the preset:\n\n{e}")
+            return
+        self.preset_var.set("")
+        self.refresh_preset_names()
+
+    # --- Watch Folder ---
+
+    def open_watch_window(self):
+        """Opens (or shows again) the watch-folder window."""
+        if self.watch_window is not None and self.watch_window.winfo_exists():
+            self.watch_window.deiconify()
+            self.watch_window.lift()
+            return
+
+        self.ensure_styles()
+        self.watch_window = tk.Toplevel(self.root)
+        self.watch_window.title("Watch Folder")
+        self.watch_window.geometry("750x450")
+        self.watch_window.transient(self.root)
+        self.watch_window.protocol("WM_DELETE_WINDOW", self.close_watch_window)
+
+        watch_frame = ttk.Frame(self.watch_window, padding="20")
+        watch_frame.pack(expand=True, fill='both')
+
+        folder_row = ttk.Frame(watch_frame)
+        folder_row.pack(fill='x', pady=(0, 10))
+        folder_row.columnconfigure(1, weight=1)
+        ttk.Label(folder_row, text="Folder:").grid(row=0, column=0, sticky='w', padx=(0, 10))
+        self.watch_folder_var = tk.StringVar(value=self.settings.get("watch_folder", ""))
+        self.watch_folder_entry = ttk.Entry(folder_row, textvariable=self.watch_folder_var)
+        self.watch_folder_entry.grid(row=0, column=1, sticky='ew', ipady=2)
+        self.watch_browse_button = ttk.Button(folder_row, text="Browse...", command=self.browse_watch_folder)
+        self.watch_browse_button.grid(row=0, column=2, padx=(10, 0))
+        self.watch_recursive_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(folder_row, text="Include subfolders", variable=self.watch_recursive_var).grid(
+            row=1, column=1, sticky='w', pady=(5, 0))
+
+        # Files seen by the watcher, newest last
+        tree_frame = ttk.Frame(watch_frame)
+        tree_frame.pack(expand=True, fill='both')
+        self.watch_tree = ttk.Treeview(tree_frame, columns=('file', 'status', 'detail'), show='headings')
+        self.watch_tree.heading('file', text="Input File")
+        self.watch_tree.heading('status', text="Status")
+        self.watch_tree.heading('detail', text="Detail")
+        self.watch_tree.column('file', width=380)
+        self.watch_tree.column('status', width=90, anchor='center')
+        self.watch_tree.column('detail', width=180)
+        tree_scroll = ttk.Scrollbar(tree_frame, orient='vertical', command=self.watch_tree.yview)
+        self.watch_tree.configure(yscrollcommand=tree_scroll.set)
+        self.watch_tree.pack(side='left', expand=True, fill='both')
+        tree_scroll.pack(side='right', fill='y')
+
+        ttk.Label(watch_frame, text="New files are converted next to their input with the format and frame options "
+                  "the main window had when watching started. Already converted files are remembered across restarts.",
+                  wraplength=700).pack(fill='x', pady=(10, 0))
+
+        btn_frame = ttk.Frame(watch_frame)
+        btn_frame.pack(fill='x', side='bottom', pady=(10, 0))
+        self.watch_status_var = tk.StringVar(value="Not watching")
+        ttk.Label(btn_frame, textvariable=self.watch_status_var).pack(side='left')
+        ttk.Button(btn_frame, text="Close", command=self.close_watch_window).pack(side='right')
+        self.watch_toggle_button = ttk.Button(btn_frame, text="Start Watching", command=self.toggle_watch,
+                                              style='Accent.TButton')
+        self.watch_toggle_button.pack(side='right', padx=10)
+
+    def close_watch_window(self):
+        """Hides the window while watching (the watcher keeps running), otherwise closes it."""
+        if self.watcher is not None:
+            self.watch_window.withdraw()
+            return
+        self.watch_window.destroy()
+        self.watch_window = None
+
+    def browse_watch_folder(self):
+        """Lets the user pick the folder to watch."""
+        folder = filedialog.askdirectory(title="Select Folder to Watch", parent=self.watch_window)
+        if folder:
+            self.watch_folder_var.set(folder)
+
+    def toggle_watch(self):
+        """Starts or stops watching the selected folder."""
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+            self.set_watch_state(False)
+            self.watch_status_var.set("Not watching")
+            return
+
+        folder = self.watch_folder_var.get().strip()
+        if not os.path.isdir(folder):
+            messagebox.showerror("Error", f"Folder not found:\n{folder}", parent=self.watch_window)
+            return
+        # Snapshot the options: the watcher builds commands on its own thread, away from the Tk variables
+        settings = self.command_settings()
+        output_format = self.output_format_dropdown.get()
+        try:
+            commands = frame_commands(settings, os.path.join(folder, "probe.gprec"), os.path.join(folder, "probe"),
+                                      output_format, self.get_frame_option())
+        except CommandError as e:
+            messagebox.showerror("Error", f"Could not build the command:\n\n{e}", parent=self.watch_window)
+            return
+        if len(commands) > 1:
+            messagebox.showerror("Error", "Frame lists and ranges can't be used when watching a folder.",
+                                 parent=self.watch_window)
+            return
+        frame = get_option_value(commands[0][1], '-f') # The frame field as the preview resolves it; None for all frames
+        if not os.path.exists(settings["converter_path"]):
+            messagebox.showerror("Error", f"Converter not found at: {settings['converter_path']}\nPlease check the path in Settings.",
+                                 parent=self.watch_window)
+            return
+
+        def command_for(input_file):
+            command_parts = build_command(settings, input_file, default_output_base(input_file), output_format, frame)
+            problems = self.converter_probe.check(command_parts)
+            if problems:
+                raise CommandError(problems) # Reported as failed by the watcher, without starting the converter
+            return command_parts
+
+        from replay_core.watch import FolderWatcher, ProcessedIndex, index_path_for, watch_extensions # Imported here: watchdog is slow to load
+        index = ProcessedIndex(index_path_for(settings_store.get_watch_dir(), folder))
+        # Outputs go next to the recordings, so files of the output format are never taken as new recordings
+        self.watcher = FolderWatcher(folder, command_for, index, max_workers=default_max_workers(),
+                                     extensions=watch_extensions(folder, output_format),
+                                     recursive=self.watch_recursive_var.get(), log_dir=self.log_dir, cache=self.get_cache(),
+                                     history=self.get_history(), scheduler=self.get_scheduler(), staging=self.get_staging(),
+                                     packager=self.get_packager(), validate=self.settings.get("validate_outputs", True),
+                                     metrics=self.metrics, launcher=self.get_launcher())
+        self.watcher.start()
+        self.settings["watch_folder"] = folder
+        self.save_settings()
+        self.set_watch_state(True)
+        mode = "change notifications" if self.watcher.using_notifications else "polling"
+        self.watch_status_var.set(f"Watching ({mode}) - {len(index)} file(s) already processed")
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_watch)
+
+    def set_watch_state(self, watching):
+        """Locks the folder options while watching and flips the toggle button."""
+        state = 'disabled' if watching else 'normal'
+        self.watch_folder_entry.config(state=state)
+        self.watch_browse_button.config(state=state)
+        self.watch_toggle_button.config(text="Stop Watching" if watching else "Start Watching")
+        self.watch_button.config(text="Watching..." if watching else "Watch...")
+
+    def poll_watch(self):
+        """Runs on the Tk thread: shows the watcher's events in the table."""
+        watcher = self.watcher
+        if watcher is None:
+            return
+        while not watcher.events.empty():
+            event, path, detail = watcher.events.get_nowait()
+            if event == "error":
+                self.watch_status_var.set(f"Error reading {path}: {detail}")
+                continue
+            if self.watch_tree.exists(path):
+                self.watch_tree.item(path, values=(path, event.capitalize(), detail))
+            else:
+                self.watch_tree.insert('', 'end', iid=path, values=(path, event.capitalize(), detail))
+                self.watch_tree.see(path)
+        self.root.after(self.JOB_POLL_INTERVAL_MS, self.poll_watch)
+
+    # --- History ---
+
+    def open_history_window(self):
+        """Opens (or raises) the window listing earlier conversion runs."""
+        if self.history_window is not None and self.history_window.winfo_exists():
+            self.history_window.lift()
+            self.refresh_history()
+            return
+
+        from replay_core.history import STATUSES as HISTORY_STATUSES
+        self.ensure_styles()
+        self.history_window = tk.Toplevel(self.root)
+        self.history_window.title("Conversion History")
+        self.history_window.geometry("950x500")
+        self.history_window.transient(self.root)
+
+        history_frame = ttk.Frame(self.history_window, padding="20")
+        history_frame.pack(expand=True, fill='both')
+
+        # Filters
+        filter_row = ttk.Frame(history_frame)
+        filter_row.pack(fill='x', pady=(0, 10))
+        ttk.Label(filter_row, text="Input contains:").pack(side='left')
+        self.history_filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_row, textvariable=self.history_filter_var, width=30)
+        filter_entry.pack(side='left', padx=(5, 15))
+        filter_entry.bind("<Return>", self.refresh_history)
+        ttk.Label(filter_row, text="Format:").pack(side='left')
+        self.history_format_var = tk.StringVar(value="All")
+        format_box = ttk.Combobox(filter_row, textvariable=self.history_format_var, values=["All"] + list(OUTPUT_FORMATS),
+                                  state='readonly', width=6)
+        format_box.pack(side='left', padx=(5, 15))
+        format_box.bind("<<ComboboxSelected>>", self.refresh_history)
+        ttk.Label(filter_row, text="Status:").pack(side='left')
+        self.history_status_var = tk.StringVar(value="All")
+        status_box = ttk.Combobox(filter_row, textvariable=self.history_status_var, values=["All"] + list(HISTORY_STATUSES),
+                                  state='readonly', width=10)
+        status_box.pack(side='left', padx=(5, 15))
+        status_box.bind("<<ComboboxSelected>>", self.refresh_history)
+        ttk.Button(filter_row, text="Refresh", command=self.refresh_history).pack(side='left')
+
+        # Runs, newest first
+        tree_frame = ttk.Frame(history_frame)
+        tree_frame.pack(expand=True, fill='both')
+        columns = (('time', "Started", 130), ('file', "Input File", 240), ('format', "Format", 60),
+                   ('status', "Status", 80), ('wall', "Time", 60), ('cpu', "CPU", 60), ('memory', "Peak Mem", 80),
+                   ('in_size', "In Size", 75), ('out_size', "Out Size", 75))
+        self.history_tree = ttk.Treeview(tree_frame, columns=[name for name, _, _ in columns], show='headings')
+        for name, heading, width in columns:
+            self.history_tree.heading(name, text=heading)
+            self.history_tree.column(name, width=width, anchor='w' if name == 'file' else 'center')
+        tree_scroll = ttk.Scrollbar(tree_frame, orient='vertical', command=self.history_tree.yview)
+        self.history_tree.configure(yscrollcommand=tree_scroll.set)
+        self.history_tree.pack(side='left', expand=True, fill='both')
+        tree_scroll.pack(side='right', fill='y')
+        self.history_tree.bind("<Double-1>", self.rerun_history_entry)
+
+        btn_frame = ttk.Frame(history_frame)
+        btn_frame.pack(fill='x', side='bottom', pady=(10, 0))
+        self.history_status_text_var = tk.StringVar(value="")
+        ttk.Label(btn_frame, textvariable=self.history_status_text_var).pack(side='left')
+        ttk.Button(btn_frame, text="Close", command=self.history_window.destroy).pack(side='right')
+        ttk.Button(btn_frame, text="Re-run", command=self.rerun_history_entry, style='Accent.TButton').pack(side='right', padx=10)
+
+        self.refresh_history()
+
+    def refresh_history(self, event=None):
+        """Reloads the history table with the current filters."""
+        fmt = self.history_format_var.get()
+        status = self.history_status_var.get()
+        entries = self.get_history().query(input_contains=self.history_filter_var.get().strip() or None,
+                                     output_format=None if fmt == "All" else fmt,
+                                     status=None if status == "All" else status)
+        self.history_entries = {str(entry.id): entry for entry in entries}
+        self.history_tree.delete(*self.history_tree.get_children())
+        for entry in entries:
+            status_text = entry.status + (" (cached)" if entry.cached else "")
+            self.history_tree.insert('', 'end', iid=str(entry.id), values=(
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry.started_at)),
+                entry.input_path or "", entry.output_format or "", status_text,
+                format_elapsed(entry.wall_seconds or 0),
+                f"{entry.cpu_seconds:.1f} s" if entry.cpu_seconds is not None else "",
+                format_bytes(entry.peak_rss) if entry.peak_rss is not None else "",
+                format_bytes(entry.input_size) if entry.input_size is not None else "",
+                format_bytes(entry.output_size) if entry.output_size is not None else "",
+            ))
+        self.history_status_text_var.set(f"{len(entries)} run(s) - double-click a run to convert it again")
+
+    def rerun_history_entry(self, event=None):
+        """Runs the selected history entry's exact command again in the main window."""
+        selection = self.history_tree.selection()
+        if not selection:
+            messagebox.showinfo("Re-run", "Select a run first.", parent=self.history_window)
+            return
+        entry = self.history_entries.get(selection[0])
+        if entry is None:
+            return
+        if self.is_converting():
+            messagebox.showwarning("Busy", "A conversion is already running.", parent=self.history_window)
+            return
+        if not os.path.exists(entry.command_parts[0]):
+            messagebox.showerror("Error", f"Converter not found at: {entry.command_parts[0]}", parent=self.history_window)
+            return
+        if entry.input_path and not os.path.exists(entry.input_path):
+            messagebox.showerror("Error", f"Input file not found:\n{entry.input_path}", parent=self.history_window)
+            return
+        problems = self.converter_probe.check(entry.command_parts, wait=False) # The converter may have changed since
+        if problems:
+            messagebox.showerror("Error", "\n".join(problems), parent=self.history_window)
+            return
+        self.start_single_job(entry.command_parts, entry.input_path or "")
+        self.root.lift()
 
     def open_settings(self):
-        """Opens the modal settings window."""
+        """Opens the modal settings window, building it on first use."""
+        if self.settings_window is None or not self.settings_window.winfo_exists():
+            self.build_settings_window()
+        else:
+            self.settings_window.deiconify()
+        self.populate_settings_window()
+        self.settings_window.lift()
+        self.settings_window.grab_set()
+
+    def close_settings_window(self):
+        """Hides the settings window; it is kept for the next open_settings."""
+        self.settings_window.grab_release()
+        self.settings_window.withdraw()
+
+    def populate_settings_window(self):
+        """Loads the current settings into the settings window's fields."""
+        self.converter_path_var.set(self.settings.get("converter_path", ""))
+        self.show_converter_info()
+        pcd_settings = self.command_settings() # Shows an applied preset's options; saving makes them the defaults
+        self.pcd_width_var.set(pcd_settings.get('pcd_width', "0"))
+        self.pcd_height_var.set(pcd_settings.get('pcd_height', "0"))
+        self.pcd_zoom_var.set(pcd_settings.get('pcd_zoom', "1.0"))
+        self.pcd_swap_var.set(pcd_settings.get('pcd_swap', False))
+        self.pcd_remove_var.set(pcd_settings.get('pcd_remove', False))
+        self.cache_enabled_var.set(self.settings.get('cache_enabled', False))
+        self.cache_max_mb_var.set(self.settings.get('cache_max_mb', "5000"))
+        self.cache_full_digest_var.set(self.settings.get('cache_full_digest', False))
+        self.cache_hardlinks_var.set(self.settings.get('cache_hardlinks', False))
+        self.schedule_throttle_var.set(self.settings.get('schedule_throttle', True))
+        self.schedule_memory_reserve_var.set(self.settings.get('schedule_memory_reserve_mb', "1024"))
+        self.schedule_disk_reserve_var.set(self.settings.get('schedule_disk_reserve_mb', "1024"))
+        self.schedule_order_var.set(self.settings.get('schedule_order', "fifo"))
+        self.staging_enabled_var.set(self.settings.get('staging_enabled', False))
+        self.staging_dir_var.set(self.settings.get('staging_dir', ""))
+        self.staging_max_mb_var.set(self.settings.get('staging_max_mb', "20000"))
+        self.staging_remote_only_var.set(self.settings.get('staging_remote_only', True))
+        self.package_compression_var.set(self.settings.get('package_compression', "none"))
+        self.package_group_frames_var.set(self.settings.get('package_group_frames', False))
+        self.package_keep_originals_var.set(self.settings.get('package_keep_originals', False))
+        self.validate_outputs_var.set(self.settings.get('validate_outputs', True))
+        self.resume_exports_var.set(self.settings.get('resume_exports', True))
+        self.launch_mode_var.set(self.settings.get('launch_mode', "auto"))
+        self.wine_command_var.set(self.settings.get('wine_command', "wine"))
+        self.wine_prefix_var.set(self.settings.get('wine_prefix', ""))
+        self.launch_wrapper_var.set(self.settings.get('launch_wrapper', ""))
+        self.process_priority_var.set(self.settings.get('process_priority', "normal"))
+        self.process_cpus_var.set(self.settings.get('process_cpus', ""))
+
+    def build_settings_window(self):
+        """Creates the settings window and its widgets (filled in by populate_settings_window)."""
+        from replay_core.packaging import COMPRESSIONS, PACKAGED_FORMATS, zstd_available # Imported here, with the window
+        from replay_core.staging import default_scratch_dir
+        self.ensure_styles()
         self.settings_window = tk.Toplevel(self.root)
         self.settings_window.title("Settings")
-        self.settings_window.geometry("550x400")
+        self.settings_window.geometry("560x460")
         self.settings_window.transient(self.root)
-        self.settings_window.grab_set()
+        self.settings_window.protocol("WM_DELETE_WINDOW", self.close_settings_window)
         
-        # Styles are inherited from the root window, including ThemedTk theme
+        # Styles are inherited from the root window, including the ttkthemes theme
         # and custom styles like 'Accent.TButton' defined in setup_styles.
-        settings_frame = ttk.Frame(self.settings_window, padding="20")
-        settings_frame.pack(expand=True, fill='both')
+        window_frame = ttk.Frame(self.settings_window, padding="20")
+        window_frame.pack(expand=True, fill='both')
+
+        # One tab per group of settings
+        notebook = ttk.Notebook(window_frame)
+        notebook.pack(expand=True, fill='both')
+        settings_frame = ttk.Frame(notebook, padding=10)
+        notebook.add(settings_frame, text="General")
 
         path_frame = ttk.LabelFrame(settings_frame, text="ReplayConverter.exe Path", padding=10)
         path_frame.pack(fill='x', pady=(0, 15))
         path_frame.columnconfigure(0, weight=1)
 
-        self.converter_path_var = tk.StringVar(value=self.settings.get("converter_path", ""))
+        self.converter_path_var = tk.StringVar()
         ttk.Entry(path_frame, textvariable=self.converter_path_var, state='readonly').grid(row=0, column=0, sticky='ew', padx=(0, 10), ipady=4)
         ttk.Button(path_frame, text="Browse...", command=self.browse_converter_path).grid(row=0, column=1)
+        self.converter_info_var = tk.StringVar()
+        ttk.Label(path_frame, textvariable=self.converter_info_var, wraplength=460).grid(row=1, column=0, columnspan=2, sticky='w', pady=(8, 0))
 
         pcd_frame = ttk.LabelFrame(settings_frame, text="PCD Import Defaults", padding=10)
         pcd_frame.pack(fill='x', pady=15)
 
         ttk.Label(pcd_frame, text="Width (-w):").grid(row=0, column=0, sticky='w', pady=4)
-        self.pcd_width_var = tk.StringVar(value=self.settings.get('pcd_width', "0"))
+        self.pcd_width_var = tk.StringVar()
         ttk.Entry(pcd_frame, textvariable=self.pcd_width_var, width=10).grid(row=0, column=1, sticky='w', pady=4)
         
         ttk.Label(pcd_frame, text="Height (-h):").grid(row=1, column=0, sticky='w', pady=4)
-        self.pcd_height_var = tk.StringVar(value=self.settings.get('pcd_height', "0"))
+        self.pcd_height_var = tk.StringVar()
         ttk.Entry(pcd_frame, textvariable=self.pcd_height_var, width=10).grid(row=1, column=1, sticky='w', pady=4)
         
         ttk.Label(pcd_frame, text="Zoom (-z):").grid(row=2, column=0, sticky='w', pady=4)
-        self.pcd_zoom_var = tk.StringVar(value=self.settings.get('pcd_zoom', "1.0"))
+        self.pcd_zoom_var = tk.StringVar()
         ttk.Entry(pcd_frame, textvariable=self.pcd_zoom_var, width=10).grid(row=2, column=1, sticky='w', pady=4)
 
-        self.pcd_swap_var = tk.BooleanVar(value=self.settings.get('pcd_swap', False))
+        self.pcd_swap_var = tk.BooleanVar()
         ttk.Checkbutton(pcd_frame, text="Swap X/Z (-s)", variable=self.pcd_swap_var).grid(row=0, column=2, sticky='w', padx=30)
         
-        self.pcd_remove_var = tk.BooleanVar(value=self.settings.get('pcd_remove', False))
+        self.pcd_remove_var = tk.BooleanVar()
         ttk.Checkbutton(pcd_frame, text="Remove specific point (-r)", variable=self.pcd_remove_var).grid(row=1, column=2, sticky='w', padx=30)
 
-        btn_frame = ttk.Frame(settings_frame)
+        # --- Cache tab ---
+        cache_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(cache_tab, text="Cache")
+        cache_frame = ttk.LabelFrame(cache_tab, text="Conversion Cache", padding=10)
+        cache_frame.pack(fill='x')
+
+        self.cache_enabled_var = tk.BooleanVar()
+        ttk.Checkbutton(cache_frame, text="Reuse outputs of identical conversions", variable=self.cache_enabled_var).grid(row=0, column=0, columnspan=2, sticky='w', pady=4)
+        ttk.Label(cache_frame, text="Maximum size (MB):").grid(row=1, column=0, sticky='w', pady=4)
+        self.cache_max_mb_var = tk.StringVar()
+        ttk.Entry(cache_frame, textvariable=self.cache_max_mb_var, width=10).grid(row=1, column=1, sticky='w', pady=4)
+        self.cache_full_digest_var = tk.BooleanVar()
+        ttk.Checkbutton(cache_frame, text="Identify inputs by full content hash (slower, survives copies/touches)",
+                        variable=self.cache_full_digest_var).grid(row=2, column=0, columnspan=2, sticky='w', pady=4)
+        self.cache_hardlinks_var = tk.BooleanVar()
+        ttk.Checkbutton(cache_frame, text="Hard link cached outputs instead of copying",
+                        variable=self.cache_hardlinks_var).grid(row=3, column=0, columnspan=2, sticky='w', pady=4)
+        ttk.Button(cache_frame, text="Clear Cache", command=self.clear_cache).grid(row=4, column=0, sticky='w', pady=(10, 0))
+        ttk.Label(cache_frame, text=f"Stored in {self.cache_dir}", wraplength=460).grid(row=5, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        # --- Scheduling tab ---
+        schedule_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(schedule_tab, text="Scheduling")
+        schedule_frame = ttk.LabelFrame(schedule_tab, text="Parallel Conversions", padding=10)
+        schedule_frame.pack(fill='x')
+        self.schedule_throttle_var = tk.BooleanVar()
+        ttk.Checkbutton(schedule_frame, text="Start a job only when free memory and disk space allow",
+                        variable=self.schedule_throttle_var).grid(row=0, column=0, columnspan=2, sticky='w', pady=4)
+        ttk.Label(schedule_frame, text="Keep free memory (MB):").grid(row=1, column=0, sticky='w', pady=4)
+        self.schedule_memory_reserve_var = tk.StringVar()
+        ttk.Entry(schedule_frame, textvariable=self.schedule_memory_reserve_var, width=10).grid(row=1, column=1, sticky='w', pady=4)
+        ttk.Label(schedule_frame, text="Keep free disk space (MB):").grid(row=2, column=0, sticky='w', pady=4)
+        self.schedule_disk_reserve_var = tk.StringVar()
+        ttk.Entry(schedule_frame, textvariable=self.schedule_disk_reserve_var, width=10).grid(row=2, column=1, sticky='w', pady=4)
+        ttk.Label(schedule_frame, text="Job order:").grid(row=3, column=0, sticky='w', pady=4)
+        self.schedule_order_var = tk.StringVar()
+        ttk.Combobox(schedule_frame, textvariable=self.schedule_order_var, values=list(ORDERINGS), state='readonly',
+                     width=13).grid(row=3, column=1, sticky='w', pady=4)
+        ttk.Label(schedule_frame, text="Memory and output size per job are estimated from the conversion history. "
+                  "Largest-first usually finishes a batch soonest; shortest-first gets results out early.",
+                  wraplength=460).grid(row=4, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        # --- Launch tab ---
+        launch_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(launch_tab, text="Launch")
+        launch_frame = ttk.LabelFrame(launch_tab, text="Starting the Converter", padding=10)
+        launch_frame.pack(fill='x', pady=(0, 15))
+        launch_frame.columnconfigure(1, weight=1)
+        ttk.Label(launch_frame, text="Start it:").grid(row=0, column=0, sticky='w', pady=4)
+        self.launch_mode_var = tk.StringVar()
+        ttk.Combobox(launch_frame, textvariable=self.launch_mode_var, values=list(LAUNCH_MODES), state='readonly',
+                     width=10).grid(row=0, column=1, sticky='w', pady=4)
+        ttk.Label(launch_frame, text="Wine command:").grid(row=1, column=0, sticky='w', pady=4)
+        self.wine_command_var = tk.StringVar()
+        ttk.Entry(launch_frame, textvariable=self.wine_command_var).grid(row=1, column=1, sticky='ew', padx=(0, 10), pady=4)
+        ttk.Label(launch_frame, text="Wine prefix:").grid(row=2, column=0, sticky='w', pady=4)
+        self.wine_prefix_var = tk.StringVar()
+        ttk.Entry(launch_frame, textvariable=self.wine_prefix_var).grid(row=2, column=1, sticky='ew', padx=(0, 10), pady=4)
+        ttk.Button(launch_frame, text="Browse...", command=self.browse_wine_prefix).grid(row=2, column=2, pady=4)
+        ttk.Label(launch_frame, text="Wrapper command:").grid(row=3, column=0, sticky='w', pady=4)
+        self.launch_wrapper_var = tk.StringVar()
+        ttk.Entry(launch_frame, textvariable=self.launch_wrapper_var).grid(row=3, column=1, sticky='ew', padx=(0, 10), pady=4)
+        ttk.Label(launch_frame, text="auto runs a .exe converter through Wine on Linux and macOS, and natively otherwise. "
+                  "wrapper starts the converter command through the wrapper command, e.g. firejail --quiet.",
+                  wraplength=460).grid(row=4, column=0, columnspan=3, sticky='w', pady=(10, 0))
+        priority_frame = ttk.LabelFrame(launch_tab, text="Keeping the Computer Responsive", padding=10)
+        priority_frame.pack(fill='x')
+        ttk.Label(priority_frame, text="Priority:").grid(row=0, column=0, sticky='w', pady=4)
+        self.process_priority_var = tk.StringVar()
+        ttk.Combobox(priority_frame, textvariable=self.process_priority_var, values=list(PRIORITIES), state='readonly',
+                     width=10).grid(row=0, column=1, sticky='w', pady=4)
+        ttk.Label(priority_frame, text="Only on CPUs:").grid(row=1, column=0, sticky='w', pady=4)
+        self.process_cpus_var = tk.StringVar()
+        ttk.Entry(priority_frame, textvariable=self.process_cpus_var, width=14).grid(row=1, column=1, sticky='w', pady=4)
+        ttk.Label(priority_frame, text="CPUs as a list such as 0-3,6 (empty for all). The priority and CPUs also apply to "
+                  "whatever the converter starts, and Cancel stops all of it.",
+                  wraplength=460).grid(row=2, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        # --- Staging tab ---
+        staging_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(staging_tab, text="Staging")
+        staging_frame = ttk.LabelFrame(staging_tab, text="Local Scratch", padding=10)
+        staging_frame.pack(fill='x')
+        staging_frame.columnconfigure(1, weight=1)
+        self.staging_enabled_var = tk.BooleanVar()
+        ttk.Checkbutton(staging_frame, text="Convert from a local copy and copy the outputs back afterwards",
+                        variable=self.staging_enabled_var).grid(row=0, column=0, columnspan=3, sticky='w', pady=4)
+        self.staging_remote_only_var = tk.BooleanVar()
+        ttk.Checkbutton(staging_frame, text="Only for files on network shares",
+                        variable=self.staging_remote_only_var).grid(row=1, column=0, columnspan=3, sticky='w', pady=4)
+        ttk.Label(staging_frame, text="Scratch folder:").grid(row=2, column=0, sticky='w', pady=4)
+        self.staging_dir_var = tk.StringVar()
+        ttk.Entry(staging_frame, textvariable=self.staging_dir_var).grid(row=2, column=1, sticky='ew', padx=(0, 10), pady=4)
+        ttk.Button(staging_frame, text="Browse...", command=self.browse_staging_dir).grid(row=2, column=2, pady=4)
+        ttk.Label(staging_frame, text="Maximum size (MB):").grid(row=3, column=0, sticky='w', pady=4)
+        self.staging_max_mb_var = tk.StringVar()
+        ttk.Entry(staging_frame, textvariable=self.staging_max_mb_var, width=10).grid(row=3, column=1, sticky='w', pady=4)
+        ttk.Label(staging_frame, text=f"Leave the folder empty to use {default_scratch_dir()}. Inputs are copied "
+                  "while earlier jobs convert; files that don't fit are converted in place.",
+                  wraplength=460).grid(row=4, column=0, columnspan=3, sticky='w', pady=(10, 0))
+
+        # --- Outputs tab ---
+        package_tab = ttk.Frame(notebook, padding=10)
+        notebook.add(package_tab, text="Outputs")
+        validate_frame = ttk.LabelFrame(package_tab, text="Output Check", padding=10)
+        validate_frame.pack(fill='x', pady=(0, 15))
+        self.validate_outputs_var = tk.BooleanVar()
+        ttk.Checkbutton(validate_frame, text="Check .csv/.pcd outputs (point count, bounding box, invalid points, truncation)",
+                        variable=self.validate_outputs_var).grid(row=0, column=0, sticky='w', pady=4)
+        resume_frame = ttk.LabelFrame(package_tab, text="Interrupted Exports", padding=10)
+        resume_frame.pack(fill='x', pady=(0, 15))
+        self.resume_exports_var = tk.BooleanVar()
+        ttk.Checkbutton(resume_frame, text="Offer to finish interrupted all-frames .csv/.pcd exports by converting only the missing frames",
+                        variable=self.resume_exports_var).grid(row=0, column=0, sticky='w', pady=4)
+        package_frame = ttk.LabelFrame(package_tab, text="Compress Outputs After Converting", padding=10)
+        package_frame.pack(fill='x')
+        ttk.Label(package_frame, text="Compression:").grid(row=0, column=0, sticky='w', pady=4)
+        self.package_compression_var = tk.StringVar()
+        compressions = [c for c in COMPRESSIONS if c != "zstd" or zstd_available()]
+        ttk.Combobox(package_frame, textvariable=self.package_compression_var, values=compressions, state='readonly',
+                     width=10).grid(row=0, column=1, sticky='w', pady=4)
+        self.package_group_frames_var = tk.BooleanVar()
+        ttk.Checkbutton(package_frame, text="Pack all frames of a recording into one archive",
+                        variable=self.package_group_frames_var).grid(row=1, column=0, columnspan=2, sticky='w', pady=4)
+        self.package_keep_originals_var = tk.BooleanVar()
+        ttk.Checkbutton(package_frame, text="Keep the uncompressed files",
+                        variable=self.package_keep_originals_var).grid(row=2, column=0, columnspan=2, sticky='w', pady=4)
+        zstd_note = "" if zstd_available() else " Install the 'zstandard' package for zstd."
+        ttk.Label(package_frame, text=f"Applies to {' and '.join(PACKAGED_FORMATS)} exports.{zstd_note}",
+                  wraplength=460).grid(row=3, column=0, columnspan=2, sticky='w', pady=(10, 0))
+
+        btn_frame = ttk.Frame(window_frame)
         btn_frame.pack(fill='x', side='bottom', pady=(10, 0))
         
-        ttk.Button(btn_frame, text="Cancel", command=self.settings_window.destroy).pack(side='right')
+        ttk.Button(btn_frame, text="Cancel", command=self.close_settings_window).pack(side='right')
         ttk.Button(btn_frame, text="Save", command=self.save_and_close_settings, style='Accent.TButton').pack(side='right', padx=10)
 
     def browse_converter_path(self):
@@ -585,6 +2027,51 @@ class ReplayConverterApp:
         )
         if file_path:
             self.converter_path_var.set(file_path)
+            self.converter_probe.probe_in_background(file_path) # Runs the new converter once to read its options
+            self.poll_converter_info(file_path)
+
+    def poll_converter_info(self, converter_path):
+        """Runs on the Tk thread: refreshes the converter info once the background probe of `converter_path` is done."""
+        if self.settings_window is None or not self.settings_window.winfo_exists():
+            return
+        if self.converter_path_var.get() != converter_path:
+            return # Another converter was chosen meanwhile
+        if self.converter_probe.cached(converter_path) is None and os.path.exists(converter_path):
+            self.converter_info_var.set("Checking the converter...")
+            self.root.after(self.CONVERTER_INFO_POLL_MS, self.poll_converter_info, converter_path)
+            return
+        self.show_converter_info()
+
+    def show_converter_info(self):
+        """Shows the version and options detected for the converter in the path field."""
+        converter_path = self.converter_path_var.get()
+        if not converter_path:
+            self.converter_info_var.set("")
+            return
+        if not os.path.exists(converter_path):
+            self.converter_info_var.set("Converter not found.")
+            return
+        capabilities = self.converter_probe.cached(converter_path)
+        self.converter_info_var.set(capabilities.describe() if capabilities else "Not checked yet.")
+
+    def browse_wine_prefix(self):
+        """Opens a folder dialog to select the Wine prefix the converter runs in."""
+        folder = filedialog.askdirectory(title="Select Wine Prefix", parent=self.settings_window)
+        if folder:
+            self.wine_prefix_var.set(folder)
+
+    def browse_staging_dir(self):
+        """Opens a folder dialog to select the local scratch folder."""
+        folder = filedialog.askdirectory(title="Select Scratch Folder", parent=self.settings_window)
+        if folder:
+            self.staging_dir_var.set(folder)
+
+    def clear_cache(self):
+        """Deletes every cached conversion output."""
+        if not messagebox.askyesno("Clear Cache", "Delete all cached conversion outputs?", parent=self.settings_window):
+            return
+        ConversionCache(self.cache_dir).clear()
+        messagebox.showinfo("Clear Cache", "The conversion cache has been cleared.", parent=self.settings_window)
 
     def save_and_close_settings(self):
         """Saves settings and closes the settings window."""
@@ -594,14 +2081,42 @@ class ReplayConverterApp:
         self.settings["pcd_swap"] = self.pcd_swap_var.get()
         self.settings["pcd_zoom"] = self.pcd_zoom_var.get()
         self.settings["pcd_remove"] = self.pcd_remove_var.get()
+        self.preset_pcd = {} # The PCD options shown, including an applied preset's, are now the saved ones
+        self.settings["cache_enabled"] = self.cache_enabled_var.get()
+        self.settings["cache_max_mb"] = self.cache_max_mb_var.get()
+        self.settings["cache_full_digest"] = self.cache_full_digest_var.get()
+        self.settings["cache_hardlinks"] = self.cache_hardlinks_var.get()
+        self.settings["schedule_throttle"] = self.schedule_throttle_var.get()
+        self.settings["schedule_memory_reserve_mb"] = self.schedule_memory_reserve_var.get()
+        self.settings["schedule_disk_reserve_mb"] = self.schedule_disk_reserve_var.get()
+        self.settings["schedule_order"] = self.schedule_order_var.get()
+        self.settings["staging_enabled"] = self.staging_enabled_var.get()
+        self.settings["staging_dir"] = self.staging_dir_var.get()
+        self.settings["staging_max_mb"] = self.staging_max_mb_var.get()
+        self.settings["staging_remote_only"] = self.staging_remote_only_var.get()
+        self.settings["package_compression"] = self.package_compression_var.get()
+        self.settings["package_group_frames"] = self.package_group_frames_var.get()
+        self.settings["package_keep_originals"] = self.package_keep_originals_var.get()
+        self.settings["validate_outputs"] = self.validate_outputs_var.get()
+        self.settings["resume_exports"] = self.resume_exports_var.get()
+        self.settings["launch_mode"] = self.launch_mode_var.get()
+        self.settings["wine_command"] = self.wine_command_var.get()
+        self.settings["wine_prefix"] = self.wine_prefix_var.get()
+        self.settings["launch_wrapper"] = self.launch_wrapper_var.get()
+        self.settings["process_priority"] = self.process_priority_var.get()
+        self.settings["process_cpus"] = self.process_cpus_var.get()
+        self.converter_probe.launcher = self.get_launcher()
         
         self.save_settings()
         messagebox.showinfo("Saved", f"Settings have been saved to:\n{self.settings_file_path}", parent=self.settings_window)
-        self.settings_window.destroy()
+        self.close_settings_window()
         self.update_command_display()
 
 if __name__ == '__main__':
-    # Use ThemedTk to apply a modern theme
-    root = ThemedTk(theme="arc")
-    app = ReplayConverterApp(root)
+    profiler = StartupProfiler(profiling_requested(), started_at=_STARTED_AT)
+    profiler.mark("imports")
+    # A plain Tk root; the "arc" theme from ttkthemes is applied after the first paint (see finish_startup)
+    root = tk.Tk()
+    profiler.mark("create root window")
+    app = ReplayConverterApp(root, profiler)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,6 @@
+"""
+Core (Tk-free) pieces of the Replay Converter UI.
+
+Everything in this package must stay importable without tkinter or ttkthemes so
+it can be reused from scripts, the command line and headless build servers.
+"""
@@ -0,0 +1,301 @@
+import os
+import queue
+import threading
+import time
+
+from .command import get_option_value
+from .engine import ConversionJob
+from .outputlog import new_log_path
+
+
+def default_max_workers():
+    """Default number of converters to run in parallel (one per CPU)."""
+    return os.cpu_count() or 1
+
+
+class BatchJob:
+    """One input file (or one frame of it) in a batch, together with its command and current status."""
+    QUEUED = "Queued"
+    WAITING = "Waiting"  # Held back by the ResourceScheduler until memory/disk allow
+    RUNNING = "Running"
+    UPLOADING = "Uploading"  # Converted into local scratch; outputs are being copied back
+    RETRYING = "Retrying"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
+    CANCELLED = "Cancelled"
+
+    def __init__(self, job_id, input_path, command_parts, frame=None, checkpoint=None):
+        self.job_id = job_id
+        self.input_path = input_path
+        self.command_parts = list(command_parts)
+        self.frame = frame  # Set for the per-frame jobs of a sharded export
+        self.checkpoint = checkpoint  # ExportCheckpoint of a resumable all-frames export (see resume.py)
+        self.status = self.QUEUED
+        self.attempts = 0
+        self.result = None  # ConversionResult of the last attempt
+        self.waiting_reason = ""  # Why the scheduler is holding the job back
+        self.worker = None  # Worker running it, for jobs served to other machines (see jobserver.py)
+        self.queued_at = None  # time.perf_counter() when it was last put in the queue
+
+    @property
+    def label(self):
+        """Input path, plus the frame for sharded jobs."""
+        if self.frame is None:
+            return self.input_path
+        return f"{self.input_path} (frame {self.frame})"
+
+    @property
+    def is_final(self):
+        return self.status in (self.SUCCEEDED, self.FAILED, self.CANCELLED)
+
+
+class BatchSummary:
+    """Totals for a finished (or cancelled) batch."""
+
+    def __init__(self, jobs, elapsed):
+        self.total = len(jobs)
+        self.succeeded = sum(1 for j in jobs if j.status == BatchJob.SUCCEEDED)
+        self.failed = sum(1 for j in jobs if j.status == BatchJob.FAILED)
+        self.cancelled = sum(1 for j in jobs if j.status == BatchJob.CANCELLED)
+        self.retried = sum(1 for j in jobs if j.attempts > 1)
+        self.elapsed = elapsed
+        self.failed_jobs = [j for j in jobs if j.status == BatchJob.FAILED]
+        # Succeeded, but the output check found something wrong (empty, truncated, ...)
+        self.suspect_jobs = [j for j in jobs if j.status == BatchJob.SUCCEEDED and j.result is not None
+                             and j.result.validation is not None and not j.result.validation.ok]
+
+    def __str__(self):
+        return (f"{self.succeeded} of {self.total} succeeded, {self.failed} failed, "
+                f"{self.cancelled} cancelled ({self.retried} needed a retry)")
+
+
+class BatchRunner:
+    """
+    Converts a list of BatchJobs with at most `max_workers` converter processes at a time.
+
+    Like ConversionJob this never touches the GUI: status changes are posted to the
+    `events` queue as ("job", BatchJob) and, once everything is done,
+    ("done", BatchSummary). If `log_dir` is given, each attempt's output is written
+    to its own log file there. `on_line(job, stream, text)` receives output lines.
+    `cache` (a ConversionCache) and `history` (a JobHistory, with `source` as the
+    run's tag) are handed to every ConversionJob. With a ResourceScheduler the jobs
+    start in its order, and each waits (status Waiting) until the scheduler admits it.
+
+    With a StagingArea the inputs of the next jobs are copied to scratch while the
+    current ones convert, and a worker moves on to its next job while the previous
+    outputs are copied back (status Uploading); the batch is done once every upload is.
+
+    A Packager compresses each job's outputs; with its `group_frames` set, the
+    outputs of per-frame jobs are instead packed into one archive per recording
+    once the batch is done (listed in `archives`). With `validate` every job's
+    .csv/.pcd output is checked (ConversionResult.validation). With a
+    MetricsRegistry each job's time in the queue is recorded ("queue_wait") and
+    the registry is handed to every ConversionJob, as is the `launcher` (a
+    Launcher) that starts the converters and the `probe` (a ConverterProbe) that
+    checks their commands first.
+    """
+
+    def __init__(self, jobs, max_workers=None, max_retries=0, log_dir=None, on_line=None, cache=None,
+                 history=None, source="batch", scheduler=None, staging=None, packager=None,
+                 validate=False, metrics=None, launcher=None, probe=None):
+        self.jobs = list(jobs)
+        self.max_workers = max(1, int(max_workers or default_max_workers()))
+        self.max_retries = max(0, int(max_retries))
+        self.log_dir = log_dir
+        self.on_line = on_line
+        self.cache = cache
+        self.history = history
+        self.source = source
+        self.scheduler = scheduler
+        self.staging = staging
+        self.packager = packager
+        self.validate = validate
+        self.metrics = metrics
+        self.launcher = launcher
+        self.probe = probe
+        self.archives = []  # Per-recording archives of grouped frame outputs
+        self.events = queue.Queue()
+        self.summary = None
+        self._pending = queue.Queue()
+        self._active = {}  # job_id -> ConversionJob currently running for it
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._threads = []
+        self._start_time = None
+        self._remaining = 0
+        self._done = threading.Event()
+
+    @property
+    def is_running(self):
+        return self._start_time is not None and self.summary is None
+
+    @property
+    def elapsed(self):
+        if self._start_time is None:
+            return 0.0
+        if self.summary is not None:
+            return self.summary.elapsed
+        return time.monotonic() - self._start_time
+
+    def start(self):
+        """Starts the worker threads and returns immediately."""
+        if self._start_time is not None:
+            raise RuntimeError("A BatchRunner can only be started once.")
+        self._start_time = time.monotonic()
+        self._remaining = len(self.jobs)
+        for job in (self.scheduler.order(self.jobs) if self.scheduler is not None else self.jobs):
+            job.queued_at = time.perf_counter()
+            self._pending.put(job)
+        if not self.jobs:
+            self._finish()
+            return
+        for index in range(min(self.max_workers, len(self.jobs))):
+            thread = threading.Thread(target=self._worker, name=f"BatchWorker-{index}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def run(self):
+        """Runs the whole batch on the calling thread and returns the BatchSummary."""
+        self.start()
+        for thread in self._threads:
+            thread.join()
+        self._done.wait()  # Uploads may still be copying outputs back
+        return self.summary
+
+    @property
+    def cancel_requested(self):
+        return self._cancelled.is_set()
+
+    def active_conversions(self):
+        """Returns {job_id: ConversionJob} for the conversions running right now."""
+        with self._lock:
+            return dict(self._active)
+
+    def progress_fractions(self):
+        """Returns {job_id: fraction done (0..1) or None} for the conversions running right now."""
+        return {job_id: conversion.progress.snapshot().fraction
+                for job_id, conversion in self.active_conversions().items()}
+
+    def cancel(self):
+        """Stops handing out new jobs and terminates the ones already running."""
+        self._cancelled.set()
+        with self._lock:
+            running = list(self._active.values())
+        for conversion in running:
+            conversion.cancel()
+
+    def _worker(self):
+        while True:
+            try:
+                job = self._pending.get_nowait()
+            except queue.Empty:
+                return
+            if self._cancelled.is_set():
+                self._set_final(job, BatchJob.CANCELLED)
+                continue
+            if self.staging is not None:
+                self._prefetch_next()
+
+            reservation = None
+            if self.scheduler is not None:
+                reservation = self.scheduler.admit(job.command_parts, job.label, cancelled=self._cancelled,
+                                                   on_wait=lambda reason, job=job: self._set_waiting(job, reason))
+                if reservation is None:
+                    self._set_final(job, BatchJob.CANCELLED)
+                    continue
+                job.waiting_reason = ""
+
+            job.attempts += 1
+            job.status = BatchJob.RUNNING
+            self.events.put(("job", job))
+            queue_wait = time.perf_counter() - job.queued_at
+
+            log_path = new_log_path(self.log_dir, job.input_path) if self.log_dir else None
+            on_line = None
+            if self.on_line is not None:
+                on_line = lambda stream, text, job=job: self.on_line(job, stream, text)
+            conversion = ConversionJob(job.command_parts, log_path=log_path, on_line=on_line, cache=self.cache,
+                                       history=self.history, source=self.source, staging=self.staging,
+                                       defer_upload=True, packager=self._job_packager(job),
+                                       validate=self.validate, checkpoint=job.checkpoint, metrics=self.metrics,
+                                       launcher=self.launcher, probe=self.probe)
+            conversion.timings["queue_wait"] = queue_wait
+            if self.metrics is not None:
+                self.metrics.observe("queue_wait", queue_wait)
+            if reservation is not None:
+                reservation.conversion = conversion
+            with self._lock:
+                self._active[job.job_id] = conversion
+            if self._cancelled.is_set():
+                conversion.cancel()  # cancel() ran before this job was registered
+            result = conversion.run()
+            with self._lock:
+                self._active.pop(job.job_id, None)
+            if reservation is not None:
+                self.scheduler.release(reservation)
+            job.result = result
+
+            if result.succeeded and conversion.upload is not None:
+                job.status = BatchJob.UPLOADING
+                self.events.put(("job", job))
+                conversion.upload.add_done_callback(lambda upload, job=job: self._set_final(
+                    job, BatchJob.SUCCEEDED if job.result.succeeded else BatchJob.FAILED))
+            elif result.succeeded:
+                self._set_final(job, BatchJob.SUCCEEDED)
+            elif result.cancelled or self._cancelled.is_set():
+                self._set_final(job, BatchJob.CANCELLED)
+            elif job.attempts <= self.max_retries:
+                job.status = BatchJob.RETRYING
+                self.events.put(("job", job))
+                job.queued_at = time.perf_counter()
+                self._pending.put(job)
+            else:
+                self._set_final(job, BatchJob.FAILED)
+
+    def _job_packager(self, job):
+        if self.packager is not None and self.packager.group_frames and job.frame is not None:
+            return None  # Packed together in _package_frame_groups
+        return self.packager
+
+    def _package_frame_groups(self):
+        """Packs the outputs of each recording's successful per-frame jobs into one archive."""
+        groups = {}
+        for job in self.jobs:
+            if job.frame is not None and job.status == BatchJob.SUCCEEDED:
+                groups.setdefault(job.input_path, []).append(get_option_value(job.command_parts, '-o'))
+        for input_path, output_paths in groups.items():
+            try:
+                archive = self.packager.archive_group(output_paths)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"Warning: Could not pack the frame outputs of {input_path}: {e}")
+                continue
+            if archive:
+                self.archives.append(archive)
+
+    def _prefetch_next(self):
+        """Starts copying the inputs of the next few queued jobs to scratch."""
+        with self._pending.mutex:
+            upcoming = list(self._pending.queue)[:self.max_workers]
+        for job in upcoming:
+            self.staging.prefetch(job.input_path)
+
+    def _set_waiting(self, job, reason):
+        job.status = BatchJob.WAITING
+        job.waiting_reason = reason
+        self.events.put(("job", job))
+
+    def _set_final(self, job, status):
+        job.status = status
+        self.events.put(("job", job))
+        with self._lock:
+            self._remaining -= 1
+            finished = self._remaining == 0
+        if finished:
+            self._finish()
+
+    def _finish(self):
+        if self.packager is not None and self.packager.group_frames and not self._cancelled.is_set():
+            self._package_frame_groups()
+        self.summary = BatchSummary(self.jobs, time.monotonic() - self._start_time)
+        self._done.set()
+        self.events.put(("done", self.summary))
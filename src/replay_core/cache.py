@@ -0,0 +1,252 @@
+import glob
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from .command import get_option_value
+
+DEFAULT_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+HASH_CHUNK_BYTES = 4 * 1024 * 1024
+CACHE_FORMAT_VERSION = 1
+META_FILENAME = "meta.json"
+FRAME_SUFFIX_RE = re.compile(r"^_\d+$")  # Per-frame files the converter may write next to -o
+
+
+class ConversionCache:
+    """
+    Content-addressed store of converter outputs under `cache_dir`.
+
+    An entry is keyed on a hash of the input file (size + mtime by default, or a
+    full SHA-256 of its contents with `full_digest`), the converter's argument
+    vector (with the -i/-o paths factored out) and the converter binary itself.
+    On a hit the stored output is copied (or hard linked, with `use_hardlinks`)
+    to the requested -o path instead of spawning the converter. The least
+    recently used entries are evicted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, full_digest=False, use_hardlinks=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.full_digest = full_digest
+        self.use_hardlinks = use_hardlinks
+        self._digests = {}  # (path, size, mtime_ns) -> sha256, so big inputs are hashed once per session
+        self._lock = threading.Lock()
+
+    # --- Keys ---
+
+    def make_key(self, command_parts):
+        """Returns the cache key for a command, or None if it can't be cached."""
+        input_path = get_option_value(command_parts, '-i')
+        output_path = get_option_value(command_parts, '-o')
+        if not input_path or not output_path:
+            return None
+        try:
+            input_fingerprint = self._file_fingerprint(input_path, self.full_digest)
+            converter_fingerprint = self._file_fingerprint(command_parts[0], False, include_path=False)
+        except OSError:
+            return None
+
+        # The paths themselves don't change the result, only the output extension does
+        args = []
+        for i, part in enumerate(command_parts[1:], start=1):
+            if command_parts[i - 1] == '-i':
+                args.append("<input>")
+            elif command_parts[i - 1] == '-o':
+                args.append("<output>" + os.path.splitext(part)[1].lower())
+            else:
+                args.append(part)
+
+        payload = json.dumps({
+            "version": CACHE_FORMAT_VERSION,
+            "input": input_fingerprint,
+            "converter": converter_fingerprint,
+            "args": args,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _file_fingerprint(self, path, full_digest, include_path=True):
+        st = os.stat(path)
+        if full_digest:
+            return {"size": st.st_size, "sha256": self._sha256(path, st)}
+        fingerprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+        if include_path:
+            fingerprint["path"] = os.path.normcase(os.path.abspath(path))
+        else:
+            fingerprint["name"] = os.path.basename(path).lower()
+        return fingerprint
+
+    def _sha256(self, path, st):
+        memo_key = (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if memo_key in self._digests:
+                return self._digests[memo_key]
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+                digest.update(chunk)
+        with self._lock:
+            self._digests[memo_key] = digest.hexdigest()
+        return self._digests[memo_key]
+
+    # --- Lookup / restore ---
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, command_parts, key=None):
+        """
+        Puts the cached outputs for `command_parts` in place.
+        Returns the list of files written, or None on a cache miss.
+        """
+        key = key or self.make_key(command_parts)
+        if key is None:
+            return None
+        entry_dir = self._entry_dir(key)
+        meta_path = os.path.join(entry_dir, META_FILENAME)
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return None
+
+        output_base, output_ext = os.path.splitext(get_option_value(command_parts, '-o'))
+        written = []
+        try:
+            for suffix, stored_name in meta["files"]:
+                target = f"{output_base}{suffix}{output_ext}"
+                self._place(os.path.join(entry_dir, stored_name), target)
+                written.append(target)
+        except (OSError, KeyError, ValueError) as e:
+            print(f"Warning: Could not restore cached output {key}: {e}")
+            return None
+        try:
+            os.utime(meta_path)  # Marks the entry as recently used for LRU eviction
+        except OSError:
+            pass
+        return written
+
+    def _place(self, source, target):
+        os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+        if os.path.lexists(target):
+            os.remove(target)
+        if self.use_hardlinks:
+            try:
+                os.link(source, target)
+                return
+            except OSError:
+                pass  # Different volume or no hard link support: fall back to copying
+        shutil.copyfile(source, target)
+
+    # --- Store / evict ---
+
+    def store(self, command_parts, started_at, key=None):
+        """
+        Copies the outputs of a successful run into the cache. `started_at` (a time.time()
+        value) is used to pick up per-frame files the converter wrote next to the -o file.
+        """
+        key = key or self.make_key(command_parts)
+        if key is None:
+            return False
+        outputs = collect_outputs(get_option_value(command_parts, '-o'), started_at)
+        if not outputs:
+            return False
+
+        entry_dir = self._entry_dir(key)
+        temp_dir = f"{entry_dir}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.makedirs(temp_dir, exist_ok=True)
+            files, total = [], 0
+            for index, (suffix, path) in enumerate(outputs):
+                stored_name = f"out{index}{os.path.splitext(path)[1]}"
+                shutil.copyfile(path, os.path.join(temp_dir, stored_name))
+                files.append([suffix, stored_name])
+                total += os.path.getsize(path)
+            with open(os.path.join(temp_dir, META_FILENAME), 'w') as f:
+                json.dump({"files": files, "size": total, "created": time.time(),
+                           "command": command_parts}, f, indent=2)
+            if os.path.isdir(entry_dir):
+                shutil.rmtree(temp_dir, ignore_errors=True)  # Another worker stored it first
+            else:
+                os.replace(temp_dir, entry_dir)
+        except OSError as e:
+            print(f"Warning: Could not store conversion in cache: {e}")
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return False
+        self.evict()
+        return True
+
+    def entries(self):
+        """Returns [(last_used, size, entry_dir), ...] for every complete entry."""
+        result = []
+        for meta_path in glob.glob(os.path.join(self.cache_dir, "??", "*", META_FILENAME)):
+            try:
+                with open(meta_path, 'r') as f:
+                    size = json.load(f).get("size", 0)
+                result.append((os.path.getmtime(meta_path), size, os.path.dirname(meta_path)))
+            except (OSError, json.JSONDecodeError):
+                continue
+        return result
+
+    def evict(self):
+        """Deletes least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, entry_dir in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        """Removes every cached entry."""
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+
+def cache_from_settings(settings, cache_dir):
+    """Returns a ConversionCache configured from the settings, or None if caching is off."""
+    if not settings.get("cache_enabled"):
+        return None
+    try:
+        max_bytes = int(float(settings.get("cache_max_mb", "5000")) * 1024 * 1024)
+    except ValueError:
+        max_bytes = DEFAULT_MAX_BYTES
+    return ConversionCache(cache_dir, max_bytes=max_bytes,
+                           full_digest=bool(settings.get("cache_full_digest")),
+                           use_hardlinks=bool(settings.get("cache_hardlinks")))
+
+
+def collect_outputs(output_path, started_at):
+    """
+    Returns [(suffix, path), ...] for the -o file and any '<base>_<number><ext>'
+    siblings modified since `started_at`. The suffix is what follows the base name.
+    """
+    outputs = []
+    base, ext = os.path.splitext(output_path)
+    if os.path.isfile(output_path):
+        outputs.append(("", output_path))
+    for path in sorted(glob.glob(glob.escape(base) + "_*" + glob.escape(ext))):
+        suffix = path[len(base):len(path) - len(ext)]
+        if not FRAME_SUFFIX_RE.match(suffix):
+            continue
+        try:
+            if os.path.getmtime(path) + 1 >= started_at:  # 1 s slack for coarse file system timestamps
+                outputs.append((suffix, path))
+        except OSError:
+            continue
+    return outputs
+
+
+def break_hardlink(path):
+    """
+    Removes `path` if it is a hard link (e.g. to a cache entry), so a converter that
+    rewrites it in place can't corrupt the other copy.
+    """
+    try:
+        if os.stat(path).st_nlink > 1:
+            os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,628 @@
+"""
+Headless command line front end: converts files without loading tkinter.
+
+Run from the src/ directory (or with src/ on PYTHONPATH):
+    python -m replay_core recording.gprec --format .pcd
+    python -m replay_core *.gprec --output-dir converted -j 4
+    python -m replay_core --watch D:\\recordings --output-dir converted
+    python -m replay_core --sync D:\\recordings --output-dir E:\\converted --format .pcd
+    python -m replay_core \\\\share\\rec\\*.gprec --serve 8765      (then, on each worker machine:)
+    python -m replay_core --worker http://server:8765 -j 2
+"""
+import argparse
+import os
+import sys
+import time
+
+from .batch import BatchJob, BatchRunner, default_max_workers
+from .cache import cache_from_settings
+from .command import (OUTPUT_FORMATS, CommandError, build_command, default_output_base, format_command,
+                      get_option_value)
+from .frames import build_shard_commands, is_single_frame, parse_frame_spec
+from .launcher import MODE_WRAPPER, MODES, PRIORITIES, launcher_from_settings, parse_cpu_list
+from .packaging import COMPRESSIONS
+from .presets import PresetStore
+from .probe import ConverterProbe
+from .resume import plan_export
+from .scheduler import ORDERINGS
+from .settings import (CONVERTER_EXE_NAME, find_converter, get_cache_dir, get_history_db_path,
+                       get_presets_file_path, get_probe_cache_path, get_settings_file_path, get_watch_dir,
+                       read_settings_file)
+from .sync import ORPHAN_ACTIONS
+from .util import format_elapsed
+from .watch import DEFAULT_STABLE_SECONDS
+
+DEFAULT_FORMAT = ".srf"
+
+# The job server, metrics, history, staging and watch modules are imported by the functions
+# that use them: http.server, urllib and sqlite3 would otherwise slow down every run,
+# even a dry run or --probe.
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m replay_core",
+        description="Convert GoPxL replay files with LMI's ReplayConverter.exe (headless).",
+    )
+    parser.add_argument("inputs", nargs="*", metavar="INPUT", help="input replay file(s)")
+    parser.add_argument("-o", "--output", help="output file name (single input only); "
+                        "a known extension also selects the format")
+    parser.add_argument("--output-dir", help="directory for the outputs (default: next to each input)")
+    parser.add_argument("-t", "--format", choices=OUTPUT_FORMATS,
+                        help=f"output format (default: the preset's, else {DEFAULT_FORMAT})")
+    parser.add_argument("-f", "--frame", help="export only this frame index, or a list/range such as 3,7,42 or "
+                        "1000-5000:10 which runs one job per frame (default: the preset's, else all frames)")
+    parser.add_argument("-p", "--preset", help="use the output format, frame selection and PCD options of a preset "
+                        "saved in the GUI; -t and -f still take precedence")
+    parser.add_argument("--list-presets", action="store_true", help="list the saved presets and exit")
+    parser.add_argument("--converter", help="path to ReplayConverter.exe (default: from the GUI settings)")
+    parser.add_argument("--settings", default=get_settings_file_path(),
+                        help="settings JSON to read PCD options from (default: the GUI's settings file)")
+    parser.add_argument("-j", "--jobs", type=int, default=default_max_workers(),
+                        help="number of conversions to run in parallel (default: CPU count)")
+    parser.add_argument("--retries", type=int, default=0, help="retries per failed file (default: 0)")
+    parser.add_argument("-n", "--dry-run", action="store_true", help="print the commands without running them")
+    parser.add_argument("--probe", action="store_true",
+                        help="print the converter's version and supported options, as used to check commands, and exit")
+    parser.add_argument("-v", "--verbose", action="store_true", help="stream the converter's output")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=None,
+                        help="reuse outputs of identical earlier conversions (default: as in the GUI settings)")
+    parser.add_argument("--log-dir", help="write each conversion's full output to a log file in this directory")
+    parser.add_argument("--order", choices=ORDERINGS, help="start order of the jobs (default: as in the GUI settings)")
+    parser.add_argument("--throttle", action=argparse.BooleanOptionalAction, default=None,
+                        help="only start a job when free memory and disk allow, judged from earlier runs "
+                        "(default: as in the GUI settings)")
+    parser.add_argument("--stage", action=argparse.BooleanOptionalAction, default=None,
+                        help="convert files on network shares from a local scratch copy and copy the outputs "
+                        "back afterwards (default: as in the GUI settings)")
+    parser.add_argument("--scratch-dir", help="local directory for staged copies (default: as in the GUI settings)")
+    parser.add_argument("--compress", choices=COMPRESSIONS,
+                        help="compress .csv/.pcd outputs after converting (default: as in the GUI settings)")
+    parser.add_argument("--group-frames", action=argparse.BooleanOptionalAction, default=None,
+                        help="pack all per-frame outputs of a recording into one archive (default: as in the GUI settings)")
+    parser.add_argument("--validate", action=argparse.BooleanOptionalAction, default=None,
+                        help="check .csv/.pcd outputs for empty/truncated files and print point counts, "
+                        "bounding box and invalid points (default: as in the GUI settings)")
+    parser.add_argument("--resume", action=argparse.BooleanOptionalAction, default=None,
+                        help="finish an interrupted all-frames .csv/.pcd export by converting only its missing "
+                        "frames (default: as in the GUI settings)")
+    watch = parser.add_argument_group("watch folder")
+    watch.add_argument("--watch", metavar="DIR", help="keep running and convert new recordings as they appear in DIR")
+    watch.add_argument("--recursive", action="store_true", help="also watch subdirectories of DIR")
+    watch.add_argument("--stable-seconds", type=float, default=DEFAULT_STABLE_SECONDS,
+                       help=f"wait until a file hasn't changed for this long (default: {DEFAULT_STABLE_SECONDS:g})")
+    sync = parser.add_argument_group("folder sync")
+    sync.add_argument("--sync", metavar="DIR",
+                      help="convert the recordings under DIR (and its subfolders) into --output-dir, mirroring "
+                      "its folders; files converted with the same options by an earlier sync are skipped")
+    sync.add_argument("--orphans", choices=ORPHAN_ACTIONS, default="flag",
+                      help="what to do with outputs whose recording is gone or that other options left behind "
+                      "(default: flag, i.e. list them)")
+    debug = parser.add_argument_group("timings")
+    debug.add_argument("--metrics-port", metavar="[HOST:]PORT",
+                       help="serve counters and stage timings in the Prometheus text format at "
+                       "http://127.0.0.1:PORT/metrics while running (e.g. 9464)")
+    debug.add_argument("--metrics-file", metavar="FILE",
+                       help="write the same metrics to FILE every few seconds and at the end "
+                       "(e.g. for node_exporter's textfile collector)")
+    launching = parser.add_argument_group("starting the converter")
+    launching.add_argument("--launcher", choices=MODES,
+                           help="run the converter natively, through Wine, or behind --wrapper (default: as in the "
+                           "GUI settings; auto uses Wine for a .exe converter off Windows)")
+    launching.add_argument("--wine-prefix", metavar="DIR", help="WINEPREFIX for running the converter through Wine")
+    launching.add_argument("--wrapper", metavar="COMMAND",
+                           help="command to start the converter with, e.g. \"firejail --quiet\" (implies "
+                           "--launcher wrapper)")
+    launching.add_argument("--priority", choices=list(PRIORITIES),
+                           help="CPU priority of the converters, so they don't slow down the rest of the machine "
+                           "(low = nice 10, idle = nice 19; default: as in the GUI settings)")
+    launching.add_argument("--cpus", metavar="LIST", help="run the converters only on these CPUs, e.g. 0-3,6")
+    remote = parser.add_argument_group("several machines")
+    remote.add_argument("--serve", metavar="[HOST:]PORT",
+                        help="hand the INPUT jobs to workers on other machines instead of converting here "
+                        "(e.g. 8765); inputs and outputs must be on a share the workers can reach. Needs --token "
+                        "unless HOST is 127.0.0.1")
+    remote.add_argument("--worker", metavar="URL",
+                        help="convert jobs from a --serve server (e.g. http://server:8765) with the converter of "
+                        "this machine until interrupted; -j sets how many at a time")
+    remote.add_argument("--token", default=os.environ.get("REPLAY_CONVERTER_TOKEN", ""),
+                        help="shared secret the server and its workers must agree on "
+                        "(default: $REPLAY_CONVERTER_TOKEN)")
+    remote.add_argument("--path-map", action="append", default=[], metavar="SERVER_PREFIX=LOCAL_PREFIX",
+                        help="worker only: rewrite input/output paths starting with SERVER_PREFIX, e.g. "
+                        "/mnt/rec=\\\\nas\\rec (repeatable)")
+    return parser
+
+
+def resolve_settings(args):
+    """Reads the settings file and applies command line overrides."""
+    settings = read_settings_file(args.settings)
+    if args.converter:
+        settings["converter_path"] = args.converter
+    if args.cache is not None:
+        settings["cache_enabled"] = args.cache
+    if args.stage is not None:
+        settings["staging_enabled"] = args.stage
+    if args.scratch_dir:
+        settings["staging_dir"] = args.scratch_dir
+    if args.validate is not None:
+        settings["validate_outputs"] = args.validate
+    if args.resume is not None:
+        settings["resume_exports"] = args.resume
+    if args.wrapper:
+        settings["launch_wrapper"] = args.wrapper
+        settings["launch_mode"] = MODE_WRAPPER
+    if args.launcher:
+        settings["launch_mode"] = args.launcher
+    if args.wine_prefix:
+        settings["wine_prefix"] = args.wine_prefix
+    if args.priority:
+        settings["process_priority"] = args.priority
+    if args.cpus is not None:
+        settings["process_cpus"] = args.cpus
+    if not settings.get("converter_path"):
+        search_dirs = [os.getcwd()] + os.environ.get("PATH", "").split(os.pathsep)
+        settings["converter_path"] = find_converter(search_dirs)
+    return settings
+
+
+def preset_options(args, settings, preset):
+    """(settings, output_format, frame) of a job: the preset's options, with -t/-f taking precedence."""
+    if preset is None:
+        return settings, args.format or DEFAULT_FORMAT, args.frame
+    return (preset.apply(settings), args.format or preset.output_format,
+            args.frame if args.frame is not None else preset.frame_option)
+
+
+def plan_jobs(args, settings, preset=None, out=sys.stdout):
+    """
+    Builds one BatchJob per input. Raises CommandError for bad combinations.
+    An interrupted all-frames export is resumed with one job per missing frame.
+    """
+    settings, output_format, frame_option = preset_options(args, settings, preset)
+    output_base = None
+    if args.output:
+        if len(args.inputs) > 1:
+            raise CommandError(["Error: -o/--output can only be used with a single input; use --output-dir."])
+        output_base, ext = os.path.splitext(args.output)
+        if ext.lower() in OUTPUT_FORMATS:
+            output_format = ext.lower()
+        else:
+            output_base = args.output
+
+    frames = None
+    if frame_option is not None and not is_single_frame(frame_option):
+        try:
+            frames = parse_frame_spec(frame_option)
+        except ValueError as e:
+            raise CommandError([f"Error: {e}"])
+
+    jobs = []
+    for index, input_file in enumerate(args.inputs):
+        base = output_base or default_output_base(input_file)
+        if args.output_dir:
+            base = os.path.join(args.output_dir, os.path.basename(base))
+        if frames is None:
+            command_parts = build_command(settings, input_file, base, output_format, frame_option)
+            checkpoint, commands = plan_export(command_parts, settings.get("resume_exports", True))
+            if commands == [command_parts]:
+                jobs.append(BatchJob(str(index), input_file, command_parts, checkpoint=checkpoint))
+                continue
+            if not commands:
+                print(f"{input_file}: every frame was already converted.", file=out)
+                if not args.dry_run:
+                    checkpoint.delete()
+                continue
+            print(f"Resuming {input_file}: {checkpoint.describe()}.", file=out)
+            for command_parts in commands:
+                frame = int(get_option_value(command_parts, '-f'))
+                jobs.append(BatchJob(f"{index}:{frame}", input_file, command_parts, frame=frame,
+                                     checkpoint=checkpoint))
+        else:
+            # Frame list/range: one single-frame job per frame, all run through the same pool
+            for frame, command_parts in build_shard_commands(settings, input_file, base, output_format, frames):
+                jobs.append(BatchJob(f"{index}:{frame}", input_file, command_parts, frame=frame))
+    return jobs
+
+
+def plan_sync(args, settings, preset=None, out=sys.stdout):
+    """
+    Plans a --sync run: returns (DirectorySync, jobs) with one job per new or changed
+    recording. Orphaned outputs are listed, or deleted with --orphans delete.
+    Raises CommandError for bad combinations.
+    """
+    settings, output_format, frame_option = preset_options(args, settings, preset)
+    if frame_option is not None and not is_single_frame(frame_option):
+        raise CommandError(["Error: Frame lists and ranges can't be used with --sync."])
+    from .sync import DirectorySync
+    sync = DirectorySync(args.sync, args.output_dir,
+                         lambda input_file, base: build_command(settings, input_file, base, output_format, frame_option))
+    plan = sync.plan()
+    print(f"Sync: {plan}.", file=out, flush=True)
+    if plan.orphans and args.orphans == "delete" and not args.dry_run:
+        failures = sync.remove_orphans(plan.orphans, plan.gone)
+        print(f"Deleted {len(plan.orphans) - len(failures)} orphaned output(s).", file=out)
+        for failure in failures:
+            print(f"Warning: Could not delete {failure}", file=sys.stderr)
+    else:
+        for path in plan.orphans:
+            print(f"Orphaned: {os.path.join(sync.output_dir, path)}", file=out)
+    if not args.dry_run:
+        try:
+            sync.make_output_dirs(plan)
+        except OSError as e:
+            raise CommandError([f"Error: Could not create the output folders: {e}"])
+    return sync, sync.jobs(plan)
+
+
+def sync_recorder(sync, delete_orphans, out=sys.stdout):
+    """on_job callback for report_batch that records each finished job of a --sync run in its manifest."""
+    def on_job(job):
+        orphans = sync.job_finished(job)
+        if delete_orphans and orphans:
+            for failure in sync.remove_orphans(orphans):
+                print(f"Warning: Could not delete {failure}", file=sys.stderr)
+        else:
+            for path in orphans:
+                print(f"    orphaned: {os.path.join(sync.output_dir, path)}", file=out, flush=True)
+    return on_job
+
+
+def start_metrics(args, out=sys.stdout):
+    """
+    (MetricsRegistry, stop) for --metrics-port/--metrics-file: the registry is
+    served and/or written to the file until stop() is called, which writes the
+    file one last time and prints a summary. (None, no-op) without either option.
+    """
+    if not args.metrics_port and not args.metrics_file:
+        return None, lambda: None
+    from .jobserver import parse_address
+    from .metrics import MetricsRegistry, MetricsServer, TextfileWriter, describe_snapshot
+    registry = MetricsRegistry()
+    server = writer = None
+    if args.metrics_port:
+        server = MetricsServer(registry, parse_address(args.metrics_port, default_host="127.0.0.1"))
+        server.start()
+        print(f"Metrics at {server.url}", file=out, flush=True)
+    if args.metrics_file:
+        writer = TextfileWriter(registry, args.metrics_file)
+        writer.start()
+
+    def stop():
+        if writer is not None:
+            writer.stop()
+        if server is not None:
+            server.stop()
+        lines = describe_snapshot(registry.snapshot())
+        if lines:
+            print("Timings:", file=out)
+            for line in lines:
+                print(f"  {line}", file=out, flush=True)
+    return registry, stop
+
+
+def check_jobs(jobs, probe):
+    """Checks every job's command against the converter before anything starts. Returns "<file>: <problem>" lines."""
+    problems = []
+    for job in jobs:
+        problems.extend(f"{job.label}: {problem}" for problem in probe.check(job.command_parts))
+    return problems
+
+
+def watch_command_factory(args, settings, probe=None, presets=None):
+    """
+    Returns a function mapping a new file in the watched folder to its converter command.
+    With --preset the preset is looked up in `presets` (a PresetStore) for every file,
+    so saving the preset again changes the options of the files still to come.
+    """
+    if args.output:
+        raise CommandError(["Error: -o/--output can't be used with --watch; use --output-dir."])
+    if args.frame is not None and not is_single_frame(args.frame):
+        raise CommandError(["Error: Frame lists and ranges can't be used with --watch."])
+
+    def command_for(input_file):
+        base = default_output_base(input_file)
+        if args.output_dir:
+            base = os.path.join(args.output_dir, os.path.basename(base))
+        try:
+            preset = presets.require(args.preset) if args.preset else None
+        except KeyError as e:
+            raise CommandError([f"Error: {e.args[0]}"])
+        job_settings, output_format, frame_option = preset_options(args, settings, preset)
+        if frame_option is not None and not is_single_frame(frame_option):
+            raise CommandError([f"Error: Preset '{preset.name}' selects several frames, which can't be used with --watch."])
+        command_parts = build_command(job_settings, input_file, base, output_format, frame_option)
+        problems = probe.check(command_parts) if probe is not None else []
+        if problems:
+            raise CommandError(problems)
+        return command_parts
+    return command_for
+
+
+def watch_folder(args, settings, out=sys.stdout, metrics=None, launcher=None):
+    """Runs the folder watcher until interrupted. Returns the exit code."""
+    if not os.path.isdir(args.watch):
+        print(f"Error: Watch folder not found: {args.watch}", file=sys.stderr)
+        return 2
+    try:
+        probe = ConverterProbe(get_probe_cache_path(), launcher=launcher)
+        presets = PresetStore(get_presets_file_path())
+        command_for = watch_command_factory(args, settings, probe, presets)
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    from .history import JobHistory
+    from .packaging import packager_from_settings
+    from .scheduler import scheduler_from_settings
+    from .staging import staging_from_settings
+    from .watch import FolderWatcher, ProcessedIndex, index_path_for, watch_extensions
+    index = ProcessedIndex(index_path_for(get_watch_dir(), args.watch))
+    history = JobHistory(get_history_db_path())
+    staging = staging_from_settings(settings)
+    # Outputs in the watched tree must not look like new recordings (the preset's format as of now)
+    preset = presets.get(args.preset) if args.preset else None
+    output_format = args.format or (preset.output_format if preset is not None else DEFAULT_FORMAT)
+    extensions = watch_extensions(args.watch, output_format, args.output_dir)
+    watcher = FolderWatcher(args.watch, command_for, index, max_workers=args.jobs, extensions=extensions,
+                            recursive=args.recursive,
+                            stable_seconds=args.stable_seconds, log_dir=args.log_dir,
+                            cache=cache_from_settings(settings, get_cache_dir()), history=history,
+                            scheduler=scheduler_from_settings(settings, history, args.order, args.throttle),
+                            staging=staging, packager=packager_from_settings(settings, args.compress,
+                                                                             args.group_frames),
+                            validate=settings.get("validate_outputs", True), metrics=metrics, launcher=launcher)
+    watcher.start()
+    mode = "change notifications" if watcher.using_notifications else "polling"
+    print(f"Watching {args.watch} ({mode}, {len(index)} file(s) already processed). Press Ctrl+C to stop.",
+          file=out, flush=True)
+    try:
+        while True:
+            event, path, detail = watcher.events.get()
+            stamp = time.strftime("%H:%M:%S")
+            print(f"{stamp} [{event}] {path}" + (f": {detail}" if detail else ""), file=out, flush=True)
+    except KeyboardInterrupt:
+        watcher.stop()
+        if staging is not None:
+            staging.close()
+        return 130
+
+
+def run_jobs(jobs, max_workers, max_retries, out=sys.stdout, verbose=False, log_dir=None, cache=None, history=None,
+             scheduler=None, staging=None, packager=None, validate=False, on_job=None, metrics=None, launcher=None):
+    """Runs the jobs, printing one line per status change (and with `verbose`, each job's output and timings)."""
+    on_line = (lambda job, stream, text: print(f"{os.path.basename(job.label)}: {text}", file=out, flush=True)) \
+        if verbose else None
+    runner = BatchRunner(jobs, max_workers=max_workers, max_retries=max_retries, log_dir=log_dir, on_line=on_line,
+                         cache=cache, history=history, source="cli", scheduler=scheduler,
+                         staging=staging, packager=packager, validate=validate, metrics=metrics, launcher=launcher)
+    runner.start()
+    return report_batch(runner, out, on_job, show_timings=verbose)
+
+
+def report_batch(runner, out=sys.stdout, on_job=None, show_timings=False):
+    """
+    Prints one line per status change of a started BatchRunner/RemoteBatchRunner,
+    calling `on_job(job)` after each. Returns the BatchSummary.
+    """
+    try:
+        while True:
+            event, payload = runner.events.get()
+            if event == "job":
+                cached = " (cached)" if payload.result is not None and payload.result.cached else ""
+                detail = f" - {payload.waiting_reason}" if payload.status == BatchJob.WAITING else ""
+                if payload.status == BatchJob.RUNNING and payload.worker:
+                    detail = f" on {payload.worker}"
+                print(f"[{payload.status}] {payload.label}{cached}{detail}", file=out, flush=True)
+                if payload.status in (BatchJob.FAILED, BatchJob.RETRYING) and payload.result is not None:
+                    detail = payload.result.stderr.strip() or str(payload.result.error or "")
+                    if detail:
+                        print(f"    {detail}", file=out, flush=True)
+                if payload.status == BatchJob.SUCCEEDED and payload.result is not None:
+                    if payload.result.validation is not None:
+                        for line in payload.result.validation.describe().splitlines():
+                            print(f"    {line}", file=out, flush=True)
+                    for archive in payload.result.archives:
+                        print(f"    -> {archive}", file=out, flush=True)
+                if show_timings and payload.is_final and payload.result is not None and payload.result.timings:
+                    from .metrics import format_timings
+                    print(f"    timings: {format_timings(payload.result.timings)}", file=out, flush=True)
+                if on_job is not None:
+                    on_job(payload)
+            elif event == "done":
+                for archive in getattr(runner, "archives", []):
+                    print(f"Packed {archive}", file=out, flush=True)
+                return payload
+    except KeyboardInterrupt:
+        runner.cancel()
+        while True:
+            event, payload = runner.events.get()
+            if event == "job" and on_job is not None:
+                on_job(payload)  # Jobs that still finish are recorded
+            elif event == "done":
+                return payload
+
+
+def serve_jobs(args, jobs, settings, out=sys.stdout, on_job=None):
+    """Serves the jobs to remote workers until they are all done. Returns the BatchSummary (None if it can't listen)."""
+    from .jobserver import RemoteBatchRunner, parse_address
+    try:
+        runner = RemoteBatchRunner(jobs, parse_address(args.serve), token=args.token, max_retries=args.retries,
+                                   validate=settings.get("validate_outputs", True))
+        runner.start()
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not start the job server: {e}", file=sys.stderr)
+        return None
+    print(f"Serving {len(jobs)} job(s) at {runner.url}. Start workers with: "
+          f"python -m replay_core --worker {runner.url}", file=out, flush=True)
+    return report_batch(runner, out, on_job)
+
+
+def run_worker(args, settings, out=sys.stdout, metrics=None, launcher=None):
+    """Converts jobs from a job server until interrupted. Returns the exit code."""
+    path_map = []
+    for item in args.path_map:
+        prefix, sep, replacement = item.partition("=")
+        if not sep or not prefix:
+            print(f"Error: --path-map needs SERVER_PREFIX=LOCAL_PREFIX, not '{item}'.", file=sys.stderr)
+            return 2
+        path_map.append((prefix, replacement))
+    from .history import JobHistory
+    from .jobserver import JobWorker
+    worker = JobWorker(args.worker, settings["converter_path"], slots=args.jobs, token=args.token, path_map=path_map,
+                       log_dir=args.log_dir, history=JobHistory(get_history_db_path()),
+                       probe=ConverterProbe(get_probe_cache_path(), launcher=launcher), metrics=metrics,
+                       launcher=launcher)
+    worker.start()
+    print(f"Worker {worker.worker_id} taking up to {worker.slots} job(s) at a time from {args.worker}. "
+          f"Press Ctrl+C to stop.", file=out, flush=True)
+    try:
+        while True:
+            event, label, detail = worker.events.get()
+            stamp = time.strftime("%H:%M:%S")
+            print(f"{stamp} [{event}] {label}" + (f": {detail}" if detail else ""), file=out, flush=True)
+    except KeyboardInterrupt:
+        worker.stop()
+        worker.join(timeout=10)  # Lets the cancelled jobs report back
+        return 130
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.watch and args.inputs:
+        parser.error("INPUT files can't be combined with --watch")
+    if args.worker and (args.inputs or args.watch or args.serve):
+        parser.error("--worker takes its jobs from the server; it can't be combined with INPUT, --watch or --serve")
+    if args.serve and args.watch:
+        parser.error("--serve can't be combined with --watch")
+    if args.sync and (args.inputs or args.watch or args.worker or args.output):
+        parser.error("--sync can't be combined with INPUT, --watch, --worker or -o")
+    if args.sync and not args.output_dir:
+        parser.error("--sync needs --output-dir")
+    if not (args.watch or args.inputs or args.sync) and not (args.probe or args.list_presets or args.worker):
+        parser.error("at least one INPUT (or --watch DIR, or --sync DIR) is required")
+    if args.wrapper and args.launcher not in (None, MODE_WRAPPER):
+        parser.error("--wrapper can only be used with --launcher wrapper")
+    try:
+        parse_cpu_list(args.cpus)
+    except ValueError as e:
+        parser.error(f"--cpus: {e}")
+    settings = resolve_settings(args)
+
+    presets = PresetStore(get_presets_file_path())
+    if args.list_presets:
+        for name in presets.names():
+            print(f"{name}: {presets.get(name).describe()}")
+        return 0
+    preset = None
+    if args.preset:
+        try:
+            preset = presets.require(args.preset)
+        except KeyError as e:
+            print(f"Error: {e.args[0]}", file=sys.stderr)
+            return 2
+
+    if args.probe:
+        if not os.path.exists(settings["converter_path"]):
+            print(f"Error: Converter not found at: {settings['converter_path']}", file=sys.stderr)
+            return 2
+        probe = ConverterProbe(get_probe_cache_path(), launcher=launcher_from_settings(settings))
+        print(probe.capabilities(settings["converter_path"]).describe())
+        return 0
+
+    try:
+        metrics, stop_metrics = start_metrics(args)
+    except (OSError, ValueError) as e:
+        print(f"Error: Could not export metrics: {e}", file=sys.stderr)
+        return 2
+    try:
+        return convert(args, settings, preset, metrics)
+    finally:
+        stop_metrics()
+
+
+def convert(args, settings, preset=None, metrics=None):
+    """Runs the worker, watcher, sync or batch asked for by `args`. Returns the exit code."""
+    launcher = launcher_from_settings(settings)
+    if args.verbose and settings["converter_path"]:
+        print(f"Starting the converter: {launcher.describe([settings['converter_path']])}", flush=True)
+    if args.worker:
+        if not os.path.exists(settings["converter_path"]):
+            print(f"Error: Converter not found at: {settings['converter_path']}", file=sys.stderr)
+            return 2
+        return run_worker(args, settings, metrics=metrics, launcher=launcher)
+
+    if args.watch:
+        if not os.path.exists(settings["converter_path"]):
+            print(f"Error: Converter not found at: {settings['converter_path']}", file=sys.stderr)
+            return 2
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        return watch_folder(args, settings, metrics=metrics, launcher=launcher)
+
+    if args.serve and not settings["converter_path"]:
+        # Workers run their own converter, so this machine doesn't need one
+        settings["converter_path"] = CONVERTER_EXE_NAME
+    if args.sync and not os.path.isdir(args.sync):
+        print(f"Error: Sync folder not found: {args.sync}", file=sys.stderr)
+        return 2
+    on_job = None
+    try:
+        if args.sync:
+            sync, jobs = plan_sync(args, settings, preset)
+            on_job = sync_recorder(sync, args.orphans == "delete")
+        else:
+            jobs = plan_jobs(args, settings, preset)
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    if args.dry_run:
+        for job in jobs:
+            print(format_command(job.command_parts if args.serve else launcher.argv(job.command_parts)))
+        return 0
+
+    if args.serve:
+        if args.output_dir:
+            os.makedirs(args.output_dir, exist_ok=True)
+        summary = serve_jobs(args, jobs, settings, on_job=on_job)
+        if summary is None:
+            return 2
+        print(f"{summary} in {format_elapsed(summary.elapsed)}")
+        if summary.cancelled:
+            return 130
+        return 0 if summary.failed == 0 else 1
+
+    converter_path = settings["converter_path"]
+    if not os.path.exists(converter_path):
+        print(f"Error: Converter not found at: {converter_path}", file=sys.stderr)
+        return 2
+    problems = check_jobs(jobs, ConverterProbe(get_probe_cache_path(), launcher=launcher))
+    if problems:
+        print("\n".join(problems), file=sys.stderr)
+        return 2
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    from .history import JobHistory
+    from .packaging import packager_from_settings
+    from .scheduler import scheduler_from_settings
+    from .staging import staging_from_settings
+    cache = cache_from_settings(settings, get_cache_dir())
+    history = JobHistory(get_history_db_path())
+    scheduler = scheduler_from_settings(settings, history, args.order, args.throttle)
+    staging = staging_from_settings(settings)
+    try:
+        summary = run_jobs(jobs, args.jobs, args.retries, verbose=args.verbose, log_dir=args.log_dir, cache=cache,
+                           history=history, scheduler=scheduler, staging=staging,
+                           packager=packager_from_settings(settings, args.compress, args.group_frames),
+                           validate=settings.get("validate_outputs", True), on_job=on_job, metrics=metrics,
+                           launcher=launcher)
+    finally:
+        if staging is not None:
+            staging.close()
+    print(f"{summary} in {format_elapsed(summary.elapsed)}")
+    if summary.cancelled:
+        return 130
+    return 0 if summary.failed == 0 else 1
@@ -0,0 +1,131 @@
+import os
+
+OUTPUT_FORMATS = ('.gprec', '.srf', '.sur', '.pcd', '.pro', '.csv')
+INPUT_EXTENSIONS = ('.gprec', '.srf', '.sur', '.pcd', '.pro')
+
+# Placeholders shown in the command preview for values that are still missing
+CONVERTER_PLACEHOLDER = "[CONVERTER_PATH]"
+INPUT_PLACEHOLDER = "[INPUT_FILE]"
+FRAME_PLACEHOLDER = "[FRAME_INDEX]"
+OUTPUT_PLACEHOLDER = "[OUTPUT_NAME]"
+
+FRAME_INDEX_ERROR = "Error: Frame index must be a whole number."
+
+
+class CommandError(ValueError):
+    """Raised by build_command when a required value is missing."""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        super().__init__("\n".join(self.problems))
+
+
+def get_pcd_args(settings, output_format):
+    """Returns the PCD import arguments from the settings (empty unless the format is .pcd)."""
+    pcd_args = []
+    if output_format == '.pcd':
+        pcd_width = settings.get('pcd_width', '0')
+        pcd_height = settings.get('pcd_height', '0')
+        pcd_swap = settings.get('pcd_swap', False)
+        pcd_zoom = settings.get('pcd_zoom', '1.0')
+        pcd_remove = settings.get('pcd_remove', False)
+
+        if pcd_width != '0': pcd_args.extend(("-w", pcd_width))
+        if pcd_height != '0': pcd_args.extend(("-h", pcd_height))
+        if pcd_swap: pcd_args.append("-s")
+        if pcd_zoom != '1.0': pcd_args.extend(("-z", pcd_zoom))
+        if pcd_remove: pcd_args.append("-r")
+    return pcd_args
+
+
+def converter_segment(settings):
+    """(parts, problems) for the converter executable."""
+    converter_path = settings.get("converter_path")
+    if converter_path:
+        return [converter_path], []
+    return [CONVERTER_PLACEHOLDER], ["Error: Path to ReplayConverter.exe is not set. Please go to Settings."]
+
+
+def input_segment(input_file):
+    """(parts, problems) for the -i option."""
+    if input_file:
+        return ['-i', input_file], []
+    return ['-i', INPUT_PLACEHOLDER], ["Error: Please select an input file."]
+
+
+def frame_segment(frame):
+    """(parts, problems) for -a (frame is None) or -f <frame>."""
+    if frame is None:
+        return ['-a'], []
+    frame = str(frame)
+    if not frame:
+        return ['-f', FRAME_PLACEHOLDER], ["Warning: Frame index is empty when 'Export all frames' is unchecked."]
+    if not frame.isdigit():
+        return ['-f', frame], [FRAME_INDEX_ERROR]
+    return ['-f', frame], []
+
+
+def output_segment(output_base, output_format):
+    """(parts, problems) for the -o option."""
+    if output_base:
+        return ['-o', f"{output_base}{output_format}"], []
+    return ['-o', f"{OUTPUT_PLACEHOLDER}{output_format}"], ["Warning: Output file name is not specified."]
+
+
+def describe_command(settings, input_file, output_base, output_format, frame=None):
+    """
+    Assembles the converter command, substituting placeholders for missing values.
+
+    `frame` is None to export all frames (-a), otherwise the frame index for -f.
+    Returns (parts, problems) where problems is a list of "Error: ..."/"Warning: ..."
+    messages; the command is only runnable when problems is empty.
+    """
+    parts, problems = [], []
+    for segment_parts, segment_problems in (
+        converter_segment(settings),
+        input_segment(input_file),
+        frame_segment(frame),
+        output_segment(output_base, output_format),
+        (get_pcd_args(settings, output_format), []),
+    ):
+        parts.extend(segment_parts)
+        problems.extend(segment_problems)
+    return parts, problems
+
+
+def build_command(settings, input_file, output_base, output_format, frame=None):
+    """
+    Returns the argument list for running one conversion.
+    Raises CommandError if the converter, input, frame index or output name is missing.
+    """
+    parts, problems = describe_command(settings, input_file, output_base, output_format, frame)
+    if problems:
+        raise CommandError(problems)
+    return parts
+
+
+def format_command(parts, quote_first=True):
+    """
+    Joins command parts for display, quoting the executable and the -i/-o paths.
+    Pass quote_first=False to format a fragment that doesn't start with the executable.
+    """
+    quoted = []
+    for i, part in enumerate(parts):
+        if (i == 0 and quote_first) or (i > 0 and parts[i - 1] in ('-i', '-o')):
+            quoted.append(f'"{part}"')
+        else:
+            quoted.append(part)
+    return " ".join(quoted)
+
+
+def default_output_base(input_file):
+    """Output name used when none is given: the input's path without its extension."""
+    return os.path.splitext(input_file)[0]
+
+
+def get_option_value(parts, option):
+    """Returns the value following `option` (e.g. '-o') in a command, or None."""
+    for i, part in enumerate(parts[:-1]):
+        if part == option:
+            return parts[i + 1]
+    return None
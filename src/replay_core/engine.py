@@ -0,0 +1,354 @@
+import contextlib
+import queue
+import subprocess
+import threading
+import time
+
+from .cache import break_hardlink
+from .command import CommandError, get_option_value
+from .launcher import Launcher, terminate_process_tree
+from .outputlog import STDERR, STDOUT, OutputLog
+from .procstats import wait_with_usage
+from .progress import ProgressTracker
+from .validation import validate_outputs
+
+# Lines of stdout/stderr copied into a ConversionResult (the full output is in the log file)
+RESULT_TAIL_LINES = 50
+
+
+class ConversionResult:
+    """
+    The outcome of a single ReplayConverter run.
+    `stdout`/`stderr` only hold the last lines of each stream; see `log_path` for everything.
+    `cpu_time` (seconds) and `peak_rss` (bytes) describe the converter process, when known.
+    `archives` lists the compressed files written by the job's Packager, if it had one.
+    `validation` is the ValidationReport of a .csv/.pcd output when the job validated it.
+    `timings` maps the stages the run went through (metrics.SPANS) to seconds.
+    """
+
+    def __init__(self, command_parts, returncode=None, stdout="", stderr="",
+                 elapsed=0.0, cancelled=False, error=None, log_path=None, cached=False,
+                 started_at=None, cpu_time=None, peak_rss=None):
+        self.command_parts = list(command_parts)
+        self.cached = cached  # True if the output was restored from the conversion cache
+        self.started_at = started_at  # time.time() when the job started
+        self.cpu_time = cpu_time
+        self.peak_rss = peak_rss
+        self.archives = []
+        self.validation = None
+        self.timings = {}
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.log_path = log_path
+        self.elapsed = elapsed
+        self.cancelled = cancelled
+        self.error = error  # Exception raised while launching, if any
+
+    @property
+    def succeeded(self):
+        return not self.cancelled and self.error is None and self.returncode == 0
+
+
+class ConversionJob:
+    """
+    Runs one converter command on a background thread.
+
+    The job never touches any GUI object. Callers either block on run(), or call
+    start() and then poll the `events` queue (the GUI does this from root.after)
+    for ("finished", ConversionResult) tuples.
+
+    stdout and stderr are read line by line while the converter runs. Lines go into
+    `output` (a bounded OutputLog, optionally mirrored to `log_path`) and, if given,
+    to `on_line(stream, text)`, which is called on a reader thread. Frame counters
+    in the output (or the growth of the -o file) drive `progress`.
+
+    With a ConversionCache, a run whose inputs, arguments and converter match an
+    earlier one restores the stored output instead of spawning the converter, and
+    successful runs are added to the cache.
+
+    With a JobHistory, every finished run (including cancelled and failed ones) is
+    recorded there, tagged with `source` ("gui", "batch", "cli", ...).
+
+    With a StagingArea the converter reads a local copy of the input and writes into
+    scratch; the outputs are then copied back before the job finishes. With
+    `defer_upload` the job finishes as soon as the converter exits and `upload`
+    holds the pending Upload: the result (plus cache and history) is completed when
+    it is done, and ("uploaded", ConversionResult) is posted to `events`.
+
+    With `validate`, the .csv/.pcd outputs of a successful run are checked (see
+    validation.py). With a Packager, they are then compressed as a last step (after
+    caching and recording, which see the uncompressed files).
+
+    With an ExportCheckpoint (resume.py), the frames an all-frames export has
+    written are recorded as it runs, so an interrupted export can be resumed.
+
+    With a MetricsRegistry (metrics.py) the stages of the run are timed into it
+    and its outcome is counted. The same stage timings are kept per run in
+    ConversionResult.timings either way.
+
+    The converter is started by `launcher` (launcher.py: natively, through Wine or
+    a wrapper, with its priority and CPUs), by default Launcher(), and cancel()
+    stops it together with every process it started.
+
+    With a ConverterProbe the command is first checked against what the converter
+    supports, probing it on the job's thread if it hasn't been yet; a command it
+    can't run fails with a CommandError before anything is started.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    FINISHED = "finished"
+
+    def __init__(self, command_parts, log_path=None, on_line=None, cache=None, history=None, source=None,
+                 staging=None, defer_upload=False, packager=None, validate=False, checkpoint=None, metrics=None,
+                 launcher=None, probe=None):
+        self.command_parts = list(command_parts)
+        self.cache = cache
+        self.history = history
+        self.source = source
+        self.staging = staging
+        self.defer_upload = defer_upload
+        self.packager = packager
+        self.validate = validate
+        self.checkpoint = checkpoint
+        self.metrics = metrics
+        self.launcher = launcher if launcher is not None else Launcher()
+        self.probe = probe
+        self.timings = {}  # Stage -> seconds (see metrics.SPANS), also handed out as ConversionResult.timings
+        self.upload = None  # Upload still copying the outputs back (only with defer_upload)
+        self.events = queue.Queue()
+        self.output = OutputLog(log_path=log_path)
+        self.on_line = on_line
+        self.progress = ProgressTracker(get_option_value(self.command_parts, '-o'))
+        self.state = self.PENDING
+        self.result = None
+        self._process = None
+        self._thread = None
+        self._cancel_requested = threading.Event()
+        self._lock = threading.Lock()
+        self._start_time = None
+        self._end_time = None
+        self._spawned_at = None  # time.perf_counter() once the converter has started
+
+    @property
+    def elapsed(self):
+        """Seconds since the job started (frozen once it finishes)."""
+        if self._start_time is None:
+            return 0.0
+        end = self._end_time if self._end_time is not None else time.monotonic()
+        return end - self._start_time
+
+    @property
+    def is_running(self):
+        return self.state == self.RUNNING
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_requested.is_set()
+
+    @property
+    def pid(self):
+        """Process id of the running converter, or None before it starts / after it exits."""
+        with self._lock:
+            process = self._process
+        if process is None or process.returncode is not None:
+            return None
+        return process.pid
+
+    def start(self):
+        """Starts the conversion on a daemon thread and returns immediately."""
+        if self.state != self.PENDING:
+            raise RuntimeError("A ConversionJob can only be started once.")
+        self.state = self.RUNNING
+        self._start_time = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="ConversionJob", daemon=True)
+        self._thread.start()
+
+    def run(self):
+        """Runs the conversion on the calling thread and returns the ConversionResult."""
+        self.start()
+        self._thread.join()
+        return self.result
+
+    def wait(self, timeout=None):
+        """Blocks until the job has finished. Returns True if it did."""
+        if self._thread is None:
+            return False
+        self._thread.join(timeout)
+        return not self._thread.is_alive()
+
+    def cancel(self):
+        """Requests cancellation and terminates the child process if it is running."""
+        self._cancel_requested.set()
+        with self._lock:
+            process = self._process
+        if process is not None and process.poll() is None:
+            terminate_process_tree(process)
+
+    def _run(self):
+        returncode, error, cached, usage = None, None, False, None
+        cache_key, started_at, staged, upload = None, time.time(), None, None
+        try:
+            if self.probe is not None:
+                problems = self.probe.check(self.command_parts)
+                if problems:
+                    raise CommandError(problems)
+            if self.cache is not None:
+                cache_key = self.cache.make_key(self.command_parts)
+                if cache_key is not None and self.cache.restore(self.command_parts, cache_key):
+                    self.output.append(STDOUT, "Output restored from the conversion cache.")
+                    returncode, cached = 0, True
+                    raise _CacheHit()
+                output_path = get_option_value(self.command_parts, '-o')
+                if output_path:
+                    break_hardlink(output_path)  # Never rewrite a file shared with a cache entry
+
+            command_parts = self.command_parts
+            if self.staging is not None:
+                with self._span("stage_in"):
+                    staged = self.staging.prepare(command_parts, cancelled=self._cancel_requested)
+                command_parts = staged.command_parts
+                if staged.local_output is not None:
+                    self.progress.output_path = staged.local_output
+
+            with self._lock:
+                if self._cancel_requested.is_set():
+                    raise _Cancelled()
+                spawn_started = time.perf_counter()
+                self._process = self.launcher.popen(
+                    command_parts,
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    text=True,
+                    errors="replace",
+                    bufsize=1,
+                )
+                self._spawned_at = time.perf_counter()
+            self._record("spawn", self._spawned_at - spawn_started)
+            if self.metrics is not None:
+                self.metrics.add("conversions_running", 1)
+            readers = [
+                threading.Thread(target=self._read_stream, args=(self._process.stdout, STDOUT), daemon=True),
+                threading.Thread(target=self._read_stream, args=(self._process.stderr, STDERR), daemon=True),
+            ]
+            for reader in readers:
+                reader.start()
+            try:
+                returncode, usage = wait_with_usage(self._process)
+            finally:
+                self._record("converter", time.perf_counter() - self._spawned_at)
+                if self.metrics is not None:
+                    self.metrics.add("conversions_running", -1)
+            for reader in readers:
+                reader.join()
+            if returncode == 0 and staged is not None and not self._cancel_requested.is_set():
+                upload = staged.upload(started_at)
+                if upload is not None:
+                    upload_started = time.perf_counter()
+                    upload.add_done_callback(lambda upload: self._record("upload",
+                                                                         time.perf_counter() - upload_started))
+                if upload is not None and not self.defer_upload:
+                    upload.wait()
+                    error = upload.error
+        except (_Cancelled, _CacheHit):
+            pass
+        except Exception as e:  # e.g. FileNotFoundError / PermissionError on the converter
+            error = e
+        finally:
+            if staged is not None:
+                staged.release(discard_output=upload is None)
+
+        self._end_time = time.monotonic()
+        self.output.close()
+        self.result = ConversionResult(
+            self.command_parts, returncode=returncode,
+            stdout=self.output.tail(RESULT_TAIL_LINES, STDOUT), stderr=self.output.tail(RESULT_TAIL_LINES, STDERR),
+            elapsed=self.elapsed, cancelled=self._cancel_requested.is_set(), error=error,
+            log_path=self.output.log_path, cached=cached, started_at=started_at,
+            cpu_time=usage.cpu_seconds if usage else None, peak_rss=usage.peak_rss if usage else None,
+        )
+        self.result.timings = self.timings
+        if upload is not None and self.defer_upload:
+            self.upload = upload
+            self.state = self.FINISHED
+            self.events.put(("finished", self.result))
+            upload.add_done_callback(lambda upload: self._complete(cache_key, upload.error))
+            return
+        self._complete(cache_key, None)
+        self.state = self.FINISHED
+        self.events.put(("finished", self.result))
+
+    def _complete(self, cache_key, upload_error):
+        """Caches, records, validates and compresses a run once its outputs are in their final location."""
+        with self._span("post_process"):
+            self._post_process(cache_key, upload_error)
+        if self.metrics is not None:
+            if self.result.cached:
+                outcome = "cached"
+            elif self.result.succeeded:
+                outcome = "succeeded"
+            else:
+                outcome = "cancelled" if self.result.cancelled else "failed"
+            self.metrics.inc("conversions_total", label=("outcome", outcome))
+        if self.upload is not None:
+            self.events.put(("uploaded", self.result))
+
+    def _post_process(self, cache_key, upload_error):
+        if upload_error is not None:
+            self.result.error = upload_error
+        elif self.result.succeeded and cache_key is not None and not self.result.cached:
+            self.cache.store(self.command_parts, self.result.started_at, cache_key)
+        if self.history is not None:
+            self.history.record(self.result, source=self.source)
+        if self.checkpoint is not None:
+            self.checkpoint.job_finished(self.command_parts, self.result)
+        if self.validate and self.result.succeeded:
+            self.result.validation = validate_outputs(self.command_parts, self.result.started_at)
+        if self.packager is not None and self.result.succeeded:
+            try:
+                self.result.archives = self.packager.package(self.command_parts, self.result.started_at)
+            except (OSError, RuntimeError, ValueError) as e:
+                print(f"Warning: Could not compress the outputs (they are left uncompressed): {e}")
+
+    def _read_stream(self, pipe, stream):
+        """Reader thread: moves lines from one of the child's pipes into the output log."""
+        with pipe:
+            for line in pipe:
+                text = line.rstrip("\r\n")
+                if "first_output" not in self.timings:
+                    with self._lock:
+                        if "first_output" not in self.timings:  # The other reader may have been first
+                            self._record("first_output", time.perf_counter() - self._spawned_at)
+                if self.metrics is not None:
+                    self.metrics.inc("output_lines_total")
+                self.output.append(stream, text)
+                self.progress.feed_line(text)
+                if self.checkpoint is not None:
+                    self.checkpoint.feed_line(text)
+                if self.on_line is not None:
+                    try:
+                        self.on_line(stream, text)
+                    except Exception as e:
+                        print(f"Warning: Output callback failed: {e}")
+
+    def _record(self, stage, seconds):
+        self.timings[stage] = seconds
+        if self.metrics is not None:
+            self.metrics.observe(stage, seconds)
+
+    @contextlib.contextmanager
+    def _span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(stage, time.perf_counter() - started)
+
+
+class _Cancelled(Exception):
+    """Raised internally when a job is cancelled before its process was spawned."""
+
+
+class _CacheHit(Exception):
+    """Raised internally when the output was restored from the cache instead of converting."""
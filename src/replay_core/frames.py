@@ -0,0 +1,94 @@
+import re
+
+from .command import CommandError, build_command
+
+MAX_FRAMES_PER_SPEC = 1000000  # Guards against typos like 0-99999999
+FRAME_NUMBER_WIDTH = 6         # Zero padding of the frame number in sharded output names
+
+_RANGE_RE = re.compile(r"^(\d+)\s*-\s*(\d+)(?:\s*:\s*(\d+))?$")
+
+
+def parse_frame_spec(spec):
+    """
+    Expands a frame selection into a sorted list of unique frame indices.
+
+    Accepts comma separated items, each either a single index ("42") or an
+    inclusive range with an optional step ("1000-5000", "1000-5000:10"):
+        "3,7,42"          -> [3, 7, 42]
+        "10-20:5, 100"    -> [10, 15, 20, 100]
+    Raises ValueError with a user-facing message for anything else.
+    """
+    frames = set()
+    items = [item.strip() for item in str(spec).split(",")]
+    if not any(items):
+        raise ValueError("Frame selection is empty.")
+    for item in items:
+        if not item:
+            continue
+        if item.isdigit():
+            frames.add(int(item))
+            continue
+        match = _RANGE_RE.match(item)
+        if not match:
+            raise ValueError(f"Invalid frame selection '{item}'. Use e.g. 42, 3,7,42 or 1000-5000:10.")
+        start, end = int(match.group(1)), int(match.group(2))
+        step = int(match.group(3)) if match.group(3) else 1
+        if end < start:
+            raise ValueError(f"Invalid frame range '{item}': the end is before the start.")
+        if step < 1:
+            raise ValueError(f"Invalid frame range '{item}': the step must be at least 1.")
+        if (end - start) // step + 1 + len(frames) > MAX_FRAMES_PER_SPEC:
+            raise ValueError(f"Frame selection '{spec}' is too large (over {MAX_FRAMES_PER_SPEC} frames).")
+        frames.update(range(start, end + 1, step))
+    return sorted(frames)
+
+
+def is_single_frame(spec):
+    """True if the selection is a plain frame index (no list or range)."""
+    return str(spec).strip().isdigit()
+
+
+def resolve_frame_selection(frame):
+    """
+    Splits what the user typed into the frame field into (frame_option, shard_frames, error):
+    the -f value to preview/run, the frames to fan out over when it's a list or range
+    (empty otherwise) and a user-facing "Error: ..." message if it couldn't be parsed.
+    """
+    if not frame or is_single_frame(frame):
+        return frame.strip() if frame else frame, [], None
+    try:
+        frames = parse_frame_spec(frame)
+    except ValueError as e:
+        return frame, [], f"Error: {e}"
+    return str(frames[0]), frames if len(frames) > 1 else [], None
+
+
+def shard_output_base(output_base, frame):
+    """Output name for one frame of a sharded export: '<base>_<frame, zero padded>'."""
+    return f"{output_base}_{frame:0{FRAME_NUMBER_WIDTH}d}"
+
+
+def build_shard_commands(settings, input_file, output_base, output_format, frames):
+    """
+    Returns [(frame, command_parts), ...] with one single-frame (-f) conversion per frame,
+    each writing to shard_output_base(output_base, frame). Raises CommandError if
+    something required is missing.
+    """
+    return [(frame, build_command(settings, input_file, shard_output_base(output_base, frame), output_format, frame))
+            for frame in frames]
+
+
+def frame_commands(settings, input_file, output_base, output_format, frame):
+    """
+    The commands the frame field's text `frame` runs for one input, resolved exactly as
+    the command preview resolves it (resolve_frame_selection): [(None, command_parts)]
+    for all frames or a single frame, else one (frame, command_parts) per frame of a
+    list or range (see build_shard_commands). Raises CommandError for a selection that
+    can't be parsed or anything build_command rejects.
+    """
+    frame_option, shard_frames, error = resolve_frame_selection(frame)
+    if error:
+        raise CommandError([error])
+    if shard_frames:
+        return build_shard_commands(settings, input_file, output_base, output_format, shard_frames)
+    return [(None, build_command(settings, input_file, output_base, output_format, frame_option))]
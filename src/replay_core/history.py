@@ -0,0 +1,234 @@
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+
+from .cache import collect_outputs
+from .command import get_option_value
+
+STDERR_MAX_CHARS = 4000  # Stored per run; the full output is in the log file
+DEFAULT_QUERY_LIMIT = 500
+ESTIMATE_SAMPLE_RUNS = 200  # Recent runs of the same kind used to scale estimates by input size
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    source TEXT,
+    input_path TEXT,
+    output_path TEXT,
+    output_format TEXT,
+    command_json TEXT NOT NULL,
+    input_size INTEGER,
+    output_size INTEGER,
+    wall_seconds REAL,
+    cpu_seconds REAL,
+    peak_rss INTEGER,
+    returncode INTEGER,
+    status TEXT NOT NULL,
+    cached INTEGER NOT NULL DEFAULT 0,
+    stderr TEXT,
+    log_path TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_input_time ON runs (input_path, started_at);
+CREATE INDEX IF NOT EXISTS runs_time ON runs (started_at);
+"""
+
+SUCCEEDED = "Succeeded"
+FAILED = "Failed"
+CANCELLED = "Cancelled"
+STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class HistoryEntry:
+    """One recorded converter run."""
+
+    def __init__(self, row):
+        self.id = row["id"]
+        self.started_at = row["started_at"]
+        self.source = row["source"]
+        self.input_path = row["input_path"]
+        self.output_path = row["output_path"]
+        self.output_format = row["output_format"]
+        self.command_parts = json.loads(row["command_json"])
+        self.input_size = row["input_size"]
+        self.output_size = row["output_size"]
+        self.wall_seconds = row["wall_seconds"]
+        self.cpu_seconds = row["cpu_seconds"]
+        self.peak_rss = row["peak_rss"]
+        self.returncode = row["returncode"]
+        self.status = row["status"]
+        self.cached = bool(row["cached"])
+        self.stderr = row["stderr"]
+        self.log_path = row["log_path"]
+
+
+class RunEstimate:
+    """
+    Expected peak memory (bytes), output size (bytes) and wall time (seconds) of a run;
+    each is None when the history has nothing to go on. `exact` is True when the
+    same command has succeeded before.
+    """
+
+    def __init__(self, peak_rss=None, output_size=None, wall_seconds=None, exact=False):
+        self.peak_rss = peak_rss
+        self.output_size = output_size
+        self.wall_seconds = wall_seconds
+        self.exact = exact
+
+
+class JobHistory:
+    """
+    SQLite record of every converter run, for finding slow recordings/formats and
+    re-running old jobs.
+
+    record() is called from job threads; each call uses its own short-lived
+    connection, and the database runs in WAL mode so readers (the history view)
+    don't block writers. Database errors are printed as warnings and never fail a
+    conversion.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        connection = sqlite3.connect(self.db_path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    connection.execute("PRAGMA journal_mode=WAL")
+                    connection.executescript(_SCHEMA)
+                    self._initialized = True
+        return contextlib.closing(connection)
+
+    def record(self, result, source=None):
+        """Stores a ConversionResult. Returns the new row id, or None if it couldn't be written."""
+        parts = result.command_parts
+        input_path = get_option_value(parts, '-i')
+        output_path = get_option_value(parts, '-o')
+        if result.cancelled:
+            status = CANCELLED
+        elif result.succeeded:
+            status = SUCCEEDED
+        else:
+            status = FAILED
+        stderr = result.stderr or (str(result.error) if result.error else "")
+        row = (
+            result.started_at, source, input_path, output_path,
+            os.path.splitext(output_path)[1].lower() if output_path else None,
+            json.dumps(parts), _file_size(input_path),
+            _output_size(output_path, result.started_at) if status == SUCCEEDED else None,
+            result.elapsed, result.cpu_time, result.peak_rss, result.returncode, status, int(result.cached),
+            stderr[-STDERR_MAX_CHARS:], result.log_path,
+        )
+        try:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            with self._connect() as connection, connection:
+                cursor = connection.execute(
+                    "INSERT INTO runs (started_at, source, input_path, output_path, output_format, command_json, "
+                    "input_size, output_size, wall_seconds, cpu_seconds, peak_rss, returncode, status, cached, "
+                    "stderr, log_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+                return cursor.lastrowid
+        except (sqlite3.Error, OSError) as e:
+            print(f"Warning: Could not record the run in {self.db_path}: {e}")
+            return None
+
+    def query(self, input_contains=None, output_format=None, status=None, since=None, limit=DEFAULT_QUERY_LIMIT):
+        """Returns HistoryEntry objects, newest first, matching all of the given filters."""
+        clauses, params = [], []
+        if input_contains:
+            clauses.append("input_path LIKE ? ESCAPE '\\'")
+            escaped = input_contains.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        if output_format:
+            clauses.append("output_format = ?")
+            params.append(output_format)
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        if since is not None:
+            clauses.append("started_at >= ?")
+            params.append(since)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self._select(f"SELECT * FROM runs {where} ORDER BY started_at DESC LIMIT ?", params + [limit])
+
+    def runs_for_input(self, input_path, limit=DEFAULT_QUERY_LIMIT):
+        """Runs of one input file, newest first (uses the input_path/started_at index)."""
+        return self._select("SELECT * FROM runs WHERE input_path = ? ORDER BY started_at DESC LIMIT ?",
+                            [input_path, limit])
+
+    def estimate(self, command_parts, input_size=None):
+        """
+        Predicts a run from earlier ones: the last successful run of exactly this
+        command if there is one, otherwise the average per-input-byte cost of recent
+        runs with the same output format and frame mode, scaled by `input_size`.
+        Cached runs are ignored since they didn't run the converter.
+        """
+        if not os.path.exists(self.db_path):
+            return RunEstimate()
+        try:
+            with self._connect() as connection:
+                row = connection.execute(
+                    "SELECT peak_rss, output_size, wall_seconds FROM runs WHERE input_path = ? AND command_json = ? "
+                    "AND status = ? AND cached = 0 ORDER BY started_at DESC LIMIT 1",
+                    [get_option_value(command_parts, '-i'), json.dumps(list(command_parts)), SUCCEEDED]).fetchone()
+                if row is not None:
+                    return RunEstimate(row["peak_rss"], row["output_size"], row["wall_seconds"], exact=True)
+                if not input_size:
+                    return RunEstimate()
+                output_path = get_option_value(command_parts, '-o')
+                output_format = os.path.splitext(output_path)[1].lower() if output_path else None
+                all_frames = "-a" in command_parts
+                row = connection.execute(
+                    "SELECT AVG(peak_rss * 1.0 / input_size) AS rss, AVG(output_size * 1.0 / input_size) AS output, "
+                    "AVG(wall_seconds / input_size) AS wall FROM (SELECT * FROM runs WHERE output_format IS ? "
+                    "AND status = ? AND cached = 0 AND input_size > 0 AND (command_json LIKE '%\"-a\"%') = ? "
+                    "ORDER BY started_at DESC LIMIT ?)",
+                    [output_format, SUCCEEDED, int(all_frames), ESTIMATE_SAMPLE_RUNS]).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read {self.db_path}: {e}")
+            return RunEstimate()
+
+        def scaled(ratio):
+            return ratio * input_size if ratio is not None else None
+        return RunEstimate(scaled(row["rss"]), scaled(row["output"]), scaled(row["wall"]))
+
+    def get(self, run_id):
+        entries = self._select("SELECT * FROM runs WHERE id = ?", [run_id])
+        return entries[0] if entries else None
+
+    def clear(self):
+        try:
+            with self._connect() as connection, connection:
+                connection.execute("DELETE FROM runs")
+        except sqlite3.Error as e:
+            print(f"Warning: Could not clear {self.db_path}: {e}")
+
+    def _select(self, sql, params):
+        if not os.path.exists(self.db_path):
+            return []
+        try:
+            with self._connect() as connection:
+                return [HistoryEntry(row) for row in connection.execute(sql, params)]
+        except sqlite3.Error as e:
+            print(f"Warning: Could not read {self.db_path}: {e}")
+            return []
+
+
+def _output_size(output_path, started_at):
+    """Total size of what a run wrote: the -o file plus any per-frame siblings."""
+    if not output_path:
+        return None
+    outputs = collect_outputs(output_path, started_at or 0)
+    return sum(_file_size(path) or 0 for _, path in outputs) if outputs else None
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
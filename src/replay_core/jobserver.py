@@ -0,0 +1,571 @@
+import hmac
+import ipaddress
+import json
+import math
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .batch import BatchJob, BatchSummary
+from .engine import ConversionJob, ConversionResult, RESULT_TAIL_LINES
+from .outputlog import new_log_path
+from .validation import validate_outputs
+
+DEFAULT_PORT = 8765
+LEASE_WAIT_SECONDS = 5.0        # A worker's lease request is held this long waiting for a job
+HEARTBEAT_SECONDS = 3.0         # How often workers report in
+WORKER_TIMEOUT_SECONDS = 15.0   # A worker not heard from for this long is presumed dead
+MAX_LOST_ATTEMPTS = 3           # A job whose worker died this often is failed instead of re-queued
+RECONNECT_SECONDS = 2.0         # Wait between attempts while the server can't be reached
+REQUEST_TIMEOUT_SECONDS = LEASE_WAIT_SECONDS + 10.0
+TOKEN_HEADER = "X-Replay-Token"
+RESULT_SENT_LINES = 20          # Output lines sent back with a result (the worker's log has everything)
+MAX_REQUEST_BYTES = 1024 * 1024  # Larger request bodies are refused unread
+
+
+def job_spec(command_parts):
+    """
+    The part of a command a worker needs: everything after the converter, whose
+    path is the worker's own. The -i/-o paths must be reachable from the worker
+    (a network share), possibly under another name (see map_path).
+    """
+    return {"args": list(command_parts[1:])}
+
+
+def map_path(path, path_map):
+    """Rewrites the start of `path` with the first matching (prefix, replacement) pair of `path_map`."""
+    for prefix, replacement in path_map:
+        if path == prefix or path.startswith(prefix.rstrip("/\\") + "/") or path.startswith(prefix.rstrip("/\\") + "\\"):
+            return os.path.normpath(replacement + path[len(prefix):])
+    return path
+
+
+def command_from_spec(spec, converter_path, path_map=()):
+    """The command a worker runs for a job spec, with its own converter and mapped -i/-o paths."""
+    args = list(spec["args"])
+    for i in range(len(args) - 1):
+        if args[i] in ('-i', '-o'):
+            args[i + 1] = map_path(args[i + 1], path_map)
+    return [converter_path] + args
+
+
+def parse_address(text, default_host="0.0.0.0"):
+    """(host, port) from "HOST:PORT", ":PORT" or "PORT"."""
+    host, _, port = str(text).rpartition(":")
+    try:
+        return host or default_host, int(port)
+    except ValueError:
+        raise ValueError(f"Invalid server address '{text}'. Use PORT or HOST:PORT.")
+
+
+def is_loopback(host):
+    """True for an address only this machine can reach (127.x.x.x, ::1, localhost)."""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class RemoteBatchRunner:
+    """
+    Serves a list of BatchJobs to workers on other machines over HTTP.
+
+    It is a drop-in for BatchRunner: status changes are posted to `events` as
+    ("job", BatchJob) and ("done", BatchSummary), and start(), run(), cancel(),
+    elapsed and progress_fractions() work the same way. Instead of spawning
+    converters it listens on `address`; JobWorkers lease jobs (POST /lease, held
+    open up to LEASE_WAIT_SECONDS while nothing is queued), report progress and
+    fetch cancellations with POST /heartbeat, and deliver results with POST
+    /result. GET /status lists the jobs. With a `token`, every request must
+    carry it in the X-Replay-Token header; without one it only listens on a
+    loopback address, as anyone who can reach the port could otherwise lease the
+    jobs and report made-up results.
+
+    A worker that hasn't been heard from for `worker_timeout` seconds is presumed
+    dead and its jobs go back into the queue (up to MAX_LOST_ATTEMPTS times); a
+    late result from it is ignored. Failed conversions are retried up to
+    `max_retries` times, on whichever worker asks next. With `validate` the
+    .csv/.pcd outputs are checked here, through this machine's view of the paths.
+    """
+
+    def __init__(self, jobs, address=("127.0.0.1", DEFAULT_PORT), token="", max_retries=0, validate=False,
+                 worker_timeout=WORKER_TIMEOUT_SECONDS):
+        self.jobs = list(jobs)
+        self.address = address
+        self.token = token
+        self.max_retries = max(0, int(max_retries))
+        self.validate = validate
+        self.worker_timeout = worker_timeout
+        self.events = queue.Queue()
+        self.summary = None
+        self._by_id = {job.job_id: job for job in self.jobs}
+        self._pending = []  # Queued job ids, in order
+        self._leases = {}  # job_id -> (worker_id, lease number)
+        self._lease_count = 0
+        self._progress = {}  # job_id -> fraction reported by its worker
+        self._lost = {}  # job_id -> times its worker died
+        self._workers = {}  # worker_id -> time last heard from
+        self._cond = threading.Condition()
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._httpd = None
+        self._start_time = None
+
+    @property
+    def url(self):
+        """Address workers should use (the host name stands in for a wildcard bind)."""
+        host, port = self._httpd.server_address[:2] if self._httpd is not None else self.address
+        if host in ("0.0.0.0", "", "::"):
+            host = socket.gethostname()
+        return f"http://{host}:{port}"
+
+    @property
+    def is_running(self):
+        return self._start_time is not None and self.summary is None
+
+    @property
+    def elapsed(self):
+        if self._start_time is None:
+            return 0.0
+        if self.summary is not None:
+            return self.summary.elapsed
+        return time.monotonic() - self._start_time
+
+    @property
+    def cancel_requested(self):
+        return self._cancelled.is_set()
+
+    def workers(self):
+        """{worker_id: seconds since it was last heard from} for the live workers."""
+        now = time.monotonic()
+        with self._cond:
+            return {worker: now - seen for worker, seen in self._workers.items()}
+
+    def start(self):
+        """
+        Starts listening and returns immediately. Raises OSError if the address is in
+        use, and ValueError for an address other machines can reach without a token.
+        """
+        if self._start_time is not None:
+            raise RuntimeError("A RemoteBatchRunner can only be started once.")
+        if not self.token and not is_loopback(self.address[0]):
+            raise ValueError("Workers on other machines need a shared token; set one, or listen on 127.0.0.1 only.")
+        self._httpd = ThreadingHTTPServer(self.address, _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.runner = self
+        self._start_time = time.monotonic()
+        with self._cond:
+            self._pending = [job.job_id for job in self.jobs]
+        threading.Thread(target=self._httpd.serve_forever, name="JobServer", daemon=True).start()
+        threading.Thread(target=self._reaper, name="JobServerReaper", daemon=True).start()
+        if not self.jobs:
+            self._finish()
+
+    def run(self):
+        """Serves the whole batch on the calling thread and returns the BatchSummary."""
+        self.start()
+        self._done.wait()
+        return self.summary
+
+    def cancel(self):
+        """Cancels the queued jobs and tells the workers to stop the running ones."""
+        self._cancelled.set()
+        with self._cond:
+            pending, self._pending = self._pending, []
+            self._cond.notify_all()
+        for job_id in pending:
+            self._set_final(self._by_id[job_id], BatchJob.CANCELLED)
+
+    def progress_fractions(self):
+        """{job_id: fraction done or None} for the jobs running on workers right now."""
+        with self._cond:
+            return {job_id: self._progress.get(job_id) for job_id in self._leases}
+
+    def active_conversions(self):
+        return {}  # Nothing runs in this process
+
+    # --- Requests (called on the HTTP server's threads) ---
+
+    def lease(self, worker_id, wait=LEASE_WAIT_SECONDS):
+        """Hands the next queued job to a worker, waiting up to `wait` seconds for one."""
+        deadline = time.monotonic() + min(max(0.0, wait), LEASE_WAIT_SECONDS)
+        with self._cond:
+            self._workers[worker_id] = time.monotonic()
+            while not self._pending and not self._cancelled.is_set() and self.summary is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return {"job": None}
+                self._cond.wait(remaining)
+            if not self._pending or self._cancelled.is_set():
+                return {"job": None}
+            job = self._by_id[self._pending.pop(0)]
+            job.attempts += 1
+            self._lease_count += 1
+            lease = self._lease_count
+            self._leases[job.job_id] = (worker_id, lease)
+            self._workers[worker_id] = time.monotonic()
+        job.status = BatchJob.RUNNING
+        job.worker = worker_id
+        self.events.put(("job", job))
+        return {"job": {"id": job.job_id, "lease": lease, "spec": job_spec(job.command_parts), "label": job.label}}
+
+    def heartbeat(self, worker_id, running):
+        """Records that a worker is alive and how far its jobs are. Returns the jobs it should cancel."""
+        cancel = []
+        with self._cond:
+            self._workers[worker_id] = time.monotonic()
+            for job_id, fraction in running.items():
+                lease = self._leases.get(job_id)
+                if lease is None or lease[0] != worker_id or self._cancelled.is_set():
+                    cancel.append(job_id)  # Cancelled, or given to another worker after this one went quiet
+                else:
+                    self._progress[job_id] = fraction
+        return {"cancel": cancel}
+
+    def report(self, worker_id, record):
+        """Takes a finished job's result from its worker. Results from a stale lease are ignored."""
+        job_id = record.get("id")
+        with self._cond:
+            self._workers[worker_id] = time.monotonic()
+            if self._leases.get(job_id) != (worker_id, record.get("lease")):
+                return {"accepted": False}
+            del self._leases[job_id]
+            self._progress.pop(job_id, None)
+        job = self._by_id[job_id]
+        error = record.get("error")
+        job.result = ConversionResult(
+            job.command_parts, returncode=record.get("returncode"), stdout=record.get("stdout", ""),
+            stderr=record.get("stderr", ""), elapsed=record.get("elapsed", 0.0),
+            cancelled=bool(record.get("cancelled")), error=RuntimeError(error) if error else None,
+            started_at=record.get("started_at"), cpu_time=record.get("cpu_time"), peak_rss=record.get("peak_rss"))
+        if job.checkpoint is not None:
+            job.checkpoint.job_finished(job.command_parts, job.result)  # The outputs are on the shared storage
+        if job.result.succeeded:
+            if self.validate:
+                job.result.validation = validate_outputs(job.command_parts, job.result.started_at)
+            self._set_final(job, BatchJob.SUCCEEDED)
+        elif job.result.cancelled or self._cancelled.is_set():
+            self._set_final(job, BatchJob.CANCELLED)
+        elif job.attempts <= self.max_retries:
+            self._requeue(job, BatchJob.RETRYING)
+        else:
+            self._set_final(job, BatchJob.FAILED)
+        return {"accepted": True}
+
+    def status(self):
+        with self._cond:
+            leases = dict(self._leases)
+        return {"jobs": [{"id": job.job_id, "label": job.label, "status": job.status, "attempts": job.attempts,
+                          "worker": leases.get(job.job_id, (None,))[0]} for job in self.jobs],
+                "workers": sorted(self.workers())}
+
+    # --- Bookkeeping ---
+
+    def _reaper(self):
+        """Re-queues the jobs of workers that stopped sending heartbeats."""
+        while not self._done.wait(min(HEARTBEAT_SECONDS, self.worker_timeout / 3)):
+            now = time.monotonic()
+            with self._cond:
+                dead = {worker for worker, seen in self._workers.items() if now - seen > self.worker_timeout}
+                for worker in dead:
+                    del self._workers[worker]
+                orphaned = [job_id for job_id, (worker, _) in self._leases.items() if worker in dead]
+                for job_id in orphaned:
+                    del self._leases[job_id]
+                    self._progress.pop(job_id, None)
+                    self._lost[job_id] = self._lost.get(job_id, 0) + 1
+            for job_id in orphaned:
+                job = self._by_id[job_id]
+                if self._cancelled.is_set():
+                    self._set_final(job, BatchJob.CANCELLED)
+                elif self._lost[job_id] >= MAX_LOST_ATTEMPTS:
+                    job.result = ConversionResult(job.command_parts, error=RuntimeError(
+                        f"The worker running it stopped responding {self._lost[job_id]} times."))
+                    self._set_final(job, BatchJob.FAILED)
+                else:
+                    job.attempts -= 1  # Not the job's fault
+                    self._requeue(job, BatchJob.QUEUED)
+
+    def _requeue(self, job, status):
+        job.status = status
+        job.worker = None
+        self.events.put(("job", job))
+        with self._cond:
+            self._pending.append(job.job_id)
+            self._cond.notify_all()
+
+    def _set_final(self, job, status):
+        job.status = status
+        self.events.put(("job", job))
+        if all(j.is_final for j in self.jobs):
+            self._finish()
+
+    def _finish(self):
+        with self._cond:
+            if self.summary is not None:
+                return
+            self.summary = BatchSummary(self.jobs, time.monotonic() - self._start_time)
+            self._cond.notify_all()
+        self._done.set()
+        self.events.put(("done", self.summary))
+        # Shut down from another thread: shutdown() waits for serve_forever, which may be serving this call
+        threading.Thread(target=self._httpd.shutdown, daemon=True).start()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """JSON over HTTP for RemoteBatchRunner; see its docstring for the endpoints."""
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        if self.path == "/status":
+            self._reply(200, self.server.runner.status())
+        else:
+            self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._reply(400, {"error": "invalid Content-Length"})
+            return
+        if length > MAX_REQUEST_BYTES:
+            self.close_connection = True  # The body is never read
+            self._reply(413, {"error": f"request body over {MAX_REQUEST_BYTES} bytes"})
+            return
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            worker = str(body["worker"])
+        except (ValueError, KeyError, TypeError):
+            self._reply(400, {"error": "expected a JSON object with a 'worker'"})
+            return
+        runner = self.server.runner
+        try:
+            if self.path == "/lease":
+                handle, argument = runner.lease, _number(body.get("wait", LEASE_WAIT_SECONDS), "wait")
+            elif self.path == "/heartbeat":
+                handle, argument = runner.heartbeat, _running_jobs(body.get("running", {}))
+            elif self.path == "/result":
+                handle, argument = runner.report, _result_record(body)
+            else:
+                self._reply(404, {"error": "not found"})
+                return
+        except ValueError as e:
+            self._reply(400, {"error": str(e)})
+            return
+        self._reply(200, handle(worker, argument))
+
+    def _authorized(self):
+        token = self.server.runner.token
+        # compare_digest takes as long whatever the mismatch, so the token can't be guessed a byte at a time
+        if token and not hmac.compare_digest(self.headers.get(TOKEN_HEADER, "").encode("utf-8"),
+                                             token.encode("utf-8")):
+            self._reply(403, {"error": "wrong or missing token"})
+            return False
+        return True
+
+    def _reply(self, code, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Workers poll constantly; don't print a line per request
+
+
+def _number(value, name, optional=False):
+    if value is None and optional:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"'{name}' must be a number")
+    return value
+
+
+def _running_jobs(running):
+    """The {job id: fraction done or None} of a heartbeat. Raises ValueError if it is anything else."""
+    if not isinstance(running, dict):
+        raise ValueError("'running' must be an object of job ids")
+    return {job_id: _number(fraction, "running", optional=True) for job_id, fraction in running.items()}
+
+
+def _result_record(body):
+    """The body of a /result request, with the types RemoteBatchRunner.report relies on checked."""
+    if not isinstance(body.get("id"), str) or isinstance(body.get("lease"), bool) \
+            or not isinstance(body.get("lease"), int):
+        raise ValueError("a result needs the job's 'id' and 'lease'")
+    returncode = body.get("returncode")
+    if returncode is not None and (isinstance(returncode, bool) or not isinstance(returncode, int)):
+        raise ValueError("'returncode' must be an integer")
+    for name in ("stdout", "stderr"):
+        if not isinstance(body.get(name, ""), str):
+            raise ValueError(f"'{name}' must be a string")
+    if body.get("error") is not None and not isinstance(body["error"], str):
+        raise ValueError("'error' must be a string")
+    _number(body.get("elapsed", 0.0), "elapsed")
+    for name in ("started_at", "cpu_time", "peak_rss"):
+        _number(body.get(name), name, optional=True)
+    return body
+
+
+class JobWorker:
+    """
+    Runs jobs leased from a RemoteBatchRunner with this machine's converter.
+
+    `slots` threads each lease and run one job at a time; a heartbeat thread
+    reports progress every HEARTBEAT_SECONDS and cancels the jobs the server asks
+    it to. The -i/-o paths of each job are rewritten with `path_map` (pairs of
+    server-side prefix and local prefix). A `probe` (ConverterProbe) checks each
+    command against the local converter before it is started, a `launcher`
+    (Launcher) starts it, and a `metrics` (MetricsRegistry) times every run like
+    the local runners do. While the server can't be reached the worker keeps
+    retrying, so it can be started before the batch and serves the batches that
+    follow.
+
+    Progress is posted to `events` as (event, label, detail) tuples with event one
+    of "leased", "done", "failed", "cancelled", "offline" and "online" (the label
+    is the server URL for the last two).
+    """
+
+    def __init__(self, server_url, converter_path, slots=1, token="", path_map=(), worker_id=None,
+                 log_dir=None, history=None, probe=None, heartbeat_seconds=HEARTBEAT_SECONDS, metrics=None,
+                 launcher=None):
+        self.server_url = server_url.rstrip("/")
+        self.converter_path = converter_path
+        self.slots = max(1, int(slots))
+        self.token = token
+        self.path_map = list(path_map)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.log_dir = log_dir
+        self.history = history
+        self.probe = probe
+        self.metrics = metrics
+        self.launcher = launcher
+        self.heartbeat_seconds = heartbeat_seconds
+        self.events = queue.Queue()
+        self._running = {}  # job_id -> ConversionJob
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._offline = False
+        self._threads = []
+
+    def start(self):
+        threads = [threading.Thread(target=self._slot, name=f"JobWorker-{index}", daemon=True)
+                   for index in range(self.slots)]
+        threads.append(threading.Thread(target=self._heartbeat, name="JobWorkerHeartbeat", daemon=True))
+        for thread in threads:
+            thread.start()
+        self._threads = threads
+
+    def stop(self):
+        """Stops leasing and cancels the running jobs (their results are still reported)."""
+        self._stop.set()
+        with self._lock:
+            running = list(self._running.values())
+        for conversion in running:
+            conversion.cancel()
+
+    def join(self, timeout=None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _slot(self):
+        while not self._stop.is_set():
+            try:
+                job = self._post("/lease", {"wait": LEASE_WAIT_SECONDS}).get("job")
+            except (OSError, ValueError) as e:
+                self._went_offline(e)
+                self._stop.wait(RECONNECT_SECONDS)
+                continue
+            if job is not None:
+                self._run(job)
+
+    def _run(self, job):
+        command_parts = command_from_spec(job["spec"], self.converter_path, self.path_map)
+        label = job.get("label") or job["id"]
+        self.events.put(("leased", label, ""))
+        problems = self.probe.check(command_parts) if self.probe is not None else []
+        if problems:
+            record = {"returncode": None, "error": "; ".join(problems), "stdout": "", "stderr": "",
+                      "elapsed": 0.0, "cancelled": False}
+        else:
+            log_path = new_log_path(self.log_dir, command_parts[command_parts.index('-i') + 1]) \
+                if self.log_dir and '-i' in command_parts else None
+            conversion = ConversionJob(command_parts, log_path=log_path, history=self.history, source="worker",
+                                       metrics=self.metrics, launcher=self.launcher)
+            with self._lock:
+                self._running[job["id"]] = conversion
+            result = conversion.run()
+            with self._lock:
+                self._running.pop(job["id"], None)
+            lines = min(RESULT_SENT_LINES, RESULT_TAIL_LINES)
+            record = {"returncode": result.returncode, "error": str(result.error) if result.error else None,
+                      "stdout": "\n".join(result.stdout.splitlines()[-lines:]),
+                      "stderr": "\n".join(result.stderr.splitlines()[-lines:]),
+                      "elapsed": result.elapsed, "cancelled": result.cancelled, "started_at": result.started_at,
+                      "cpu_time": result.cpu_time, "peak_rss": result.peak_rss}
+        record.update({"id": job["id"], "lease": job["lease"]})
+        if record["cancelled"]:
+            self.events.put(("cancelled", label, ""))
+        elif record["returncode"] == 0 and not record["error"]:
+            self.events.put(("done", label, f"{record['elapsed']:.1f} s"))
+        else:
+            detail = record["error"] or (record["stderr"].splitlines() or [f"exit code {record['returncode']}"])[-1]
+            self.events.put(("failed", label, detail))
+        # Keep trying to deliver it: a result lost here would run the job again elsewhere
+        while True:
+            try:
+                self._post("/result", record)
+                return
+            except (OSError, ValueError) as e:
+                self._went_offline(e)
+                if self._stop.wait(RECONNECT_SECONDS):
+                    return
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                running = dict(self._running)
+            try:
+                reply = self._post("/heartbeat", {"running": {job_id: conversion.progress.snapshot().fraction
+                                                              for job_id, conversion in running.items()}})
+            except (OSError, ValueError) as e:
+                self._went_offline(e)
+                continue
+            for job_id in reply.get("cancel", []):
+                conversion = running.get(job_id)
+                if conversion is not None:
+                    conversion.cancel()
+
+    def _post(self, path, payload):
+        payload = dict(payload, worker=self.worker_id)
+        request = urllib.request.Request(self.server_url + path, data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        if self.token:
+            request.add_header(TOKEN_HEADER, self.token)
+        with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT_SECONDS) as response:
+            reply = json.loads(response.read())
+        if self._offline:
+            self._offline = False
+            self.events.put(("online", self.server_url, ""))
+        return reply
+
+    def _went_offline(self, error):
+        if isinstance(error, urllib.error.HTTPError) and error.code == 403:
+            error = "the server rejected the token"
+        if not self._offline:
+            self._offline = True
+            self.events.put(("offline", self.server_url, str(getattr(error, "reason", error))))
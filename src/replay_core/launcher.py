@@ -0,0 +1,263 @@
+import os
+import shlex
+import signal
+import subprocess
+import sys
+import threading
+
+# Only defined on Windows; elsewhere we simply pass no flags.
+CREATE_NO_WINDOW = getattr(subprocess, "CREATE_NO_WINDOW", 0)
+CREATE_NEW_PROCESS_GROUP = getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)
+
+# How long to wait after asking a converter to stop before killing its process tree
+TERMINATE_GRACE_SECONDS = 5.0
+
+MODE_AUTO = "auto"        # Wine for a .exe converter off Windows, else native
+MODE_NATIVE = "native"
+MODE_WINE = "wine"
+MODE_WRAPPER = "wrapper"  # The converter command is appended to a configured wrapper command
+MODES = (MODE_AUTO, MODE_NATIVE, MODE_WINE, MODE_WRAPPER)
+
+# Priority name -> (POSIX nice value, Windows priority class)
+PRIORITIES = {
+    "normal": (0, 0),
+    "low": (10, getattr(subprocess, "BELOW_NORMAL_PRIORITY_CLASS", 0)),
+    "idle": (19, getattr(subprocess, "IDLE_PRIORITY_CLASS", 0)),
+}
+
+
+def parse_cpu_list(text):
+    """
+    CPU numbers of a list such as "0-3,6" as a sorted tuple, or None for "" (all CPUs).
+    Raises ValueError with a user-facing message for anything else.
+    """
+    text = str(text or "").strip()
+    if not text:
+        return None
+    cpus = set()
+    for part in text.split(","):
+        first, sep, last = part.strip().partition("-")
+        try:
+            first = int(first)
+            last = int(last) if sep else first
+        except ValueError:
+            raise ValueError(f"'{part.strip()}' is not a CPU number or range (use e.g. 0-3,6).")
+        if first < 0 or last < first:
+            raise ValueError(f"'{part.strip()}' is not a valid CPU range.")
+        cpus.update(range(first, last + 1))
+    return tuple(sorted(cpus))
+
+
+def wine_path(path):
+    """An absolute POSIX path as Wine's Z: drive sees it (Z: is mapped to / in every default prefix)."""
+    if not path.startswith("/"):
+        return path  # Relative paths resolve against the working directory, which Wine maps too
+    return "Z:" + path.replace("/", "\\")
+
+
+class Launcher:
+    """
+    Starts converter processes the way this machine needs: natively, through Wine
+    (with `wine_prefix` as WINEPREFIX, if set) or behind a `wrapper` command (e.g.
+    "firejail --quiet" or a container runner), which is given the converter command
+    as its arguments. In "auto" mode a .exe converter is run through Wine off Windows.
+
+    Every process is started in a process group of its own (a new session on POSIX),
+    so terminate_process_tree() can stop it together with whatever it started. The
+    `priority` (see PRIORITIES) and `cpus` (CPU numbers, None for all) are applied to
+    each process as soon as it is started; the processes it starts inherit them.
+    Raises ValueError for an unknown mode or priority, or wrapper mode without a wrapper.
+    """
+
+    def __init__(self, mode=MODE_AUTO, wine_command="wine", wine_prefix="", wrapper="", priority="normal",
+                 cpus=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown launch mode '{mode}'. Use one of: {', '.join(MODES)}.")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'. Use one of: {', '.join(PRIORITIES)}.")
+        self.wrapper = shlex.split(wrapper) if isinstance(wrapper, str) else list(wrapper)
+        if mode == MODE_WRAPPER and not self.wrapper:
+            raise ValueError("The wrapper launch mode needs a wrapper command.")
+        self.mode = mode
+        self.wine_command = shlex.split(wine_command or "wine")
+        self.wine_prefix = wine_prefix
+        self.priority = priority
+        self.cpus = tuple(cpus) if cpus else None
+
+    def resolve_mode(self, command_parts):
+        """The mode `command_parts` is started in ("auto" resolved)."""
+        if self.mode != MODE_AUTO:
+            return self.mode
+        if sys.platform != "win32" and command_parts[0].lower().endswith(".exe"):
+            return MODE_WINE
+        return MODE_NATIVE
+
+    def argv(self, command_parts):
+        """The arguments actually started for a converter command."""
+        mode = self.resolve_mode(command_parts)
+        if mode == MODE_WRAPPER:
+            return self.wrapper + list(command_parts)
+        if mode == MODE_WINE:
+            parts = [wine_path(part) if i > 0 and command_parts[i - 1] in ('-i', '-o') else part
+                     for i, part in enumerate(command_parts)]
+            return self.wine_command + parts
+        return list(command_parts)
+
+    def describe(self, command_parts=None):
+        """One line for logs and the CLI, e.g. "wine (prefix ~/.wine-rc), low priority, CPUs 0-3"."""
+        mode = self.resolve_mode(command_parts) if command_parts else self.mode
+        text = mode
+        if mode == MODE_WINE and self.wine_prefix:
+            text += f" (prefix {self.wine_prefix})"
+        elif mode == MODE_WRAPPER:
+            text += f" ({shlex.join(self.wrapper)})"
+        if self.priority != "normal":
+            text += f", {self.priority} priority"
+        if self.cpus:
+            text += f", CPUs {','.join(str(cpu) for cpu in self.cpus)}"
+        return text
+
+    def popen(self, command_parts, **kwargs):
+        """Starts a converter command like subprocess.Popen(command_parts, **kwargs). Raises OSError."""
+        mode = self.resolve_mode(command_parts)
+        if sys.platform == "win32":
+            kwargs["creationflags"] = (kwargs.get("creationflags", 0) | CREATE_NO_WINDOW | CREATE_NEW_PROCESS_GROUP
+                                       | PRIORITIES[self.priority][1])
+        else:
+            kwargs["start_new_session"] = True
+        if mode == MODE_WINE:
+            env = dict(kwargs.get("env") or os.environ)
+            if self.wine_prefix:
+                env["WINEPREFIX"] = os.path.expanduser(self.wine_prefix)
+            env.setdefault("WINEDEBUG", "-all")  # Wine's fixme: lines would otherwise fill stderr and the logs
+            kwargs["env"] = env
+        process = subprocess.Popen(self.argv(command_parts), **kwargs)
+        self._apply_limits(process)
+        return process
+
+    def run(self, command_parts, timeout, **kwargs):
+        """
+        Runs a command to completion with its output captured, like subprocess.run.
+        On timeout the whole process tree is killed and TimeoutExpired is raised.
+        """
+        process = self.popen(command_parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs)
+        try:
+            stdout, stderr = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            terminate_process_tree(process, grace=0)
+            process.communicate()
+            raise
+        return subprocess.CompletedProcess(process.args, process.returncode, stdout, stderr)
+
+    def _apply_limits(self, process):
+        nice = PRIORITIES[self.priority][0]
+        try:
+            if nice and sys.platform != "win32":
+                # The whole group: a wrapper or Wine may already have started helpers
+                os.setpriority(os.PRIO_PGRP, process.pid, nice)
+            if self.cpus:
+                _set_affinity(process, self.cpus)
+        except Exception as e:  # OSError, or psutil's NoSuchProcess/AccessDenied
+            print(f"Warning: Could not apply the priority/CPU settings to the converter: {e}")
+
+
+def launcher_from_settings(settings):
+    """Returns the Launcher described by the settings ("launch_*", "wine_*", "process_*" keys)."""
+    try:
+        cpus = parse_cpu_list(settings.get("process_cpus", ""))
+    except ValueError as e:
+        print(f"Warning: Ignoring the CPU list in settings: {e}")
+        cpus = None
+    try:
+        return Launcher(settings.get("launch_mode", MODE_AUTO), settings.get("wine_command", "wine"),
+                        settings.get("wine_prefix", ""), settings.get("launch_wrapper", ""),
+                        settings.get("process_priority", "normal"), cpus)
+    except ValueError as e:
+        print(f"Warning: {e} Starting the converter the default way.")
+        return Launcher(cpus=cpus)
+
+
+def terminate_process_tree(process, grace=TERMINATE_GRACE_SECONDS):
+    """
+    Stops a process started by a Launcher and everything it started (Wine's
+    processes, a wrapper's child). On POSIX its process group gets SIGTERM, and
+    SIGKILL once the process has exited or `grace` seconds have passed. On Windows
+    the tree is killed at once, as console programs can't be asked to stop there.
+    Never blocks the caller (usually the Tk thread).
+    """
+    if sys.platform == "win32":
+        threading.Thread(target=_kill_windows_tree, args=(process,), name="ConversionJobKill", daemon=True).start()
+        return
+    try:
+        own_group = os.getpgid(process.pid) == process.pid
+    except OSError:
+        return  # Already gone
+    if not own_group:  # Not started by a Launcher; only the process itself can be stopped
+        _terminate_one(process, grace)
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        return
+
+    def _escalate():
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            pass
+        try:
+            os.killpg(process.pid, signal.SIGKILL)  # Also whatever it left running
+        except OSError:
+            pass
+
+    threading.Thread(target=_escalate, name="ConversionJobKill", daemon=True).start()
+
+
+def _terminate_one(process, grace):
+    try:
+        process.terminate()
+    except OSError:
+        return
+
+    def _escalate():
+        try:
+            process.wait(timeout=grace)
+        except subprocess.TimeoutExpired:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+    threading.Thread(target=_escalate, name="ConversionJobKill", daemon=True).start()
+
+
+def _kill_windows_tree(process):
+    try:
+        # /T walks the tree by parent process id, so it has to run while the converter is alive
+        subprocess.run(["taskkill", "/PID", str(process.pid), "/T", "/F"], stdin=subprocess.DEVNULL,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, creationflags=CREATE_NO_WINDOW)
+    except OSError:
+        pass
+    try:
+        process.kill()  # In case taskkill couldn't
+    except OSError:
+        pass
+
+
+def _set_affinity(process, cpus):
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(process.pid, cpus)
+        return
+    try:
+        import psutil
+        psutil.Process(process.pid).cpu_affinity(list(cpus))
+        return
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        import ctypes
+        mask = sum(1 << cpu for cpu in cpus)
+        if not ctypes.windll.kernel32.SetProcessAffinityMask(int(process._handle), ctypes.c_size_t(mask)):
+            raise OSError(f"SetProcessAffinityMask failed (error {ctypes.windll.kernel32.GetLastError()})")
+        return
+    raise OSError("setting CPU affinity isn't supported here without psutil")
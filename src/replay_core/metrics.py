@@ -0,0 +1,288 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIX = "replay_converter_"
+DEFAULT_METRICS_PORT = 9464
+TEXTFILE_INTERVAL_SECONDS = 10.0  # How often --metrics-file is rewritten while a run goes on
+# Histogram bucket bounds in seconds: from process spawns (ms) to long exports (an hour)
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0)
+
+# Timed stages of a conversion, in the order they happen (exported as <PREFIX><name>_seconds)
+SPANS = {
+    "queue_wait": "Time a batch job waited in the queue (and for the scheduler) before it started",
+    "stage_in": "Time to copy an input to the local scratch folder",
+    "spawn": "Time to start the converter process",
+    "first_output": "Time from the converter's start to its first output line",
+    "converter": "Time from the converter's start to its exit",
+    "post_process": "Time spent caching, recording, checking and compressing outputs after the converter exited",
+    "upload": "Time to copy staged outputs back to their destination",
+    "gui_command_preview": "Time the GUI took to rebuild the command preview",
+    "gui_poll": "Time the GUI spent on one poll of a running conversion",
+}
+COUNTERS = {
+    "conversions_total": "Conversions finished, by outcome (succeeded, failed, cancelled, cached)",
+    "output_lines_total": "Lines the converter printed",
+}
+GAUGES = {
+    "conversions_running": "Converter processes running right now",
+}
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # The last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.last = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.last = value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (None without observations)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS + (self.max,), self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """
+    Counters, gauges and timing histograms of the conversions in this process.
+
+    Handed to ConversionJob, BatchRunner and FolderWatcher (their `metrics`) like
+    a cache or history; they time the stages listed in SPANS and count outcomes.
+    Every method is thread-safe and cheap (a lock and a few additions), so it
+    can be called from reader threads. Read it with snapshot() (the GUI's debug
+    overlay) or prometheus_text() (MetricsServer, write_textfile).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}  # span name -> _Histogram
+        self._counters = {}    # (name, (label, value)) -> count
+        self._gauges = {}      # name -> value
+
+    def observe(self, span, seconds):
+        with self._lock:
+            histogram = self._histograms.get(span)
+            if histogram is None:
+                histogram = self._histograms[span] = _Histogram()
+            histogram.observe(max(0.0, seconds))
+
+    @contextmanager
+    def span(self, name):
+        """Times the body of a `with` block into the `name` histogram."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started)
+
+    def inc(self, name, amount=1, label=None):
+        """Adds to a counter; `label` is an optional (name, value) pair such as ("outcome", "failed")."""
+        with self._lock:
+            self._counters[(name, label)] = self._counters.get((name, label), 0) + amount
+
+    def add(self, name, delta):
+        """Moves a gauge up or down."""
+        with self._lock:
+            self._gauges[name] = self._gauges.get(name, 0) + delta
+
+    def snapshot(self):
+        """
+        {"spans": {name: {"count", "mean", "last", "max", "p95"}}, "counters": {name or
+        "name{label=value}": count}, "gauges": {name: value}}, spans in SPANS order.
+        """
+        with self._lock:
+            spans = {}
+            for name in sorted(self._histograms, key=_span_order):
+                h = self._histograms[name]
+                spans[name] = {"count": h.count, "mean": h.sum / h.count if h.count else 0.0, "last": h.last,
+                               "max": h.max, "p95": h.quantile(0.95)}
+            counters = {_series(name, label): value for (name, label), value in sorted(self._counters.items(),
+                                                                                      key=_counter_order)}
+            return {"spans": spans, "counters": counters, "gauges": dict(self._gauges)}
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._histograms, key=_span_order):
+                h = self._histograms[name]
+                metric = f"{PREFIX}{name}_seconds"
+                lines.append(f"# HELP {metric} {SPANS.get(name, name)}")
+                lines.append(f"# TYPE {metric} histogram")
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), h.buckets):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'{metric}_bucket{{le="{le}"}} {cumulative}')
+                lines.append(f"{metric}_sum {h.sum!r}")
+                lines.append(f"{metric}_count {h.count}")
+            described = set()
+            for (name, label), value in sorted(self._counters.items(), key=_counter_order):
+                metric = PREFIX + name
+                if name not in described:
+                    described.add(name)
+                    lines.append(f"# HELP {metric} {COUNTERS.get(name, name)}")
+                    lines.append(f"# TYPE {metric} counter")
+                lines.append(f"{PREFIX}{_series(name, label)} {value}")
+            for name, value in sorted(self._gauges.items()):
+                lines.append(f"# HELP {PREFIX}{name} {GAUGES.get(name, name)}")
+                lines.append(f"# TYPE {PREFIX}{name} gauge")
+                lines.append(f"{PREFIX}{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """
+        Writes prometheus_text() to `path` with write-and-rename, so a collector
+        (e.g. node_exporter's textfile collector) never reads a half-written file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(temp_path, 'w', encoding='utf-8', newline='\n') as f:
+            f.write(self.prometheus_text())
+        os.replace(temp_path, path)
+
+
+def describe_snapshot(snapshot):
+    """Lines for the debug overlay and the CLI summary: one per span, then the counters and gauges."""
+    lines = []
+    for name, stats in snapshot["spans"].items():
+        lines.append(f"{name:<20s} n={stats['count']:<5d} last {_ms(stats['last'])}  mean {_ms(stats['mean'])}"
+                     f"  p95 {_ms(stats['p95'])}  max {_ms(stats['max'])}")
+    for name, value in snapshot["gauges"].items():
+        lines.append(f"{name:<20s} {value}")
+    for name, value in snapshot["counters"].items():
+        lines.append(f"{name} {value}")
+    return lines
+
+
+def format_timings(timings):
+    """One line with a run's stage timings (ConversionResult.timings), in SPANS order."""
+    return ", ".join(f"{stage} {_ms(timings[stage]).strip()}" for stage in SPANS if stage in timings)
+
+
+class MetricsServer:
+    """
+    Serves a MetricsRegistry as Prometheus text at http://HOST:PORT/metrics (and
+    snapshot() as JSON at /metrics.json). Binds to localhost unless told otherwise.
+    """
+
+    def __init__(self, registry, address=("127.0.0.1", DEFAULT_METRICS_PORT)):
+        self.registry = registry
+        self.address = address
+        self._httpd = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2] if self._httpd is not None else self.address
+        return f"http://{host}:{port}/metrics"
+
+    def start(self):
+        """Starts listening on a daemon thread. Raises OSError if the port is taken."""
+        from http.server import ThreadingHTTPServer  # Imported here: most runs never serve metrics
+        self._httpd = ThreadingHTTPServer(self.address, _metrics_handler())
+        self._httpd.daemon_threads = True
+        self._httpd.registry = self.registry
+        threading.Thread(target=self._httpd.serve_forever, name="MetricsServer", daemon=True).start()
+
+    def stop(self):
+        if self._httpd is not None:
+            threading.Thread(target=self._httpd.shutdown, daemon=True).start()
+            self._httpd = None
+
+
+def _metrics_handler():
+    """The request handler class, defined on first use so http.server is only loaded for a server."""
+    from http.server import BaseHTTPRequestHandler
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                self._reply(self.server.registry.prometheus_text(), "text/plain; version=0.0.4; charset=utf-8")
+            elif self.path == "/metrics.json":
+                self._reply(json.dumps(self.server.registry.snapshot()), "application/json")
+            else:
+                self.send_error(404)
+
+        def _reply(self, text, content_type):
+            data = text.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass  # Scrapes every few seconds would flood the console
+
+    return _MetricsHandler
+
+
+class TextfileWriter:
+    """Rewrites a Prometheus text file from a MetricsRegistry every `interval` seconds until stopped."""
+
+    def __init__(self, registry, path, interval=TEXTFILE_INTERVAL_SECONDS):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="MetricsTextfile", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops and writes the final numbers."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._write()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self._write()
+
+    def _write(self):
+        try:
+            self.registry.write_textfile(self.path)
+        except OSError as e:
+            print(f"Warning: Could not write metrics to {self.path}: {e}")
+
+
+def _span_order(name):
+    return (list(SPANS).index(name) if name in SPANS else len(SPANS), name)
+
+
+def _counter_order(item):
+    (name, label), _ = item
+    return (name, label or ("", ""))
+
+
+def _series(name, label):
+    return f'{name}{{{label[0]}="{label[1]}"}}' if label else name
+
+
+def _ms(seconds):
+    if seconds is None:
+        return "     -"
+    if seconds >= 10:
+        return f"{seconds:5.0f}s"
+    return f"{seconds * 1000:4.0f}ms" if seconds < 1 else f"{seconds:5.2f}s"
@@ -0,0 +1,93 @@
+import collections
+import itertools
+import os
+import threading
+import time
+
+DEFAULT_MAX_LINES = 2000  # Lines of converter output kept in memory per job
+DEFAULT_KEEP_LOGS = 200   # Log files kept on disk by prune_logs
+
+STDOUT = "stdout"
+STDERR = "stderr"
+
+_log_counter = itertools.count(1)
+
+
+class OutputLog:
+    """
+    Thread-safe, bounded store for a converter's output.
+
+    The last `max_lines` lines stay in memory (a ring buffer); every line is also
+    appended to `log_path` on disk, so memory stays flat no matter how much the
+    converter prints while the complete output can still be inspected afterwards.
+    Each line gets a sequence number so a reader can ask for "everything since".
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, log_path=None):
+        self.max_lines = max_lines
+        self.log_path = log_path
+        self.total_lines = 0
+        self._lines = collections.deque(maxlen=max_lines)  # (seq, stream, text)
+        self._lock = threading.Lock()
+        self._file = None
+        if log_path:
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                self._file = open(log_path, 'w', encoding='utf-8', errors='replace')
+            except OSError as e:
+                print(f"Warning: Could not open log file {log_path}: {e}")
+                self.log_path = None
+
+    def append(self, stream, text):
+        """Adds one line (without its trailing newline)."""
+        with self._lock:
+            self._lines.append((self.total_lines, stream, text))
+            self.total_lines += 1
+            if self._file is not None:
+                prefix = "[stderr] " if stream == STDERR else ""
+                self._file.write(f"{prefix}{text}\n")
+
+    def read_since(self, seq):
+        """
+        Returns (lines, next_seq, skipped): the buffered (stream, text) lines numbered
+        `seq` and up, the sequence number to pass next time, and how many requested
+        lines had already dropped out of the ring buffer.
+        """
+        with self._lock:
+            lines = [(stream, text) for line_seq, stream, text in self._lines if line_seq >= seq]
+            oldest = self._lines[0][0] if self._lines else self.total_lines
+            skipped = max(0, oldest - seq)
+            return lines, self.total_lines, skipped
+
+    def tail(self, count=20, stream=None):
+        """Returns the last `count` buffered lines (optionally of one stream) as text."""
+        with self._lock:
+            lines = [text for _, line_stream, text in self._lines if stream is None or line_stream == stream]
+        return "\n".join(lines[-count:])
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def new_log_path(log_dir, input_path=None):
+    """Returns a unique log file path in `log_dir`, named after the time and the input file."""
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    name = os.path.splitext(os.path.basename(input_path))[0] if input_path else "conversion"
+    return os.path.join(log_dir, f"{stamp}-{os.getpid()}-{next(_log_counter)}-{name}.log")
+
+
+def prune_logs(log_dir, keep=DEFAULT_KEEP_LOGS):
+    """Deletes the oldest .log files in `log_dir` so at most `keep` remain."""
+    try:
+        entries = [e for e in os.scandir(log_dir) if e.is_file() and e.name.endswith(".log")]
+    except OSError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for entry in entries[:max(0, len(entries) - keep)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
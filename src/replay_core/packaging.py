@@ -0,0 +1,235 @@
+import collections
+import gzip
+import os
+import re
+import threading
+
+from .cache import collect_outputs
+from .command import get_option_value
+
+try:
+    import zstandard
+except ImportError:  # Optional: zstd output needs `pip install zstandard`
+    zstandard = None
+
+COMPRESSION_NONE = "none"
+COMPRESSION_GZIP = "gzip"
+COMPRESSION_ZSTD = "zstd"
+COMPRESSIONS = (COMPRESSION_NONE, COMPRESSION_GZIP, COMPRESSION_ZSTD)
+EXTENSIONS = {COMPRESSION_GZIP: ".gz", COMPRESSION_ZSTD: ".zst"}
+DEFAULT_LEVELS = {COMPRESSION_GZIP: 6, COMPRESSION_ZSTD: 3}
+
+PACKAGED_FORMATS = (".csv", ".pcd")  # Text exports; .srf/.pro are binary and barely compress
+CHUNK_BYTES = 4 * 2**20              # Read/compress granularity; memory stays at a few chunks per thread
+PARALLEL_MIN_BYTES = 32 * 2**20      # Smaller outputs are compressed on a single thread
+SHARD_SUFFIX_RE = re.compile(r"_\d{6}$")  # "<base>_<frame>" names of per-frame jobs (see frames.py)
+
+
+def zstd_available():
+    return zstandard is not None
+
+
+def default_threads():
+    return max(1, min(4, os.cpu_count() or 1))
+
+
+class ParallelGzipWriter:
+    """
+    Write-only file object producing a gzip stream, compressed on several threads.
+
+    The data is cut into CHUNK_BYTES blocks and each block becomes its own gzip
+    member; concatenated members are a valid .gz file that gunzip/zlib read as one.
+    zlib releases the GIL while compressing, so the threads really run in parallel.
+    At most two blocks per thread are in flight, so memory use doesn't grow with
+    the file size.
+    """
+
+    def __init__(self, fileobj, level=DEFAULT_LEVELS[COMPRESSION_GZIP], threads=None):
+        self.fileobj = fileobj
+        self.level = level
+        self.threads = threads or default_threads()
+        import concurrent.futures  # Imported here: it loads logging, which nothing else needs
+        self._executor = concurrent.futures.ThreadPoolExecutor(self.threads, thread_name_prefix="GzipWorker")
+        self._pending = collections.deque()
+        self._buffer = bytearray()
+        self.closed = False
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= CHUNK_BYTES:
+            self._submit(bytes(self._buffer[:CHUNK_BYTES]))
+            del self._buffer[:CHUNK_BYTES]
+        return len(data)
+
+    def _submit(self, block):
+        self._pending.append(self._executor.submit(gzip.compress, block, self.level, mtime=0))
+        while len(self._pending) > 2 * self.threads:
+            self.fileobj.write(self._pending.popleft().result())
+
+    def flush(self):
+        pass  # Blocks are only written in order as they finish; close() writes the rest
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            if self._buffer or not self._pending:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self.fileobj.write(self._pending.popleft().result())
+        finally:
+            self._executor.shutdown(cancel_futures=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_compressed_writer(fileobj, compression, level=None, threads=1):
+    """Wraps a binary file object in a streaming compressor (close it before `fileobj`)."""
+    level = level if level is not None else DEFAULT_LEVELS[compression]
+    if compression == COMPRESSION_GZIP:
+        if threads > 1:
+            return ParallelGzipWriter(fileobj, level, threads)
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=level, mtime=0)
+    if compression == COMPRESSION_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard).")
+        # zstd splits the work across its own threads; 0 means single-threaded
+        compressor = zstandard.ZstdCompressor(level=level, threads=threads if threads > 1 else 0)
+        return compressor.stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression '{compression}'. Use one of: {', '.join(COMPRESSIONS)}.")
+
+
+class Packager:
+    """
+    Compresses successful conversion outputs in place.
+
+    package() turns the -o file of a run into <name><ext>.gz (or .zst); with
+    `group_frames` a run that wrote several per-frame files is packed into one
+    <base><ext>.tar.gz instead, and archive_group() does the same for the outputs
+    of the per-frame jobs of a frame list. Files are read and compressed in
+    CHUNK_BYTES blocks, on `threads` threads for outputs over PARALLEL_MIN_BYTES.
+    Archives are written under a temporary name and renamed when complete; the
+    original files are deleted afterwards unless `keep_originals` is set. Only
+    PACKAGED_FORMATS are touched.
+    """
+
+    def __init__(self, compression=COMPRESSION_GZIP, level=None, group_frames=False, keep_originals=False,
+                 threads=None):
+        if compression not in (COMPRESSION_GZIP, COMPRESSION_ZSTD):
+            raise ValueError(f"Unknown compression '{compression}'. Use gzip or zstd.")
+        if compression == COMPRESSION_ZSTD and zstandard is None:
+            raise RuntimeError("zstd compression needs the 'zstandard' package (pip install zstandard).")
+        self.compression = compression
+        self.level = level
+        self.group_frames = group_frames
+        self.keep_originals = keep_originals
+        self.threads = threads or default_threads()
+
+    @property
+    def extension(self):
+        return EXTENSIONS[self.compression]
+
+    def applies_to(self, output_path):
+        return bool(output_path) and os.path.splitext(output_path)[1].lower() in PACKAGED_FORMATS
+
+    def package(self, command_parts, started_at):
+        """Packages the outputs of one finished run. Returns the archive paths written."""
+        output_path = get_option_value(command_parts, '-o')
+        if not self.applies_to(output_path):
+            return []
+        paths = [path for _, path in collect_outputs(output_path, started_at)]
+        if self.group_frames and len(paths) > 1:
+            base, ext = os.path.splitext(output_path)
+            return [self.archive_files(paths, base + ext + ".tar" + self.extension)]
+        return [self.compress_file(path) for path in paths]
+
+    def archive_group(self, output_paths):
+        """Packs the outputs of a frame list's per-frame jobs into one archive. Returns its path, or None."""
+        paths = [path for path in output_paths if self.applies_to(path) and os.path.isfile(path)]
+        if not paths:
+            return None
+        base, ext = os.path.splitext(paths[0])
+        base = SHARD_SUFFIX_RE.sub("", base)
+        return self.archive_files(paths, base + ext + ".tar" + self.extension)
+
+    def compress_file(self, path):
+        """Streams one file into <path>.gz/.zst. Returns the archive path."""
+        archive_path = path + self.extension
+        threads = self.threads if os.path.getsize(path) >= PARALLEL_MIN_BYTES else 1
+        with _AtomicFile(archive_path) as raw, open(path, 'rb') as src:
+            with open_compressed_writer(raw, self.compression, self.level, threads) as writer:
+                while True:
+                    chunk = src.read(CHUNK_BYTES)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+        self._remove_originals([path])
+        return archive_path
+
+    def archive_files(self, paths, archive_path):
+        """Streams several files into one compressed tar. Returns the archive path."""
+        total = sum(os.path.getsize(path) for path in paths)
+        threads = self.threads if total >= PARALLEL_MIN_BYTES else 1
+        with _AtomicFile(archive_path) as raw:
+            with open_compressed_writer(raw, self.compression, self.level, threads) as writer:
+                import tarfile  # Imported here: only grouped frames need it
+                # "w|" writes a plain tar stream, so the compressor sees it block by block
+                with tarfile.open(fileobj=writer, mode='w|', bufsize=CHUNK_BYTES) as tar:
+                    for path in paths:
+                        tar.add(path, arcname=os.path.basename(path))
+        self._remove_originals(paths)
+        return archive_path
+
+    def _remove_originals(self, paths):
+        if self.keep_originals:
+            return
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError as e:
+                print(f"Warning: Could not remove {path} after compressing it: {e}")
+
+
+class _AtomicFile:
+    """Binary file written under a temporary name and renamed into place on success."""
+
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = f"{path}.part-{os.getpid()}-{threading.get_ident()}"
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.temp_path, 'wb')
+        return self.file
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.temp_path, self.path)
+        else:
+            try:
+                os.remove(self.temp_path)
+            except OSError:
+                pass
+
+
+def packager_from_settings(settings, compression=None, group_frames=None):
+    """Returns the Packager described by the settings ("package_*" keys), or None if compression is off."""
+    compression = compression or settings.get("package_compression", COMPRESSION_NONE)
+    if compression == COMPRESSION_NONE:
+        return None
+    if compression == COMPRESSION_ZSTD and zstandard is None:
+        print("Warning: zstd compression needs the 'zstandard' package; using gzip.")
+        compression = COMPRESSION_GZIP
+    if compression not in COMPRESSIONS:
+        print(f"Warning: Unknown compression '{compression}' in settings; outputs are left uncompressed.")
+        return None
+    group_frames = settings.get("package_group_frames", False) if group_frames is None else group_frames
+    return Packager(compression, group_frames=group_frames,
+                    keep_originals=settings.get("package_keep_originals", False))
@@ -0,0 +1,141 @@
+import json
+import threading
+
+from .command import OUTPUT_FORMATS
+from .frames import parse_frame_spec
+from .settings import FileLock, file_stamp, write_json_atomic
+
+PCD_KEYS = ("pcd_width", "pcd_height", "pcd_swap", "pcd_zoom", "pcd_remove")
+PCD_DEFAULTS = {"pcd_width": "0", "pcd_height": "0", "pcd_swap": False, "pcd_zoom": "1.0", "pcd_remove": False}
+
+
+class Preset:
+    """
+    A named set of conversion options: the output format, the frame mode ("" for
+    all frames, else a frame index, list or range as typed into the frame field)
+    and the PCD import options. Raises ValueError for an invalid name, format or frame.
+    """
+
+    def __init__(self, name, output_format=".srf", frame="", pcd=None):
+        name = str(name).strip()
+        if not name:
+            raise ValueError("A preset needs a name.")
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format '{output_format}'. Use one of: {', '.join(OUTPUT_FORMATS)}.")
+        frame = str(frame or "").strip()
+        if frame:
+            parse_frame_spec(frame)
+        self.name = name
+        self.output_format = output_format
+        self.frame = frame
+        self.pcd = dict(PCD_DEFAULTS)
+        self.pcd.update({key: value for key, value in (pcd or {}).items() if key in PCD_KEYS})
+
+    @classmethod
+    def from_settings(cls, name, settings, output_format, frame=None):
+        """Preset of the current options (`frame` None for all frames, as in build_command)."""
+        return cls(name, output_format, frame or "", {key: settings.get(key, PCD_DEFAULTS[key]) for key in PCD_KEYS})
+
+    @property
+    def frame_option(self):
+        """None for all frames (-a), otherwise the frame selection."""
+        return self.frame or None
+
+    def apply(self, settings):
+        """A copy of `settings` with this preset's PCD options."""
+        applied = dict(settings)
+        applied.update(self.pcd)
+        return applied
+
+    def describe(self):
+        frames = f"frame(s) {self.frame}" if self.frame else "all frames"
+        return f"{self.output_format}, {frames}"
+
+    def to_dict(self):
+        return {"output_format": self.output_format, "frame": self.frame, "pcd": dict(self.pcd)}
+
+    @classmethod
+    def from_dict(cls, name, record):
+        return cls(name, record.get("output_format", ".srf"), record.get("frame", ""), record.get("pcd"))
+
+
+class PresetStore:
+    """
+    Named presets kept in one JSON file that several GUI instances, scripts and
+    watchers can share.
+
+    Changes take the file's FileLock, re-read the file, apply the one change and
+    write it back with write-and-rename, so concurrent saves of different presets
+    don't lose each other and a reader never sees a half-written file. Reads are
+    served from memory and the file is only read again when its stamp (mtime,
+    size, inode) changed, so looking a preset up for every job costs one stat().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._presets = {}  # name -> Preset
+        self._stamp = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def changed(self):
+        """True if the file was changed (by anyone else) since it was last read."""
+        return not self._loaded or file_stamp(self.path) != self._stamp
+
+    def names(self):
+        with self._lock:
+            self._refresh()
+            return sorted(self._presets, key=str.lower)
+
+    def get(self, name):
+        """The Preset called `name`, or None."""
+        with self._lock:
+            self._refresh()
+            return self._presets.get(name)
+
+    def require(self, name):
+        """The Preset called `name`. Raises KeyError with a user-facing message if there is none."""
+        preset = self.get(name)
+        if preset is None:
+            raise KeyError(f"There is no preset called '{name}'.")
+        return preset
+
+    def save(self, preset):
+        """Adds or replaces a preset. Raises OSError if the file can't be locked or written."""
+        self._modify(lambda presets: presets.__setitem__(preset.name, preset))
+
+    def delete(self, name):
+        self._modify(lambda presets: presets.pop(name, None))
+
+    def _modify(self, change):
+        with self._lock, FileLock(self.path):
+            self._loaded = False  # Start from what is on disk now, not from our copy
+            self._refresh(strict=True)
+            change(self._presets)
+            write_json_atomic(self.path, {"presets": {name: preset.to_dict()
+                                                      for name, preset in sorted(self._presets.items())}})
+            self._stamp = file_stamp(self.path)
+
+    def _refresh(self, strict=False):
+        stamp = file_stamp(self.path)
+        if self._loaded and stamp == self._stamp:
+            return
+        presets = {}
+        if stamp is not None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    records = json.load(f).get("presets", {})
+                for name, record in records.items():
+                    try:
+                        presets[name] = Preset.from_dict(name, record)
+                    except (ValueError, TypeError, AttributeError) as e:
+                        print(f"Warning: Ignoring preset '{name}' in {self.path}: {e}")
+            except (OSError, ValueError, AttributeError) as e:
+                if strict:  # Don't overwrite a file we couldn't read
+                    raise OSError(f"Could not read presets from {self.path}: {e}")
+                print(f"Warning: Could not read presets from {self.path}: {e}")
+                if self._loaded:
+                    return  # Keep the presets we have rather than losing them all
+        self._presets = presets
+        self._stamp = stamp
+        self._loaded = True
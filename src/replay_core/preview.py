@@ -0,0 +1,125 @@
+from .command import (FRAME_INDEX_ERROR, converter_segment, format_command, frame_segment,
+                      get_pcd_args, input_segment, output_segment)
+from .frames import resolve_frame_selection, shard_output_base
+
+# Segment order in the command, and the inputs each segment depends on
+SEGMENTS = (
+    ("converter", ("converter_path",)),
+    ("input", ("input_file",)),
+    ("frame", ("frame",)),
+    ("output", ("output_base", "output_format", "frame")),
+    ("pcd", ("pcd_args",)),
+)
+SEGMENTS_ORDER = tuple(name for name, _ in SEGMENTS)
+_MISSING = object()
+
+
+class PreviewState:
+    """What the preview should show: the command text, its problems and the runnable command."""
+
+    def __init__(self, parts, problems, display, shard_frames):
+        self.parts = parts
+        self.problems = problems
+        self.display = display
+        self.shard_frames = shard_frames
+
+    @property
+    def command_parts(self):
+        """The command to execute, or [] while something required is missing."""
+        return [] if self.problems else self.parts
+
+
+class CommandPreviewModel:
+    """
+    Incremental version of describe_command for the live preview.
+
+    The command is kept as segments (converter, -i, -a/-f, -o, PCD options). set()
+    only marks the segments whose inputs actually changed, and render() rebuilds
+    just those, reusing the cached parts and display text of the others. The
+    segment functions are the same ones describe_command uses, so the preview and
+    the executed command can't drift apart.
+    """
+
+    def __init__(self):
+        self._values = {}
+        self._segments = {}  # name -> (parts, problems, display)
+        self._dirty = {name for name, _ in SEGMENTS}
+        self._state = None
+        self._frame_resolution = (None, [], None)  # resolve_frame_selection() of the current frame text
+        self.shard_frames = []
+
+    def set(self, settings, input_file, output_base, output_format, frame):
+        """Updates the inputs. Returns True if anything changed."""
+        values = {
+            "converter_path": settings.get("converter_path"),
+            "input_file": input_file,
+            "output_base": output_base,
+            "output_format": output_format,
+            "frame": frame,
+            "pcd_args": tuple(get_pcd_args(settings, output_format)),
+        }
+        changed = {key for key, value in values.items() if self._values.get(key, _MISSING) != value}
+        if not changed:
+            return False
+        self._values = values
+        for name, depends_on in SEGMENTS:
+            if changed.intersection(depends_on):
+                self._dirty.add(name)
+        self._state = None
+        return True
+
+    def render(self):
+        """Returns the PreviewState, recomputing only dirty segments."""
+        if self._state is not None:
+            return self._state
+        values = self._values
+
+        if "frame" in self._dirty:
+            self._frame_resolution = resolve_frame_selection(values.get("frame"))
+        frame_option, self.shard_frames, frame_error = self._frame_resolution
+        for name in SEGMENTS_ORDER:
+            if name not in self._dirty:
+                continue
+            if name == "converter":
+                parts, problems = converter_segment({"converter_path": values.get("converter_path")})
+            elif name == "input":
+                parts, problems = input_segment(values.get("input_file"))
+            elif name == "frame":
+                parts, problems = frame_segment(frame_option)
+                if frame_error:
+                    problems = [p for p in problems if p != FRAME_INDEX_ERROR] + [frame_error]
+            elif name == "output":
+                output_base = values.get("output_base")
+                if output_base and self.shard_frames:
+                    output_base = shard_output_base(output_base, self.shard_frames[0])
+                parts, problems = output_segment(output_base, values.get("output_format", ""))
+            else:
+                parts, problems = list(values.get("pcd_args", ())), []
+            self._segments[name] = (parts, problems, format_command(parts, quote_first=(name == "converter")))
+        self._dirty.clear()
+
+        parts, problems, displays = [], [], []
+        for name in SEGMENTS_ORDER:
+            segment_parts, segment_problems, display = self._segments[name]
+            parts.extend(segment_parts)
+            problems.extend(segment_problems)
+            if display:
+                displays.append(display)
+        self._state = PreviewState(parts, problems, " ".join(displays), list(self.shard_frames))
+        return self._state
+
+
+def diff_text(old, new):
+    """
+    Returns (start, old_end, replacement) describing the smallest single edit that
+    turns `old` into `new`: replace old[start:old_end] with `replacement`.
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    while start < limit and old[start] == new[start]:
+        start += 1
+    end_old, end_new = len(old), len(new)
+    while end_old > start and end_new > start and old[end_old - 1] == new[end_new - 1]:
+        end_old -= 1
+        end_new -= 1
+    return start, end_old, new[start:end_new]
@@ -0,0 +1,286 @@
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+from .command import OUTPUT_FORMATS, get_option_value
+from .launcher import Launcher
+
+PROBE_TIMEOUT_SECONDS = 10.0
+# Tried in order until one prints a usable option list. The converter prints its
+# usage when started without -i/-o; -h can't be used as it is the PCD height option.
+PROBE_ARGUMENTS = ([], ["-?"], ["--help"])
+MAX_CACHED_BINARIES = 20
+HELP_EXCERPT_CHARS = 4000
+
+VALUE_OPTIONS = ('-i', '-o', '-f', '-w', '-h', '-z')  # Options followed by a value
+INTEGER_OPTIONS = ('-f', '-w', '-h')
+NUMBER_OPTIONS = ('-z',)
+
+_OPTION_RE = re.compile(r"(?<![\w-])(-[A-Za-z])(?![\w-])")
+_VERSION_RE = re.compile(r"(?i)(?:\bversion\b\D{0,3}|\bv)(\d+(?:\.\d+)+)")
+_FORMAT_RE = re.compile(r"(?i)(?<![\w.])(\.(?:" + "|".join(ext[1:] for ext in OUTPUT_FORMATS) + r"))\b")
+
+
+class ConverterCapabilities:
+    """
+    What a converter binary said about itself: its version (may be "") and the
+    options and output formats its usage text lists. Empty `options`/`formats`
+    mean the text couldn't be parsed, and nothing is rejected on their account.
+    """
+
+    def __init__(self, version="", options=(), formats=(), probed_at=None, error="", help_text=""):
+        self.version = version
+        self.options = frozenset(options)
+        self.formats = frozenset(formats)
+        self.probed_at = probed_at if probed_at is not None else time.time()
+        self.error = error  # Why the probe failed, if it did
+        self.help_text = help_text
+
+    @property
+    def knows_options(self):
+        return bool(self.options)
+
+    @property
+    def knows_formats(self):
+        return bool(self.formats)
+
+    def describe(self):
+        """One line for the settings window and `--probe`."""
+        if self.error:
+            return f"Could not query the converter: {self.error}"
+        name = f"ReplayConverter {self.version}" if self.version else "ReplayConverter (version unknown)"
+        if not self.knows_options:
+            return f"{name}; its options could not be read, so commands are not checked against them"
+        text = f"{name}; options {' '.join(sorted(self.options, key=str.lower))}"
+        if self.knows_formats:
+            text += f"; formats {' '.join(sorted(self.formats))}"
+        return text
+
+    def to_dict(self):
+        return {"version": self.version, "options": sorted(self.options), "formats": sorted(self.formats),
+                "probed_at": self.probed_at, "error": self.error, "help_text": self.help_text}
+
+    @classmethod
+    def from_dict(cls, record):
+        return cls(record.get("version", ""), record.get("options", ()), record.get("formats", ()),
+                   record.get("probed_at"), record.get("error", ""), record.get("help_text", ""))
+
+
+def parse_help(text):
+    """ConverterCapabilities from the converter's usage/version output."""
+    version_match = _VERSION_RE.search(text)
+    options = set(_OPTION_RE.findall(text))
+    if not {'-i', '-o'} <= options:
+        options = set()  # Not a usage text we understand; don't reject anything based on it
+    formats = {ext.lower() for ext in _FORMAT_RE.findall(text)}
+    if len(formats) < 2:
+        formats = set()  # A single extension is an example file name, not a list of formats
+    return ConverterCapabilities(version_match.group(1) if version_match else "", options, formats,
+                                 help_text=text[:HELP_EXCERPT_CHARS])
+
+
+def probe_converter(converter_path, timeout=PROBE_TIMEOUT_SECONDS, launcher=None):
+    """
+    Runs the converter with each of PROBE_ARGUMENTS in turn until its output lists
+    the options, and returns the parsed ConverterCapabilities. Never raises: a
+    converter that can't be started or times out gives capabilities with `error` set.
+    It is started by `launcher` (launcher.py) like the conversions, by default Launcher().
+    """
+    launcher = launcher if launcher is not None else Launcher()
+    capabilities = ConverterCapabilities(error="no output")
+    for arguments in PROBE_ARGUMENTS:
+        try:
+            completed = launcher.run([converter_path] + arguments, timeout, stdin=subprocess.DEVNULL,
+                                     text=True, encoding='utf-8', errors='replace')
+        except subprocess.TimeoutExpired:
+            return ConverterCapabilities(error=f"no answer within {timeout:g} s")
+        except OSError as e:
+            return ConverterCapabilities(error=str(e))
+        parsed = parse_help(completed.stdout + "\n" + completed.stderr)
+        if parsed.knows_options:
+            return parsed
+        if parsed.version or parsed.help_text.strip():
+            capabilities = parsed  # Keep what we learned in case no attempt does better
+    return capabilities
+
+
+def binary_key(converter_path):
+    """Cache key of a converter binary: its path, size and modification time. None if it doesn't exist."""
+    try:
+        st = os.stat(converter_path)
+    except OSError:
+        return None
+    return f"{os.path.normcase(os.path.abspath(converter_path))}|{st.st_size}|{st.st_mtime_ns}"
+
+
+class ConverterProbe:
+    """
+    Knows what each converter binary supports, starting it at most once per binary.
+
+    Results are kept in memory and in `cache_path` (JSON in the settings directory)
+    keyed on binary_key(), so replacing or updating the converter probes it again
+    while every other run — including other processes — reads the stored answer.
+    A failed probe (`error` set, e.g. a timeout) is not stored: the next
+    capabilities() call tries again. Binaries are started by `launcher` (see
+    probe_converter).
+    """
+
+    def __init__(self, cache_path, timeout=PROBE_TIMEOUT_SECONDS, launcher=None):
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self.launcher = launcher
+        self._memory = {}  # binary key -> ConverterCapabilities
+        self._lock = threading.Lock()
+        self._probing = {}  # binary key -> threading.Event set when its probe finishes
+        self._failed = {}  # binary key -> failed capabilities, for the threads that waited on that probe
+
+    def cached(self, converter_path):
+        """Capabilities already known for the binary, or None. Never starts a process."""
+        key = binary_key(converter_path)
+        if key is None:
+            return None
+        with self._lock:
+            if key not in self._memory:
+                record = self._read_cache().get(key)
+                if record is None or record.get("error"):
+                    return None
+                self._memory[key] = ConverterCapabilities.from_dict(record)
+            return self._memory[key]
+
+    def capabilities(self, converter_path):
+        """Capabilities of the binary, probing it first if needed. None if it doesn't exist."""
+        found = self.cached(converter_path)
+        if found is not None:
+            return found
+        key = binary_key(converter_path)
+        if key is None:
+            return None
+        with self._lock:
+            running = self._probing.get(key)
+            if running is None:
+                running = self._probing[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+        if not owner:
+            running.wait()  # Another thread is probing the same binary
+            with self._lock:
+                failed = self._failed.get(key)
+            return self.cached(converter_path) or failed
+        try:
+            found = probe_converter(converter_path, self.timeout, self.launcher)
+            with self._lock:
+                if found.error:
+                    self._failed[key] = found
+                else:
+                    self._failed.pop(key, None)
+                    self._memory[key] = found
+                    self._write_cache(key, found)
+        finally:
+            with self._lock:
+                self._probing.pop(key, None)
+            running.set()
+        return found
+
+    def probe_in_background(self, converter_path):
+        """Probes the binary on a daemon thread (if it isn't known yet) so later checks are instant."""
+        if converter_path and self.cached(converter_path) is None and binary_key(converter_path) is not None:
+            threading.Thread(target=self.capabilities, args=(converter_path,), name="ConverterProbe",
+                             daemon=True).start()
+
+    def check(self, command_parts, wait=True):
+        """
+        check_command() against the converter of `command_parts`. With wait=False
+        a converter that hasn't been probed yet is only given the checks that
+        don't need its capabilities.
+        """
+        converter_path = command_parts[0] if command_parts else ""
+        capabilities = self.capabilities(converter_path) if wait else self.cached(converter_path)
+        return check_command(command_parts, capabilities)
+
+    def _read_cache(self):
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            return records if isinstance(records, dict) else {}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read converter probe cache {self.cache_path}: {e}")
+            return {}
+
+    def _write_cache(self, key, capabilities):
+        records = self._read_cache()  # Merge with what other processes stored meanwhile
+        records[key] = capabilities.to_dict()
+        if len(records) > MAX_CACHED_BINARIES:
+            newest = sorted(records, key=lambda k: records[k].get("probed_at", 0), reverse=True)
+            records = {k: records[k] for k in newest[:MAX_CACHED_BINARIES]}
+        temp_path = f"{self.cache_path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            os.makedirs(os.path.dirname(self.cache_path) or ".", exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(records, f, indent=1)
+            os.replace(temp_path, self.cache_path)
+        except OSError as e:
+            print(f"Warning: Could not save converter probe cache {self.cache_path}: {e}")
+
+
+def check_command(command_parts, capabilities=None):
+    """
+    Finds problems in a converter command without running it: a missing converter
+    or input, -a combined with -f, options without a (valid) value and, given the
+    converter's ConverterCapabilities, options or output formats it doesn't support.
+    Returns a list of "Error: ..." messages (empty if the command looks runnable).
+    """
+    if not command_parts:
+        return ["Error: No command to execute."]
+    problems = []
+    if not os.path.exists(command_parts[0]):
+        problems.append(f"Error: Converter not found at: {command_parts[0]}")
+    input_path = get_option_value(command_parts, '-i')
+    if input_path and not os.path.exists(input_path):
+        problems.append(f"Error: Input file not found: {input_path}")
+
+    seen = []
+    index = 1
+    while index < len(command_parts):
+        option = command_parts[index]
+        index += 1
+        if option.startswith('-'):
+            seen.append(option)
+        if option not in VALUE_OPTIONS:
+            continue
+        if index >= len(command_parts):
+            problems.append(f"Error: {option} needs a value.")
+            break
+        value = command_parts[index]
+        index += 1
+        if option in INTEGER_OPTIONS and not value.isdigit():
+            problems.append(f"Error: {option} needs a whole number, not '{value}'.")
+        elif option in NUMBER_OPTIONS and not _is_number(value):
+            problems.append(f"Error: {option} needs a number, not '{value}'.")
+    if '-a' in seen and '-f' in seen:
+        problems.append("Error: -a (all frames) and -f (one frame) can't be combined.")
+
+    if capabilities is not None:
+        name = f"ReplayConverter {capabilities.version}" if capabilities.version else "This ReplayConverter"
+        if capabilities.knows_options:
+            for option in dict.fromkeys(seen):
+                if option not in capabilities.options:
+                    problems.append(f"Error: {name} does not support the {option} option.")
+        output_path = get_option_value(command_parts, '-o')
+        output_format = os.path.splitext(output_path)[1].lower() if output_path else ""
+        if capabilities.knows_formats and output_format and output_format not in capabilities.formats:
+            problems.append(f"Error: {name} can't write {output_format} files.")
+    return problems
+
+
+def _is_number(text):
+    try:
+        float(text)
+    except ValueError:
+        return False
+    return True
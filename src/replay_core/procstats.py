@@ -0,0 +1,91 @@
+import os
+import sys
+
+
+class ProcessUsage:
+    """CPU time (user + system seconds) and peak resident memory (bytes) of a finished child process."""
+
+    def __init__(self, cpu_seconds=None, peak_rss=None):
+        self.cpu_seconds = cpu_seconds
+        self.peak_rss = peak_rss
+
+
+def wait_with_usage(process):
+    """
+    Waits for a subprocess.Popen to exit and returns (returncode, ProcessUsage).
+
+    Uses wait4() on POSIX and GetProcessTimes/GetProcessMemoryInfo on Windows, so the
+    numbers belong to this child only even when several conversions run at once.
+    Falls back to a plain wait() with an empty ProcessUsage where neither is available.
+    """
+    if sys.platform == "win32":
+        returncode = process.wait()
+        return returncode, _windows_usage(process)
+    if hasattr(os, "wait4"):
+        return _wait4(process)
+    return process.wait(), ProcessUsage()
+
+
+def process_rss(pid):
+    """Current resident memory of a running process in bytes, or None if it can't be read."""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss
+    except ImportError:
+        pass
+    except Exception:  # psutil.NoSuchProcess / AccessDenied
+        return None
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _wait4(process):
+    with process._waitpid_lock:  # Popen's own lock, so poll()/wait() from other threads don't race us
+        if process.returncode is not None:
+            return process.returncode, ProcessUsage()  # Already reaped elsewhere; usage is lost
+        try:
+            _, status, rusage = os.wait4(process.pid, 0)
+        except ChildProcessError:
+            return process.wait(), ProcessUsage()
+        process.returncode = os.waitstatus_to_exitcode(status)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+    return process.returncode, ProcessUsage(rusage.ru_utime + rusage.ru_stime, peak_rss)
+
+
+def _windows_usage(process):
+    """Reads the usage of an exited (but not yet closed) process handle."""
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        handle = wintypes.HANDLE(int(process._handle))
+        creation, exit_, kernel, user = (wintypes.FILETIME() for _ in range(4))
+        cpu_seconds = None
+        if ctypes.windll.kernel32.GetProcessTimes(handle, ctypes.byref(creation), ctypes.byref(exit_),
+                                                  ctypes.byref(kernel), ctypes.byref(user)):
+            cpu_seconds = (_filetime_seconds(kernel) + _filetime_seconds(user))
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        peak_rss = None
+        if ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb):
+            peak_rss = counters.PeakWorkingSetSize
+        return ProcessUsage(cpu_seconds, peak_rss)
+    except Exception as e:
+        print(f"Warning: Could not read converter resource usage: {e}")
+        return ProcessUsage()
+
+
+def _filetime_seconds(filetime):
+    return ((filetime.dwHighDateTime << 32) | filetime.dwLowDateTime) / 1e7
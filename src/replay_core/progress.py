@@ -0,0 +1,159 @@
+import collections
+import os
+import re
+import threading
+import time
+
+from .util import format_bytes, format_elapsed
+
+# Lines the converter prints while exporting, e.g. "Processing frame 12/400", "Frame 12 of 400".
+FRAME_PATTERNS = (
+    re.compile(r"frame\s*[#:]?\s*(\d+)\s*(?:/|of)\s*(\d+)", re.IGNORECASE),
+    re.compile(r"(\d+)\s*(?:/|of)\s*(\d+)\s*frames?", re.IGNORECASE),
+)
+
+RATE_WINDOW_SECONDS = 10.0   # Throughput is averaged over this sliding window
+FILE_POLL_INTERVAL = 0.5     # Minimum seconds between stat() calls on the output file
+STALL_SECONDS = 30.0         # No progress for this long counts as stalled
+
+
+class ProgressSnapshot:
+    """A point-in-time view of a conversion's progress. Unknown values are None."""
+
+    def __init__(self, frames_done=None, frames_total=None, frames_per_sec=None, eta=None,
+                 bytes_written=None, bytes_per_sec=None, idle_seconds=0.0):
+        self.frames_done = frames_done
+        self.frames_total = frames_total
+        self.frames_per_sec = frames_per_sec
+        self.eta = eta
+        self.bytes_written = bytes_written
+        self.bytes_per_sec = bytes_per_sec
+        self.idle_seconds = idle_seconds
+
+    @property
+    def fraction(self):
+        """0.0-1.0 when the frame total is known, else None."""
+        if self.frames_done is None or not self.frames_total:
+            return None
+        return min(1.0, self.frames_done / self.frames_total)
+
+    @property
+    def stalled(self):
+        return self.idle_seconds >= STALL_SECONDS
+
+    def describe(self):
+        """Short human readable summary for status lines."""
+        parts = []
+        if self.frames_done is not None:
+            if self.frames_total:
+                parts.append(f"Frame {self.frames_done}/{self.frames_total} ({self.fraction:.0%})")
+            else:
+                parts.append(f"Frame {self.frames_done}")
+            if self.frames_per_sec:
+                parts.append(f"{self.frames_per_sec:.1f} frames/s")
+        elif self.bytes_written is not None:
+            parts.append(f"{format_bytes(self.bytes_written)} written")
+            if self.bytes_per_sec:
+                parts.append(f"{format_bytes(self.bytes_per_sec)}/s")
+        if self.eta is not None:
+            parts.append(f"ETA {format_elapsed(self.eta)}")
+        if self.stalled:
+            parts.append(f"no progress for {format_elapsed(self.idle_seconds)}")
+        return " | ".join(parts)
+
+
+class ProgressTracker:
+    """
+    Derives progress from the converter's output lines (feed_line) and, when it
+    prints no frame counters, from the growth of the output file given by -o.
+    feed_line is called from reader threads; snapshot from anywhere.
+    """
+
+    def __init__(self, output_path=None, clock=time.monotonic):
+        self.output_path = output_path
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._frames_done = None
+        self._frames_total = None
+        self._frame_samples = collections.deque()  # (time, frames_done)
+        self._bytes_written = None
+        self._byte_samples = collections.deque()   # (time, bytes_written)
+        self._last_file_poll = None
+        self._last_change = clock()
+
+    def feed_line(self, text):
+        """Parses one output line. Returns True if it carried a frame counter."""
+        match = parse_frame_counter(text)
+        if match is None:
+            return False
+        done, total = match
+        now = self._clock()
+        with self._lock:
+            if done != self._frames_done:
+                self._last_change = now
+            self._frames_done = done
+            self._frames_total = total
+            _add_sample(self._frame_samples, now, done)
+        return True
+
+    def poll_output_file(self):
+        """Stats the output file (rate limited) to track bytes written."""
+        if not self.output_path:
+            return
+        now = self._clock()
+        if self._last_file_poll is not None and now - self._last_file_poll < FILE_POLL_INTERVAL:
+            return
+        self._last_file_poll = now
+        try:
+            size = os.path.getsize(self.output_path)
+        except OSError:
+            return
+        with self._lock:
+            if size != self._bytes_written:
+                self._last_change = now
+            self._bytes_written = size
+            _add_sample(self._byte_samples, now, size)
+
+    def snapshot(self):
+        """Returns the current ProgressSnapshot."""
+        self.poll_output_file()
+        now = self._clock()
+        with self._lock:
+            frames_per_sec = _rate(self._frame_samples)
+            bytes_per_sec = _rate(self._byte_samples)
+            eta = None
+            if self._frames_total and self._frames_done is not None and frames_per_sec:
+                eta = max(0.0, (self._frames_total - self._frames_done) / frames_per_sec)
+            return ProgressSnapshot(
+                frames_done=self._frames_done, frames_total=self._frames_total,
+                frames_per_sec=frames_per_sec, eta=eta,
+                bytes_written=self._bytes_written, bytes_per_sec=bytes_per_sec,
+                idle_seconds=now - self._last_change,
+            )
+
+
+def parse_frame_counter(text):
+    """Returns (frames_done, frames_total) if the line contains a frame counter, else None."""
+    for pattern in FRAME_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            done, total = int(match.group(1)), int(match.group(2))
+            if total > 0 and done <= total:
+                return done, total
+    return None
+
+
+def _add_sample(samples, now, value):
+    samples.append((now, value))
+    while len(samples) > 2 and now - samples[0][0] > RATE_WINDOW_SECONDS:
+        samples.popleft()
+
+
+def _rate(samples):
+    """Units per second across the sample window, or None if it can't be computed yet."""
+    if len(samples) < 2:
+        return None
+    (t0, v0), (t1, v1) = samples[0], samples[-1]
+    if t1 <= t0 or v1 < v0:
+        return None
+    return (v1 - v0) / (t1 - t0)
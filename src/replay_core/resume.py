@@ -0,0 +1,224 @@
+import glob
+import json
+import os
+import threading
+import time
+
+from .command import get_option_value
+from .progress import parse_frame_counter
+from .settings import write_json_atomic
+
+CHECKPOINT_SUFFIX = ".resume.json"
+RESUMABLE_FORMATS = (".csv", ".pcd")  # -a writes one '<base>_<frame><ext>' file per frame only for these
+SAVE_INTERVAL_SECONDS = 10.0          # How often a running export's checkpoint is brought up to date
+
+
+def is_resumable(command_parts):
+    """True for an all-frames (-a) export to a format with one output file per frame."""
+    output_path = get_option_value(command_parts, '-o')
+    return ('-a' in command_parts and bool(output_path)
+            and os.path.splitext(output_path)[1].lower() in RESUMABLE_FORMATS)
+
+
+def checkpoint_path_for(output_path):
+    return output_path + CHECKPOINT_SUFFIX
+
+
+def frame_files(output_path):
+    """
+    {frame: (path, stat)} of the '<base>_<frame><ext>' files next to `output_path`,
+    whether the converter wrote them during an -a run or a resumed -f job wrote them.
+    """
+    base, ext = os.path.splitext(output_path)
+    files = {}
+    for path in glob.glob(glob.escape(base) + "_*" + glob.escape(ext)):
+        suffix = path[len(base) + 1:len(path) - len(ext)]
+        if not suffix.isdigit():
+            continue
+        try:
+            files[int(suffix)] = (path, os.stat(path))
+        except OSError:
+            continue
+    return files
+
+
+def completed_frames(output_path):
+    """{frame: mtime} of the non-empty per-frame files of `output_path`."""
+    return {frame: st.st_mtime for frame, (path, st) in frame_files(output_path).items() if st.st_size > 0}
+
+
+def frame_file_path(output_path, frame, files=None):
+    """
+    The '<base>_<frame><ext>' file of one frame of an -a export: the existing one if
+    there is one, else numbered like the frames already written (zero padded to
+    their width if they are, else plain, e.g. '<base>_6.csv'). `files` is
+    frame_files(output_path), if already at hand.
+    """
+    files = frame_files(output_path) if files is None else files
+    if frame in files:
+        return files[frame][0]
+    base, ext = os.path.splitext(output_path)
+    width = 0
+    for path, _ in files.values():
+        suffix = path[len(base) + 1:len(path) - len(ext)]
+        if len(suffix) > 1 and suffix.startswith("0"):
+            width = max(width, len(suffix))
+    return f"{base}_{frame:0{width}d}{ext}"
+
+
+def frame_command(command_parts, frame, files=None):
+    """
+    The -f job converting one missing frame of an -a export, writing the file the
+    -a run would have written (see frame_file_path), so a (partial) one is replaced.
+    """
+    output_path = get_option_value(command_parts, '-o')
+    parts = []
+    for i, part in enumerate(command_parts):
+        if part == '-a':
+            parts.extend(('-f', str(frame)))
+        elif i > 0 and command_parts[i - 1] == '-o':
+            parts.append(frame_file_path(output_path, frame, files))
+        else:
+            parts.append(part)
+    return parts
+
+
+class ExportCheckpoint:
+    """
+    Record of how far an all-frames (-a) .csv/.pcd export got, kept next to its
+    output as '<output>.resume.json' so a crashed or cancelled export can be
+    finished later by converting only the missing frames with -f.
+
+    The record holds the command (without the converter, which may be updated in
+    between), the input's size and mtime, the frame total the converter printed
+    and the frames whose output files exist. Frames are read back from the files
+    themselves (completed_frames), and the newest frame file of an interrupted -a
+    run is not trusted, as the converter may have been writing it.
+
+    Hand it to the ConversionJob of the -a run and of each -f job of a resume
+    (ConversionJob's `checkpoint`): it learns the total from the output lines,
+    saves itself every SAVE_INTERVAL_SECONDS and when a job ends, and deletes
+    itself once every frame is done.
+    """
+
+    def __init__(self, command_parts):
+        self.command_parts = list(command_parts)
+        self.output_path = get_option_value(command_parts, '-o')
+        self.path = checkpoint_path_for(self.output_path)
+        self.total = None
+        self.done = set()
+        self._lock = threading.Lock()
+        self._last_save = 0.0
+
+    @classmethod
+    def load(cls, command_parts):
+        """
+        The checkpoint of an earlier, unfinished run of the same export, or None if
+        there is none, or it is for another command or an input that has changed since.
+        """
+        checkpoint = cls(command_parts)
+        try:
+            with open(checkpoint.path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read resume checkpoint {checkpoint.path}: {e}")
+            return None
+        if record.get("args") != checkpoint.command_parts[1:] or record.get("input") != checkpoint._input_stamp():
+            return None
+        checkpoint.total = record.get("total")
+        # Frames whose files have been deleted since are converted again
+        on_disk = completed_frames(checkpoint.output_path)
+        checkpoint.done = {frame for frame in record.get("done", []) if frame in on_disk}
+        return checkpoint
+
+    def missing_frames(self):
+        """Frames still to convert, or None if the total isn't known (the export has to start over)."""
+        if not self.total:
+            return None
+        return [frame for frame in range(self.total) if frame not in self.done]
+
+    def describe(self):
+        if not self.total:
+            return f"{len(self.done)} frame(s) done, total unknown"
+        return f"{len(self.done)} of {self.total} frames done, {self.total - len(self.done)} to go"
+
+    # --- Called by ConversionJob ---
+
+    def feed_line(self, text):
+        """Learns the frame total from the converter's counters and saves now and then (reader thread)."""
+        match = parse_frame_counter(text)
+        if match is None:
+            return
+        with self._lock:
+            self.total = match[1]
+        if time.monotonic() - self._last_save >= SAVE_INTERVAL_SECONDS:
+            self._update(trust_newest=False)
+
+    def job_finished(self, command_parts, result):
+        """Records the outcome of the -a run or of one -f job of a resume."""
+        frame = get_option_value(command_parts, '-f')
+        if '-a' in command_parts:
+            if result.succeeded:
+                self.delete()
+                return
+            self._update(trust_newest=False)
+        elif frame is not None and result.succeeded:
+            with self._lock:
+                self.done.add(int(frame))
+            if self.missing_frames() == []:
+                self.delete()
+            else:
+                self._save()
+
+    def delete(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: Could not remove resume checkpoint {self.path}: {e}")
+
+    def _update(self, trust_newest):
+        frames = completed_frames(self.output_path)
+        if frames and not trust_newest:
+            frames.pop(max(frames, key=frames.get))  # May be half-written
+        with self._lock:
+            self.done.update(frames)
+        self._save()
+
+    def _save(self):
+        with self._lock:
+            record = {"args": self.command_parts[1:], "input": self._input_stamp(), "total": self.total,
+                      "done": sorted(self.done), "updated": time.time()}
+        try:
+            write_json_atomic(self.path, record)
+        except OSError as e:
+            print(f"Warning: Could not save resume checkpoint {self.path}: {e}")
+        self._last_save = time.monotonic()
+
+    def _input_stamp(self):
+        try:
+            st = os.stat(get_option_value(self.command_parts, '-i'))
+        except (OSError, TypeError):
+            return None
+        return [st.st_size, st.st_mtime_ns]
+
+
+def plan_export(command_parts, resume=True):
+    """
+    How to run an export that may have been interrupted before. Returns
+    (checkpoint, commands): with an earlier checkpoint that knows the frame total,
+    the -f commands of the missing frames (none if the earlier run only failed
+    after writing the last frame); otherwise the command itself, with a fresh
+    checkpoint. The checkpoint is None for commands that can't be resumed.
+    With resume=False an earlier checkpoint is ignored (and replaced).
+    """
+    if not is_resumable(command_parts):
+        return None, [command_parts]
+    checkpoint = ExportCheckpoint.load(command_parts) if resume else None
+    if checkpoint is not None and checkpoint.missing_frames() is not None:
+        files = frame_files(checkpoint.output_path)  # Listed once: an export can have thousands of frames
+        return checkpoint, [frame_command(command_parts, frame, files) for frame in checkpoint.missing_frames()]
+    return ExportCheckpoint(command_parts), [command_parts]
@@ -0,0 +1,237 @@
+import os
+import shutil
+import sys
+import threading
+import time
+
+from .command import get_option_value
+from .procstats import process_rss
+
+ORDER_FIFO = "fifo"
+ORDER_LARGEST_FIRST = "largest-first"
+ORDER_SHORTEST_FIRST = "shortest-first"
+ORDERINGS = (ORDER_FIFO, ORDER_LARGEST_FIRST, ORDER_SHORTEST_FIRST)
+
+DEFAULT_MEMORY_RESERVE_MB = 1024  # RAM kept free for the OS and other programs
+DEFAULT_DISK_RESERVE_MB = 1024    # Disk space kept free at each output location
+ADMIT_POLL_SECONDS = 1.0          # How often a job waiting for resources re-checks
+
+
+class Reservation:
+    """An admitted job: what it's expected to use, and (once started) its ConversionJob."""
+
+    def __init__(self, label, memory, disk, output_dir):
+        self.label = label
+        self.memory = memory or 0
+        self.disk = disk or 0
+        self.output_dir = output_dir
+        self.conversion = None  # Set by the runner so the scheduler can read the child's RSS
+
+
+class ResourceScheduler:
+    """
+    Decides the order of a multi-job run and when the next job may start.
+
+    Ordering (`ORDERINGS`): "fifo" keeps the given order, "largest-first" starts the
+    biggest inputs first (so no long job is left running alone at the end), and
+    "shortest-first" starts the jobs with the shortest predicted time first.
+
+    Admission: a job starts only if the memory it is expected to peak at fits into
+    what is free, after setting aside `memory_reserve` and the remaining growth of
+    the jobs already running, and if its expected output fits on the -o disk next
+    to the outputs still being written. Expectations come from the JobHistory (the
+    same command's last run, or recent runs of the same kind scaled by input size).
+    A job is always admitted when nothing else is running, so an oversized job runs
+    alone instead of waiting forever.
+
+    Free memory comes from psutil when installed, else /proc/meminfo or
+    GlobalMemoryStatusEx; where none is available only the disk check applies.
+    """
+
+    def __init__(self, history=None, ordering=ORDER_FIFO, memory_reserve=DEFAULT_MEMORY_RESERVE_MB * 2**20,
+                 disk_reserve=DEFAULT_DISK_RESERVE_MB * 2**20, poll_seconds=ADMIT_POLL_SECONDS,
+                 memory_probe=None, disk_probe=None):
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown job ordering '{ordering}'. Use one of: {', '.join(ORDERINGS)}.")
+        self.history = history
+        self.ordering = ordering
+        self.memory_reserve = memory_reserve
+        self.disk_reserve = disk_reserve
+        self.poll_seconds = poll_seconds
+        self.memory_probe = memory_probe or available_memory
+        self.disk_probe = disk_probe or free_disk_space
+        self._running = []
+        self._lock = threading.Lock()
+        self._estimates = {}  # tuple(command_parts) -> RunEstimate
+
+    def estimate(self, command_parts):
+        """RunEstimate for a command (memoized: ordering and admission ask for the same jobs)."""
+        key = tuple(command_parts)
+        if key not in self._estimates:
+            if self.history is None:
+                from .history import RunEstimate  # Imported here: history loads sqlite3, unused without one
+                self._estimates[key] = RunEstimate()
+            else:
+                input_size = _file_size(get_option_value(command_parts, '-i'))
+                self._estimates[key] = self.history.estimate(command_parts, input_size)
+        return self._estimates[key]
+
+    def order(self, jobs):
+        """Returns the jobs (anything with .command_parts and .input_path) in start order."""
+        jobs = list(jobs)
+        if self.ordering == ORDER_LARGEST_FIRST:
+            jobs.sort(key=lambda job: _file_size(job.input_path) or 0, reverse=True)
+        elif self.ordering == ORDER_SHORTEST_FIRST:
+            def predicted_seconds(job):
+                seconds = self.estimate(job.command_parts).wall_seconds
+                # Without history, input size is the best guess at duration
+                return (0, seconds) if seconds is not None else (1, _file_size(job.input_path) or 0)
+            jobs.sort(key=predicted_seconds)
+        return jobs
+
+    def try_admit(self, command_parts, label=""):
+        """Returns (Reservation, "") if the job may start now, else (None, reason)."""
+        estimate = self.estimate(command_parts)
+        output_path = get_option_value(command_parts, '-o')
+        output_dir = os.path.dirname(os.path.abspath(output_path)) if output_path else None
+        with self._lock:
+            if self._running:
+                reason = self._blocking_reason(estimate, output_dir)
+                if reason:
+                    return None, reason
+            reservation = Reservation(label, estimate.peak_rss, estimate.output_size, output_dir)
+            self._running.append(reservation)
+            return reservation, ""
+
+    def admit(self, command_parts, label="", cancelled=None, on_wait=None):
+        """
+        Blocks until the job may start. Returns its Reservation, or None if the
+        `cancelled` event was set while waiting. `on_wait(reason)` is called whenever
+        the reason for waiting changes.
+        """
+        last_reason = None
+        while True:
+            if cancelled is not None and cancelled.is_set():
+                return None
+            reservation, reason = self.try_admit(command_parts, label)
+            if reservation is not None:
+                return reservation
+            if on_wait is not None and reason != last_reason:
+                on_wait(reason)
+            last_reason = reason
+            if cancelled is not None:
+                cancelled.wait(self.poll_seconds)
+            else:
+                time.sleep(self.poll_seconds)
+
+    def release(self, reservation):
+        with self._lock:
+            if reservation in self._running:
+                self._running.remove(reservation)
+
+    def _blocking_reason(self, estimate, output_dir):
+        """Why a job with this estimate can't start next to the running ones ("" if it can). Holds _lock."""
+        free_memory = self.memory_probe()
+        if free_memory is not None and estimate.peak_rss:
+            # Running jobs may still grow to their expected peak; count what they haven't used yet
+            still_growing = 0
+            for running in self._running:
+                current = process_rss(running.conversion.pid) if running.conversion and running.conversion.pid else None
+                still_growing += max(0, running.memory - (current or 0))
+            if estimate.peak_rss + still_growing + self.memory_reserve > free_memory:
+                return f"waiting for memory ({_mb(estimate.peak_rss)} needed)"
+        if output_dir and estimate.output_size:
+            free_disk = self.disk_probe(output_dir)
+            if free_disk is not None:
+                pending_output = sum(running.disk for running in self._running if running.output_dir == output_dir)
+                if estimate.output_size + pending_output + self.disk_reserve > free_disk:
+                    return f"waiting for disk space ({_mb(estimate.output_size)} needed)"
+        return ""
+
+
+def scheduler_from_settings(settings, history=None, ordering=None, throttle=None):
+    """
+    Builds the ResourceScheduler described by the settings ("schedule_*" keys), with
+    optional overrides. Returns None for plain FIFO without throttling.
+    """
+    ordering = ordering or settings.get("schedule_order", ORDER_FIFO)
+    if ordering not in ORDERINGS:
+        print(f"Warning: Unknown job ordering '{ordering}'; using {ORDER_FIFO}.")
+        ordering = ORDER_FIFO
+    throttle = settings.get("schedule_throttle", True) if throttle is None else throttle
+    if not throttle:
+        if ordering == ORDER_FIFO:
+            return None
+        # Ordering only: with no resource readings every job is admitted at once
+        return ResourceScheduler(history, ordering, memory_probe=lambda: None, disk_probe=lambda path: None)
+    try:
+        memory_reserve = int(float(settings.get("schedule_memory_reserve_mb", DEFAULT_MEMORY_RESERVE_MB)) * 2**20)
+        disk_reserve = int(float(settings.get("schedule_disk_reserve_mb", DEFAULT_DISK_RESERVE_MB)) * 2**20)
+    except (TypeError, ValueError):
+        print("Warning: Invalid memory/disk reserve in settings; using the defaults.")
+        memory_reserve = DEFAULT_MEMORY_RESERVE_MB * 2**20
+        disk_reserve = DEFAULT_DISK_RESERVE_MB * 2**20
+    return ResourceScheduler(history, ordering, memory_reserve=memory_reserve, disk_reserve=disk_reserve)
+
+
+def available_memory():
+    """Bytes of memory available to new processes, or None if it can't be determined."""
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        pass
+    if sys.platform == "win32":
+        return _windows_available_memory()
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def free_disk_space(path):
+    """Free bytes on the disk holding `path` (or its nearest existing parent), or None."""
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    try:
+        return shutil.disk_usage(path or ".").free
+    except OSError:
+        return None
+
+
+def _windows_available_memory():
+    try:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                        ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                        ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                        ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                        ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(status)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullAvailPhys
+    except Exception as e:
+        print(f"Warning: Could not read free memory: {e}")
+    return None
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path) if path else None
+    except OSError:
+        return None
+
+
+def _mb(size):
+    return f"{max(0, size) / 2**20:.0f} MB"
@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:  # POSIX
+    msvcrt = None
+
+APP_NAME = "ReplayConverterGUI"
+SETTINGS_FILENAME = "replay_converter_settings.json"
+CONVERTER_EXE_NAME = "ReplayConverter.exe"
+LOCK_TIMEOUT_SECONDS = 10.0
+LOCK_POLL_SECONDS = 0.05
+
+
+def get_app_data_dir():
+    """Directory holding the settings file and other per-user data (~/.ReplayConverterGUI)."""
+    return os.path.join(os.path.expanduser("~"), f".{APP_NAME}")
+
+
+def get_cache_dir():
+    """Directory of the conversion cache."""
+    return os.path.join(get_app_data_dir(), "cache")
+
+
+def get_history_db_path():
+    """SQLite database with the record of every conversion run."""
+    return os.path.join(get_app_data_dir(), "history.sqlite3")
+
+
+def get_watch_dir():
+    """Directory of the watch-folder indexes (which files were already converted)."""
+    return os.path.join(get_app_data_dir(), "watch")
+
+
+def get_probe_cache_path():
+    """JSON file with what each converter binary supports (see probe.py)."""
+    return os.path.join(get_app_data_dir(), "converter_probe.json")
+
+
+def get_presets_file_path():
+    """JSON file with the named conversion presets (see presets.py)."""
+    return os.path.join(get_app_data_dir(), "presets.json")
+
+
+def get_settings_file_path():
+    """Default location of the settings JSON file."""
+    return os.path.join(get_app_data_dir(), SETTINGS_FILENAME)
+
+
+def get_default_settings():
+    """Returns a dictionary with default settings."""
+    return {
+        "converter_path": "",
+        "pcd_width": "0",
+        "pcd_height": "0",
+        "pcd_swap": False,
+        "pcd_zoom": "1.0",
+        "pcd_remove": False,
+        "cache_enabled": False,
+        "cache_max_mb": "5000",
+        "cache_full_digest": False,
+        "cache_hardlinks": False,
+        "watch_folder": "",
+        "schedule_order": "fifo",
+        "schedule_throttle": True,
+        "schedule_memory_reserve_mb": "1024",
+        "schedule_disk_reserve_mb": "1024",
+        "staging_enabled": False,
+        "staging_dir": "",
+        "staging_max_mb": "20000",
+        "staging_remote_only": True,
+        "package_compression": "none",
+        "package_group_frames": False,
+        "package_keep_originals": False,
+        "validate_outputs": True,
+        "resume_exports": True,
+        "server_port": "8765",
+        "server_token": "",
+        "metrics_port": "",
+        "launch_mode": "auto",
+        "wine_command": "wine",
+        "wine_prefix": "",
+        "launch_wrapper": "",
+        "process_priority": "normal",
+        "process_cpus": ""
+    }
+
+
+def read_settings_file(settings_file_path):
+    """Loads settings from JSON merged over the defaults; returns the defaults if the file is missing or invalid."""
+    settings = get_default_settings()
+    try:
+        with open(settings_file_path, 'r') as f:
+            loaded_settings = json.load(f)
+            # Merge loaded settings with defaults to ensure all keys are present
+            settings.update(loaded_settings)
+    except (FileNotFoundError, json.JSONDecodeError):
+        # File not found or invalid JSON, return defaults. File will be created on first save.
+        pass
+    except Exception as e:
+        print(f"Warning: Error loading settings file {settings_file_path}: {e}")
+    return settings
+
+
+def write_settings_file(settings_file_path, settings):
+    """Saves settings to the JSON file, creating its directory if needed. Raises OSError on failure."""
+    with FileLock(settings_file_path):
+        write_json_atomic(settings_file_path, settings)
+
+
+def update_settings_file(settings_file_path, settings, baseline):
+    """
+    Saves the settings that differ from `baseline` (the settings as they were read)
+    over the file's current contents, so what another GUI instance or script saved
+    in the meantime is kept. Returns the merged settings. Raises OSError on failure.
+    """
+    with FileLock(settings_file_path):
+        merged = read_settings_file(settings_file_path)
+        merged.update({key: value for key, value in settings.items() if baseline.get(key, object()) != value})
+        write_json_atomic(settings_file_path, merged)
+    return merged
+
+
+def write_json_atomic(path, data):
+    """
+    Writes JSON to a temporary file next to `path` and renames it into place, so
+    readers in other processes see either the old or the new file, never half of one.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def file_stamp(path):
+    """(mtime_ns, size, inode) of a file, or None if it doesn't exist; changes whenever the file is replaced."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class FileLock:
+    """
+    Exclusive lock on `<path>.lock`, shared between threads and processes, held
+    while a JSON file is read, changed and written back (flock on POSIX,
+    msvcrt.locking on Windows). Raises TimeoutError, an OSError, if it can't be
+    taken within `timeout` seconds.
+    """
+
+    def __init__(self, path, timeout=LOCK_TIMEOUT_SECONDS):
+        self.lock_path = path + ".lock"
+        self.timeout = timeout
+        self._file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.lock_path) or ".", exist_ok=True)
+        self._file = open(self.lock_path, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._lock()
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    raise TimeoutError(f"{self.lock_path} is locked by another process")
+                time.sleep(LOCK_POLL_SECONDS)
+
+    def __exit__(self, *exc_info):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+            elif msvcrt is not None:
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        finally:
+            self._file.close()
+
+    def _lock(self):
+        if fcntl is not None:
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+
+
+def find_converter(search_dirs):
+    """Returns the path of ReplayConverter.exe in the first of `search_dirs` that has one, else ''."""
+    for directory in search_dirs:
+        if not directory:
+            continue
+        potential_path = os.path.join(directory, CONVERTER_EXE_NAME)
+        if os.path.isfile(potential_path):
+            return potential_path
+    return ""
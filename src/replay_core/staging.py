@@ -0,0 +1,427 @@
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from .cache import collect_outputs
+from .command import get_option_value
+
+COPY_CHUNK_BYTES = 8 * 2**20      # Large sequential reads/writes; SMB is slow with small random I/O
+DEFAULT_MAX_MB = 20000
+STALE_SESSION_SECONDS = 24 * 3600  # Scratch left behind by a crashed session is removed after this long
+NETWORK_FILESYSTEMS = {"cifs", "smb3", "smbfs", "nfs", "nfs4", "afs", "9p", "fuse.sshfs", "webdav", "davfs"}
+
+
+def default_scratch_dir():
+    return os.path.join(tempfile.gettempdir(), "ReplayConverterGUI-scratch")
+
+
+def is_network_path(path):
+    """True if `path` is on a network share (UNC path, mapped network drive or a network mount)."""
+    path = os.path.abspath(path)
+    if path.startswith(("\\\\", "//")):
+        return True
+    if sys.platform == "win32":
+        try:
+            import ctypes
+            drive = os.path.splitdrive(path)[0]
+            return bool(drive) and ctypes.windll.kernel32.GetDriveTypeW(drive + "\\") == 4  # DRIVE_REMOTE
+        except Exception:
+            return False
+    try:
+        best, fstype = "", None
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best):
+                    best, fstype = mount_point, fields[2]
+        return fstype in NETWORK_FILESYSTEMS
+    except OSError:
+        return False
+
+
+class StagedInput:
+    """A local copy of an input file, filled in by the copier thread."""
+
+    def __init__(self, source, size, local_path):
+        self.source = source
+        self.size = size
+        self.local_path = local_path
+        self.ready = threading.Event()
+        self.error = None
+        self.refs = 0
+        self.copying = False
+
+
+class Upload:
+    """Background copy of a finished run's outputs back to their destination."""
+
+    def __init__(self, files, size):
+        self.files = files  # [(local path, destination path)]
+        self.size = size
+        self.error = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Calls `callback(upload)` once the upload has finished (right away if it already has)."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self, error=None):
+        self.error = error
+        with self._lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"Warning: Upload callback failed: {e}")
+
+
+class StagedRun:
+    """The local version of one conversion command, see StagingArea.prepare."""
+
+    def __init__(self, area, command_parts, staged_input=None, local_output=None, dest_output=None):
+        self.area = area
+        self.command_parts = command_parts
+        self.staged_input = staged_input
+        self.local_output = local_output
+        self.dest_output = dest_output
+
+    def upload(self, started_at):
+        """Starts moving the outputs back to the real -o location. Returns the Upload, or None if -o wasn't redirected."""
+        if self.local_output is None:
+            return None
+        return self.area.upload(self.local_output, self.dest_output, started_at)
+
+    def release(self, discard_output=False):
+        """Drops the local input copy; with `discard_output` also the (failed) run's local outputs."""
+        if self.staged_input is not None:
+            self.area.release_input(self.staged_input)
+            self.staged_input = None
+        if discard_output and self.local_output is not None:
+            shutil.rmtree(os.path.dirname(self.local_output), ignore_errors=True)
+
+
+class StagingArea:
+    """
+    Runs conversions against fast local scratch instead of network shares.
+
+    prefetch() queues an input for copying to scratch with large sequential reads on
+    a background thread, ideally while the previous job is still converting.
+    prepare() returns the command with -i pointing at the local copy (waiting for
+    the copy if needed) and -o pointing into scratch. After the run, the outputs are
+    copied back to the real -o location on a second background thread (upload()),
+    written under a temporary name and renamed so a half-copied file is never seen.
+
+    Staged inputs plus outputs waiting for upload are kept under `max_bytes`; an
+    input that can't fit is used straight from the share. With `remote_only` (the
+    default) only paths on network shares are staged. Each StagingArea works in its
+    own session directory, removed by close().
+    """
+
+    def __init__(self, scratch_dir=None, max_bytes=DEFAULT_MAX_MB * 2**20, remote_only=True,
+                 chunk_size=COPY_CHUNK_BYTES):
+        self.scratch_dir = scratch_dir or default_scratch_dir()
+        self.max_bytes = max_bytes
+        self.remote_only = remote_only
+        self.chunk_size = chunk_size
+        self.session_dir = os.path.join(self.scratch_dir, f"session-{os.getpid()}-{int(time.time())}")
+        self._inputs = {}  # source path -> StagedInput
+        self._copy_queue = collections.deque()
+        self._upload_queue = collections.deque()
+        self._used = 0
+        self._next_id = 0
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads = []
+        self._remove_stale_sessions()
+
+    # --- Inputs ---
+
+    def should_stage(self, path):
+        if not path or not os.path.isfile(path):
+            return False
+        return not self.remote_only or is_network_path(path)
+
+    def prefetch(self, path):
+        """Queues `path` for copying to scratch, if it should be staged. Returns immediately."""
+        if self.should_stage(path):
+            with self._cond:
+                self._entry(path)
+
+    def acquire_input(self, path, cancelled=None):
+        """
+        Waits for the local copy of `path` and returns its StagedInput (whose `error`
+        is set if the copy failed), or None if `path` isn't staged. Pair with release_input.
+        """
+        if not self.should_stage(path):
+            return None
+        with self._cond:
+            entry = self._entry(path)
+            if entry is None:
+                return None
+            entry.refs += 1
+            if not entry.copying and entry in self._copy_queue:
+                # Needed now: jump ahead of the inputs that are only prefetched
+                self._copy_queue.remove(entry)
+                self._copy_queue.appendleft(entry)
+                self._cond.notify_all()
+        while not entry.ready.wait(0.2):
+            if cancelled is not None and cancelled.is_set():
+                break
+        return entry
+
+    def release_input(self, entry):
+        """Drops one user of a staged input and deletes the local copy when nobody needs it."""
+        with self._cond:
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            self._inputs.pop(entry.source, None)
+            if entry in self._copy_queue:
+                self._copy_queue.remove(entry)
+            if entry.ready.is_set() and entry.error is None:
+                self._used -= entry.size
+                self._cond.notify_all()
+        if entry.ready.is_set():
+            _remove(entry.local_path)
+
+    def _entry(self, path):
+        """Existing or newly queued StagedInput for `path`, or None if it can never fit. Holds _cond."""
+        entry = self._inputs.get(path)
+        if entry is not None:
+            return entry
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        if size > self.max_bytes:
+            print(f"Warning: {path} is larger than the scratch limit; converting it from its original location.")
+            return None
+        self._next_id += 1
+        local_dir = os.path.join(self.session_dir, "inputs", str(self._next_id))
+        entry = StagedInput(path, size, os.path.join(local_dir, os.path.basename(path)))
+        self._inputs[path] = entry
+        self._copy_queue.append(entry)
+        self._ensure_threads()
+        self._cond.notify_all()
+        return entry
+
+    # --- Commands ---
+
+    def prepare(self, command_parts, cancelled=None):
+        """Returns a StagedRun whose command reads a local input copy and writes to scratch."""
+        parts = list(command_parts)
+        run = StagedRun(self, parts)
+        input_path = get_option_value(parts, '-i')
+        entry = self.acquire_input(input_path, cancelled) if input_path else None
+        if entry is not None:
+            run.staged_input = entry
+            if entry.error is None and entry.ready.is_set():
+                parts[parts.index('-i') + 1] = entry.local_path
+        output_path = get_option_value(parts, '-o')
+        if output_path and (not self.remote_only or is_network_path(os.path.dirname(os.path.abspath(output_path)))):
+            with self._cond:
+                self._next_id += 1
+                local_dir = os.path.join(self.session_dir, "outputs", str(self._next_id))
+            os.makedirs(local_dir, exist_ok=True)
+            run.local_output = os.path.join(local_dir, os.path.basename(output_path))
+            run.dest_output = output_path
+            parts[parts.index('-o') + 1] = run.local_output
+        return run
+
+    # --- Outputs ---
+
+    def upload(self, local_output, dest_output, started_at):
+        """Queues the outputs of a finished run (the -o file and per-frame siblings) for copying back."""
+        local_base, ext = os.path.splitext(local_output)
+        dest_base = os.path.splitext(dest_output)[0]
+        files, size = [], 0
+        for suffix, path in collect_outputs(local_output, started_at):
+            files.append((path, dest_base + suffix + ext))
+            try:
+                size += os.path.getsize(path)
+            except OSError:
+                pass
+        upload = Upload(files, size)
+        with self._cond:
+            self._used += size  # Counted until the local copies are deleted
+            self._upload_queue.append(upload)
+            self._ensure_threads()
+            self._cond.notify_all()
+        return upload
+
+    # --- Background threads ---
+
+    def _ensure_threads(self):
+        if not self._threads:
+            self._threads = [threading.Thread(target=self._copier, name="StagingCopier", daemon=True),
+                             threading.Thread(target=self._uploader, name="StagingUploader", daemon=True)]
+            for thread in self._threads:
+                thread.start()
+
+    def _copier(self):
+        while True:
+            with self._cond:
+                entry = None
+                while not self._closed:
+                    if self._copy_queue:
+                        candidate = self._copy_queue[0]
+                        if candidate.refs:
+                            self._evict_prefetched(candidate.size)  # A job is waiting for this one
+                        if self._used + candidate.size <= self.max_bytes:
+                            entry = self._copy_queue.popleft()
+                            break
+                        if candidate.refs and not self._space_will_free():
+                            # Needed now and nothing will free space: convert from the share instead
+                            self._copy_queue.popleft()
+                            candidate.error = OSError("Not enough scratch space")
+                            candidate.ready.set()
+                            continue
+                    self._cond.wait(1.0)
+                if self._closed:
+                    return
+                entry.copying = True
+                self._used += entry.size
+            try:
+                os.makedirs(os.path.dirname(entry.local_path), exist_ok=True)
+                _copy_file(entry.source, entry.local_path, self.chunk_size)
+            except OSError as e:
+                print(f"Warning: Could not stage {entry.source}, converting it from its original location: {e}")
+                entry.error = e
+                with self._cond:
+                    self._used -= entry.size
+                    self._cond.notify_all()
+            with self._cond:
+                entry.copying = False
+                entry.ready.set()
+                # Released while it was being copied: nobody will delete it otherwise
+                abandoned = entry.error is None and self._inputs.get(entry.source) is not entry
+                if abandoned:
+                    self._used -= entry.size
+                    self._cond.notify_all()
+            if abandoned:
+                _remove(entry.local_path)
+
+    def _evict_prefetched(self, needed):
+        """Deletes prefetched copies no job holds yet until `needed` bytes fit. Holds _cond."""
+        for entry in list(self._inputs.values()):
+            if self._used + needed <= self.max_bytes:
+                return
+            if entry.refs == 0 and entry.ready.is_set() and entry.error is None:
+                del self._inputs[entry.source]  # Copied again if it is needed later
+                self._used -= entry.size
+                _remove(entry.local_path)
+
+    def _space_will_free(self):
+        """True if scratch space is held by uploads or by inputs of running jobs. Holds _cond."""
+        return bool(self._upload_queue) or any(entry.refs and entry.ready.is_set() and entry.error is None
+                                               for entry in self._inputs.values())
+
+    def _uploader(self):
+        while True:
+            with self._cond:
+                while not self._upload_queue and not self._closed:
+                    self._cond.wait(1.0)
+                if not self._upload_queue:
+                    return
+                upload = self._upload_queue[0]
+            error = None
+            for local_path, dest_path in upload.files:
+                temp_path = f"{dest_path}.part-{os.getpid()}"
+                try:
+                    os.makedirs(os.path.dirname(os.path.abspath(dest_path)), exist_ok=True)
+                    _copy_file(local_path, temp_path, self.chunk_size)
+                    os.replace(temp_path, dest_path)
+                except OSError as e:
+                    error = error or e
+                    _remove(temp_path)
+            if upload.files:
+                # Keep the local outputs if the upload failed, so nothing is lost
+                if error is None:
+                    shutil.rmtree(os.path.dirname(upload.files[0][0]), ignore_errors=True)
+                else:
+                    print(f"Warning: Could not copy outputs back: {error}. They are kept in "
+                          f"{os.path.dirname(upload.files[0][0])}")
+            with self._cond:
+                self._upload_queue.popleft()
+                self._used -= upload.size
+                self._cond.notify_all()
+            upload._finish(error)
+
+    # --- Lifetime ---
+
+    def pending_uploads(self):
+        with self._cond:
+            return len(self._upload_queue)
+
+    def close(self, wait_for_uploads=True):
+        """Stops the background threads and deletes the session's scratch directory."""
+        if wait_for_uploads:
+            with self._cond:
+                uploads = list(self._upload_queue)
+            for upload in uploads:
+                upload.wait()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        shutil.rmtree(self.session_dir, ignore_errors=True)
+
+    def _remove_stale_sessions(self):
+        try:
+            with os.scandir(self.scratch_dir) as entries:
+                for entry in entries:
+                    if entry.name.startswith("session-") and time.time() - entry.stat().st_mtime > STALE_SESSION_SECONDS:
+                        shutil.rmtree(entry.path, ignore_errors=True)
+        except OSError:
+            pass
+
+
+def staging_from_settings(settings):
+    """Returns a StagingArea per the settings, or None if staging is off."""
+    if not settings.get("staging_enabled"):
+        return None
+    try:
+        max_bytes = int(float(settings.get("staging_max_mb", DEFAULT_MAX_MB)) * 2**20)
+    except (TypeError, ValueError):
+        print(f"Warning: Invalid scratch size limit in settings; using {DEFAULT_MAX_MB} MB.")
+        max_bytes = DEFAULT_MAX_MB * 2**20
+    return StagingArea(settings.get("staging_dir") or None, max_bytes,
+                       remote_only=settings.get("staging_remote_only", True))
+
+
+def _copy_file(source, target, chunk_size):
+    """Copies with large sequential chunks (and keeps the modification time)."""
+    with open(source, 'rb') as src, open(target, 'wb') as dst:
+        shutil.copyfileobj(src, dst, chunk_size)
+    shutil.copystat(source, target)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
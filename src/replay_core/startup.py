@@ -0,0 +1,55 @@
+import os
+import sys
+import time
+
+PROFILE_ENV_VAR = "REPLAY_CONVERTER_PROFILE_STARTUP"
+PROFILE_FLAG = "--profile-startup"
+
+
+def profiling_requested(argv=None, environ=None):
+    """True if the startup report was asked for with --profile-startup or REPLAY_CONVERTER_PROFILE_STARTUP=1."""
+    argv = sys.argv[1:] if argv is None else argv
+    environ = os.environ if environ is None else environ
+    return PROFILE_FLAG in argv or environ.get(PROFILE_ENV_VAR, "") not in ("", "0")
+
+
+class StartupProfiler:
+    """
+    Records how long each phase of the GUI start takes and prints a report.
+
+    Each `profiler.mark("name")` closes a phase covering everything since the
+    previous mark (or the start). When disabled every call is a cheap no-op, so the
+    hooks can stay in the code.
+    """
+
+    def __init__(self, enabled=False, started_at=None, clock=time.perf_counter, out=None):
+        self.enabled = enabled
+        self.clock = clock
+        self.out = out
+        self.started_at = clock() if started_at is None else started_at
+        self.phases = []  # (name, seconds)
+        self._last_mark = self.started_at
+        self._reported = False
+
+    def mark(self, name):
+        """Ends a phase named `name` that began at the previous mark (or at start)."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        self.phases.append((name, now - self._last_mark))
+        self._last_mark = now
+
+    @property
+    def total(self):
+        return self._last_mark - self.started_at
+
+    def report(self):
+        """Prints the per-phase timings once (to stderr unless `out` was given)."""
+        if not self.enabled or self._reported:
+            return
+        self._reported = True
+        out = self.out or sys.stderr
+        print("Startup timings:", file=out)
+        for name, seconds in self.phases:
+            print(f"  {name:<28s} {seconds * 1000:8.1f} ms", file=out)
+        print(f"  {'total':<28s} {self.total * 1000:8.1f} ms", file=out, flush=True)
@@ -0,0 +1,323 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from .batch import BatchJob
+from .cache import collect_outputs
+from .command import INPUT_EXTENSIONS, get_option_value
+
+MANIFEST_NAME = ".replay_sync.jsonl"  # Kept in the output directory, next to what it describes
+ORPHAN_ACTIONS = ("flag", "delete")
+
+# Why a recording is converted again (SyncItem.reason)
+NEW = "new"
+CHANGED = "changed"
+OPTIONS_CHANGED = "options changed"
+OUTPUT_MISSING = "output missing"
+NOT_DONE = "failed last time"
+
+
+def options_hash(command_parts):
+    """
+    Hash of what decides a recording's outputs besides the recording itself: every
+    argument except the converter and the -i/-o paths, plus the output format.
+    """
+    args = [part for i, part in enumerate(command_parts[1:], start=1) if command_parts[i - 1] not in ('-i', '-o')]
+    output_path = get_option_value(command_parts, '-o') or ""
+    args.append(os.path.splitext(output_path)[1].lower())
+    return hashlib.sha1("\0".join(args).encode("utf-8")).hexdigest()[:16]
+
+
+class SyncManifest:
+    """
+    What the last syncs converted: per source file (relative to the source
+    directory) its size, mtime_ns and options hash, the outputs written for it
+    (relative to the output directory) and outputs it no longer owns.
+
+    Stored like the watch index (watch.ProcessedIndex): an append-only JSON-lines
+    file, so recording a file is one small append even with 100k entries, and
+    compacted on load. A line with "removed" forgets its path.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._entries = {}  # relative source path -> record
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        if record.get("removed"):
+                            self._entries.pop(record["path"], None)
+                        else:
+                            self._entries[record["path"]] = record
+                    except (ValueError, KeyError, AttributeError):
+                        continue  # Ignore a torn last line from a crash
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Warning: Could not read sync manifest {self.path}: {e}")
+            return
+        self._compact()
+
+    def _compact(self):
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for record in self._entries.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Warning: Could not compact sync manifest {self.path}: {e}")
+
+    def get(self, rel_path):
+        with self._lock:
+            return self._entries.get(rel_path)
+
+    def paths(self):
+        with self._lock:
+            return list(self._entries)
+
+    def record(self, rel_path, size, mtime_ns, options, outputs, status, orphans=()):
+        self._append({"path": rel_path, "size": size, "mtime_ns": mtime_ns, "options": options,
+                      "outputs": sorted(outputs), "orphans": sorted(orphans), "status": status,
+                      "time": time.time()})
+
+    def forget(self, rel_path):
+        self._append({"path": rel_path, "removed": True})
+
+    def _append(self, record):
+        with self._lock:
+            if record.get("removed"):
+                self._entries.pop(record["path"], None)
+            else:
+                self._entries[record["path"]] = record
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Warning: Could not update sync manifest {self.path}: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SyncItem:
+    """A source recording that has to be converted, and why (one of the reasons above)."""
+
+    def __init__(self, rel_path, input_path, size, mtime_ns, command_parts, options, reason):
+        self.rel_path = rel_path
+        self.input_path = input_path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.command_parts = command_parts
+        self.options = options
+        self.reason = reason
+
+
+class SyncPlan:
+    """Result of DirectorySync.plan(): the stale recordings and the orphaned outputs."""
+
+    def __init__(self, stale, up_to_date, orphans, gone, elapsed):
+        self.stale = stale            # [SyncItem]
+        self.up_to_date = up_to_date  # Number of recordings that need nothing
+        self.orphans = orphans        # Output paths no current recording owns
+        self.gone = gone              # {relative path of a recording that no longer exists: its outputs}
+        self.elapsed = elapsed
+
+    @property
+    def scanned(self):
+        return len(self.stale) + self.up_to_date
+
+    def reasons(self):
+        """{reason: count} of the stale recordings."""
+        counts = {}
+        for item in self.stale:
+            counts[item.reason] = counts.get(item.reason, 0) + 1
+        return counts
+
+    def __str__(self):
+        reasons = ", ".join(f"{count} {reason}" for reason, count in sorted(self.reasons().items()))
+        text = f"{self.scanned} recording(s) scanned in {self.elapsed:.1f} s: {len(self.stale)} to convert"
+        if reasons:
+            text += f" ({reasons})"
+        text += f", {self.up_to_date} up to date"
+        if self.orphans:
+            text += f", {len(self.orphans)} orphaned output(s)"
+        return text
+
+
+class DirectorySync:
+    """
+    Mirrors a tree of recordings into converted outputs under `output_dir`,
+    converting only what changed since the last sync.
+
+    `command_factory(input_path, output_base)` returns the converter command of a
+    recording (or raises CommandError); output bases mirror the source tree. plan()
+    walks the source tree with os.scandir and the output tree once, and compares
+    every recording with its manifest record: a recording is stale if it is new,
+    its size or mtime changed, the options changed, one of its recorded outputs is
+    gone, or its last conversion failed. Outputs recorded for recordings that no
+    longer exist (or left over from other options) are orphans.
+
+    job_finished() records a finished BatchJob of the plan, so an interrupted sync
+    only redoes what it hadn't finished.
+    """
+
+    def __init__(self, source_dir, output_dir, command_factory, extensions=INPUT_EXTENSIONS, manifest=None):
+        self.source_dir = os.path.abspath(source_dir)
+        self.output_dir = os.path.abspath(output_dir)
+        self.command_factory = command_factory
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        if manifest is None:
+            manifest = SyncManifest(os.path.join(self.output_dir, MANIFEST_NAME))
+        self.manifest = manifest
+        self._items = {}  # job_id -> SyncItem
+
+    def plan(self):
+        """Walks both trees and returns the SyncPlan. Raises CommandError from the command factory."""
+        started = time.monotonic()
+        existing = {rel_path for rel_path, _ in self._walk(self.output_dir, None)}
+        stale, up_to_date, orphans, seen = [], 0, [], set()
+        for rel_path, entry in self._walk(self.source_dir, self.extensions):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue  # Deleted since it was listed
+            seen.add(rel_path)
+            input_path = entry.path
+            command_parts = self.command_factory(input_path, self.output_dir + os.sep + os.path.splitext(rel_path)[0])
+            options = options_hash(command_parts)
+            record = self.manifest.get(rel_path)
+            if record is not None:
+                orphans.extend(path for path in record.get("orphans", []) if path in existing)
+            reason = self._stale_reason(record, st, options, existing)
+            if reason is None:
+                up_to_date += 1
+            else:
+                stale.append(SyncItem(rel_path, input_path, st.st_size, st.st_mtime_ns, command_parts, options, reason))
+        gone = {}
+        for rel_path in self.manifest.paths():
+            if rel_path in seen:
+                continue
+            record = self.manifest.get(rel_path)
+            left = [path for path in record.get("outputs", []) + record.get("orphans", []) if path in existing]
+            if left:
+                gone[rel_path] = left
+                orphans.extend(left)
+            else:
+                self.manifest.forget(rel_path)  # Nothing of it left to look after
+        return SyncPlan(stale, up_to_date, sorted(set(orphans)), gone, time.monotonic() - started)
+
+    def _stale_reason(self, record, st, options, existing):
+        if record is None:
+            return NEW
+        if record.get("size") != st.st_size or record.get("mtime_ns") != st.st_mtime_ns:
+            return CHANGED
+        if record.get("options") != options:
+            return OPTIONS_CHANGED
+        if record.get("status") != "done":
+            return NOT_DONE
+        if not record.get("outputs") or any(path not in existing for path in record["outputs"]):
+            return OUTPUT_MISSING
+        return None
+
+    def jobs(self, plan):
+        """One BatchJob per stale recording of `plan`."""
+        jobs = []
+        for index, item in enumerate(plan.stale):
+            job = BatchJob(str(index), item.input_path, item.command_parts)
+            self._items[job.job_id] = item
+            jobs.append(job)
+        return jobs
+
+    def make_output_dirs(self, plan):
+        """Creates the output folders of the stale recordings of `plan` (the converter won't)."""
+        for directory in {os.path.dirname(get_option_value(item.command_parts, '-o')) for item in plan.stale}:
+            os.makedirs(directory, exist_ok=True)
+
+    def job_finished(self, job):
+        """
+        Records a final BatchJob of jobs() in the manifest. Returns the outputs the
+        recording no longer owns (those of other options), which are now orphans.
+        """
+        item = self._items.get(job.job_id)
+        if item is None or not job.is_final or job.status == BatchJob.CANCELLED:
+            return []  # Cancelled recordings keep their old record and are picked up next time
+        record = self.manifest.get(item.rel_path) or {}
+        previous = set(record.get("outputs", [])) | set(record.get("orphans", []))
+        if job.status != BatchJob.SUCCEEDED:
+            self.manifest.record(item.rel_path, item.size, item.mtime_ns, item.options,
+                                 record.get("outputs", []), "failed", record.get("orphans", []))
+            return []
+        outputs = [path for _, path in collect_outputs(get_option_value(job.command_parts, '-o'), 0)]
+        outputs.extend(job.result.archives if job.result is not None else [])
+        outputs = {os.path.relpath(path, self.output_dir) for path in outputs}
+        orphans = previous - outputs
+        self.manifest.record(item.rel_path, item.size, item.mtime_ns, item.options, outputs,
+                             "done" if outputs else "no output", orphans)
+        return sorted(orphans)
+
+    def remove_orphans(self, orphans, gone=None):
+        """
+        Deletes orphaned outputs (paths relative to the output directory) and forgets
+        the recordings of `gone` (SyncPlan.gone) whose outputs are all deleted.
+        Returns "<path>: <error>" failures.
+        """
+        failures = []
+        removed = set()
+        for rel_path in orphans:
+            try:
+                os.remove(os.path.join(self.output_dir, rel_path))
+                removed.add(rel_path)
+            except FileNotFoundError:
+                removed.add(rel_path)
+            except OSError as e:
+                failures.append(f"{rel_path}: {e}")
+        gone = gone or {}
+        for rel_path in self.manifest.paths():
+            record = self.manifest.get(rel_path)
+            if rel_path in gone:
+                if not set(gone[rel_path]) - removed:
+                    self.manifest.forget(rel_path)
+            elif set(record.get("orphans", [])) & removed:
+                self.manifest.record(rel_path, record["size"], record["mtime_ns"], record["options"],
+                                     record.get("outputs", []), record.get("status", "done"),
+                                     set(record["orphans"]) - removed)
+        return failures
+
+    def _walk(self, directory, extensions):
+        """
+        Yields (path relative to `directory`, os.DirEntry) of the files under it,
+        only those with `extensions` unless that is None. Relative paths are built
+        while descending, which is much cheaper than os.path.relpath per file.
+        """
+        stack = [(directory, "")]
+        while stack:
+            current, prefix = stack.pop()
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if entry.path != self.output_dir:  # An output tree inside the sources
+                                    stack.append((entry.path, prefix + entry.name + os.sep))
+                            elif extensions is None:
+                                if entry.name != MANIFEST_NAME:
+                                    yield prefix + entry.name, entry
+                            elif os.path.splitext(entry.name)[1].lower() in extensions and entry.is_file():
+                                yield prefix + entry.name, entry
+                        except OSError:
+                            continue
+            except FileNotFoundError:
+                continue  # No outputs yet
+            except OSError as e:
+                print(f"Warning: Could not read directory {current}: {e}")
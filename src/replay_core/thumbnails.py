@@ -0,0 +1,279 @@
+import glob
+import hashlib
+import json
+import math
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+from .command import build_command, get_option_value
+from .engine import ConversionJob
+from .frames import FRAME_NUMBER_WIDTH
+from .launcher import launcher_from_settings
+from .validation import VALIDATED_FORMATS, validate_file
+
+try:
+    import numpy
+except ImportError:  # Optional: without numpy the points are binned in plain Python, just slower
+    numpy = None
+
+THUMBNAIL_SIZE = (320, 240)  # Largest width/height; the image keeps the point cloud's aspect ratio
+DEFAULT_CACHE_MB = 100
+PREVIEW_FORMAT = ".pcd"      # Format frames are converted to when there is no output to preview yet
+EMPTY_COLOR = (45, 45, 45)   # Bins without any valid point
+# Dark blue (low) to yellow (high), a coarse viridis
+_COLORMAP = [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)]
+
+
+def render_heightmap(path, max_size=THUMBNAIL_SIZE):
+    """
+    Renders a .pcd/.csv point cloud as a top-down height map and returns it as PPM
+    bytes: x/y are binned into pixels and each pixel is colored by the mean z of
+    its points. Reads the file twice (bounding box, then binning) through the
+    memory-mapped reader in validation.py, so memory use stays flat.
+    """
+    stats = validate_file(path)
+    if stats.bbox_min is None:
+        raise ValueError(f"{os.path.basename(path)} has no valid points to preview.")
+    x0, y0, z0 = stats.bbox_min
+    x1, y1, z1 = stats.bbox_max
+    span_x, span_y, span_z = (x1 - x0) or 1.0, (y1 - y0) or 1.0, (z1 - z0) or 1.0
+    scale = min(max_size[0] / span_x, max_size[1] / span_y)
+    width = max(1, min(max_size[0], round(span_x * scale)))
+    height = max(1, min(max_size[1], round(span_y * scale)))
+
+    if numpy is not None:
+        sums = numpy.zeros(width * height)
+        counts = numpy.zeros(width * height)
+
+        def on_points(coords):
+            coords = coords[numpy.isfinite(coords).all(axis=1)]
+            columns = numpy.clip(((coords[:, 0] - x0) / span_x * width).astype(numpy.int64), 0, width - 1)
+            rows = numpy.clip(((y1 - coords[:, 1]) / span_y * height).astype(numpy.int64), 0, height - 1)
+            bins = rows * width + columns
+            sums[:] += numpy.bincount(bins, weights=coords[:, 2], minlength=width * height)
+            counts[:] += numpy.bincount(bins, minlength=width * height)
+
+        validate_file(path, on_points)
+        filled = counts > 0
+        levels = numpy.zeros(width * height)
+        levels[filled] = (sums[filled] / counts[filled] - z0) / span_z
+        anchors = numpy.linspace(0.0, 1.0, len(_COLORMAP))
+        pixels = numpy.empty((width * height, 3), dtype=numpy.uint8)
+        for channel in range(3):
+            values = numpy.interp(levels, anchors, [color[channel] for color in _COLORMAP])
+            pixels[:, channel] = numpy.where(filled, values, EMPTY_COLOR[channel])
+        data = pixels.tobytes()
+    else:
+        sums = [0.0] * (width * height)
+        counts = [0] * (width * height)
+
+        def on_points(rows):
+            for x, y, z in rows:
+                if not (math.isfinite(x) and math.isfinite(y) and math.isfinite(z)):
+                    continue
+                column = min(width - 1, max(0, int((x - x0) / span_x * width)))
+                row = min(height - 1, max(0, int((y1 - y) / span_y * height)))
+                sums[row * width + column] += z
+                counts[row * width + column] += 1
+
+        validate_file(path, on_points)
+        data = bytearray()
+        for total, count in zip(sums, counts):
+            data += bytes(_color((total / count - z0) / span_z) if count else EMPTY_COLOR)
+    return b"P6\n%d %d\n255\n" % (width, height) + bytes(data)
+
+
+def _color(level):
+    """Colormap lookup for a level in 0..1 (plain Python version of the numpy interpolation)."""
+    position = min(1.0, max(0.0, level)) * (len(_COLORMAP) - 1)
+    index = min(int(position), len(_COLORMAP) - 2)
+    fraction = position - index
+    low, high = _COLORMAP[index], _COLORMAP[index + 1]
+    return tuple(round(a + (b - a) * fraction) for a, b in zip(low, high))
+
+
+def find_frame_output(output_path, frame):
+    """
+    An existing .csv/.pcd output holding `frame` of the export written to `output_path`
+    (the per-frame file of an all-frames export or of a frame list job), or None.
+    """
+    base, ext = os.path.splitext(output_path)
+    if ext.lower() not in VALIDATED_FORMATS:
+        return None
+    shard = f"{base}_{frame:0{FRAME_NUMBER_WIDTH}d}{ext}"
+    if os.path.isfile(shard):
+        return shard
+    for path in glob.glob(glob.escape(base) + "_*" + glob.escape(ext)):
+        suffix = path[len(base) + 1:len(path) - len(ext)]
+        if suffix.isdigit() and int(suffix) == frame:
+            return path
+    return None
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of rendered thumbnails (PPM files) under `cache_dir`, keyed on
+    what was rendered. A hit refreshes the file's modification time, and the least
+    recently used thumbnails are deleted once the cache exceeds `max_bytes`.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MB * 2**20):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def key_for_file(self, path, max_size=THUMBNAIL_SIZE):
+        """Key of a thumbnail of an existing output file (changes when the file does)."""
+        st = os.stat(path)
+        return _digest(["file", os.path.normcase(os.path.abspath(path)), st.st_size, st.st_mtime_ns, max_size])
+
+    def key_for_frame(self, command_parts, max_size=THUMBNAIL_SIZE):
+        """Key of a thumbnail of a frame converted by `command_parts` (input, converter and options, not -o)."""
+        input_path = get_option_value(command_parts, '-i')
+        input_st = os.stat(input_path)
+        converter_st = os.stat(command_parts[0])
+        args = [part for i, part in enumerate(command_parts[1:], start=1) if command_parts[i - 1] not in ('-i', '-o')]
+        return _digest(["frame", os.path.normcase(os.path.abspath(input_path)), input_st.st_size,
+                        input_st.st_mtime_ns, converter_st.st_size, converter_st.st_mtime_ns, args, max_size])
+
+    def get(self, key):
+        """Path of the cached thumbnail, or None."""
+        path = self._path(key)
+        try:
+            os.utime(path)  # Most recently used
+        except OSError:
+            return None
+        return path
+
+    def put(self, key, data):
+        """Stores a rendered thumbnail and returns its path."""
+        path = self._path(key)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self._evict()
+        return path
+
+    def clear(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".ppm")
+
+    def _evict(self):
+        with self._lock:
+            entries, total = [], 0
+            try:
+                with os.scandir(self.cache_dir) as scan:
+                    for entry in scan:
+                        if entry.name.endswith(".ppm"):
+                            st = entry.stat()
+                            entries.append((st.st_mtime, st.st_size, entry.path))
+                            total += st.st_size
+            except OSError:
+                return
+            entries.sort()
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+class ThumbnailRenderer:
+    """
+    Renders thumbnails on one background thread and posts
+    ("thumbnail", key, image_path, error) to `events` (image_path is None on error).
+
+    Cached thumbnails are posted straight away. Otherwise only the newest request
+    is kept, so scrubbing quickly through frames renders the frame the user
+    stopped on rather than every frame passed on the way.
+    """
+
+    def __init__(self, cache, max_size=THUMBNAIL_SIZE, work_dir=None):
+        self.cache = cache
+        self.max_size = max_size
+        self.work_dir = work_dir or tempfile.gettempdir()
+        self.events = queue.Queue()
+        self._pending = None
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closed = False
+
+    def request_file(self, path):
+        """Previews an existing .csv/.pcd file. Returns the request key."""
+        key = self.cache.key_for_file(path, self.max_size)
+        self._request(key, lambda: (path, None))
+        return key
+
+    def request_frame(self, settings, input_path, frame):
+        """Converts one frame of a recording to PREVIEW_FORMAT and previews it. Returns the request key."""
+        output_base = os.path.join(self.work_dir, f"preview_{os.getpid()}")
+        command_parts = build_command(settings, input_path, output_base, PREVIEW_FORMAT, str(frame))
+        key = self.cache.key_for_frame(command_parts, self.max_size)
+
+        def convert():
+            result = ConversionJob(command_parts, launcher=launcher_from_settings(settings)).run()
+            output_path = get_option_value(command_parts, '-o')
+            if not result.succeeded:
+                detail = result.stderr.strip().splitlines()[-1:] or [str(result.error or f"exit code {result.returncode}")]
+                raise RuntimeError(f"Could not convert frame {frame}: {detail[0]}")
+            return output_path, lambda: _remove(output_path)
+        self._request(key, convert)
+        return key
+
+    def _request(self, key, produce):
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.events.put(("thumbnail", key, cached, None))
+            return
+        with self._cond:
+            self._pending = (key, produce)  # Replaces an older request that hasn't started
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._worker, name="ThumbnailRenderer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                key, produce = self._pending
+                self._pending = None
+            cleanup = None
+            try:
+                path, cleanup = produce()
+                image_path = self.cache.put(key, render_heightmap(path, self.max_size))
+                self.events.put(("thumbnail", key, image_path, None))
+            except (OSError, ValueError, RuntimeError) as e:
+                self.events.put(("thumbnail", key, None, str(e)))
+            finally:
+                if cleanup is not None:
+                    cleanup()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+
+
+def _digest(parts):
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:32]
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
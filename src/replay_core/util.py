@@ -0,0 +1,19 @@
+"""Small formatting helpers shared by the GUI and the command line."""
+
+
+def format_elapsed(seconds):
+    """Formats a duration as H:MM:SS (or M:SS under an hour)."""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, secs = divmod(remainder, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes}:{secs:02d}"
+
+
+def format_bytes(size):
+    """Formats a byte count as B/KB/MB/GB."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024.0
@@ -0,0 +1,383 @@
+import io
+import math
+import mmap
+import os
+import re
+import struct
+import warnings
+
+from .cache import collect_outputs
+from .command import get_option_value
+from .util import format_bytes
+
+try:
+    import numpy
+except ImportError:  # Optional: without numpy the same checks run in plain Python, just slower
+    numpy = None
+
+VALIDATED_FORMATS = (".csv", ".pcd")
+CHUNK_BYTES = 16 * 2**20   # Text is parsed this much at a time (cut at a line end)
+CHUNK_POINTS = 2**20       # Binary PCD rows examined at a time
+MAX_PROBLEMS = 20
+
+# PCD TYPE/SIZE -> struct format character
+_PCD_TYPES = {("F", 4): "f", ("F", 8): "d", ("I", 1): "b", ("I", 2): "h", ("I", 4): "i", ("I", 8): "q",
+              ("U", 1): "B", ("U", 2): "H", ("U", 4): "I", ("U", 8): "Q"}
+_FRAME_COLUMN_RE = re.compile(r"frame", re.IGNORECASE)
+
+
+class OutputStats:
+    """
+    Summary of one exported point cloud file: point count, how many points are
+    invalid (NaN/inf coordinates), the bounding box of the valid ones and, for CSV
+    files with a frame column, the number of distinct frames. `problems` lists
+    anything that looks wrong (empty, truncated, unreadable).
+
+    `on_points(chunk)`, if set, receives the x/y/z of every chunk of points as they
+    are read: an (N, 3) float array with numpy, else a list of [x, y, z] lists.
+    """
+
+    def __init__(self, path, on_points=None):
+        self.path = path
+        self.on_points = on_points
+        self.size = 0
+        self.points = 0
+        self.invalid_points = 0
+        self.declared_points = None  # POINTS from a PCD header
+        self.bbox_min = None  # (x, y, z) of the valid points
+        self.bbox_max = None
+        self.frames = None
+        self.problems = []
+
+    @property
+    def invalid_ratio(self):
+        return self.invalid_points / self.points if self.points else 0.0
+
+    @property
+    def ok(self):
+        return not self.problems
+
+    def problem(self, text):
+        if len(self.problems) < MAX_PROBLEMS:
+            self.problems.append(text)
+
+    def describe(self):
+        name = os.path.basename(self.path)
+        lines = [f"{name}: {self.points:,} points, {self.invalid_ratio:.1%} invalid, {format_bytes(self.size)}"]
+        if self.bbox_min is not None:
+            low = ", ".join(f"{v:.3f}" for v in self.bbox_min)
+            high = ", ".join(f"{v:.3f}" for v in self.bbox_max)
+            lines.append(f"  bounding box: ({low}) to ({high})")
+        if self.frames is not None:
+            lines.append(f"  frames: {self.frames}")
+        lines.extend(f"  problem: {text}" for text in self.problems)
+        return "\n".join(lines)
+
+    def _add(self, points, invalid, low, high):
+        self.points += points
+        self.invalid_points += invalid
+        if low is None:
+            return
+        if self.bbox_min is None:
+            self.bbox_min, self.bbox_max = tuple(low), tuple(high)
+        else:
+            self.bbox_min = tuple(min(a, b) for a, b in zip(self.bbox_min, low))
+            self.bbox_max = tuple(max(a, b) for a, b in zip(self.bbox_max, high))
+
+
+class ValidationReport:
+    """OutputStats for every file a run wrote; `frames` counts per-frame files (or CSV frame values)."""
+
+    def __init__(self, files):
+        self.files = files
+
+    @property
+    def ok(self):
+        return bool(self.files) and all(stats.ok for stats in self.files)
+
+    @property
+    def points(self):
+        return sum(stats.points for stats in self.files)
+
+    @property
+    def frames(self):
+        if len(self.files) > 1:
+            return len(self.files)
+        if self.files and self.files[0].frames is not None:
+            return self.files[0].frames
+        return len(self.files)
+
+    @property
+    def problems(self):
+        return [f"{os.path.basename(stats.path)}: {text}" for stats in self.files for text in stats.problems]
+
+    def describe(self):
+        if not self.files:
+            return "No output files found."
+        if len(self.files) == 1:
+            return self.files[0].describe()
+        invalid = sum(stats.invalid_points for stats in self.files)
+        ratio = invalid / self.points if self.points else 0.0
+        empty = sum(1 for stats in self.files if not stats.points)
+        lines = [f"{len(self.files)} frame files, {self.points:,} points, {ratio:.1%} invalid"
+                 + (f", {empty} empty" if empty else "")]
+        lines.extend(self.problems[:MAX_PROBLEMS])
+        return "\n".join(lines)
+
+
+def validate_outputs(command_parts, started_at):
+    """Validates every .csv/.pcd file the run wrote (the -o file and per-frame siblings), or returns None."""
+    output_path = get_option_value(command_parts, '-o')
+    if not output_path or os.path.splitext(output_path)[1].lower() not in VALIDATED_FORMATS:
+        return None
+    return ValidationReport([validate_file(path) for _, path in collect_outputs(output_path, started_at)])
+
+
+def validate_file(path, on_points=None):
+    """Returns OutputStats for one .pcd or .csv file, read through a memory map (see OutputStats for `on_points`)."""
+    stats = OutputStats(path, on_points)
+    try:
+        stats.size = os.path.getsize(path)
+        if stats.size == 0:
+            stats.problem("file is empty")
+            return stats
+        with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if path.lower().endswith(".pcd"):
+                _validate_pcd(data, stats)
+            else:
+                _validate_csv(data, stats)
+    except (OSError, ValueError) as e:
+        stats.problem(f"could not be read: {e}")
+    if stats.points == 0 and not stats.problems:
+        stats.problem("contains no points")
+    elif stats.points and stats.invalid_points == stats.points:
+        stats.problem("every point is invalid")
+    return stats
+
+
+# --- PCD ---
+
+def _validate_pcd(data, stats):
+    header, data_start = _read_pcd_header(data)
+    fields = header.get("FIELDS", [])
+    sizes = [int(v) for v in header.get("SIZE", [])]
+    types = header.get("TYPE", [])
+    counts = [int(v) for v in header.get("COUNT", ["1"] * len(fields))]
+    if not fields or not (len(fields) == len(sizes) == len(types) == len(counts)):
+        raise ValueError("inconsistent FIELDS/SIZE/TYPE/COUNT in the PCD header")
+    declared = int(header.get("POINTS", ["0"])[0])
+    stats.declared_points = declared
+    xyz = _xyz_columns(fields, counts)
+    encoding = header.get("DATA", ["ascii"])[0].lower()
+
+    if encoding == "ascii":
+        _scan_text(data, data_start, stats, b" ", xyz, None, sum(counts))
+    elif encoding == "binary":
+        try:
+            formats = [_PCD_TYPES[(t.upper(), s)] for t, s in zip(types, sizes)]
+        except KeyError:
+            raise ValueError("unsupported TYPE/SIZE in the PCD header")
+        _scan_binary(data, data_start, stats, formats, counts, xyz, declared)
+    else:
+        # binary_compressed is LZF-packed: only the header is checked, the points are taken as declared
+        stats.points = declared
+        return
+    if stats.points != declared:
+        stats.problem(f"truncated: header declares {declared:,} points but {stats.points:,} were found")
+
+
+def _read_pcd_header(data):
+    header, offset = {}, 0
+    while offset < len(data):
+        end = data.find(b"\n", offset)
+        if end < 0:
+            raise ValueError("the PCD header is incomplete")
+        line = data[offset:end].decode("ascii", "replace").strip()
+        offset = end + 1
+        if not line or line.startswith("#"):
+            continue
+        key, _, value = line.partition(" ")
+        header[key.upper()] = value.split()
+        if key.upper() == "DATA":
+            return header, offset
+    raise ValueError("no DATA line in the PCD header")
+
+
+def _xyz_columns(fields, counts):
+    """Column indices of x, y and z in a flattened row (first three columns if they aren't named)."""
+    starts, column = {}, 0
+    for name, count in zip(fields, counts):
+        starts[name.lower()] = column
+        column += count
+    if all(axis in starts for axis in ("x", "y", "z")):
+        return [starts["x"], starts["y"], starts["z"]]
+    return [0, 1, 2][:column]
+
+
+def _scan_binary(data, data_start, stats, formats, counts, xyz, declared):
+    row_format = "<" + "".join(f"{count}{fmt}" for fmt, count in zip(formats, counts))
+    row_size = struct.calcsize(row_format)
+    available = (len(data) - data_start) // row_size
+    rows = min(declared, available)
+    if numpy is not None:
+        _scan_binary_numpy(data, data_start, stats, formats, counts, xyz, rows)
+    else:
+        view = memoryview(data)
+        try:
+            for start in range(0, rows, CHUNK_POINTS):
+                end = min(rows, start + CHUNK_POINTS)
+                block = view[data_start + start * row_size:data_start + end * row_size]
+                _add_rows(stats, ([row[c] for c in xyz] for row in struct.iter_unpack(row_format, block)))
+                block.release()
+        finally:
+            view.release()
+    if (len(data) - data_start) % row_size and available < declared:
+        stats.problem("the last point is cut off")
+
+
+def _scan_binary_numpy(data, data_start, stats, formats, counts, xyz, rows):
+    names = [f"c{i}" for i in range(len(formats))]
+    dtype = numpy.dtype([(name, "<" + fmt, (count,)) for name, fmt, count in zip(names, formats, counts)])
+    # frombuffer reads straight from the memory map; only the x/y/z of one chunk are copied at a time.
+    # The views must be gone before the map is closed, hence a function of its own.
+    table = numpy.frombuffer(data, dtype=dtype, count=rows, offset=data_start)
+    flat_columns = [(name, i) for name, count in zip(names, counts) for i in range(count)]
+    for start in range(0, rows, CHUNK_POINTS):
+        chunk = table[start:start + CHUNK_POINTS]
+        coords = numpy.column_stack([chunk[flat_columns[c][0]][:, flat_columns[c][1]] for c in xyz])
+        _add_numpy(stats, coords.astype(numpy.float64, copy=False))
+
+
+# --- CSV / text ---
+
+def _validate_csv(data, stats):
+    first_start = 0
+    while data[first_start:first_start + 1] == b"#":  # Leading comment lines
+        next_line = data.find(b"\n", first_start)
+        first_start = len(data) if next_line < 0 else next_line + 1
+    first_end = data.find(b"\n", first_start)
+    first = data[first_start:first_end if first_end >= 0 else len(data)].decode("utf-8", "replace").strip()
+    delimiter = b"," if "," in first else (b";" if ";" in first else b" ")
+    cells = [cell.strip() for cell in first.split(delimiter.decode())]
+    has_header = not all(_is_number(cell) for cell in cells if cell)
+    frame_column = None
+    if has_header:
+        lowered = [cell.lower() for cell in cells]
+        xyz = [lowered.index(a) for a in ("x", "y", "z")] if all(a in lowered for a in ("x", "y", "z")) \
+            else [0, 1, 2][:len(cells)]
+        frame_column = next((i for i, cell in enumerate(cells) if _FRAME_COLUMN_RE.search(cell)), None)
+        start = first_end + 1 if first_end >= 0 else len(data)
+    else:
+        xyz, start = [0, 1, 2][:len(cells)], first_start
+    _scan_text(data, start, stats, delimiter, xyz, frame_column, len(cells))
+    if data[-1:] != b"\n":
+        stats.problem("truncated: the last line has no line end")
+
+
+def _scan_text(data, start, stats, delimiter, xyz, frame_column, width):
+    """Parses delimited numeric rows in CHUNK_BYTES pieces cut at line ends."""
+    frames = set()
+    bad_rows = 0
+    offset = start
+    while offset < len(data):
+        if offset + CHUNK_BYTES >= len(data):
+            end = len(data)
+        else:
+            end = data.rfind(b"\n", offset, offset + CHUNK_BYTES)
+            if end < 0:  # One line longer than a chunk
+                end = data.find(b"\n", offset + CHUNK_BYTES)
+            end = len(data) if end < 0 else end + 1
+        chunk = data[offset:end]
+        offset = end
+        if numpy is not None:
+            rows = _parse_numpy(chunk, delimiter, width)
+            if rows is not None:
+                _add_numpy(stats, rows[:, xyz])
+                if frame_column is not None:
+                    frames.update(numpy.unique(rows[:, frame_column][numpy.isfinite(rows[:, frame_column])]).tolist())
+                continue
+        rows = []
+        for line in chunk.split(b"\n"):
+            line = line.strip()
+            if not line or line.startswith(b"#"):
+                continue
+            values = [_to_float(cell) for cell in line.split(delimiter)] if delimiter != b" " else \
+                [_to_float(cell) for cell in line.split()]
+            if len(values) < width:
+                bad_rows += 1
+                values += [math.nan] * (width - len(values))
+            rows.append(values)
+            if frame_column is not None and math.isfinite(values[frame_column]):
+                frames.add(values[frame_column])
+        _add_rows(stats, ([row[c] for c in xyz] for row in rows))
+    if bad_rows:
+        stats.problem(f"{bad_rows:,} row(s) have missing columns")
+    if frame_column is not None:
+        stats.frames = len(frames)
+
+
+def _parse_numpy(chunk, delimiter, width):
+    """The chunk as a float array of shape (rows, width), or None if it isn't plain numeric rows."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # Empty chunks warn
+            rows = numpy.loadtxt(io.BytesIO(chunk), delimiter=None if delimiter == b" " else delimiter.decode(),
+                                 comments="#", ndmin=2, dtype=numpy.float64)
+    except ValueError:
+        return None  # Missing cells or text: the slower parser counts them
+    if rows.size == 0:
+        return numpy.empty((0, width))
+    return rows if rows.shape[1] == width else None
+
+
+# --- Accumulation ---
+
+def _add_numpy(stats, coords):
+    if not len(coords):
+        return
+    if stats.on_points is not None:
+        stats.on_points(coords)
+    valid = numpy.isfinite(coords).all(axis=1)
+    good = coords[valid]
+    if len(good):
+        stats._add(len(coords), int(len(coords) - len(good)), good.min(axis=0).tolist(), good.max(axis=0).tolist())
+    else:
+        stats._add(len(coords), len(coords), None, None)
+
+
+def _add_rows(stats, rows):
+    if stats.on_points is not None:
+        rows = list(rows)
+        if rows:
+            stats.on_points(rows)
+    points = invalid = 0
+    low = high = None
+    for row in rows:
+        points += 1
+        if not all(math.isfinite(v) for v in row):
+            invalid += 1
+            continue
+        if low is None:
+            low, high = list(row), list(row)
+        else:
+            for i, v in enumerate(row):
+                if v < low[i]:
+                    low[i] = v
+                elif v > high[i]:
+                    high[i] = v
+    stats._add(points, invalid, low, high)
+
+
+def _to_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return math.nan
+
+
+def _is_number(text):
+    try:
+        float(text)
+        return True
+    except ValueError:
+        return False
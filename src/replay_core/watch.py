@@ -0,0 +1,388 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from .cache import FRAME_SUFFIX_RE, collect_outputs
+from .command import INPUT_EXTENSIONS, get_option_value
+from .engine import ConversionJob
+from .outputlog import new_log_path
+from .resume import RESUMABLE_FORMATS
+
+# watchdog gives native change notifications (ReadDirectoryChangesW, inotify, FSEvents).
+# It's optional: without it the watcher falls back to polling the directory.
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+DEFAULT_STABLE_SECONDS = 5.0    # A file must keep its size/mtime this long before it is converted
+DEFAULT_POLL_SECONDS = 2.0      # How often pending files are checked (and, without watchdog, the folder rescanned)
+NOTIFY_RESCAN_SECONDS = 60.0    # Safety-net rescan with watchdog (network shares can drop notifications)
+
+
+class ProcessedIndex:
+    """
+    Persistent record of files the watcher has already handled, keyed on path and
+    stamped with (size, mtime_ns) so a file that changes is picked up again.
+
+    Stored as an append-only JSON-lines file: recording a file is one small append,
+    and the file is compacted on load.
+    """
+
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self._entries = {}  # path -> {"size", "mtime_ns", "status"}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                        self._entries[record["path"]] = record
+                    except (ValueError, KeyError):
+                        continue  # Ignore a torn last line from a crash
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            print(f"Warning: Could not read watch index {self.index_path}: {e}")
+            return
+        self._compact()
+
+    def _compact(self):
+        temp_path = self.index_path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for record in self._entries.values():
+                    f.write(json.dumps(record) + "\n")
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            print(f"Warning: Could not compact watch index {self.index_path}: {e}")
+
+    def is_processed(self, path, size, mtime_ns):
+        with self._lock:
+            record = self._entries.get(path)
+        return record is not None and record["size"] == size and record["mtime_ns"] == mtime_ns
+
+    def mark(self, path, size, mtime_ns, status):
+        record = {"path": path, "size": size, "mtime_ns": mtime_ns, "status": status, "time": time.time()}
+        with self._lock:
+            self._entries[path] = record
+            try:
+                os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+                with open(self.index_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Warning: Could not update watch index {self.index_path}: {e}")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+def watch_extensions(directory, output_format, output_dir=None, extensions=INPUT_EXTENSIONS):
+    """
+    The input extensions to watch `directory` for. Outputs written into the watched
+    tree (next to the inputs, or to an output directory inside it) would be picked
+    up as new recordings, so the output format is left out then.
+    """
+    if output_dir is not None and not _is_inside(output_dir, directory):
+        return tuple(extensions)
+    return tuple(ext for ext in extensions if ext != output_format.lower())
+
+
+def index_path_for(index_dir, directory):
+    """Index file used for a watched directory (one per directory)."""
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(directory)).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(index_dir, f"watch-{key}.jsonl")
+
+
+class FolderWatcher:
+    """
+    Watches a directory for new or changed input files and converts each one once
+    it has stopped growing.
+
+    `command_factory(path)` returns the converter command for a file; a file it
+    raises for (usually CommandError) is reported as failed. Up to `max_workers` conversions run at a time. Status changes
+    are posted to `events` as ("queued" | "waiting" | "converting" | "done" | "failed" | "error", path, detail).
+    With a ResourceScheduler each conversion waits until it admits the file. With a
+    StagingArea files on a network share are converted from a local copy; a
+    Packager compresses the outputs; with `validate` they are checked first and
+    any problems are added to the "done" event. A MetricsRegistry gets the
+    conversions' stage timings, including how long files waited in the queue.
+    A Launcher starts the converters (see ConversionJob).
+    """
+
+    def __init__(self, directory, command_factory, index, max_workers=1, extensions=INPUT_EXTENSIONS,
+                 recursive=False, stable_seconds=DEFAULT_STABLE_SECONDS, poll_seconds=DEFAULT_POLL_SECONDS,
+                 log_dir=None, cache=None, history=None, scheduler=None, staging=None,
+                 packager=None, validate=False, use_notifications=True, metrics=None, launcher=None):
+        self.directory = directory
+        self.command_factory = command_factory
+        self.index = index
+        self.max_workers = max(1, int(max_workers))
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.recursive = recursive
+        self.stable_seconds = stable_seconds
+        self.poll_seconds = poll_seconds
+        self.log_dir = log_dir
+        self.cache = cache
+        self.history = history
+        self.scheduler = scheduler
+        self.staging = staging
+        self.packager = packager
+        self.validate = validate
+        self.metrics = metrics
+        self.launcher = launcher
+        self.events = queue.Queue()
+        self.using_notifications = False
+        self._use_notifications = use_notifications and Observer is not None
+        self._pending = {}     # path -> (size, mtime_ns, first time seen with that size/mtime)
+        self._queued = set()   # paths queued or converting
+        self._jobs = queue.Queue()
+        self._active = {}      # path -> ConversionJob
+        self._outputs = set()  # (base, ext) of every -o path, so the watcher never converts its own outputs
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._observer = None
+
+    @property
+    def is_running(self):
+        return bool(self._threads) and not self._stop.is_set()
+
+    def start(self):
+        self._stop.clear()
+        if self._use_notifications:
+            try:
+                self._observer = Observer()
+                self._observer.schedule(_NotifyHandler(self), self.directory, recursive=self.recursive)
+                self._observer.start()
+                self.using_notifications = True
+            except Exception as e:  # e.g. the share doesn't support notifications
+                print(f"Warning: Change notifications unavailable for {self.directory}, polling instead: {e}")
+                self._observer = None
+        self._threads = [threading.Thread(target=self._scan_loop, name="FolderWatcherScan", daemon=True)]
+        for index in range(self.max_workers):
+            self._threads.append(threading.Thread(target=self._worker, name=f"FolderWatcherWorker-{index}", daemon=True))
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, cancel_running=True):
+        """Stops watching; running conversions are cancelled unless cancel_running is False."""
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if cancel_running:
+            with self._lock:
+                running = list(self._active.values())
+            for conversion in running:
+                conversion.cancel()
+
+    # --- Discovery ---
+
+    def notice(self, path):
+        """Registers a path reported by a change notification (called from the observer thread)."""
+        if self._is_candidate_name(path):
+            self._consider(path)
+
+    def _is_candidate_name(self, path):
+        return os.path.splitext(path)[1].lower() in self.extensions
+
+    def _is_output(self, path):
+        """True for an -o file of one of our jobs, or one of its '<base>_<frame><ext>' siblings."""
+        base, ext = os.path.splitext(_normalize(path))
+        with self._lock:
+            if (base, ext) in self._outputs:
+                return True
+            if ext not in RESUMABLE_FORMATS:  # Only these are written one file per frame
+                return False
+            frame_base, sep, frame = base.rpartition("_")
+            return bool(sep) and FRAME_SUFFIX_RE.match(sep + frame) is not None and (frame_base, ext) in self._outputs
+
+    def _scan_loop(self):
+        next_rescan = 0.0
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if now >= next_rescan:
+                self._rescan()
+                next_rescan = now + (NOTIFY_RESCAN_SECONDS if self.using_notifications else self.poll_seconds)
+            self._check_pending()
+            self._stop.wait(self.poll_seconds)
+
+    def _rescan(self):
+        for path in self._iter_files(self.directory):
+            self._consider(path)
+
+    def _iter_files(self, directory):
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_file() and self._is_candidate_name(entry.name):
+                        yield entry.path
+                    elif self.recursive and entry.is_dir(follow_symlinks=False):
+                        yield from self._iter_files(entry.path)
+        except OSError as e:
+            self.events.put(("error", directory, str(e)))
+
+    def _consider(self, path):
+        if self._is_output(path):
+            return
+        try:
+            st = os.stat(path)
+        except OSError:
+            return
+        with self._lock:
+            if path in self._queued or path in self._pending:
+                return
+        if self.index.is_processed(path, st.st_size, st.st_mtime_ns):
+            return
+        with self._lock:
+            self._pending.setdefault(path, (st.st_size, st.st_mtime_ns, time.monotonic()))
+
+    def _check_pending(self):
+        """Queues pending files whose size and mtime haven't changed for stable_seconds."""
+        now = time.monotonic()
+        with self._lock:
+            pending = list(self._pending.items())
+        for path, (size, mtime_ns, since) in pending:
+            try:
+                st = os.stat(path)
+            except OSError:
+                with self._lock:
+                    self._pending.pop(path, None)  # Deleted or renamed away
+                continue
+            if (st.st_size, st.st_mtime_ns) != (size, mtime_ns):
+                with self._lock:
+                    self._pending[path] = (st.st_size, st.st_mtime_ns, now)  # Still being written
+                continue
+            if now - since < self.stable_seconds or not _can_open(path):
+                continue
+            with self._lock:
+                self._pending.pop(path, None)
+                self._queued.add(path)
+            self._jobs.put((path, size, mtime_ns, time.perf_counter()))
+            self.events.put(("queued", path, ""))
+
+    # --- Conversion ---
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                path, size, mtime_ns, queued_at = self._jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                command_parts = self.command_factory(path)
+            except Exception as e:  # CommandError, or anything else the factory ran into
+                self.events.put(("failed", path, str(e) or type(e).__name__))
+                self.index.mark(path, size, mtime_ns, "failed")
+                with self._lock:
+                    self._queued.discard(path)
+                continue
+            output_path = get_option_value(command_parts, '-o')
+            if output_path and _normalize(output_path) == _normalize(path):
+                self.events.put(("failed", path, "The output would overwrite the recording; choose another "
+                                                 "output format or an output folder."))
+                self.index.mark(path, size, mtime_ns, "failed")
+                with self._lock:
+                    self._queued.discard(path)
+                continue
+            if output_path:
+                with self._lock:
+                    self._outputs.add(os.path.splitext(_normalize(output_path)))
+
+            reservation = None
+            if self.scheduler is not None:
+                reservation = self.scheduler.admit(command_parts, path, cancelled=self._stop,
+                                                   on_wait=lambda reason, path=path: self.events.put(("waiting", path, reason)))
+                if reservation is None:  # Stopped while waiting
+                    with self._lock:
+                        self._queued.discard(path)
+                    continue
+
+            log_path = new_log_path(self.log_dir, path) if self.log_dir else None
+            conversion = ConversionJob(command_parts, log_path=log_path, cache=self.cache, history=self.history,
+                                       source="watch", staging=self.staging,
+                                       packager=self.packager, validate=self.validate, metrics=self.metrics,
+                                       launcher=self.launcher)
+            conversion.timings["queue_wait"] = time.perf_counter() - queued_at
+            if self.metrics is not None:
+                self.metrics.observe("queue_wait", conversion.timings["queue_wait"])
+            if reservation is not None:
+                reservation.conversion = conversion
+            with self._lock:
+                self._active[path] = conversion
+            self.events.put(("converting", path, ""))
+            result = conversion.run()
+            with self._lock:
+                self._active.pop(path, None)
+                self._queued.discard(path)
+            if reservation is not None:
+                self.scheduler.release(reservation)
+
+            if result.cancelled:
+                continue  # Not recorded, so it is picked up again next time
+            if result.succeeded:
+                self.index.mark(path, size, mtime_ns, "done")
+                self._mark_outputs(output_path, result.started_at)
+                detail = f"{result.elapsed:.1f} s"
+                if result.validation is not None and not result.validation.ok:
+                    detail += f", check the output: {result.validation.problems[0]}"
+                self.events.put(("done", path, detail))
+            else:
+                # Recorded as failed so it isn't retried in a loop; touching the file retries it
+                self.index.mark(path, size, mtime_ns, "failed")
+                detail = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else str(result.error or result.returncode)
+                self.events.put(("failed", path, detail))
+
+    def _mark_outputs(self, output_path, started_at):
+        """Records the outputs in the index too, so they are skipped after a restart of the watcher."""
+        if not output_path:
+            return
+        for _, path in collect_outputs(output_path, started_at):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            self.index.mark(path, st.st_size, st.st_mtime_ns, "output")
+
+
+class _NotifyHandler(FileSystemEventHandler):
+    """Forwards watchdog events to the FolderWatcher."""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        path = getattr(event, "dest_path", None) or event.src_path
+        self.watcher.notice(path)
+
+
+def _normalize(path):
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _is_inside(path, directory):
+    path, directory = _normalize(path), _normalize(directory)
+    return path == directory or path.startswith(directory.rstrip(os.sep) + os.sep)
+
+
+def _can_open(path):
+    """False while another process still holds the file exclusively (e.g. a copy in progress on Windows)."""
+    try:
+        with open(path, 'rb'):
+            return True
+    except OSError:
+        return False
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_DIR, "src"))
+
+FAKE_CONVERTER = os.path.join(REPO_DIR, "tools", "fake_replay_converter.py")
+
+
+@pytest.fixture(autouse=True)
+def app_data_dir(tmp_path, monkeypatch):
+    """Keeps settings, history and caches of the code under test out of the real home directory."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))  # expanduser("~") on Windows
+    return home
+
+
+@pytest.fixture
+def fake_converter(monkeypatch):
+    """Path of tools/fake_replay_converter.py, made fast; tests tune it further with FAKE_RC_* variables."""
+    monkeypatch.setenv("FAKE_RC_FRAMES", "3")
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.01")
+    return FAKE_CONVERTER
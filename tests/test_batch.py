@@ -0,0 +1,72 @@
+import threading
+import time
+
+from replay_core.batch import BatchJob, BatchRunner
+from replay_core.command import build_command
+
+
+def make_jobs(tmp_path, converter, count):
+    jobs = []
+    for index in range(count):
+        recording = tmp_path / f"rec{index}.gprec"
+        recording.write_text("recording")
+        command_parts = build_command({"converter_path": converter}, str(recording), str(tmp_path / f"rec{index}"),
+                                      ".srf")
+        jobs.append(BatchJob(str(index), str(recording), command_parts))
+    return jobs
+
+
+def test_no_more_than_max_workers_convert_at_once(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.05")
+    running = []
+    lock = threading.Lock()
+
+    def on_line(job, stream, text):
+        with lock:
+            running.append(len(runner.active_conversions()))
+
+    runner = BatchRunner(make_jobs(tmp_path, fake_converter, 6), max_workers=2, on_line=on_line)
+    summary = runner.run()
+
+    assert summary.succeeded == 6
+    assert max(running) == 2
+    for index in range(6):
+        assert (tmp_path / f"rec{index}.srf").is_file()
+
+
+def test_failed_jobs_are_retried_up_to_max_retries(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_EXIT_CODE", "3")
+    runner = BatchRunner(make_jobs(tmp_path, fake_converter, 2), max_workers=2, max_retries=2)
+    summary = runner.run()
+
+    assert [job.attempts for job in runner.jobs] == [3, 3]
+    assert (summary.failed, summary.retried) == (2, 2)
+    assert all(job.result.returncode == 3 for job in summary.failed_jobs)
+
+
+def test_cancel_stops_running_and_queued_jobs(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "1000")
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.05")
+    runner = BatchRunner(make_jobs(tmp_path, fake_converter, 4), max_workers=2)
+    runner.start()
+    deadline = time.monotonic() + 10
+    while len(runner.active_conversions()) < 2 and time.monotonic() < deadline:
+        time.sleep(0.02)
+
+    runner.cancel()
+    event, summary = None, None
+    while event != "done":
+        event, summary = runner.events.get(timeout=10)
+    assert summary.cancelled == 4
+    assert summary.elapsed < 10  # Far from the 50 s each conversion would take
+    assert not runner.active_conversions()
+
+
+def test_summary_counts_each_outcome(tmp_path, fake_converter):
+    jobs = make_jobs(tmp_path, fake_converter, 3)
+    jobs[1].command_parts[0] = str(tmp_path / "missing.exe")
+    summary = BatchRunner(jobs, max_workers=3).run()
+
+    assert (summary.total, summary.succeeded, summary.failed, summary.cancelled) == (3, 2, 1, 0)
+    assert summary.failed_jobs == [jobs[1]]
+    assert str(summary).startswith("2 of 3 succeeded, 1 failed, 0 cancelled")
@@ -0,0 +1,86 @@
+import os
+import shutil
+import time
+
+from replay_core.cache import ConversionCache
+from replay_core.command import build_command
+from replay_core.engine import ConversionJob
+
+
+def convert_command(converter, tmp_path, name="a", output_format=".csv", frame=None, settings=None):
+    recording = tmp_path / f"{name}.gprec"
+    if not recording.exists():
+        recording.write_text("recording")
+    return build_command(dict(settings or {}, converter_path=converter), str(recording), str(tmp_path / name),
+                         output_format, frame)
+
+
+def test_hit_restores_the_output_without_starting_the_converter(tmp_path, fake_converter, monkeypatch):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    command_parts = convert_command(fake_converter, tmp_path)
+    first = ConversionJob(command_parts, cache=cache).run()
+    assert first.succeeded and not first.cached
+    expected = (tmp_path / "a.csv").read_text()
+    os.remove(tmp_path / "a.csv")
+
+    monkeypatch.setenv("FAKE_RC_EXIT_CODE", "9")  # Would fail if it were started
+    second = ConversionJob(command_parts, cache=cache).run()
+    assert second.succeeded and second.cached
+    assert (tmp_path / "a.csv").read_text() == expected
+
+
+def test_other_arguments_or_converter_miss(tmp_path, fake_converter):
+    cache = ConversionCache(str(tmp_path / "cache"))
+    command_parts = convert_command(fake_converter, tmp_path)
+    assert ConversionJob(command_parts, cache=cache).run().succeeded
+    key = cache.make_key(command_parts)
+
+    assert cache.make_key(convert_command(fake_converter, tmp_path, frame="1")) != key
+    pcd_key = cache.make_key(convert_command(fake_converter, tmp_path, output_format=".pcd"))
+    assert pcd_key != key
+    assert cache.make_key(convert_command(fake_converter, tmp_path, output_format=".pcd",
+                                          settings={"pcd_swap": True})) != pcd_key
+
+    converter = tmp_path / "bin" / os.path.basename(fake_converter)
+    converter.parent.mkdir()
+    shutil.copy2(fake_converter, converter)
+    assert cache.make_key(convert_command(str(converter), tmp_path)) == key  # Same binary elsewhere
+    os.utime(converter, (time.time() + 60, time.time() + 60))  # An updated converter
+    updated = convert_command(str(converter), tmp_path)
+    assert cache.make_key(updated) != key
+    assert cache.restore(updated) is None
+
+
+def test_per_frame_files_are_restored(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_SPLIT_FRAMES", "1")
+    cache = ConversionCache(str(tmp_path / "cache"))
+    command_parts = convert_command(fake_converter, tmp_path)
+    assert ConversionJob(command_parts, cache=cache).run().succeeded
+    frame_files = sorted(path.name for path in tmp_path.glob("a_*.csv"))
+    assert frame_files == ["a_0.csv", "a_1.csv", "a_2.csv"]
+    for name in frame_files:
+        os.remove(tmp_path / name)
+
+    restored = cache.restore(command_parts)
+    assert sorted(os.path.basename(path) for path in restored) == frame_files
+    assert sorted(path.name for path in tmp_path.glob("a_*.csv")) == frame_files
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAME_BYTES", "1000")
+    cache = ConversionCache(str(tmp_path / "cache"), max_bytes=7000)  # Room for two 3000 byte outputs
+    commands = [convert_command(fake_converter, tmp_path, name) for name in ("a", "b", "c")]
+
+    assert ConversionJob(commands[0], cache=cache).run().succeeded
+    time.sleep(0.01)
+    assert ConversionJob(commands[1], cache=cache).run().succeeded
+    time.sleep(0.01)
+    assert cache.restore(commands[0])  # "a" is now used more recently than "b"
+    time.sleep(0.01)
+    assert ConversionJob(commands[2], cache=cache).run().succeeded
+
+    assert len(cache.entries()) == 2
+    assert sum(size for _, size, _ in cache.entries()) <= cache.max_bytes
+    assert cache.restore(commands[0]) is not None
+    assert cache.restore(commands[1]) is None
+    assert cache.restore(commands[2]) is not None
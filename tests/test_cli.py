@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+# Imports the command line tool and runs it, then lists the GUI modules that got loaded
+CHECK_IMPORTS = """\
+import json, sys
+import replay_core.cli
+try:
+    replay_core.cli.main(sys.argv[1:])
+except SystemExit:
+    pass
+print(json.dumps(sorted(name for name in sys.modules if name.split(".")[0] in ("tkinter", "_tkinter", "ttkthemes"))))
+"""
+
+
+def loaded_gui_modules(*args):
+    completed = subprocess.run([sys.executable, "-c", CHECK_IMPORTS] + list(args), capture_output=True, text=True,
+                               env=dict(os.environ, PYTHONPATH=SRC_DIR), timeout=60)
+    return json.loads(completed.stdout.splitlines()[-1])
+
+
+def test_the_command_line_tool_does_not_load_the_gui(tmp_path, fake_converter):
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    assert loaded_gui_modules("--help") == []
+    assert loaded_gui_modules("--converter", fake_converter, str(recording), "-t", ".csv") == []
+    assert (tmp_path / "a.csv").is_file()
+
+
+def test_python_m_replay_core_runs_without_tkinter(tmp_path, fake_converter):
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    # A tkinter that can't be imported, as on a server without Tk
+    (tmp_path / "tkinter.py").write_text("raise ImportError('no Tk here')\n")
+    completed = subprocess.run([sys.executable, "-m", "replay_core", "--converter", fake_converter, str(recording)],
+                               capture_output=True, text=True, timeout=60,
+                               env=dict(os.environ, PYTHONPATH=os.pathsep.join([str(tmp_path), SRC_DIR])))
+    assert completed.returncode == 0, completed.stderr
+    assert (tmp_path / "a.srf").is_file()
@@ -0,0 +1,86 @@
+import time
+
+from replay_core.command import build_command
+from replay_core.engine import ConversionJob
+
+
+def convert_command(converter, tmp_path, output_format=".srf", frame=None):
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    return build_command({"converter_path": converter}, str(recording), str(tmp_path / "a"), output_format, frame)
+
+
+def test_job_runs_the_converter_and_collects_its_output(tmp_path, fake_converter):
+    job = ConversionJob(convert_command(fake_converter, tmp_path))
+    result = job.run()
+
+    assert result.succeeded
+    assert result.returncode == 0
+    assert "Done." in result.stdout
+    assert (tmp_path / "a.srf").is_file()
+    assert job.state == ConversionJob.FINISHED
+    assert job.events.get_nowait() == ("finished", result)
+
+
+def test_failed_run_keeps_the_exit_code_and_stderr(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_EXIT_CODE", "5")
+    result = ConversionJob(convert_command(fake_converter, tmp_path)).run()
+
+    assert not result.succeeded
+    assert result.returncode == 5
+    assert "simulated failure" in result.stderr
+
+
+def test_missing_converter_is_reported_not_raised(tmp_path):
+    result = ConversionJob(convert_command(str(tmp_path / "missing.exe"), tmp_path)).run()
+
+    assert not result.succeeded
+    assert isinstance(result.error, OSError)
+
+
+def test_cancel_stops_the_converter(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "1000")
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.05")
+    job = ConversionJob(convert_command(fake_converter, tmp_path))
+    job.start()
+    deadline = time.monotonic() + 10
+    while job.progress.snapshot().frames_done is None and time.monotonic() < deadline:
+        time.sleep(0.02)  # Until the converter is running and printing
+    assert job.is_running
+    assert job.pid is not None
+
+    job.cancel()
+    assert job.wait(timeout=10)
+    result = job.result
+    assert result.cancelled
+    assert not result.succeeded
+    assert result.elapsed < 10  # Far from the 50 s a full run would take
+    assert job.pid is None
+
+
+def test_cancel_before_start_never_spawns_the_converter(tmp_path, fake_converter):
+    job = ConversionJob(convert_command(fake_converter, tmp_path))
+    job.cancel()
+    result = job.run()
+
+    assert result.cancelled
+    assert result.returncode is None
+    assert not (tmp_path / "a.srf").exists()
+
+
+def test_elapsed_counts_while_running_and_freezes_when_finished(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "10")
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.03")
+    job = ConversionJob(convert_command(fake_converter, tmp_path))
+    assert job.elapsed == 0.0
+
+    job.start()
+    time.sleep(0.1)
+    running = job.elapsed
+    assert running >= 0.1
+    assert job.wait(timeout=10)
+    final = job.elapsed
+    assert final >= running + 0.1  # The converter takes at least 0.3 s
+    assert job.result.elapsed == final
+    time.sleep(0.05)
+    assert job.elapsed == final
@@ -0,0 +1,40 @@
+import pytest
+
+from replay_core.command import CommandError, get_option_value
+from replay_core.frames import frame_commands
+
+
+@pytest.fixture
+def recording(tmp_path):
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    return recording
+
+
+def commands_for(tmp_path, recording, frame):
+    return frame_commands({"converter_path": "converter.exe"}, str(recording), str(tmp_path / "a"), ".csv", frame)
+
+
+def test_all_frames_and_single_frames_give_one_command(tmp_path, recording):
+    [(frame, parts)] = commands_for(tmp_path, recording, None)
+    assert frame is None
+    assert '-a' in parts
+
+    [(frame, parts)] = commands_for(tmp_path, recording, " 7 ")  # As the preview shows it
+    assert frame is None
+    assert get_option_value(parts, '-f') == "7"
+    assert get_option_value(parts, '-o') == str(tmp_path / "a.csv")
+
+
+def test_frame_lists_fan_out_into_one_command_per_frame(tmp_path, recording):
+    commands = commands_for(tmp_path, recording, "3, 7,42")
+
+    assert [frame for frame, _ in commands] == [3, 7, 42]
+    for frame, parts in commands:
+        assert get_option_value(parts, '-f') == str(frame)
+        assert get_option_value(parts, '-o') == str(tmp_path / f"a_{frame:06d}.csv")
+
+
+def test_invalid_frame_selections_are_rejected_with_their_reason(tmp_path, recording):
+    with pytest.raises(CommandError, match="Invalid frame selection"):
+        commands_for(tmp_path, recording, "3,x")
@@ -0,0 +1,186 @@
+import http.client
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from replay_core.batch import BatchJob
+from replay_core.command import build_command
+from replay_core.jobserver import MAX_LOST_ATTEMPTS, MAX_REQUEST_BYTES, TOKEN_HEADER, JobWorker, RemoteBatchRunner
+
+TOKEN = "secret"
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+
+def make_jobs(tmp_path, converter, count):
+    jobs = []
+    for index in range(count):
+        recording = tmp_path / f"rec{index}.gprec"
+        recording.write_text("recording")
+        command_parts = build_command({"converter_path": converter}, str(recording), str(tmp_path / f"rec{index}"),
+                                      ".srf")
+        jobs.append(BatchJob(str(index), str(recording), command_parts))
+    return jobs
+
+
+def wait_for_summary(runner, timeout=30):
+    """Follows the runner's events until the batch is done and returns its BatchSummary."""
+    while True:
+        event, payload = runner.events.get(timeout=timeout)
+        if event == "done":
+            return payload
+
+
+def post(runner, path, payload, token=TOKEN):
+    request = urllib.request.Request(runner.url + path, data=json.dumps(payload).encode("utf-8"),
+                                     headers={"Content-Type": "application/json", TOKEN_HEADER: token})
+    try:
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return response.status, json.load(response)
+    except urllib.error.HTTPError as e:
+        return e.code, json.load(e)
+
+
+def wait_for_status(runner, job, status, timeout=10):
+    """Follows the runner's events until `job` changes to `status`."""
+    deadline = time.monotonic() + timeout
+    while True:
+        event, payload = runner.events.get(timeout=max(0.0, deadline - time.monotonic()))
+        if event == "job" and payload is job and job.status == status:
+            return
+
+
+def post_length(runner, length):
+    """POSTs to /lease claiming a body of `length` bytes without sending one; returns the status code."""
+    connection = http.client.HTTPConnection(*runner.url[len("http://"):].split(":"), timeout=10)
+    try:
+        connection.putrequest("POST", "/lease")
+        connection.putheader(TOKEN_HEADER, TOKEN)
+        connection.putheader("Content-Length", str(length))
+        connection.endheaders()
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+@pytest.fixture
+def runner(tmp_path, fake_converter):
+    runner = RemoteBatchRunner(make_jobs(tmp_path, fake_converter, 1), ("127.0.0.1", 0), token=TOKEN)
+    runner.start()
+    yield runner
+    runner.cancel()
+
+
+def test_worker_converts_the_served_jobs(tmp_path, fake_converter):
+    runner = RemoteBatchRunner(make_jobs(tmp_path, fake_converter, 3), ("127.0.0.1", 0), token=TOKEN)
+    runner.start()
+    worker = JobWorker(runner.url, fake_converter, slots=2, token=TOKEN, worker_id="test-worker")
+    worker.start()
+    try:
+        summary = wait_for_summary(runner)
+    finally:
+        worker.stop()
+        worker.join(timeout=10)
+
+    assert summary.succeeded == 3
+    for job in runner.jobs:
+        assert job.status == BatchJob.SUCCEEDED
+        assert job.worker == "test-worker"
+        assert (tmp_path / f"rec{job.job_id}.srf").is_file()
+
+
+def test_wrong_token_is_rejected(runner):
+    assert post(runner, "/lease", {"worker": "w", "wait": 0}, token="wrong")[0] == 403
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/lease", {"worker": "w", "wait": "soon"}),
+    ("/lease", {"worker": "w", "wait": None}),
+    ("/heartbeat", {"worker": "w", "running": ["0"]}),
+    ("/heartbeat", {"worker": "w", "running": {"0": "half"}}),
+    ("/result", {"worker": "w", "id": "0"}),
+    ("/result", {"worker": "w", "id": "0", "lease": 1, "elapsed": "long"}),
+    ("/result", {"worker": "w", "id": "0", "lease": 1, "returncode": "0"}),
+])
+def test_malformed_requests_get_400(runner, path, payload):
+    status, reply = post(runner, path, payload)
+    assert status == 400
+    assert reply["error"]
+    assert post(runner, "/lease", {"worker": "w", "wait": 0})[0] == 200  # The server is still serving
+
+
+def test_other_machines_can_only_connect_with_a_token(tmp_path, fake_converter):
+    jobs = make_jobs(tmp_path, fake_converter, 1)
+    with pytest.raises(ValueError):
+        RemoteBatchRunner(jobs, ("0.0.0.0", 0)).start()
+    runner = RemoteBatchRunner(jobs)
+    assert runner.address[0] == "127.0.0.1"
+
+
+def test_oversized_and_negative_bodies_are_refused_unread(runner):
+    assert post_length(runner, MAX_REQUEST_BYTES + 1) == 413
+    assert post_length(runner, -1) == 400
+    assert post(runner, "/lease", {"worker": "w", "wait": 0})[0] == 200
+
+
+def test_jobs_of_a_silent_worker_are_requeued(tmp_path, fake_converter):
+    runner = RemoteBatchRunner(make_jobs(tmp_path, fake_converter, 1), ("127.0.0.1", 0), token=TOKEN,
+                               worker_timeout=1)
+    runner.start()
+    try:
+        [job] = runner.jobs
+        status, reply = post(runner, "/lease", {"worker": "ghost", "wait": 0})
+        assert reply["job"]["id"] == job.job_id
+        wait_for_status(runner, job, BatchJob.QUEUED)  # No heartbeat from "ghost" for over a second
+        assert job.attempts == 0  # Not counted against the job's retries
+
+        status, second = post(runner, "/lease", {"worker": "alive", "wait": 0})
+        assert second["job"]["id"] == job.job_id
+        late = {"worker": "ghost", "id": job.job_id, "lease": reply["job"]["lease"], "returncode": 0}
+        assert post(runner, "/result", late)[1] == {"accepted": False}
+        assert job.status == BatchJob.RUNNING
+        assert job.worker == "alive"
+    finally:
+        runner.cancel()
+
+
+def test_job_fails_when_its_workers_keep_dying(tmp_path, fake_converter):
+    runner = RemoteBatchRunner(make_jobs(tmp_path, fake_converter, 1), ("127.0.0.1", 0), token=TOKEN,
+                               worker_timeout=1)
+    runner.start()
+    try:
+        [job] = runner.jobs
+        for attempt in range(MAX_LOST_ATTEMPTS):
+            assert post(runner, "/lease", {"worker": f"ghost{attempt}", "wait": 0})[1]["job"]["id"] == job.job_id
+            wait_for_status(runner, job, BatchJob.FAILED if attempt == MAX_LOST_ATTEMPTS - 1 else BatchJob.QUEUED)
+        summary = wait_for_summary(runner)
+    finally:
+        runner.cancel()
+
+    assert summary.failed == 1
+    assert "stopped responding" in str(job.result.error)
+
+
+def test_worker_processes_share_the_batch(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.2")
+    monkeypatch.setenv("PYTHONPATH", SRC_DIR)
+    runner = RemoteBatchRunner(make_jobs(tmp_path, fake_converter, 6), ("127.0.0.1", 0), token=TOKEN)
+    runner.start()
+    workers = [subprocess.Popen([sys.executable, "-m", "replay_core", "--worker", runner.url, "--token", TOKEN,
+                                 "--converter", fake_converter, "-j", "1"],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for _ in range(2)]
+    try:
+        summary = wait_for_summary(runner, timeout=60)
+    finally:
+        runner.cancel()
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+
+    assert summary.succeeded == 6
+    assert len({job.worker for job in runner.jobs}) == 2
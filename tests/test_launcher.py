@@ -0,0 +1,75 @@
+import sys
+import time
+
+import pytest
+
+from replay_core import launcher as launcher_module
+from replay_core.command import build_command
+from replay_core.engine import ConversionJob
+from replay_core.launcher import MODE_AUTO, MODE_NATIVE, MODE_WINE, MODE_WRAPPER, Launcher
+
+COMMAND = ["/opt/rc/ReplayConverter.exe", "-i", "/data/run 1/a.gprec", "-f", "3", "-o", "out/a.csv"]
+
+# Starts the converter command it is given as a child and writes the child's pid to a file
+WRAPPER_SCRIPT = """\
+import subprocess, sys
+child = subprocess.Popen(sys.argv[2:])
+with open(sys.argv[1], "w") as f:
+    f.write(str(child.pid))
+sys.exit(child.wait())
+"""
+
+
+def is_alive(pid):
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"  # A zombie has exited
+    except FileNotFoundError:
+        return False
+
+
+def test_wine_gets_windows_paths_for_the_input_and_output_only():
+    launcher = Launcher(MODE_WINE, wine_command="wine64 --verbose")
+    assert launcher.argv(COMMAND) == ["wine64", "--verbose", "/opt/rc/ReplayConverter.exe",
+                                      "-i", "Z:\\data\\run 1\\a.gprec", "-f", "3", "-o", "out/a.csv"]
+
+
+def test_wrapper_gets_the_command_unchanged():
+    assert Launcher(MODE_WRAPPER, wrapper="firejail --quiet").argv(COMMAND) == ["firejail", "--quiet"] + COMMAND
+    with pytest.raises(ValueError):
+        Launcher(MODE_WRAPPER)
+
+
+def test_auto_mode_uses_wine_for_exe_converters_off_windows(monkeypatch):
+    monkeypatch.setattr(launcher_module.sys, "platform", "linux")
+    launcher = Launcher(MODE_AUTO)
+    assert launcher.resolve_mode(COMMAND) == MODE_WINE
+    assert launcher.resolve_mode(["/opt/rc/replay-converter"] + COMMAND[1:]) == MODE_NATIVE
+    assert Launcher(MODE_NATIVE).argv(COMMAND) == COMMAND
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="checks processes through /proc")
+def test_cancel_stops_what_the_converter_started(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "1000")
+    monkeypatch.setenv("FAKE_RC_FRAME_DELAY", "0.05")
+    wrapper = tmp_path / "wrapper.py"
+    wrapper.write_text(WRAPPER_SCRIPT)
+    pid_file = tmp_path / "converter.pid"
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    command_parts = build_command({"converter_path": fake_converter}, str(recording), str(tmp_path / "a"), ".srf")
+    job = ConversionJob(command_parts, launcher=Launcher(MODE_WRAPPER, wrapper=[sys.executable, str(wrapper),
+                                                                                 str(pid_file)]))
+    job.start()
+    deadline = time.monotonic() + 10
+    while job.progress.snapshot().frames_done is None and time.monotonic() < deadline:
+        time.sleep(0.02)  # Until the converter is running and printing
+    converter_pid = int(pid_file.read_text())
+    assert is_alive(converter_pid)
+
+    job.cancel()
+    assert job.wait(timeout=10)
+    assert job.result.cancelled
+    while is_alive(converter_pid) and time.monotonic() < deadline + 10:
+        time.sleep(0.02)
+    assert not is_alive(converter_pid)
@@ -0,0 +1,37 @@
+import threading
+
+from replay_core.presets import Preset, PresetStore
+
+
+def test_two_stores_on_one_file_keep_each_others_presets(tmp_path):
+    path = str(tmp_path / "presets.json")
+    first, second = PresetStore(path), PresetStore(path)
+    assert first.names() == second.names() == []
+
+    first.save(Preset("Point cloud", ".pcd", "", {"pcd_width": "640"}))
+    assert second.changed()
+    second.save(Preset("Frame 7", ".csv", "7"))
+    assert first.changed()
+
+    assert first.names() == second.names() == ["Frame 7", "Point cloud"]
+    assert not first.changed()
+    assert first.get("Point cloud").pcd["pcd_width"] == "640"
+    second.delete("Point cloud")
+    assert first.names() == ["Frame 7"]
+
+
+def test_concurrent_saves_are_all_kept(tmp_path):
+    path = str(tmp_path / "presets.json")
+    stores = [PresetStore(path) for _ in range(4)]
+
+    def save_presets(store, index):
+        for number in range(10):
+            store.save(Preset(f"Preset {index}-{number}", ".csv", str(number)))
+
+    threads = [threading.Thread(target=save_presets, args=(store, index)) for index, store in enumerate(stores)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(PresetStore(path).names()) == 40
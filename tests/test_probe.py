@@ -0,0 +1,23 @@
+import os
+import sys
+
+from replay_core.probe import ConverterProbe
+
+
+def test_failed_probes_are_not_cached(tmp_path):
+    converter = tmp_path / "converter"
+    converter.write_text(f"#!{sys.executable}\nprint('Usage: converter -i <input> -o <output> [-a | -f <frame>]')\n")
+    converter.chmod(0o644)  # Can't be started yet
+    cache_path = tmp_path / "probe.json"
+    probe = ConverterProbe(str(cache_path))
+
+    failed = probe.capabilities(str(converter))
+    assert failed.error
+    assert probe.cached(str(converter)) is None
+    assert not cache_path.exists()
+
+    os.chmod(converter, 0o755)  # Same size and modification time, so the same cache key
+    found = probe.capabilities(str(converter))
+    assert not found.error
+    assert {'-i', '-o', '-f'} <= found.options
+    assert ConverterProbe(str(cache_path)).cached(str(converter)).options == found.options
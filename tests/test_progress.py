@@ -0,0 +1,89 @@
+import pytest
+
+from replay_core.command import build_command
+from replay_core.engine import ConversionJob
+from replay_core.progress import STALL_SECONDS, ProgressTracker, parse_frame_counter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Processing frame 12/400", (12, 400)),
+    ("Frame 12 of 400", (12, 400)),
+    ("frame #3 / 9", (3, 9)),
+    ("Exported 5/20 frames", (5, 20)),
+    ("Done.", None),
+    ("Processing frame 12/0", None),
+    ("Processing frame 13/12", None),
+])
+def test_frame_counters_are_parsed(line, expected):
+    assert parse_frame_counter(line) == expected
+
+
+def test_eta_follows_the_frame_rate():
+    clock = FakeClock()
+    tracker = ProgressTracker(clock=clock)
+    assert tracker.snapshot().fraction is None
+    assert tracker.snapshot().eta is None
+
+    assert tracker.feed_line("Processing frame 10/100")
+    clock.now += 2.0
+    tracker.feed_line("Processing frame 30/100")
+    snapshot = tracker.snapshot()
+
+    assert snapshot.frames_per_sec == pytest.approx(10.0)
+    assert snapshot.eta == pytest.approx(7.0)
+    assert snapshot.fraction == pytest.approx(0.3)
+    assert "Frame 30/100 (30%)" in snapshot.describe()
+    assert "ETA" in snapshot.describe()
+
+
+def test_lines_without_counters_are_ignored_and_stalls_detected():
+    clock = FakeClock()
+    tracker = ProgressTracker(clock=clock)
+    tracker.feed_line("Processing frame 1/10")
+    assert not tracker.feed_line("Loading calibration...")
+
+    clock.now += STALL_SECONDS
+    snapshot = tracker.snapshot()
+    assert snapshot.frames_done == 1
+    assert snapshot.stalled
+    assert "no progress" in snapshot.describe()
+
+
+def test_output_file_growth_is_tracked_without_counters(tmp_path):
+    clock = FakeClock()
+    output = tmp_path / "a.srf"
+    tracker = ProgressTracker(str(output), clock=clock)
+    assert tracker.snapshot().bytes_written is None  # Not created yet
+
+    clock.now += 1.0
+    output.write_bytes(b"x" * 1000)
+    tracker.poll_output_file()
+    clock.now += 2.0
+    output.write_bytes(b"x" * 5000)
+    snapshot = tracker.snapshot()
+
+    assert snapshot.bytes_written == 5000
+    assert snapshot.bytes_per_sec == pytest.approx(2000.0)
+    assert snapshot.fraction is None
+
+
+def test_job_progress_reaches_the_frame_total(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "5")
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    command_parts = build_command({"converter_path": fake_converter}, str(recording), str(tmp_path / "a"), ".csv")
+    job = ConversionJob(command_parts)
+
+    assert job.run().succeeded
+    snapshot = job.progress.snapshot()
+    assert (snapshot.frames_done, snapshot.frames_total) == (5, 5)
+    assert snapshot.fraction == 1.0
+    assert snapshot.eta == 0.0
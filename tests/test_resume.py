@@ -0,0 +1,41 @@
+from replay_core.command import build_command, get_option_value
+from replay_core.engine import ConversionJob
+from replay_core.resume import ExportCheckpoint, frame_command, plan_export
+
+
+def all_frames_command(converter, recording, output_base):
+    return build_command({"converter_path": converter}, str(recording), str(output_base), ".csv")
+
+
+def test_interrupted_export_resumes_with_the_converters_frame_names(tmp_path, fake_converter, monkeypatch):
+    monkeypatch.setenv("FAKE_RC_FRAMES", "8")
+    monkeypatch.setenv("FAKE_RC_SPLIT_FRAMES", "1")
+    monkeypatch.setenv("FAKE_RC_CRASH_AFTER", "5")
+    recording = tmp_path / "a.gprec"
+    recording.write_text("recording")
+    command_parts = all_frames_command(fake_converter, recording, tmp_path / "a")
+
+    checkpoint, commands = plan_export(command_parts)
+    assert commands == [command_parts]
+    result = ConversionJob(command_parts, checkpoint=checkpoint).run()
+    assert not result.succeeded
+
+    checkpoint, commands = plan_export(command_parts)
+    outputs = [get_option_value(parts, '-o') for parts in commands]
+    # Frame 4 was the newest file when the run stopped, so it is converted again, under the same name
+    assert outputs == [str(tmp_path / f"a_{frame}.csv") for frame in (4, 5, 6, 7)]
+
+    monkeypatch.delenv("FAKE_RC_CRASH_AFTER")
+    for parts in commands:
+        assert ConversionJob(parts, checkpoint=checkpoint).run().succeeded
+    assert sorted(path.name for path in tmp_path.glob("a_*.csv")) == [f"a_{frame}.csv" for frame in range(8)]
+    assert ExportCheckpoint.load(command_parts) is None
+
+
+def test_missing_frames_keep_the_zero_padding_of_existing_ones(tmp_path, fake_converter):
+    for frame in range(3):
+        (tmp_path / f"a_{frame:06d}.csv").write_text("# frame\n")
+    command_parts = all_frames_command(fake_converter, tmp_path / "a.gprec", tmp_path / "a")
+
+    assert get_option_value(frame_command(command_parts, 1), '-o') == str(tmp_path / "a_000001.csv")
+    assert get_option_value(frame_command(command_parts, 12), '-o') == str(tmp_path / "a_000012.csv")
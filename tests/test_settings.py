@@ -0,0 +1,27 @@
+import json
+
+from replay_core.settings import get_default_settings, read_settings_file, update_settings_file
+
+
+def test_saving_keeps_what_another_instance_saved_meanwhile(tmp_path):
+    path = str(tmp_path / "settings.json")
+    baseline = read_settings_file(path)
+    settings = dict(baseline, pcd_width="640")
+
+    other = dict(baseline, converter_path="C:/tools/ReplayConverter.exe")
+    update_settings_file(path, other, baseline)  # Another GUI instance saves first
+    merged = update_settings_file(path, settings, baseline)
+
+    assert merged["pcd_width"] == "640"
+    assert merged["converter_path"] == "C:/tools/ReplayConverter.exe"
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == merged
+
+
+def test_unchanged_settings_do_not_overwrite_newer_values(tmp_path):
+    path = str(tmp_path / "settings.json")
+    baseline = get_default_settings()
+    update_settings_file(path, dict(baseline, cache_enabled=True), baseline)
+
+    merged = update_settings_file(path, dict(baseline), baseline)  # Nothing changed here
+    assert merged["cache_enabled"] is True
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from replay_core.batch import BatchRunner
+from replay_core.command import build_command
+from replay_core.sync import CHANGED, NEW, NOT_DONE, OPTIONS_CHANGED, OUTPUT_MISSING, DirectorySync
+
+
+@pytest.fixture
+def tree(tmp_path):
+    source = tmp_path / "recordings"
+    (source / "day2").mkdir(parents=True)
+    (source / "a.gprec").write_text("recording a")
+    (source / "day2" / "b.gprec").write_text("recording b")
+    (source / "notes.txt").write_text("not a recording")
+    return source, tmp_path / "converted"
+
+
+def make_sync(tree, converter, output_format=".srf"):
+    source, output = tree
+    return DirectorySync(str(source), str(output), lambda input_file, base: build_command(
+        {"converter_path": converter}, input_file, base, output_format))
+
+
+def run_sync(sync):
+    """Converts what plan() finds stale and records it, like `--sync`. Returns the orphans of the finished jobs."""
+    plan = sync.plan()
+    sync.make_output_dirs(plan)
+    runner = BatchRunner(sync.jobs(plan), max_workers=2)
+    runner.run()
+    orphans = []
+    for job in runner.jobs:
+        orphans.extend(sync.job_finished(job))
+    return plan, orphans
+
+
+def test_each_reason_to_convert_again(tree, fake_converter, monkeypatch):
+    source, output = tree
+    plan, _ = run_sync(make_sync(tree, fake_converter))
+    assert plan.reasons() == {NEW: 2}
+    assert (output / "day2" / "b.srf").is_file()
+    plan = make_sync(tree, fake_converter).plan()
+    assert (plan.stale, plan.up_to_date) == ([], 2)
+
+    (source / "a.gprec").write_text("recording a, recorded again")
+    assert [(item.rel_path, item.reason) for item in make_sync(tree, fake_converter).plan().stale] == \
+        [("a.gprec", CHANGED)]
+    run_sync(make_sync(tree, fake_converter))
+
+    os.remove(output / "day2" / "b.srf")
+    assert [(item.rel_path, item.reason) for item in make_sync(tree, fake_converter).plan().stale] == \
+        [(os.path.join("day2", "b.gprec"), OUTPUT_MISSING)]
+    monkeypatch.setenv("FAKE_RC_EXIT_CODE", "2")
+    run_sync(make_sync(tree, fake_converter))
+    assert make_sync(tree, fake_converter).plan().reasons() == {NOT_DONE: 1}
+    monkeypatch.delenv("FAKE_RC_EXIT_CODE")
+    run_sync(make_sync(tree, fake_converter))
+
+    assert make_sync(tree, fake_converter, ".csv").plan().reasons() == {OPTIONS_CHANGED: 2}
+
+
+def test_outputs_of_other_options_become_orphans(tree, fake_converter):
+    source, output = tree
+    run_sync(make_sync(tree, fake_converter))
+
+    sync = make_sync(tree, fake_converter, ".csv")
+    _, orphans = run_sync(sync)
+    assert sorted(orphans) == ["a.srf", os.path.join("day2", "b.srf")]
+    assert (output / "a.srf").is_file()  # Only flagged
+    plan = make_sync(tree, fake_converter, ".csv").plan()
+    assert (plan.stale, plan.orphans) == ([], sorted(orphans))
+
+    assert sync.remove_orphans(plan.orphans, plan.gone) == []
+    assert not (output / "a.srf").exists()
+    assert (output / "a.csv").is_file()
+    assert make_sync(tree, fake_converter, ".csv").plan().orphans == []
+
+
+def test_outputs_of_deleted_recordings_are_orphans(tree, fake_converter):
+    source, output = tree
+    run_sync(make_sync(tree, fake_converter))
+    os.remove(source / "day2" / "b.gprec")
+
+    sync = make_sync(tree, fake_converter)
+    plan = sync.plan()
+    assert plan.stale == []
+    assert plan.orphans == [os.path.join("day2", "b.srf")]
+    assert plan.gone == {os.path.join("day2", "b.gprec"): plan.orphans}
+
+    assert sync.remove_orphans(plan.orphans, plan.gone) == []
+    assert not (output / "day2" / "b.srf").exists()
+    assert sync.manifest.paths() == ["a.gprec"]
@@ -0,0 +1,88 @@
+import math
+import struct
+
+import pytest
+
+from replay_core import validation
+from replay_core.validation import validate_file
+
+
+@pytest.fixture(autouse=True)
+def without_numpy(monkeypatch):
+    """Runs the plain Python parsers, which are used wherever numpy isn't installed."""
+    monkeypatch.setattr(validation, "numpy", None)
+
+
+def pcd_header(points, data="ascii"):
+    return (f"# .PCD v0.7\nVERSION 0.7\nFIELDS x y z\nSIZE 4 4 4\nTYPE F F F\nCOUNT 1 1 1\n"
+            f"WIDTH {points}\nHEIGHT 1\nPOINTS {points}\nDATA {data}\n").encode("ascii")
+
+
+def test_csv_points_invalid_ratio_and_frames(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("frame,x,y,z\n0,1,2,3\n0,-1,5,0.5\n1,nan,0,0\n1,2,inf,1\n")
+    stats = validate_file(str(path))
+
+    assert stats.ok, stats.problems
+    assert (stats.points, stats.invalid_points, stats.frames) == (4, 2, 2)
+    assert stats.invalid_ratio == 0.5
+    assert stats.bbox_min == (-1.0, 2.0, 0.5)
+    assert stats.bbox_max == (1.0, 5.0, 3.0)
+
+
+def test_truncated_csv_is_reported(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("x,y,z\n1,2,3\n4,5,6\n7,8")
+    stats = validate_file(str(path))
+
+    assert stats.points == 3
+    assert stats.invalid_points == 1  # The cut off row's z is missing
+    assert any("missing columns" in problem for problem in stats.problems)
+    assert any("truncated" in problem for problem in stats.problems)
+
+
+def test_only_invalid_points_are_a_problem(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_text("x,y,z\nnan,nan,nan\nnan,1,2\n")
+    stats = validate_file(str(path))
+
+    assert math.isclose(stats.invalid_ratio, 1.0)
+    assert stats.bbox_min is None
+    assert stats.problems == ["every point is invalid"]
+
+
+def test_empty_files_are_a_problem(tmp_path):
+    path = tmp_path / "a.csv"
+    path.write_bytes(b"")
+    assert validate_file(str(path)).problems == ["file is empty"]
+
+
+def test_ascii_pcd_with_fewer_points_than_declared(tmp_path):
+    path = tmp_path / "a.pcd"
+    path.write_bytes(pcd_header(5) + b"0 0 0\n1 2 3\nnan 0 0\n")
+    stats = validate_file(str(path))
+
+    assert (stats.declared_points, stats.points, stats.invalid_points) == (5, 3, 1)
+    assert stats.problems == ["truncated: header declares 5 points but 3 were found"]
+
+
+def test_binary_pcd_cut_off_mid_point(tmp_path):
+    path = tmp_path / "a.pcd"
+    rows = [(0.0, 0.0, 0.0), (1.0, 2.0, 3.0), (math.nan, 0.0, 0.0)]
+    data = b"".join(struct.pack("<3f", *row) for row in rows)
+    path.write_bytes(pcd_header(4, "binary") + data + struct.pack("<f", 7.0))
+    stats = validate_file(str(path))
+
+    assert (stats.points, stats.invalid_points) == (3, 1)
+    assert stats.bbox_max == (1.0, 2.0, 3.0)
+    assert "the last point is cut off" in stats.problems
+    assert any("truncated" in problem for problem in stats.problems)
+
+
+def test_complete_binary_pcd_is_ok(tmp_path):
+    path = tmp_path / "a.pcd"
+    path.write_bytes(pcd_header(2, "binary") + struct.pack("<6f", 0, 0, 0, 1, 1, 1))
+    stats = validate_file(str(path))
+
+    assert stats.ok, stats.problems
+    assert stats.points == 2
@@ -0,0 +1,87 @@
+import os
+import queue
+import time
+
+from replay_core.command import build_command, default_output_base
+from replay_core.watch import FolderWatcher, ProcessedIndex, watch_extensions
+
+
+def watch_for(watcher, seconds):
+    """Runs the watcher for `seconds` and returns its events."""
+    events = []
+    watcher.start()
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline:
+            try:
+                events.append(watcher.events.get(timeout=0.05))
+            except queue.Empty:
+                continue
+    finally:
+        watcher.stop()
+    return events
+
+
+def make_watcher(folder, converter, index_path, output_format=".srf", **kwargs):
+    settings = {"converter_path": converter}
+
+    def command_for(path):
+        return build_command(settings, path, default_output_base(path), output_format)
+    return FolderWatcher(str(folder), command_for, ProcessedIndex(str(index_path)), stable_seconds=0.1,
+                         poll_seconds=0.05, use_notifications=False, **kwargs)
+
+
+def test_watcher_does_not_convert_its_own_output(tmp_path, fake_converter):
+    folder = tmp_path / "recordings"
+    folder.mkdir()
+    (folder / "a.gprec").write_text("recording")
+    index_path = tmp_path / "index.jsonl"
+
+    # .srf stays a watched extension, so only the watcher's own bookkeeping keeps a.srf out
+    events = watch_for(make_watcher(folder, fake_converter, index_path), 2.0)
+    done = [path for event, path, _ in events if event == "done"]
+    assert done == [str(folder / "a.gprec")]
+    assert not [path for _, path, _ in events if path.endswith(".srf")]
+
+    # A new watcher over the same index doesn't take the output for a new recording either
+    events = watch_for(make_watcher(folder, fake_converter, index_path), 1.0)
+    assert events == []
+
+
+def test_watcher_refuses_to_overwrite_the_input(tmp_path, fake_converter):
+    folder = tmp_path / "recordings"
+    folder.mkdir()
+    recording = folder / "b.srf"
+    recording.write_text("recording")
+    stamp = os.stat(recording).st_mtime_ns
+
+    events = watch_for(make_watcher(folder, fake_converter, tmp_path / "index.jsonl"), 1.0)
+    assert [(event, path) for event, path, _ in events] == [("queued", str(recording)), ("failed", str(recording))]
+    assert "overwrite" in events[-1][2]
+    assert recording.read_text() == "recording" and os.stat(recording).st_mtime_ns == stamp
+
+
+def test_files_the_command_factory_fails_on_are_reported(tmp_path, fake_converter):
+    folder = tmp_path / "recordings"
+    folder.mkdir()
+    (folder / "a.gprec").write_text("recording")
+    (folder / "b.gprec").write_text("recording")
+    settings = {"converter_path": fake_converter}
+
+    def command_for(path):
+        if path.endswith("a.gprec"):
+            raise OSError("share went away")
+        return build_command(settings, path, default_output_base(path), ".srf")
+    watcher = FolderWatcher(str(folder), command_for, ProcessedIndex(str(tmp_path / "index.jsonl")),
+                            stable_seconds=0.1, poll_seconds=0.05, use_notifications=False)
+    events = watch_for(watcher, 2.0)
+
+    assert ("failed", str(folder / "a.gprec"), "share went away") in events
+    assert [path for event, path, _ in events if event == "done"] == [str(folder / "b.gprec")]
+
+
+def test_watch_extensions_leave_out_outputs_written_into_the_folder(tmp_path):
+    folder = tmp_path / "recordings"
+    assert ".srf" not in watch_extensions(str(folder), ".srf")
+    assert ".srf" not in watch_extensions(str(folder), ".SRF", str(folder / "converted"))
+    assert ".srf" in watch_extensions(str(folder), ".srf", str(tmp_path / "converted"))
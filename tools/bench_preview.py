@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the command preview.
+
+Simulates typing a long network output path one character at a time and measures:
+  * model   - time to rebuild the command per keystroke: the old full rebuild
+              (describe_command + format_command) vs the incremental CommandPreviewModel
+  * widget  - keystroke-to-render latency of the Text widget: delete/insert everything
+              vs the diffed update used by the GUI (skipped when no display is available)
+
+Usage (from the repository root):
+    python tools/bench_preview.py [--keystrokes 400] [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from replay_core.command import describe_command, format_command  # noqa: E402
+from replay_core.frames import resolve_frame_selection, shard_output_base  # noqa: E402
+from replay_core.preview import CommandPreviewModel, diff_text  # noqa: E402
+
+SETTINGS = {"converter_path": r"C:\Program Files\LMI\GoPxL Utilities\ReplayConverter.exe",
+            "pcd_width": "1920", "pcd_height": "1080", "pcd_swap": True, "pcd_zoom": "2.0", "pcd_remove": True}
+INPUT = r"\\fileserver\sensors\line-07\2024-05-14\shift-b\recording_000123.gprec"
+FRAMES = "1000-5000:10"
+OUTPUT_PREFIX = r"\\fileserver\converted\line-07\2024-05-14\shift-b\very\long\nested\folder\recording_000123_"
+
+
+def typed_outputs(keystrokes):
+    text = (OUTPUT_PREFIX * (keystrokes // len(OUTPUT_PREFIX) + 1))[:keystrokes]
+    return [text[:i] for i in range(1, keystrokes + 1)]
+
+
+def bench_model(outputs):
+    start = time.perf_counter()
+    for output in outputs:
+        # What update_command_display used to do on every key: parse the frames, rebuild, re-quote
+        frame_option, shard_frames, _ = resolve_frame_selection(FRAMES)
+        parts, problems = describe_command(SETTINGS, INPUT, shard_output_base(output, shard_frames[0]), ".pcd", frame_option)
+        format_command(parts)
+    full = (time.perf_counter() - start) / len(outputs)
+
+    model = CommandPreviewModel()
+    start = time.perf_counter()
+    for output in outputs:
+        model.set(SETTINGS, INPUT, output, ".pcd", FRAMES)
+        model.render()
+    incremental = (time.perf_counter() - start) / len(outputs)
+    return full, incremental
+
+
+def bench_widget(outputs):
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as e:  # No display (e.g. a headless server)
+        print(f"widget: skipped ({e})")
+        return None
+    root.withdraw()
+    text = tk.Text(root, width=80, height=6, wrap='word')
+    text.pack()
+    root.update()
+
+    def full_update(display):
+        text.delete('1.0', tk.END)
+        text.insert('1.0', display)
+
+    shown = [""]
+
+    def diffed_update(display):
+        start, old_end, replacement = diff_text(shown[0], display)
+        text.delete(f"1.0 + {start} chars", f"1.0 + {old_end} chars")
+        if replacement:
+            text.insert(f"1.0 + {start} chars", replacement)
+        shown[0] = display
+
+    displays = [format_command(describe_command(SETTINGS, INPUT, output, ".pcd", "7")[0]) for output in outputs]
+    results = {}
+    for name, update in (("full", full_update), ("diffed", diffed_update)):
+        text.delete('1.0', tk.END)
+        shown[0] = ""
+        latencies = []
+        for display in displays:
+            start = time.perf_counter()
+            update(display)
+            root.update_idletasks()  # Forces layout/redraw, i.e. "rendered"
+            latencies.append(time.perf_counter() - start)
+        results[name] = latencies
+    root.destroy()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keystrokes", type=int, default=400)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    outputs = typed_outputs(args.keystrokes)
+
+    model_runs = [bench_model(outputs) for _ in range(args.repeat)]
+    full = min(run[0] for run in model_runs)
+    incremental = min(run[1] for run in model_runs)
+    print(f"model:  full rebuild {full * 1e6:8.1f} us/keystroke   incremental {incremental * 1e6:8.1f} us/keystroke")
+
+    widget = bench_widget(outputs)
+    if widget:
+        for name, latencies in widget.items():
+            latencies_ms = sorted(l * 1000 for l in latencies)
+            p95 = latencies_ms[int(len(latencies_ms) * 0.95) - 1]
+            print(f"widget: {name:6s} median {statistics.median(latencies_ms):6.3f} ms   p95 {p95:6.3f} ms   "
+                  f"max {latencies_ms[-1]:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
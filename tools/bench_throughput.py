@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of the conversion engine against the fake converter.
+
+Points `converter_path` at tools/fake_replay_converter.py (configured through its
+FAKE_RC_* environment variables) and measures:
+  * spawn       - wall time of one minimal conversion through ConversionJob vs a bare
+                  subprocess.run of the same command, i.e. what the wrapper adds per job
+  * throughput  - jobs/sec of a BatchRunner over the same set of inputs for 1..N workers
+  * memory      - peak RSS of this (parent) process during each run
+  * loop        - latency of a 100 ms "UI" tick on the main thread that does the GUI's
+                  per-tick polling work (drain events, read progress) while jobs run;
+                  this is what delays Tk's event loop, without needing a display
+
+Results are printed and written to JSON; pass --compare with an earlier file to see
+the change per metric (e.g. between two commits).
+
+Usage (from the repository root):
+    python tools/bench_throughput.py [--workers 1,2,4] [--jobs 16] [--frames 20]
+        [--frame-cpu 0.01] [--frame-bytes 100000] [--stdout-lines 5]
+        [--output bench_results.json] [--compare old.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(TOOLS_DIR, "..", "src"))
+
+from replay_core.batch import BatchJob, BatchRunner, default_max_workers  # noqa: E402
+from replay_core.command import build_command  # noqa: E402
+from replay_core.engine import ConversionJob  # noqa: E402
+
+FAKE_CONVERTER = os.path.join(TOOLS_DIR, "fake_replay_converter.py")
+UI_TICK_SECONDS = 0.1  # Same as ReplayConverterApp.JOB_POLL_INTERVAL_MS
+
+
+def converter_command(scratch_dir):
+    """Path to launch the fake converter as if it were ReplayConverter.exe."""
+    if os.name != "nt":
+        return FAKE_CONVERTER
+    # Windows can't run a .py file directly, so wrap it in a batch file
+    wrapper = os.path.join(scratch_dir, "fake_replay_converter.cmd")
+    with open(wrapper, "w") as f:
+        f.write(f'@"{sys.executable}" "{FAKE_CONVERTER}" %*\n')
+    return wrapper
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None if it can't be read."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def make_inputs(scratch_dir, count):
+    paths = []
+    for index in range(count):
+        path = os.path.join(scratch_dir, f"recording_{index:04d}.gprec")
+        with open(path, "w") as f:
+            f.write("fake recording\n")
+        paths.append(path)
+    return paths
+
+
+def bench_spawn(settings, input_file, output_base, repeat):
+    """Median seconds per minimal conversion: bare subprocess vs ConversionJob."""
+    command_parts = build_command(settings, input_file, output_base, ".srf", "0")
+    saved = dict(os.environ)
+    # One instant frame, so only process start-up and the wrapper are measured
+    os.environ.update(FAKE_RC_FRAMES="1", FAKE_RC_FRAME_DELAY="0", FAKE_RC_FRAME_CPU="0",
+                      FAKE_RC_FRAME_BYTES="0", FAKE_RC_STDOUT_LINES="0")
+    try:
+        bare, wrapped = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run(command_parts, stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL)
+            bare.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            result = ConversionJob(command_parts).run()
+            wrapped.append(time.perf_counter() - start)
+            if not result.succeeded:
+                raise RuntimeError(f"Fake converter failed: {result.stderr or result.error}")
+    finally:
+        os.environ.clear()
+        os.environ.update(saved)
+    return {
+        "bare_ms": statistics.median(bare) * 1000,
+        "job_ms": statistics.median(wrapped) * 1000,
+        "overhead_ms": (statistics.median(wrapped) - statistics.median(bare)) * 1000,
+    }
+
+
+def bench_workers(settings, inputs, scratch_dir, workers):
+    """Runs every input through a BatchRunner with `workers` workers while ticking a fake UI loop."""
+    jobs = []
+    for index, input_file in enumerate(inputs):
+        output_base = os.path.join(scratch_dir, f"out_{workers}_{index:04d}")
+        jobs.append(BatchJob(str(index), input_file, build_command(settings, input_file, output_base, ".csv", None)))
+
+    rss_before = current_rss()
+    rss_peak = rss_before
+    latencies = []
+    runner = BatchRunner(jobs, max_workers=workers)
+    runner.start()
+    summary = None
+    next_tick = time.perf_counter() + UI_TICK_SECONDS
+    while summary is None:
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+        latencies.append(max(0.0, time.perf_counter() - next_tick))
+        # The GUI's per-tick work: drain status events and read every active job's progress
+        while not runner.events.empty():
+            event, payload = runner.events.get_nowait()
+            if event == "done":
+                summary = payload
+        for conversion in runner.active_conversions().values():
+            conversion.progress.snapshot()
+        rss = current_rss()
+        if rss is not None:
+            rss_peak = max(rss_peak or 0, rss)
+        next_tick += UI_TICK_SECONDS
+        if next_tick < time.perf_counter():  # A tick overran; don't try to catch up
+            next_tick = time.perf_counter() + UI_TICK_SECONDS
+
+    if summary.failed:
+        raise RuntimeError(f"{summary.failed} job(s) failed: {summary.failed_jobs[0].result.stderr}")
+    latencies_ms = [value * 1000 for value in latencies]
+    return {
+        "workers": workers,
+        "jobs": len(jobs),
+        "elapsed_s": summary.elapsed,
+        "jobs_per_sec": len(jobs) / summary.elapsed if summary.elapsed else None,
+        "parent_rss_mb": rss_before / 2**20 if rss_before is not None else None,
+        "parent_rss_peak_mb": rss_peak / 2**20 if rss_peak is not None else None,
+        "loop_latency_ms": {
+            "median": statistics.median(latencies_ms),
+            "p95": percentile(latencies_ms, 0.95),
+            "max": max(latencies_ms),
+        },
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=TOOLS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def flatten(results):
+    """Maps 'section.key' -> number for --compare."""
+    flat = {f"spawn.{key}": value for key, value in results["spawn"].items()}
+    for run in results["throughput"]:
+        prefix = f"workers={run['workers']}"
+        flat[f"{prefix}.jobs_per_sec"] = run["jobs_per_sec"]
+        flat[f"{prefix}.parent_rss_peak_mb"] = run["parent_rss_peak_mb"]
+        for key, value in run["loop_latency_ms"].items():
+            flat[f"{prefix}.loop_latency_ms.{key}"] = value
+    return flat
+
+
+def print_comparison(old, new):
+    old_flat, new_flat = flatten(old), flatten(new)
+    print(f"\nCompared with {old['meta'].get('revision') or 'previous run'}:")
+    for key, value in new_flat.items():
+        before = old_flat.get(key)
+        if before is None or value is None:
+            continue
+        change = f"{(value - before) / before:+.1%}" if before else "n/a"
+        print(f"  {key:<42s} {before:10.2f} -> {value:10.2f}  ({change})")
+
+
+def parse_workers(text):
+    try:
+        workers = sorted({int(item) for item in text.split(",") if item.strip()})
+    except ValueError:
+        raise argparse.ArgumentTypeError("use a comma separated list such as 1,2,4")
+    if not workers or workers[0] < 1:
+        raise argparse.ArgumentTypeError("worker counts must be at least 1")
+    return workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    default_workers = ",".join(str(n) for n in sorted({1, 2, default_max_workers()}))
+    parser.add_argument("--workers", type=parse_workers, default=parse_workers(default_workers),
+                        help=f"worker counts to run (default: {default_workers})")
+    parser.add_argument("--jobs", type=int, default=16, help="conversions per run (default: 16)")
+    parser.add_argument("--frames", type=int, default=20, help="frames per recording (default: 20)")
+    parser.add_argument("--frame-delay", type=float, default=0.0, help="seconds slept per frame (default: 0)")
+    parser.add_argument("--frame-cpu", type=float, default=0.01, help="CPU seconds per frame (default: 0.01)")
+    parser.add_argument("--frame-bytes", type=int, default=100000, help="output bytes per frame (default: 100000)")
+    parser.add_argument("--stdout-lines", type=int, default=5, help="extra stdout lines per frame (default: 5)")
+    parser.add_argument("--spawn-repeat", type=int, default=20, help="samples for the spawn benchmark (default: 20)")
+    parser.add_argument("--output", default="bench_results.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    fake_config = {
+        "FAKE_RC_FRAMES": str(args.frames),
+        "FAKE_RC_FRAME_DELAY": str(args.frame_delay),
+        "FAKE_RC_FRAME_CPU": str(args.frame_cpu),
+        "FAKE_RC_FRAME_BYTES": str(args.frame_bytes),
+        "FAKE_RC_STDOUT_LINES": str(args.stdout_lines),
+        "FAKE_RC_EXIT_CODE": "0",
+    }
+    os.environ.update(fake_config)  # Inherited by every converter process
+
+    with tempfile.TemporaryDirectory(prefix="replay_bench_") as scratch_dir:
+        settings = {"converter_path": converter_command(scratch_dir)}
+        inputs = make_inputs(scratch_dir, args.jobs)
+
+        spawn = bench_spawn(settings, inputs[0], os.path.join(scratch_dir, "spawn"), args.spawn_repeat)
+        print(f"spawn:  bare {spawn['bare_ms']:7.1f} ms   ConversionJob {spawn['job_ms']:7.1f} ms   "
+              f"overhead {spawn['overhead_ms']:+6.1f} ms")
+
+        throughput = []
+        for workers in args.workers:
+            run = bench_workers(settings, inputs, scratch_dir, workers)
+            throughput.append(run)
+            latency = run["loop_latency_ms"]
+            rss = run["parent_rss_peak_mb"]
+            rss_text = f"{rss:6.1f} MB" if rss is not None else "n/a"
+            print(f"workers={workers:<3d} {run['jobs_per_sec']:7.2f} jobs/s   parent RSS peak {rss_text}   "
+                  f"UI tick latency median {latency['median']:6.2f} ms  p95 {latency['p95']:6.2f} ms  "
+                  f"max {latency['max']:6.2f} ms")
+
+    results = {
+        "meta": {
+            "revision": git_revision(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "config": dict(vars(args), **fake_config),
+        },
+        "spawn": spawn,
+        "throughput": throughput,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), results)
+
+
+if __name__ == "__main__":
+    main()
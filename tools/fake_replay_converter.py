@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Stand-in for LMI's ReplayConverter.exe, for trying the GUI out on machines without it.
+
+Point the "ReplayConverter.exe Path" setting at this script (it must be executable,
+e.g. `chmod +x tools/fake_replay_converter.py`). It accepts the same arguments the
+GUI generates (-i, -o, -a, -f, -w, -h, -s, -z, -r), sleeps a little per frame,
+prints a progress line per frame and writes a small output file.
+
+Behaviour is tuned with environment variables:
+    FAKE_RC_FRAMES        number of frames in the "recording" (default 10)
+    FAKE_RC_FRAME_DELAY   seconds slept per frame (default 0.1)
+    FAKE_RC_FRAME_CPU     seconds of busy CPU work per frame (default 0)
+    FAKE_RC_FRAME_BYTES   bytes written to the output per frame (default: one short line)
+    FAKE_RC_STDOUT_LINES  extra log lines printed per frame (default 0)
+    FAKE_RC_EXIT_CODE     exit code to finish with (default 0)
+    FAKE_RC_SPLIT_FRAMES  1 to write one <name>_<frame><ext> file per frame with -a (default 0)
+    FAKE_RC_CRASH_AFTER   exit with code 1 after this many frames, as if the converter crashed
+"""
+import argparse
+import os
+import sys
+import time
+
+
+def env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def env_float(name, default):
+    try:
+        return float(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def burn_cpu(seconds):
+    """Keeps one core busy for `seconds` of CPU time, like real point-cloud processing."""
+    end = time.process_time() + seconds
+    value = 0
+    while time.process_time() < end:
+        for i in range(1000):
+            value = (value * 31 + i) & 0xFFFFFFFF
+    return value
+
+
+def padding(size):
+    """`size` bytes of filler text ending in a newline."""
+    if size <= 1:
+        return "\n"[:size]
+    return "0" * (size - 1) + "\n"
+
+
+USAGE = """Fake ReplayConverter version 0.1 (stand-in for LMI's ReplayConverter.exe)
+Usage: ReplayConverter.exe -i <input> -o <output> [-a | -f <frame>] [PCD options]
+  -i <input>    recording to convert (.gprec, .srf, .sur, .pcd, .pro)
+  -o <output>   output file; the extension selects the format (.gprec, .srf, .sur, .pcd, .pro, .csv)
+  -a            export all frames
+  -f <frame>    export a single frame
+  -w <width>    PCD import width
+  -h <height>   PCD import height
+  -s            PCD: swap x and y
+  -z <zoom>     PCD import zoom
+  -r            PCD: remove invalid points"""
+
+
+def main(argv=None):
+    # add_help=False because -h is the PCD height option, as in the real tool
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("-i", dest="input")
+    parser.add_argument("-o", dest="output")
+    parser.add_argument("-a", dest="all_frames", action="store_true")
+    parser.add_argument("-f", dest="frame", type=int)
+    parser.add_argument("-w", dest="width")
+    parser.add_argument("-h", dest="height")
+    parser.add_argument("-s", dest="swap", action="store_true")
+    parser.add_argument("-z", dest="zoom")
+    parser.add_argument("-r", dest="remove", action="store_true")
+    args = parser.parse_args(argv)
+
+    if not args.input or not args.output:
+        print("Error: both -i and -o are required.", file=sys.stderr)
+        print(USAGE)  # Read by the GUI's converter probe (replay_core/probe.py)
+        return 2
+    if not os.path.isfile(args.input):
+        print(f"Error: input file not found: {args.input}", file=sys.stderr)
+        return 3
+
+    total_frames = env_int("FAKE_RC_FRAMES", 10)
+    frame_delay = env_float("FAKE_RC_FRAME_DELAY", 0.1)
+    frame_cpu = env_float("FAKE_RC_FRAME_CPU", 0.0)
+    frame_bytes = env_int("FAKE_RC_FRAME_BYTES", 0)
+    stdout_lines = env_int("FAKE_RC_STDOUT_LINES", 0)
+    exit_code = env_int("FAKE_RC_EXIT_CODE", 0)
+    split_frames = args.all_frames and env_int("FAKE_RC_SPLIT_FRAMES", 0)
+    crash_after = env_int("FAKE_RC_CRASH_AFTER", -1)
+
+    if args.all_frames:
+        frames = list(range(total_frames))
+    else:
+        frame = args.frame or 0
+        if frame < 0 or frame >= total_frames:
+            print(f"Error: frame index {frame} out of range (0-{total_frames - 1}).", file=sys.stderr)
+            return 4
+        frames = [frame]
+
+    print(f"Converting {args.input} -> {args.output}", flush=True)
+    base, ext = os.path.splitext(args.output)
+    with open(os.devnull if split_frames else args.output, "w") as out:
+        for count, frame in enumerate(frames, start=1):
+            if count - 1 == crash_after:
+                print(f"Error: simulated crash after {crash_after} frames.", file=sys.stderr)
+                return 1
+            if split_frames:
+                out.close()
+                out = open(f"{base}_{frame}{ext}", "w")
+            if frame_delay > 0:
+                time.sleep(frame_delay)
+            if frame_cpu > 0:
+                burn_cpu(frame_cpu)
+            header = f"# frame {frame}\n"
+            out.write(header)
+            if frame_bytes > len(header):
+                out.write(padding(frame_bytes - len(header)))
+            for line in range(stdout_lines):
+                print(f"  block {line + 1}: {frame_bytes // max(stdout_lines, 1)} bytes")
+            print(f"Processing frame {count}/{len(frames)}", flush=True)
+
+    if exit_code:
+        print(f"Error: simulated failure (exit code {exit_code}).", file=sys.stderr)
+    else:
+        print("Done.", flush=True)
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())